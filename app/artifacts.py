@@ -0,0 +1,144 @@
+"""Rechnungs-PDF und XRechnung erst beim Abruf erzeugen.
+
+Gespeicherte Vorgänge enthalten nur ``invoice.json``; PDF und XML entstehen
+beim ersten ``GET /data/<verzeichnis>/invoice.pdf`` bzw. ``.xml``. Das
+Ergebnis liegt in einem :class:`~app.cache.TieredCache`, dessen Schlüssel
+ein Hash über den Rechnungsinhalt und die Rechnungssteller-Einstellungen
+ist: identische Rechnungen (mehrere Dialogrunden, Wiederholungen) werden
+einmal gerendert. Der Hash dient zugleich als ``ETag``.
+"""
+
+from __future__ import annotations
+
+import json
+import tempfile
+from pathlib import Path
+from typing import Callable
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+
+from app import persistence
+from app.cache import TieredCache, make_key
+from app.concurrency import run_blocking
+from app.models import InvoiceContext
+from app.pdf import generate_invoice_pdf
+from app.settings import settings
+from app.xrechnung import generate_xrechnung_xml
+
+router = APIRouter()
+
+# Dateiendung → (Medientyp, Renderer)
+ARTIFACT_KINDS: dict[str, tuple[str, Callable[[InvoiceContext, Path], None]]] = {
+    "pdf": ("application/pdf", generate_invoice_pdf),
+    "xml": ("application/xml", generate_xrechnung_xml),
+}
+
+_artifact_cache: TieredCache[bytes] | None = None
+
+
+def get_artifact_cache() -> TieredCache[bytes]:
+    """Gibt den prozessweiten Cache für gerenderte Rechnungen zurück."""
+    global _artifact_cache
+    if _artifact_cache is None:
+        _artifact_cache = TieredCache(
+            "artifact_cache",
+            max_entries=settings.artifact_cache_max_entries,
+            ttl=settings.artifact_cache_ttl,
+            disk_dir=settings.artifact_cache_dir,
+            binary=True,
+        )
+    return _artifact_cache
+
+
+def artifact_key(invoice: InvoiceContext, kind: str) -> str:
+    """Inhalts-Hash einer Rechnung samt der Einstellungen, die das Layout prägen."""
+    content = json.dumps(
+        invoice.model_dump(mode="json"), sort_keys=True, separators=(",", ":")
+    )
+    layout = json.dumps(
+        [
+            settings.vat_rate,
+            settings.supplier_name,
+            settings.supplier_address,
+            settings.supplier_vat_id,
+            settings.supplier_contact,
+            settings.payment_terms,
+            settings.payment_iban,
+            settings.payment_bic,
+            settings.invoice_template_pdf,
+        ]
+    )
+    return make_key("invoice-artifact", kind, layout, content)
+
+
+def render_artifact(invoice: InvoiceContext, kind: str) -> bytes:
+    """Rendert PDF bzw. XML ohne Cache (die Renderer schreiben in Dateien)."""
+    _, renderer = ARTIFACT_KINDS[kind]
+    with tempfile.TemporaryDirectory(prefix="invoice-") as tmp:
+        path = Path(tmp) / f"invoice.{kind}"
+        renderer(invoice, path)
+        return path.read_bytes()
+
+
+async def artifact_response(
+    request: Request, invoice: InvoiceContext, kind: str
+) -> Response:
+    """Antwortet mit dem (gecachten) Artefakt; ``If-None-Match`` ergibt 304."""
+    key = artifact_key(invoice, kind)
+    etag = f'"{key[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    tags = {
+        tag.strip().removeprefix("W/")
+        for tag in request.headers.get("if-none-match", "").split(",")
+    }
+    if etag in tags or "*" in tags:
+        return Response(status_code=304, headers=headers)
+
+    async def compute() -> bytes:
+        return await run_blocking(render_artifact, invoice, kind)
+
+    data = await get_artifact_cache().aget_or_compute(key, compute)
+    media_type, _ = ARTIFACT_KINDS[kind]
+    return Response(content=data, media_type=media_type, headers=headers)
+
+
+def artifact_links(log_dir: str) -> dict[str, str]:
+    """Antwortfelder zum PDF eines unter ``log_dir`` gespeicherten Vorgangs.
+
+    ``pdf_url`` funktioniert in beiden Modi. ``pdf_path`` wird nur angegeben,
+    wenn die Datei tatsächlich geschrieben wurde (``INVOICE_ARTIFACTS_LAZY``
+    aus); im Lazy-Modus entsteht das PDF erst beim Abruf der URL.
+    """
+    pdf_path = str(Path(log_dir) / "invoice.pdf")
+    links = {"pdf_url": "/" + pdf_path.replace("\\", "/")}
+    if not settings.invoice_artifacts_lazy:
+        links["pdf_path"] = pdf_path
+    return links
+
+
+def _load_invoice(path: Path) -> InvoiceContext:
+    return InvoiceContext.model_validate_json(path.read_bytes())
+
+
+@router.get("/data/{artifact_dir:path}/invoice.{kind}")
+async def invoice_artifact(artifact_dir: str, kind: str, request: Request):
+    """Liefert ``invoice.pdf``/``invoice.xml`` eines gespeicherten Vorgangs.
+
+    Vorrang vor dem statischen ``/data``-Mount: Liegt ``invoice.json`` im
+    Verzeichnis, wird daraus gerendert; sonst (z. B. ``invoice.json`` selbst
+    oder mit ``INVOICE_ARTIFACTS_LAZY=false`` erzeugte Dateien) wird die
+    Datei unverändert ausgeliefert.
+    """
+    base = persistence.DATA_DIR.resolve()
+    target = (base / artifact_dir).resolve()
+    if not target.is_relative_to(base):
+        raise HTTPException(status_code=404, detail="Not Found")
+    source = target / "invoice.json"
+    if kind in ARTIFACT_KINDS and source.is_file():
+        invoice = await run_blocking(_load_invoice, source)
+        return await artifact_response(request, invoice, kind)
+    stored = target / f"invoice.{kind}"
+    if not stored.is_file():
+        raise HTTPException(status_code=404, detail="Not Found")
+    return FileResponse(stored)
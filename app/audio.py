@@ -0,0 +1,501 @@
+"""Audio-Uploads einlesen und bei Bedarf per ffmpeg-Pipe in WAV umwandeln.
+
+Der Upload wird stückweise aus dem ``UploadFile`` gelesen und direkt in
+ffmpegs stdin geschrieben; das WAV kommt über stdout zurück. So entfallen die
+temporären Dateien und mehrfachen Kopien der Audiodaten. Akzeptiert das
+konfigurierte STT-Backend den Originalcontainer, wird gar nicht konvertiert.
+
+Vor der Spracherkennung wird WAV-Audio zudem normalisiert (16 kHz Mono,
+Stille am Rand entfernt, lange Pausen gekürzt), was Whisper-Rechenzeit,
+Upload-Größe und Speicherplatz spart.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import logging
+import struct
+import subprocess  # nosec B404
+import wave
+from collections import deque
+from pathlib import Path
+from typing import AsyncIterator, Iterable
+
+import numpy as np
+from fastapi import HTTPException, UploadFile
+
+from app import metrics
+from app.concurrency import run_blocking
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# Magische Bytes der gängigen Container, Offset und Signatur.
+_SIGNATURES: tuple[tuple[str, int, bytes], ...] = (
+    ("flac", 0, b"fLaC"),
+    ("ogg", 0, b"OggS"),
+    ("webm", 0, b"\x1a\x45\xdf\xa3"),
+    ("mp3", 0, b"ID3"),
+    ("m4a", 4, b"ftyp"),
+)
+
+
+# Analysefenster der Energie-VAD in Sekunden.
+_VAD_FRAME = 0.03
+
+
+def _ffmpeg_command() -> list[str]:
+    command = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", "pipe:0"]
+    if settings.audio_normalize:
+        # Downmix und Resampling gleich beim Dekodieren erledigen.
+        command += ["-ac", "1", "-ar", str(settings.audio_sample_rate)]
+    return command + ["-f", "wav", "pipe:1"]
+
+
+def audio_format(filename: str | None) -> str | None:
+    """Leitet das Format aus der Dateiendung ab (``"audio.M4A"`` → ``"m4a"``)."""
+    suffix = Path(filename or "").suffix.lower().lstrip(".")
+    return suffix or None
+
+
+def sniff_format(data: bytes) -> str | None:
+    """Erkennt den Container anhand der ersten Bytes."""
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        return "wav"
+    for name, offset, signature in _SIGNATURES:
+        if data[offset : offset + len(signature)] == signature:
+            return name
+    if len(data) >= 2 and data[0] == 0xFF and data[1] & 0xE0 == 0xE0:
+        return "mp3"
+    return None
+
+
+async def iter_upload(
+    file: UploadFile, chunk_size: int = CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    """Liest einen Upload stückweise."""
+    while chunk := await file.read(chunk_size):
+        yield chunk
+
+
+async def iter_bytes(
+    data: bytes, chunk_size: int = CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    """Stellt bereits geladene Bytes als Chunk-Strom bereit (z. B. für Jobs)."""
+    view = memoryview(data)
+    for start in range(0, len(view), chunk_size):
+        yield bytes(view[start : start + chunk_size])
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Upload exceeds {max_bytes // (1024 * 1024)} MB",
+    )
+
+
+async def read_capped(
+    chunks: AsyncIterator[bytes], max_bytes: int | None = None
+) -> bytes:
+    """Sammelt alle Chunks, bricht aber beim Größenlimit mit ``413`` ab."""
+    limit = settings.audio_max_upload_bytes if max_bytes is None else max_bytes
+    parts: list[bytes] = []
+    total = 0
+    async for chunk in chunks:
+        total += len(chunk)
+        if total > limit:
+            raise _too_large(limit)
+        parts.append(chunk)
+    return b"".join(parts)
+
+
+def _fix_wav_header(data: bytes) -> bytes:
+    """Trägt die echten Längen in einen über eine Pipe geschriebenen WAV-Header ein.
+
+    ffmpeg kann bei nicht spulbarer Ausgabe die Größenfelder nicht
+    nachträglich setzen und schreibt Platzhalter.
+    """
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return data
+    fixed = bytearray(data)
+    struct.pack_into("<I", fixed, 4, min(len(fixed) - 8, 0xFFFFFFFF))
+    pos = 12
+    while pos + 8 <= len(fixed):
+        chunk_id = bytes(fixed[pos : pos + 4])
+        (size,) = struct.unpack_from("<I", fixed, pos + 4)
+        if chunk_id == b"data":
+            struct.pack_into("<I", fixed, pos + 4, len(fixed) - pos - 8)
+            break
+        pos += 8 + size + (size & 1)
+    return bytes(fixed)
+
+
+async def convert_to_wav(
+    chunks: AsyncIterator[bytes],
+    *,
+    max_bytes: int | None = None,
+    timeout: float | None = None,
+) -> bytes:
+    """Streamt Audio durch ffmpeg und gibt WAV-Bytes zurück.
+
+    Eingabe und Ausgabe laufen gleichzeitig über Pipes, damit ffmpeg nicht
+    auf einem vollen stdout-Puffer hängen bleibt. ``413`` bei zu großen
+    Uploads, ``504`` bei Zeitüberschreitung, ``422`` wenn ffmpeg die Datei
+    nicht lesen kann.
+    """
+    limit = settings.audio_max_upload_bytes if max_bytes is None else max_bytes
+    timeout_s = settings.audio_conversion_timeout if timeout is None else timeout
+    command = _ffmpeg_command()
+    try:
+        proc = await asyncio.create_subprocess_exec(  # nosec B603
+            *command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+    except FileNotFoundError as exc:
+        raise RuntimeError(
+            "Audio conversion requires ffmpeg. Install it or upload WAV files."
+        ) from exc
+
+    async def feed() -> None:
+        total = 0
+        try:
+            async for chunk in chunks:
+                total += len(chunk)
+                if total > limit:
+                    raise _too_large(limit)
+                proc.stdin.write(chunk)
+                await proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # ffmpeg hat vorzeitig beendet; der Exit-Code liefert den Grund.
+            pass
+        finally:
+            proc.stdin.close()
+
+    async def run() -> tuple[bytes, bytes]:
+        _, out, err = await asyncio.gather(
+            feed(), proc.stdout.read(), proc.stderr.read()
+        )
+        await proc.wait()
+        return out, err
+
+    try:
+        out, err = await asyncio.wait_for(run(), timeout_s)
+    except asyncio.TimeoutError as exc:
+        logger.warning("Audio conversion timed out after %.1f s", timeout_s)
+        raise HTTPException(
+            status_code=504, detail="Audio conversion timed out"
+        ) from exc
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+
+    if proc.returncode != 0:
+        logger.warning(
+            "ffmpeg failed with code %s: %s",
+            proc.returncode,
+            err.decode("utf-8", "replace").strip(),
+        )
+        raise HTTPException(status_code=422, detail="Audio conversion failed")
+    return _fix_wav_header(out)
+
+
+async def prepare_audio(
+    chunks: AsyncIterator[bytes],
+    filename: str | None,
+    accepted_formats: Iterable[str],
+) -> bytes:
+    """Liest einen Audio-Upload und konvertiert nur, wenn es nötig ist.
+
+    WAV-Dateien und Container, die das STT-Backend selbst versteht, werden
+    unverändert übernommen.
+    """
+    fmt = audio_format(filename)
+    if fmt == "wav" or fmt in set(accepted_formats):
+        return await read_capped(chunks)
+    logger.debug("Converting %s upload to WAV", fmt or "unknown")
+    return await convert_to_wav(chunks)
+
+
+def _read_pcm(data: bytes) -> tuple[np.ndarray, int]:
+    """Liest PCM-WAV als Float-Array ``(frames, channels)`` in [-1, 1]."""
+    with wave.open(io.BytesIO(data)) as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        rate = wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    elif width == 3:
+        padded = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        ints = (
+            padded[:, 0].astype(np.int32)
+            | padded[:, 1].astype(np.int32) << 8
+            | padded[:, 2].astype(np.int8).astype(np.int32) << 16
+        )
+        samples = ints.astype(np.float32) / 8388608
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648
+    else:  # pragma: no cover - exotic formats
+        raise ValueError(f"unsupported sample width {width}")
+    usable = len(samples) - len(samples) % channels
+    return samples[:usable].reshape(-1, channels), rate
+
+
+def _resample(samples: np.ndarray, rate: int, target: int) -> np.ndarray:
+    """Lineares Resampling mit einfachem Tiefpass gegen Aliasing."""
+    if rate == target or len(samples) == 0:
+        return samples
+    ratio = rate / target
+    if ratio > 1:
+        width = int(round(ratio))
+        if width > 1:
+            kernel = np.ones(width, dtype=np.float32) / width
+            samples = np.convolve(samples, kernel, mode="same")
+    length = int(len(samples) / ratio)
+    positions = np.arange(length, dtype=np.float64) * ratio
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def frame_levels(samples: np.ndarray, rate: int) -> tuple[np.ndarray, int]:
+    """Pegel in dBFS je Analysefenster (``_VAD_FRAME``) und Fenstergröße."""
+    frame = max(1, int(rate * _VAD_FRAME))
+    count = len(samples) // frame
+    if count == 0:
+        return np.zeros(0, dtype=np.float64), frame
+    frames = samples[: count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10)), frame
+
+
+def _speech_frames(samples: np.ndarray, rate: int) -> tuple[np.ndarray, int]:
+    """Markiert Analysefenster, deren Energie über der VAD-Schwelle liegt."""
+    levels, frame = frame_levels(samples, rate)
+    return levels > settings.audio_vad_threshold_db, frame
+
+
+def _trim_silence(samples: np.ndarray, rate: int) -> np.ndarray:
+    """Schneidet Stille am Rand ab und kürzt lange Pausen auf ``audio_max_pause``."""
+    speech, frame = _speech_frames(samples, rate)
+    if not speech.any():
+        return samples
+    # Etwas Rand um Sprache stehen lassen, damit Wortanfänge nicht fehlen.
+    pad = max(1, int(settings.audio_vad_padding / _VAD_FRAME))
+    keep = speech.copy()
+    for shift in range(1, pad + 1):
+        keep[shift:] |= speech[:-shift]
+        keep[:-shift] |= speech[shift:]
+    max_pause = max(0, int(settings.audio_max_pause / _VAD_FRAME))
+
+    first = int(np.argmax(keep))
+    last = len(keep) - int(np.argmax(keep[::-1]))
+    segments: list[np.ndarray] = []
+    index = first
+    while index < last:
+        end = index
+        while end < last and keep[end] == keep[index]:
+            end += 1
+        start_sample, end_sample = index * frame, end * frame
+        if keep[index]:
+            segments.append(samples[start_sample:end_sample])
+        elif end - index > max_pause:
+            # Lange Pause: je eine halbe Maximalpause vor und nach dem Schnitt.
+            half = (max_pause * frame) // 2
+            segments.append(samples[start_sample : start_sample + half])
+            segments.append(samples[end_sample - half : end_sample])
+        else:
+            segments.append(samples[start_sample:end_sample])
+        index = end
+    if last == len(keep):
+        segments.append(samples[last * frame :])
+    return np.concatenate(segments)
+
+
+def encode_wav(samples: np.ndarray, rate: int) -> bytes:
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def normalize_wav(data: bytes) -> bytes:
+    """Wandelt WAV in 16 kHz Mono und entfernt Stille für die Spracherkennung.
+
+    Nicht lesbare Daten werden unverändert zurückgegeben.
+    """
+    try:
+        samples, rate = _read_pcm(data)
+    except (wave.Error, EOFError, ValueError) as exc:
+        logger.debug("Skipping audio normalization: %s", exc)
+        return data
+    target = settings.audio_sample_rate
+    mono = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+    mono = _resample(mono, rate, target)
+    trimmed = _trim_silence(mono, target)
+    result = encode_wav(trimmed, target)
+
+    seconds_before = len(samples) / rate if rate else 0.0
+    seconds_after = len(trimmed) / target
+    bytes_saved = len(data) - len(result)
+    logger.info(
+        "Normalized audio: %d -> %d bytes (%d saved), %.1f -> %.1f s (%.1f s saved)",
+        len(data),
+        len(result),
+        bytes_saved,
+        seconds_before,
+        seconds_after,
+        seconds_before - seconds_after,
+    )
+    metrics.inc("audio.bytes_saved", bytes_saved)
+    metrics.inc("audio.seconds_saved", seconds_before - seconds_after)
+    return result
+
+
+class SpeechSegmenter:
+    """Zerlegt einen laufenden 16-Bit-PCM-Strom an Sprechpausen in Segmente.
+
+    Für das Streaming-Diktat: Jedes Segment endet nach
+    ``stream_segment_pause`` Sekunden Stille oder spätestens nach
+    ``stream_max_segment`` Sekunden und kann sofort transkribiert werden.
+    Stille zwischen den Segmenten wird verworfen, bis auf
+    ``audio_vad_padding`` Rand um die Sprache.
+    """
+
+    def __init__(self, rate: int) -> None:
+        self.rate = rate
+        self.target = settings.audio_sample_rate
+        pad = max(1, int(settings.audio_vad_padding / _VAD_FRAME))
+        self._pad = pad
+        self._pause = max(1, int(settings.stream_segment_pause / _VAD_FRAME))
+        self._max_frames = max(1, int(settings.stream_max_segment / _VAD_FRAME))
+        self._odd = b""
+        self._rest = np.zeros(0, dtype=np.float32)
+        self._lead: deque[np.ndarray] = deque(maxlen=pad)
+        self._frames: list[np.ndarray] = []
+        self._silence = 0
+
+    def feed(self, data: bytes) -> list[np.ndarray]:
+        """Nimmt PCM-Bytes entgegen und liefert abgeschlossene Segmente."""
+        data = self._odd + data
+        usable = len(data) - len(data) % 2
+        self._odd = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768
+        resampled = _resample(samples, self.rate, self.target)
+        samples = np.concatenate([self._rest, resampled])
+        speech, frame = _speech_frames(samples, self.target)
+        self._rest = samples[len(speech) * frame :]
+        segments: list[np.ndarray] = []
+        for index, voiced in enumerate(speech):
+            chunk = samples[index * frame : (index + 1) * frame]
+            if voiced:
+                if not self._frames:
+                    self._frames.extend(self._lead)
+                    self._lead.clear()
+                self._frames.append(chunk)
+                self._silence = 0
+            elif self._frames:
+                self._frames.append(chunk)
+                self._silence += 1
+            else:
+                self._lead.append(chunk)
+                continue
+            if self._silence >= self._pause or len(self._frames) >= self._max_frames:
+                segments.append(self._cut())
+        return segments
+
+    def flush(self) -> np.ndarray | None:
+        """Gibt das angefangene Segment am Ende der Aufnahme zurück."""
+        if not self._frames:
+            return None
+        if len(self._rest):
+            self._frames.append(self._rest)
+            self._rest = np.zeros(0, dtype=np.float32)
+        return self._cut()
+
+    def _cut(self) -> np.ndarray:
+        # Nachlaufende Stille bis auf den Rand abschneiden.
+        end = len(self._frames) - max(0, self._silence - self._pad)
+        segment = np.concatenate(self._frames[:end])
+        self._frames = []
+        self._silence = 0
+        return segment
+
+
+def _ffmpeg_pcm_command(rate: int) -> list[str]:
+    return [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-i",
+        "pipe:0",
+        "-f",
+        "f32le",
+        "-ac",
+        "1",
+        "-ar",
+        str(rate),
+        "pipe:1",
+    ]
+
+
+def wav_duration(data: bytes) -> float | None:
+    """Dauer eines PCM-WAV in Sekunden, ``None`` für andere Formate.
+
+    Gerechnet wird mit der tatsächlichen Datenmenge, da per Pipe erzeugte
+    WAV-Köpfe oft keine gültige Länge enthalten.
+    """
+    if sniff_format(data) != "wav":
+        return None
+    try:
+        with wave.open(io.BytesIO(data)) as wav:
+            block = wav.getnchannels() * wav.getsampwidth()
+            rate = wav.getframerate()
+    except (wave.Error, EOFError):
+        return None
+    if not block or not rate:
+        return None
+    return max(0, len(data) - 44) / (block * rate)
+
+
+def pcm_from_audio(data: bytes, rate: int = 16000) -> np.ndarray:
+    """Dekodiert Audio im Speicher zu Mono-Float32-PCM mit ``rate`` Hz.
+
+    PCM-WAV wird direkt gelesen; andere Container laufen über eine
+    ffmpeg-Pipe. Temporäre Dateien entstehen in keinem Fall.
+    """
+    try:
+        samples, source_rate = _read_pcm(data)
+    except (wave.Error, EOFError, ValueError):
+        result = subprocess.run(  # nosec B603
+            _ffmpeg_pcm_command(rate),
+            input=data,
+            capture_output=True,
+            check=True,
+            timeout=settings.audio_conversion_timeout,
+        )
+        return np.frombuffer(result.stdout, dtype="<f4").copy()
+    mono = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+    return _resample(mono, source_rate, rate).astype(np.float32, copy=False)
+
+
+async def normalize_audio(data: bytes) -> bytes:
+    """Normalisiert WAV-Audio vor der Spracherkennung (``AUDIO_NORMALIZE``).
+
+    Komprimierte Container, die das STT-Backend direkt annimmt, bleiben
+    unverändert – sie sind bereits klein und müssten erst dekodiert werden.
+    """
+    if not settings.audio_normalize or sniff_format(data) != "wav":
+        return data
+    return await run_blocking(normalize_wav, data)
@@ -3,6 +3,7 @@ from abc import ABC, abstractmethod
 from importlib import import_module
 from typing import Optional
 
+from app.concurrency import run_blocking
 from app.models import InvoiceContext
 from app.settings import settings
 
@@ -15,6 +16,10 @@ class BillingAdapter(ABC):
         """Send the given invoice to an external billing system."""
         raise NotImplementedError
 
+    async def asend_invoice(self, invoice: InvoiceContext) -> dict:
+        """Async variant; runs ``send_invoice`` in the shared thread pool."""
+        return await run_blocking(self.send_invoice, invoice)
+
 
 class DummyAdapter(BillingAdapter):
     """Einfache Rückfalllösung, die nur einen Erfolgsstatus liefert."""
@@ -54,3 +59,9 @@ def send_to_billing_system(invoice: InvoiceContext) -> dict:
     """Hilfsfunktion für den Rest des Codes, der keine Adapterdetails kennt."""
     adapter = get_adapter()
     return adapter.send_invoice(invoice)
+
+
+async def asend_to_billing_system(invoice: InvoiceContext) -> dict:
+    """Async-Variante von :func:`send_to_billing_system`."""
+    adapter = get_adapter()
+    return await adapter.asend_invoice(invoice)
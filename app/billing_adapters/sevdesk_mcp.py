@@ -21,3 +21,11 @@ class SevDeskMCPAdapter(BillingAdapter):
         response = httpx.post(url, json=invoice.model_dump(), timeout=10)
         response.raise_for_status()
         return response.json()
+
+    async def asend_invoice(self, invoice: InvoiceContext) -> dict:
+        """Wie :meth:`send_invoice`, aber mit nicht-blockierendem HTTP-Client."""
+        url = f"{self.endpoint.rstrip('/')}/invoice"
+        async with httpx.AsyncClient() as client:
+            response = await client.post(url, json=invoice.model_dump(), timeout=10)
+        response.raise_for_status()
+        return response.json()
@@ -0,0 +1,274 @@
+"""Inhaltsadressierter Zwischenspeicher mit Speicher- und optionaler Disk-Stufe."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Awaitable, Callable, Generic, TypeVar
+
+from app import metrics
+from app.concurrency import run_blocking
+
+logger = logging.getLogger(__name__)
+
+V = TypeVar("V", str, bytes)
+
+
+class _LeaderAbandoned(Exception):
+    """Der Aufrufer, der für alle rechnete, wurde abgebrochen."""
+
+
+def make_key(*parts: str | bytes) -> str:
+    """Bildet einen stabilen SHA-256-Schlüssel aus den übergebenen Teilen."""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part.encode("utf-8") if isinstance(part, str) else part
+        # Längenpräfix verhindert Kollisionen wie ("ab", "c") vs. ("a", "bc").
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class TieredCache(Generic[V]):
+    """LRU-Cache im Speicher mit TTL, optionaler Disk-Stufe und Single-Flight.
+
+    Gleichzeitige Anfragen mit identischem Schlüssel werden zu einem einzigen
+    Aufruf zusammengefasst; alle Wartenden erhalten dasselbe Ergebnis. Wird
+    der rechnende Aufrufer abgebrochen (Client getrennt), übernimmt einer der
+    Wartenden die Berechnung, statt den Abbruch zu erben.
+    Kennzahlen landen unter ``<name>.hits``, ``<name>.misses`` usw. in
+    :mod:`app.metrics`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        max_entries: int,
+        ttl: float,
+        disk_dir: str | Path | None = None,
+        binary: bool = False,
+    ) -> None:
+        self.name = name
+        self.max_entries = max(0, max_entries)
+        self.ttl = ttl
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.binary = binary
+        self._entries: OrderedDict[str, tuple[float, V]] = OrderedDict()
+        self._inflight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    # -- Speicherstufe -------------------------------------------------
+    def _expired(self, created: float) -> bool:
+        return self.ttl > 0 and time.time() - created > self.ttl
+
+    def _memory_get(self, key: str) -> V | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        created, value = entry
+        if self._expired(created):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _memory_put(self, key: str, value: V, created: float) -> None:
+        if self.max_entries == 0:
+            return
+        self._entries[key] = (created, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            metrics.inc(f"{self.name}.evictions")
+
+    # -- Disk-Stufe ----------------------------------------------------
+    def _disk_path(self, key: str) -> Path:
+        assert self.disk_dir is not None
+        suffix = ".bin" if self.binary else ".json"
+        return self.disk_dir / key[:2] / f"{key}{suffix}"
+
+    def _disk_get(self, key: str) -> tuple[float, V] | None:
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            created = path.stat().st_mtime
+            if self._expired(created):
+                path.unlink(missing_ok=True)
+                return None
+            if self.binary:
+                return created, path.read_bytes()  # type: ignore[return-value]
+            payload = json.loads(path.read_text(encoding="utf-8"))
+            return created, payload["value"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _disk_put(self, key: str, value: V) -> None:
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            data = (
+                value
+                if isinstance(value, bytes)
+                else json.dumps({"value": value}, ensure_ascii=False).encode("utf-8")
+            )
+            # Atomar schreiben, damit parallele Prozesse keine halben Dateien lesen.
+            fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            os.replace(tmp_name, path)
+        except OSError:  # pragma: no cover - disk full, permissions etc.
+            logger.warning("Could not write %s entry to disk", self.name, exc_info=True)
+
+    # -- Öffentliche API -----------------------------------------------
+    def get(self, key: str) -> V | None:
+        """Liest einen Eintrag aus Speicher oder Disk, ohne zu berechnen."""
+        with self._lock:
+            value = self._memory_get(key)
+        if value is not None:
+            metrics.inc(f"{self.name}.hits")
+            return value
+        entry = self._disk_get(key)
+        if entry is None:
+            return None
+        created, value = entry
+        with self._lock:
+            self._memory_put(key, value, created)
+        metrics.inc(f"{self.name}.disk_hits")
+        return value
+
+    def put(self, key: str, value: V) -> None:
+        """Legt einen Eintrag in allen Stufen ab."""
+        with self._lock:
+            self._memory_put(key, value, time.time())
+        self._disk_put(key, value)
+
+    def _claim(self, key: str) -> tuple[Future, bool]:
+        """Liefert das laufende Future für ``key`` und ob der Aufrufer rechnen muss."""
+        with self._lock:
+            value = self._memory_get(key)
+            if value is not None:
+                metrics.inc(f"{self.name}.hits")
+                done: Future = Future()
+                done.set_result(value)
+                return done, False
+            future = self._inflight.get(key)
+            if future is not None:
+                metrics.inc(f"{self.name}.coalesced")
+                return future, False
+            future = Future()
+            # Laufend markiert: ein abgebrochener Wartender (``wrap_future``)
+            # kann das gemeinsame Future nicht mehr stornieren.
+            future.set_running_or_notify_cancel()
+            self._inflight[key] = future
+            return future, True
+
+    def _release(self, key: str, future: Future) -> None:
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def _fail(self, key: str, future: Future, exc: BaseException) -> None:
+        """Gibt einen Fehler an die Wartenden weiter; Abbrüche nicht."""
+        # Erst freigeben, damit Wartende sofort selbst rechnen können.
+        self._release(key, future)
+        if isinstance(exc, asyncio.CancelledError):
+            future.set_exception(_LeaderAbandoned(key))
+        else:
+            future.set_exception(exc)
+
+    def _should_store(self, value: V, store: Callable[[V], bool] | None) -> bool:
+        if store is None or store(value):
+            return True
+        metrics.inc(f"{self.name}.rejected")
+        return False
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], V],
+        store: Callable[[V], bool] | None = None,
+    ) -> V:
+        """Gibt den gecachten Wert zurück oder berechnet ihn genau einmal.
+
+        Liefert ``store`` für ein berechnetes Ergebnis ``False``, erhalten es
+        nur die aktuell Wartenden; abgelegt wird es nicht.
+        """
+        while True:
+            future, leader = self._claim(key)
+            if leader:
+                break
+            try:
+                return future.result()
+            except _LeaderAbandoned:
+                continue
+        try:
+            value = self.get(key)
+            if value is None:
+                metrics.inc(f"{self.name}.misses")
+                value = compute()
+                if self._should_store(value, store):
+                    self.put(key, value)
+        except BaseException as exc:
+            self._fail(key, future, exc)
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            self._release(key, future)
+        return value
+
+    async def aget_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[V]],
+        store: Callable[[V], bool] | None = None,
+    ) -> V:
+        """Async-Variante von :meth:`get_or_compute`."""
+        while True:
+            future, leader = self._claim(key)
+            if leader:
+                break
+            try:
+                return await asyncio.wrap_future(future)
+            except _LeaderAbandoned:
+                metrics.inc(f"{self.name}.leader_cancelled")
+                continue
+        try:
+            value = await run_blocking(self.get, key)
+            if value is None:
+                metrics.inc(f"{self.name}.misses")
+                value = await compute()
+                if self._should_store(value, store):
+                    await run_blocking(self.put, key, value)
+        except BaseException as exc:
+            self._fail(key, future, exc)
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            self._release(key, future)
+        return value
+
+    def clear(self) -> None:
+        """Leert die Speicherstufe (die Disk-Stufe bleibt erhalten)."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,111 @@
+"""Auslagerung blockierender Aufrufe aus den async-Endpunkten."""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, TypeVar
+
+from app import metrics
+from app.settings import settings
+
+T = TypeVar("T")
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Gibt den gemeinsamen, größenbeschränkten Thread-Pool zurück."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.blocking_pool_size),
+                thread_name_prefix="blocking",
+            )
+    return _executor
+
+
+async def run_blocking(
+    func: Callable[..., T], *args: Any, executor: Executor | None = None
+) -> T:
+    """Führt ``func`` in einem Thread-Pool aus, ohne den Event-Loop zu blockieren.
+
+    Der aktuelle ``contextvars``-Kontext (z. B. die Request-ID für das
+    Logging) wird in den Worker-Thread übernommen.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, func, *args)
+    return await loop.run_in_executor(executor or get_executor(), call)
+
+
+def shutdown_executor() -> None:
+    """Beendet den gemeinsamen Thread-Pool (z. B. beim Herunterfahren)."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+class KeyedLock:
+    """Ein ``asyncio.Lock`` je Schlüssel, z. B. je Session-ID.
+
+    Aufrufe mit demselben Schlüssel laufen nacheinander in Ankunftsreihenfolge,
+    verschiedene Schlüssel vollständig parallel. Locks ohne Halter oder
+    Wartende werden sofort verworfen, die Tabelle wächst also nicht mit der
+    Zahl der Schlüssel. Kennzahlen unter ``<name>.*``: ``acquired``,
+    ``contended`` (musste warten), ``timeouts``, ``wait_seconds`` (Summe) und
+    der Messwert ``waiting``.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        # Schlüssel → [Lock, Anzahl Halter + Wartende]
+        self._locks: dict[str, list[Any]] = {}
+        self._waiting = 0
+        metrics.register_gauge(f"{name}.waiting", lambda: self._waiting)
+
+    @asynccontextmanager
+    async def hold(self, key: str, timeout: float | None = None) -> AsyncIterator[None]:
+        """Hält den Lock für ``key``; wirft ``TimeoutError`` nach ``timeout`` s."""
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        lock: asyncio.Lock = entry[0]
+        try:
+            if lock.locked():
+                metrics.inc(f"{self.name}.contended")
+                self._waiting += 1
+                start = time.perf_counter()
+                try:
+                    async with asyncio.timeout(timeout):
+                        await lock.acquire()
+                except TimeoutError:
+                    metrics.inc(f"{self.name}.timeouts")
+                    raise
+                finally:
+                    self._waiting -= 1
+                    metrics.inc(
+                        f"{self.name}.wait_seconds", time.perf_counter() - start
+                    )
+            else:
+                await lock.acquire()
+            metrics.inc(f"{self.name}.acquired")
+            try:
+                yield
+            finally:
+                lock.release()
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and self._locks.get(key) is entry:
+                del self._locks[key]
+
+    def __len__(self) -> int:
+        return len(self._locks)
@@ -3,37 +3,115 @@
 from __future__ import annotations
 
 import base64
+import json
+import logging
 import re
+import secrets
+import time
 from pathlib import Path
 from typing import Dict, List
+from urllib.parse import quote
+
+from fastapi import (
+    APIRouter,
+    File,
+    Form,
+    HTTPException,
+    Request,
+    UploadFile,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import StreamingResponse
 
-from fastapi import APIRouter, File, Form, UploadFile
-
-from app.billing_adapter import send_to_billing_system
-from app.llm_agent import extract_invoice_context
+from app.artifacts import ARTIFACT_KINDS, artifact_links, artifact_response
+from app.audio import iter_upload, normalize_audio, read_capped
+from app.billing_adapter import asend_to_billing_system
+from app.concurrency import run_blocking
+from app.llm_agent import aextract_invoice_context, aextract_invoice_delta
 from app.models import (
     InvoiceContext,
     InvoiceItem,
     missing_invoice_fields,
     parse_invoice_context,
+    parse_invoice_delta,
 )
-from app.persistence import store_interaction
+from app.persistence import append_turn, render_session_artifacts
 from app.pricing import apply_pricing
+from app.settings import settings
 from app.service_estimations import estimate_labor_item
+from app.session_store import (
+    SessionBusyError,
+    SessionField,
+    json_field,
+    session_turn,
+    session_view,
+)
 from app.summaries import build_invoice_summary
-from app.stt import transcribe_audio
-from app.tts import text_to_speech
+from app.stt import atranscribe_audio
+from app.stt.streaming import (
+    MAX_SAMPLE_RATE,
+    MIN_SAMPLE_RATE,
+    StreamingTranscriber,
+    StreamLimitExceeded,
+)
+from app.transcript_facts import (
+    LABOR_ROLE_LABELS,
+    ROLE_KEYWORDS,
+    TranscriptFacts,
+    normalize_material_key,
+    update_facts,
+)
+from app.tts import astream_speech, atext_to_speech
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Zwischenspeicher für laufende Konversationen
-SESSIONS: Dict[str, List[Dict[str, str]]] = {}
+
+def _encode_invoice(invoice: InvoiceContext) -> bytes:
+    return invoice.model_dump_json().encode("utf-8")
+
+
+def _encode_pending(pending: Dict[str, object]) -> bytes:
+    invoice = pending["invoice"]
+    assert isinstance(invoice, InvoiceContext)
+    return json.dumps(
+        {"invoice": invoice.model_dump(mode="json"), "summary": pending["summary"]},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _decode_pending(data: bytes) -> Dict[str, object]:
+    pending = json.loads(data)
+    pending["invoice"] = InvoiceContext.model_validate(pending["invoice"])
+    return pending
+
+
+# Zustand laufender Konversationen im konfigurierten Session-Store
+# (``SESSION_STORE``); die Sichten verhalten sich wie Dicts je Session-ID.
+SESSIONS: SessionField[List[Dict[str, str]]] = json_field("messages")
 # Zuletzt erfolgreicher Rechnungszustand pro Session
-INVOICE_STATE: Dict[str, InvoiceContext] = {}
+INVOICE_STATE: SessionField[InvoiceContext] = SessionField(
+    "invoice", _encode_invoice, InvoiceContext.model_validate_json
+)
 # Fortschritt der jeweiligen Session (z. B. "collecting", "summarizing")
-SESSION_STATUS: Dict[str, str] = {}
+SESSION_STATUS: SessionField[str] = json_field("status")
 # Noch nicht bestätigte Rechnungsentwürfe
-PENDING_CONFIRMATION: Dict[str, Dict[str, object]] = {}
+PENDING_CONFIRMATION: SessionField[Dict[str, object]] = SessionField(
+    "pending", _encode_pending, _decode_pending
+)
+# Heuristische Fakten der bisherigen Nutzeräußerungen (inkrementell erfasst)
+TRANSCRIPT_FACTS: SessionField[TranscriptFacts] = SessionField(
+    "facts", TranscriptFacts.to_json, TranscriptFacts.from_json
+)
+
+# Texte, deren Sprachausgabe über ``/conversation/{id}/audio/{speech_id}``
+# abgerufen wird: Speech-ID → [Text, Anlagezeitpunkt]. Liegt im Session-Store,
+# damit jeder Worker die URL bedienen kann.
+SPEECH_REQUESTS: SessionField[Dict[str, list]] = json_field("speech")
+_SPEECH_MAX_PER_SESSION = 16
 
 # Pfad zur Konfigurationsdatei
 ENV_PATH = Path(".env")
@@ -46,51 +124,6 @@ _CUSTOMER_NAME_PLACEHOLDERS = {
     "erika mustermann",
 }
 
-_ROLE_KEYWORDS = {
-    r"\bmeister\b": "Meister",
-    r"\bmeisterstund": "Meister",
-    r"\bgesell": "Geselle",
-    r"\bazub": "Azubi",
-    r"\blehrling": "Azubi",
-}
-
-_LABOR_ROLE_LABELS = {
-    "meister": "Meister",
-    "gesell": "Geselle",
-    "azub": "Azubi",
-}
-
-_LABOR_QUANTITY_PATTERNS = [
-    (
-        re.compile(
-            r"(\d+(?:[.,]\d+)?)\s*(meister|gesell(?:e|en)?|azub(?:i|is)?)\w*",
-            re.IGNORECASE,
-        ),
-        1,
-        2,
-    ),
-    (
-        re.compile(
-            r"(meister|gesell(?:e|en)?|azub(?:i|is)?)\w*\s*(?:von\s+|für\s+)?(\d+(?:[.,]\d+)?)\s*(?:stunden|std|h)",
-            re.IGNORECASE,
-        ),
-        2,
-        1,
-    ),
-]
-
-_MATERIAL_PRICE_PATTERN = re.compile(
-    r"(?:die|der|das|den|ein|eine|einen|zwei|drei|vier|fünf|sechs|sieben|acht|neun|zehn|\d+)\s+"
-    r"((?:[a-zäöüß-]+(?:\s+[a-zäöüß-]+){0,2}))\s+(?:je|für|zu|kostet(?:en)?|waren|war)\s+"
-    r"(\d+(?:[.,]\d+)?)\s*(?:€|eur|euro)",
-    re.IGNORECASE,
-)
-
-_MATERIAL_COUNT_PATTERN = re.compile(
-    r"(\d+(?:[.,]\d+)?)\s*(?:x\s*)?([a-zäöüß][a-zäöüß-]*)",
-    re.IGNORECASE,
-)
-
 _ITEM_CORRECTION_PATTERN = re.compile(
     r"position\s+(?P<index>\d+)(?:\s+(?P<field>menge|preis|beschreibung))?"
     r"\s*(?:ist|sind|auf|zu|soll(?:\s+sein)?|beträgt|=)?\s*(?P<value>.+)",
@@ -105,6 +138,48 @@ _SERVICE_CORRECTION_PATTERN = re.compile(
     re.IGNORECASE,
 )
 
+# Feste Rückfragen und Hinweise; sie werden beim Start vorab vertont
+# (siehe :func:`fixed_prompts`), damit Rückfragen nicht auf TTS warten.
+_ROLE_QUESTIONS = {
+    "Meister": "Wie viele Meisterstunden?",
+    "Geselle": "Wie viele Gesellenstunden?",
+}
+_MATERIAL_QUESTION = "Wie hoch ist die Materialsumme?"
+_HOURS_QUESTION = "Wie viele Stunden wurden abgerechnet?"
+_ITEMS_QUESTION = "Welche Positionen wurden abgerechnet?"
+_FIELD_QUESTIONS = {
+    "customer.name": "Wie heißt der Kunde?",
+    "service.description": "Welche Dienstleistung wurde erbracht?",
+    "items": _ITEMS_QUESTION,
+}
+_PLACEHOLDER_MESSAGE = (
+    "Platzhalter für Arbeitszeit, Material und Anfahrt aktiv. "
+    "Bitte die tatsächlichen Positionen nennen."
+)
+_NO_COMPANY_MESSAGE = "Kein Firmenname erkannt."
+
+
+def fixed_prompts() -> list[str]:
+    """Alle Sprachausgaben ohne variable Anteile, inklusive Kombinationen.
+
+    Rückfragen werden zeilenweise zusammengefasst; erzeugt werden genau die
+    Kombinationen, die :func:`_handle_conversation` stellen kann.
+    """
+    prompts: list[str] = []
+    roles = list(_ROLE_QUESTIONS.values())
+    for role_questions in ([], roles[:1], roles[1:], roles):
+        for material in ([], [_MATERIAL_QUESTION]):
+            if role_questions or material:
+                prompts.append("\n".join(role_questions + material))
+    # Fehlende Positionen werden immer erfragt, Kunde und Dienstleistung nur
+    # zusätzlich (sonst reicht der Platzhalter).
+    for customer in ([], ["customer.name"]):
+        for service in ([], ["service.description"]):
+            fields = customer + service + ["items"]
+            prompts.append("\n".join(_FIELD_QUESTIONS[f] for f in fields))
+    prompts += [_HOURS_QUESTION, _PLACEHOLDER_MESSAGE, _NO_COMPANY_MESSAGE]
+    return list(dict.fromkeys(prompts))
+
 
 def _user_set_customer_name(name: str | None, transcript: str | None = None) -> bool:
     """Prüft, ob ein Kundenname vom Nutzer stammt."""
@@ -143,156 +218,27 @@ def _save_env_value(key: str, value: str) -> None:
     ENV_PATH.write_text("\n".join(lines) + "\n", encoding="utf-8")
 
 
-def _labor_hours_from_transcript(transcript: str) -> dict[str, float]:
-    """Extrahiert Arbeitsstunden pro Rolle aus dem Gesprächstext."""
-
-    hours: dict[str, float] = {}
-    if not transcript:
-        return hours
-
-    for pattern, qty_index, role_index in _LABOR_QUANTITY_PATTERNS:
-        for match in pattern.finditer(transcript):
-            qty_str = match.group(qty_index)
-            role_raw = match.group(role_index)
-
-            if not qty_str or not role_raw:
-                continue
-
-            role_key = role_raw.casefold()
-            label = None
-            for key, value in _LABOR_ROLE_LABELS.items():
-                if key in role_key:
-                    label = value
-                    break
-
-            if not label:
-                continue
-
-            tail = match.group(0).casefold()
-            if "stund" not in tail and not re.search(r"\b(h|std)\b", tail):
-                # Stellen wie "2 Meister" ohne Stundenangabe ignorieren.
-                continue
-
-            try:
-                qty = float(qty_str.replace(",", "."))
-            except ValueError:  # pragma: no cover - defensive
-                continue
-
-            hours[label] = hours.get(label, 0.0) + qty
-
-    return hours
-
-
-def _extract_customer_name(transcript: str) -> str | None:
-    """Versucht den Kundennamen aus Formulierungen wie 'bei Hr. ...' zu lesen."""
-
-    if not transcript:
-        return None
-
-    pattern = re.compile(
-        r"bei\s+(?:herrn?|herr|hr\.?|frau|fr\.?|firma)?\s*([a-zäöüß'\-\s]+?)(?=\s+(?:in|am|auf|an|mit|und|,|\.|$))",
-        re.IGNORECASE,
-    )
-    match = pattern.search(transcript)
-    if not match:
-        return None
-
-    name = match.group(1).strip()
-    if not name:
-        return None
-
-    # Entfernt eventuell führende Artikel wie "der" oder "die" innerhalb des Namens.
-    name = re.sub(r"^(der|die|das)\s+", "", name, flags=re.IGNORECASE)
-    return name.title()
-
-
-def _normalize_material_key(word: str) -> list[str]:
-    """Erzeugt Vergleichsvarianten für Materialbeschreibungen."""
-
-    variants: list[str] = []
-    lowered = word.casefold()
-    if lowered:
-        variants.append(lowered)
-    for suffix in ("ern", "en", "n"):
-        if lowered.endswith(suffix) and len(lowered) > len(suffix) + 1:
-            shortened = lowered[: -len(suffix)]
-            if shortened and shortened not in variants:
-                variants.append(shortened)
-    return variants
-
-
-def _material_counts_from_transcript(transcript: str) -> dict[str, float]:
-    """Sucht nach Mengenangaben wie '2 Fenster'."""
-
-    counts: dict[str, float] = {}
-    if not transcript:
-        return counts
-
-    skip_words = {
-        "km",
-        "kilometer",
-        "kilometern",
-        "stunden",
-        "stunde",
-        "std",
-        "meisterstunden",
-        "gesellenstunden",
-    }
-
-    for match in _MATERIAL_COUNT_PATTERN.finditer(transcript):
-        qty_str, word = match.groups()
-        if not qty_str or not word:
-            continue
-
-        normalized_forms = _normalize_material_key(word)
-        if any(form in skip_words for form in normalized_forms):
-            continue
-
-        try:
-            qty = float(qty_str.replace(",", "."))
-        except ValueError:  # pragma: no cover - defensive
-            continue
-
-        for form in normalized_forms:
-            counts[form] = qty
-
-    return counts
-
-
-def _ensure_material_items_from_transcript(
-    invoice: InvoiceContext, transcript: str
+def _ensure_material_items_from_facts(
+    invoice: InvoiceContext, facts: TranscriptFacts
 ) -> bool:
     """Ergänzt fehlende Materialpositionen aus einfachen Textmustern.
 
     Gibt ``True`` zurück, wenn Angaben aus dem Transkript übernommen wurden.
     """
 
-    if not transcript:
-        return False
-
     existing = {
         item.description.casefold(): item
         for item in invoice.items
         if item.category == "material"
     }
-    counts = _material_counts_from_transcript(transcript)
+    counts = facts.material_counts
 
     changed = False
 
-    for match in _MATERIAL_PRICE_PATTERN.finditer(transcript):
-        raw_desc, price_str = match.groups()
-        if not raw_desc or not price_str:
-            continue
-
-        desc = raw_desc.strip()
+    for desc, price in facts.material_prices:
         key = desc.casefold()
-        try:
-            price = float(price_str.replace(",", "."))
-        except ValueError:  # pragma: no cover - defensive
-            continue
-
         quantity = 1.0
-        for form in _normalize_material_key(desc):
+        for form in normalize_material_key(desc):
             if form in counts:
                 quantity = counts[form]
                 break
@@ -339,15 +285,15 @@ def _ensure_material_items_from_transcript(
     return changed
 
 
-def _ensure_labor_items_from_transcript(
-    invoice: InvoiceContext, transcript: str
+def _ensure_labor_items_from_facts(
+    invoice: InvoiceContext, facts: TranscriptFacts
 ) -> bool:
     """Legt Arbeitspositionen anhand erkannter Stunden an.
 
     Gibt ``True`` zurück, wenn Angaben aus dem Transkript übernommen wurden.
     """
 
-    hours = _labor_hours_from_transcript(transcript)
+    hours = facts.hours
     if not hours:
         return False
 
@@ -356,7 +302,7 @@ def _ensure_labor_items_from_transcript(
     for item in invoice.items:
         if item.category == "labor" and item.worker_role:
             key = item.worker_role.casefold()
-            for pattern, label in _LABOR_ROLE_LABELS.items():
+            for pattern, label in LABOR_ROLE_LABELS.items():
                 if pattern in key and label in hours and not item.quantity:
                     item.quantity = hours[label]
                     changed = True
@@ -624,24 +570,63 @@ def _normalize_worker_role(role: str | None) -> str | None:
         return None
 
     text = role.strip().casefold()
-    for pattern, label in _ROLE_KEYWORDS.items():
+    for pattern, label in ROLE_KEYWORDS.items():
         if re.search(pattern, text):
             return label
     return role.strip() or None
 
 
-def _roles_from_transcript(transcript: str) -> set[str]:
-    """Erkennt erwähnte Handwerkerrollen im Gespräch."""
+def _register_speech(session_id: str, text: str) -> str:
+    """Legt einen Text zur späteren Sprachausgabe ab und gibt die ID zurück."""
+    speech_id = secrets.token_urlsafe(16)
+    now = time.time()
+    entries = {
+        key: entry
+        for key, entry in SPEECH_REQUESTS.get(session_id, {}).items()
+        if now - entry[1] <= settings.conversation_audio_ttl
+    }
+    entries[speech_id] = [text, now]
+    SPEECH_REQUESTS[session_id] = dict(
+        list(entries.items())[-_SPEECH_MAX_PER_SESSION:]
+    )
+    return speech_id
+
+
+def _lookup_speech(session_id: str, speech_id: str) -> str | None:
+    entry = SPEECH_REQUESTS.get(session_id, {}).get(speech_id)
+    if entry is None:
+        return None
+    text, created = entry
+    if time.time() - created > settings.conversation_audio_ttl:
+        return None
+    return text
+
+
+def _use_audio_url(requested: bool | None) -> bool:
+    """Wunsch des Clients, sonst ``CONVERSATION_AUDIO_URL``."""
+    return settings.conversation_audio_url if requested is None else requested
+
+
+async def _speech_fields(
+    session_id: str, text: str, audio_url: bool
+) -> dict[str, str]:
+    """Sprachausgabe für die Antwort: inline als Base64 oder als Abruf-URL.
 
-    roles: set[str] = set()
-    lowered = transcript or ""
-    for pattern, label in _ROLE_KEYWORDS.items():
-        if re.search(pattern, lowered, re.IGNORECASE):
-            roles.add(label)
-    return roles
+    Mit ``audio_url`` wird nicht auf TTS gewartet; der Client ruft die
+    Audiodaten über :func:`conversation_audio` ab, während sie erzeugt werden.
+    """
+    if audio_url:
+        speech_id = _register_speech(session_id, text)
+        return {
+            "audio_url": f"/conversation/{quote(session_id, safe='')}/audio/{speech_id}"
+        }
+    audio = await atext_to_speech(text)
+    return {"audio": base64.b64encode(audio).decode("ascii")}
 
 
-def _handle_direct_corrections(session_id: str, transcript_part: str) -> dict | None:
+async def _handle_direct_corrections(
+    session_id: str, transcript_part: str, audio_url: bool = False
+) -> dict | None:
     """Verarbeitet erkannte Korrekturbefehle ohne LLM-Roundtrip."""
 
     invoice = INVOICE_STATE.get(session_id)
@@ -704,7 +689,7 @@ def _handle_direct_corrections(session_id: str, transcript_part: str) -> dict |
     session_msgs = SESSIONS.setdefault(session_id, [])
     session_msgs.append({"role": "user", "content": transcript_part})
 
-    audio_b64 = base64.b64encode(text_to_speech(spoken)).decode("ascii")
+    speech = await _speech_fields(session_id, spoken, audio_url)
 
     current_transcript = " ".join(
         m["content"] for m in session_msgs if m.get("role") == "user"
@@ -713,13 +698,41 @@ def _handle_direct_corrections(session_id: str, transcript_part: str) -> dict |
     return dict(
         done=False,
         message=spoken,
-        audio=audio_b64,
+        **speech,
         invoice=invoice.model_dump(mode="json"),
         transcript=current_transcript,
         session_status=SESSION_STATUS.get(session_id, "collecting"),
     )
 
 
+async def _record_turn(
+    session_id: str,
+    audio_bytes: bytes,
+    session_msgs: List[Dict[str, str]],
+    first_new: int,
+    invoice: InvoiceContext,
+    final: bool = False,
+) -> dict[str, str]:
+    """Schreibt die Runde ins Journal der Session.
+
+    Artefakte entstehen nur mit ``final`` (bestätigte Rechnung, Felder wie
+    bei :func:`app.artifacts.artifact_links`); sonst verweist ``pdf_url`` auf
+    den Endpunkt, der den aktuellen Entwurf auf Anfrage rendert, und
+    ``pdf_path`` entfällt.
+    """
+
+    log_dir = await run_blocking(
+        append_turn, session_id, audio_bytes, session_msgs[first_new:], invoice
+    )
+    if final:
+        await run_blocking(
+            render_session_artifacts, session_id, session_msgs, invoice
+        )
+        return {"log_dir": log_dir, **artifact_links(log_dir)}
+    pdf_url = f"/conversation/{quote(session_id, safe='')}/invoice.pdf"
+    return {"log_dir": log_dir, "pdf_url": pdf_url}
+
+
 def _build_invoice_summary(
     invoice: InvoiceContext, placeholder_notice: bool = False
 ) -> str:
@@ -769,14 +782,62 @@ def _is_confirmation(text: str) -> bool:
     return any(keyword in lowered for keyword in confirmation_keywords)
 
 
-def _handle_conversation(
+def _use_delta_extraction(
+    session_msgs: List[Dict[str, str]], full_extraction: bool
+) -> bool:
+    """Entscheidet, ob diese Runde per Delta-Extraktion ausgewertet wird."""
+
+    if full_extraction or not settings.conversation_delta_extraction:
+        return False
+    interval = settings.conversation_full_extraction_interval
+    user_turns = sum(1 for m in session_msgs if m.get("role") == "user")
+    # Jede N-te Runde wird vollständig neu extrahiert, um Drift zu korrigieren.
+    return not (interval > 0 and user_turns % interval == 0)
+
+
+async def _handle_conversation(
     session_id: str,
     transcript_part: str,
     audio_bytes: bytes,
     clarification_context: str | None = None,
+    full_extraction: bool = False,
+    audio_url: bool = False,
 ) -> dict:
-    """Gemeinsame Logik für Sprach- und Texteingaben."""
+    """Gemeinsame Logik für Sprach- und Texteingaben.
+
+    Mit ``full_extraction`` wird unabhängig von der Delta-Einstellung das
+    gesamte bisherige Gespräch neu extrahiert. Mit ``audio_url`` enthält die
+    Antwort statt ``audio`` eine URL, unter der die Sprachausgabe gestreamt
+    wird. Der Session-Zustand wird einmal geladen und nach der Runde
+    gesammelt zurückgeschrieben; Runden derselben Session laufen
+    nacheinander (HTTP 409, wenn die vorige zu lange dauert).
+    """
+
+    try:
+        async with session_turn(session_id):
+            return await _conversation_turn(
+                session_id,
+                transcript_part,
+                audio_bytes,
+                clarification_context=clarification_context,
+                full_extraction=full_extraction,
+                audio_url=audio_url,
+            )
+    except SessionBusyError:
+        logger.warning("Session %s busy, turn rejected", session_id)
+        raise HTTPException(
+            status_code=409, detail="Session is busy with a previous turn"
+        )
 
+
+async def _conversation_turn(
+    session_id: str,
+    transcript_part: str,
+    audio_bytes: bytes,
+    clarification_context: str | None = None,
+    full_extraction: bool = False,
+    audio_url: bool = False,
+) -> dict:
     SESSION_STATUS.setdefault(session_id, "collecting")
 
     # Prüft auf Konfigurationsbefehle wie "Speichere meinen Firmennamen".
@@ -791,12 +852,12 @@ def _handle_conversation(
             _save_env_value("COMPANY_NAME", company)
             message = f"Firmenname {company} gespeichert."
         else:
-            message = "Kein Firmenname erkannt."
-        audio_b64 = base64.b64encode(text_to_speech(message)).decode("ascii")
+            message = _NO_COMPANY_MESSAGE
+        speech = await _speech_fields(session_id, message, audio_url)
         return dict(
             done=False,
             message=message,
-            audio=audio_b64,
+            **speech,
             transcript=" ".join(
                 m["content"] for m in SESSIONS.get(session_id, [])
             ),
@@ -815,20 +876,22 @@ def _handle_conversation(
             SESSION_STATUS[session_id] = "collecting"
         else:
             message = f"Position {idx} nicht gefunden."
-        audio_b64 = base64.b64encode(text_to_speech(message)).decode("ascii")
+        speech = await _speech_fields(session_id, message, audio_url)
         if invoice and not _user_set_customer_name(invoice.customer.get("name"), transcript_part):
             invoice.customer.pop("name", None)
             fill_default_fields(invoice)
         return dict(
             done=False,
             message=message,
-            audio=audio_b64,
+            **speech,
             transcript=SESSIONS.get(session_id, ""),
             invoice=invoice.model_dump(mode="json") if invoice else None,
             session_status=SESSION_STATUS.get(session_id, "collecting"),
         )
 
-    correction = _handle_direct_corrections(session_id, transcript_part)
+    correction = await _handle_direct_corrections(
+        session_id, transcript_part, audio_url
+    )
     if correction:
         return correction
 
@@ -839,10 +902,11 @@ def _handle_conversation(
 
     # Neues Transkript zur Session hinzufügen.
     session_msgs = SESSIONS.setdefault(session_id, [])
+    # Ab hier hinzukommende Nachrichten gehören zu dieser Runde (Journal).
+    first_new = len(session_msgs)
     session_msgs.append({"role": "user", "content": transcript_part})
-    full_transcript = " ".join(
-        m["content"] for m in session_msgs if m["role"] == "user"
-    )
+    user_texts = [m["content"] for m in session_msgs if m["role"] == "user"]
+    full_transcript = " ".join(user_texts)
 
     overwrite_existing = False
     pending = PENDING_CONFIRMATION.get(session_id)
@@ -850,7 +914,7 @@ def _handle_conversation(
         if _is_confirmation(transcript_part):
             invoice = pending["invoice"]
             summary = pending["summary"]
-            send_to_billing_system(invoice)
+            await asend_to_billing_system(invoice)
             detailed_summary = build_invoice_summary(invoice)
             message = (
                 "Rechnung bestätigt. "
@@ -858,10 +922,10 @@ def _handle_conversation(
                 "Rechnung an das Abrechnungssystem gesendet."
             )
             session_msgs.append({"role": "assistant", "content": message})
-            log_dir = store_interaction(audio_bytes, session_msgs, invoice)
-            pdf_path = str(Path(log_dir) / "invoice.pdf")
-            pdf_url = "/" + pdf_path.replace("\\", "/")
-            audio_b64 = base64.b64encode(text_to_speech(message)).decode("ascii")
+            artifacts = await _record_turn(
+                session_id, audio_bytes, session_msgs, first_new, invoice, final=True
+            )
+            speech = await _speech_fields(session_id, message, audio_url)
             PENDING_CONFIRMATION.pop(session_id, None)
             SESSION_STATUS[session_id] = "completed"
             return {
@@ -869,11 +933,9 @@ def _handle_conversation(
                 "message": message,
                 "summary": summary,
                 "status": "confirmed",
-                "audio": audio_b64,
+                **speech,
                 "invoice": invoice.model_dump(mode="json"),
-                "log_dir": log_dir,
-                "pdf_path": pdf_path,
-                "pdf_url": pdf_url,
+                **artifacts,
                 "transcript": full_transcript,
             }
 
@@ -881,22 +943,26 @@ def _handle_conversation(
         PENDING_CONFIRMATION.pop(session_id, None)
         overwrite_existing = True
 
-    distance = 0.0
-    m_distance = re.search(
-        r"(\d+(?:[.,]\d+)?)\s*(?:km|kilometer)",
-        full_transcript,
-        re.IGNORECASE,
-    )
-    if m_distance:
-        distance = float(m_distance.group(1).replace(",", "."))
+    # Nur die neue Äußerung durchsuchen; frühere Fakten liegen in der Session.
+    facts = update_facts(TRANSCRIPT_FACTS.get(session_id), user_texts)
+    TRANSCRIPT_FACTS[session_id] = facts
+    distance = facts.distance or 0.0
 
     # Rechnungsdaten aus dem bisherigen Gespräch extrahieren.
     had_state = session_id in INVOICE_STATE
     parse_error = False
     placeholder_notice = False
+    use_delta = had_state and _use_delta_extraction(session_msgs, full_extraction)
     try:
-        invoice_json = extract_invoice_context(full_transcript)
-        parsed = parse_invoice_context(invoice_json)
+        if use_delta:
+            # Nur den neuen Gesprächsteil gegen den bisherigen Stand auswerten.
+            invoice_json = await aextract_invoice_delta(
+                INVOICE_STATE[session_id], transcript_part
+            )
+            parsed = parse_invoice_delta(invoice_json)
+        else:
+            invoice_json = await aextract_invoice_context(full_transcript)
+            parsed = parse_invoice_context(invoice_json)
         if not _user_set_customer_name(
             parsed.customer.get("name"), full_transcript
         ):
@@ -946,9 +1012,7 @@ def _handle_conversation(
             placeholder_notice = True
 
     # Rollen aus dem Gespräch ableiten.
-    detected_roles = _roles_from_transcript(transcript_part)
-    if not detected_roles:
-        detected_roles = _roles_from_transcript(full_transcript)
+    detected_roles = set(facts.last_roles) or set(facts.roles)
     for item in invoice.items:
         normalized = _normalize_worker_role(item.worker_role)
         if normalized != item.worker_role:
@@ -966,8 +1030,10 @@ def _handle_conversation(
         elif len(detected_roles) > 1:
             ambiguous_roles = True
 
-    labor_inferred = _ensure_labor_items_from_transcript(invoice, full_transcript)
-    material_inferred = _ensure_material_items_from_transcript(invoice, full_transcript)
+    labor_inferred = _ensure_labor_items_from_facts(invoice, facts)
+    material_inferred = bool(full_transcript) and _ensure_material_items_from_facts(
+        invoice, facts
+    )
 
     # Platzhalter und geschätzte Arbeitszeit ergänzen.
     travel_item = next((i for i in invoice.items if i.category == "travel"), None)
@@ -985,7 +1051,7 @@ def _handle_conversation(
         travel_item.quantity = distance
 
     if not invoice.customer.get("name"):
-        extracted_name = _extract_customer_name(full_transcript)
+        extracted_name = facts.customer_name
         if _user_set_customer_name(extracted_name, full_transcript):
             invoice.customer["name"] = extracted_name
 
@@ -1008,13 +1074,9 @@ def _handle_conversation(
             role_targets = [role for role in ("Meister", "Geselle") if role in detected_roles]
             if not role_targets:
                 role_targets = ["Meister", "Geselle"]
-            role_question_map = {
-                "Meister": "Wie viele Meisterstunden?",
-                "Geselle": "Wie viele Gesellenstunden?",
-            }
             clarification_questions.extend(
                 [
-                    role_question_map.get(role, f"Wie viele Stunden für {role}?")
+                    _ROLE_QUESTIONS.get(role, f"Wie viele Stunden für {role}?")
                     for role in role_targets
                 ]
             )
@@ -1024,7 +1086,7 @@ def _handle_conversation(
         if invoice.service.get("materialIncluded") and (
             not material_items or material_total <= 0
         ):
-            clarification_questions.append("Wie hoch ist die Materialsumme?")
+            clarification_questions.append(_MATERIAL_QUESTION)
 
     if clarification_questions:
         unique_questions = []
@@ -1039,21 +1101,19 @@ def _handle_conversation(
             if not already_asked:
                 session_msgs.append({"role": "assistant", "content": question})
         combined = "\n".join(unique_questions)
-        log_dir = store_interaction(audio_bytes, session_msgs, invoice)
-        pdf_path = str(Path(log_dir) / "invoice.pdf")
-        pdf_url = "/" + pdf_path.replace("\\", "/")
-        audio_b64 = base64.b64encode(text_to_speech(combined)).decode("ascii")
+        artifacts = await _record_turn(
+            session_id, audio_bytes, session_msgs, first_new, invoice
+        )
+        speech = await _speech_fields(session_id, combined, audio_url)
         return dict(
             done=False,
             status="clarification_needed",
             clarification_questions=unique_questions,
             question=combined,
-            audio=audio_b64,
+            **speech,
             transcript=full_transcript,
             invoice=invoice.model_dump(mode="json"),
-            log_dir=log_dir,
-            pdf_path=pdf_path,
-            pdf_url=pdf_url,
+            **artifacts,
         )
 
     missing = [f for f in missing_invoice_fields(invoice) if f != "amount.total"]
@@ -1063,68 +1123,54 @@ def _handle_conversation(
 
     if parse_error and had_state:
         if "stund" in invoice_json.lower():
-            question = "Wie viele Stunden wurden abgerechnet?"
+            question = _HOURS_QUESTION
         else:
-            question = "Welche Positionen wurden abgerechnet?"
+            question = _ITEMS_QUESTION
         session_msgs.append({"role": "assistant", "content": question})
-        log_dir = store_interaction(audio_bytes, session_msgs, invoice)
-        pdf_path = str(Path(log_dir) / "invoice.pdf")
-        pdf_url = "/" + pdf_path.replace("\\", "/")
-        audio_b64 = base64.b64encode(text_to_speech(question)).decode("ascii")
+        artifacts = await _record_turn(
+            session_id, audio_bytes, session_msgs, first_new, invoice
+        )
+        speech = await _speech_fields(session_id, question, audio_url)
         return dict(
             done=False,
             question=question,
-            audio=audio_b64,
+            **speech,
             transcript=full_transcript,
             invoice=invoice.model_dump(mode="json"),
-            log_dir=log_dir,
-            pdf_path=pdf_path,
-            pdf_url=pdf_url,
+            **artifacts,
         )
 
     if missing:
         invoice = INVOICE_STATE.get(session_id, invoice)
-        question_map = {
-            "customer.name": "Wie heißt der Kunde?",
-            "service.description": "Welche Dienstleistung wurde erbracht?",
-            "items": "Welche Positionen wurden abgerechnet?",
-        }
-        question_lines = [question_map.get(f, f) for f in missing]
+        question_lines = [_FIELD_QUESTIONS.get(f, f) for f in missing]
         question = "\n".join(question_lines)
         session_msgs.append({"role": "assistant", "content": question})
-        log_dir = store_interaction(audio_bytes, session_msgs, invoice)
-        pdf_path = str(Path(log_dir) / "invoice.pdf")
-        pdf_url = "/" + pdf_path.replace("\\", "/")
-        audio_b64 = base64.b64encode(text_to_speech(question)).decode("ascii")
+        artifacts = await _record_turn(
+            session_id, audio_bytes, session_msgs, first_new, invoice
+        )
+        speech = await _speech_fields(session_id, question, audio_url)
         return dict(
             done=False,
             question=question,
-            audio=audio_b64,
+            **speech,
             transcript=full_transcript,
             invoice=invoice.model_dump(mode="json"),
-            log_dir=log_dir,
-            pdf_path=pdf_path,
-            pdf_url=pdf_url,
+            **artifacts,
         )
 
     if placeholder_notice:
-        message = (
-            "Platzhalter für Arbeitszeit, Material und Anfahrt aktiv. "
-            "Bitte die tatsächlichen Positionen nennen."
-        )
+        message = _PLACEHOLDER_MESSAGE
         session_msgs.append({"role": "assistant", "content": message})
-        log_dir = store_interaction(audio_bytes, session_msgs, invoice)
-        pdf_path = str(Path(log_dir) / "invoice.pdf")
-        pdf_url = "/" + pdf_path.replace("\\", "/")
-        audio_b64 = base64.b64encode(text_to_speech(message)).decode("ascii")
+        artifacts = await _record_turn(
+            session_id, audio_bytes, session_msgs, first_new, invoice
+        )
+        speech = await _speech_fields(session_id, message, audio_url)
         return dict(
             done=False,
             message=message,
-            audio=audio_b64,
+            **speech,
             invoice=invoice.model_dump(mode="json"),
-            log_dir=log_dir,
-            pdf_path=pdf_path,
-            pdf_url=pdf_url,
+            **artifacts,
             transcript=full_transcript,
         )
 
@@ -1135,21 +1181,19 @@ def _handle_conversation(
         "invoice": invoice.model_copy(deep=True),
         "summary": summary,
     }
-    log_dir = store_interaction(audio_bytes, session_msgs, invoice)
-    pdf_path = str(Path(log_dir) / "invoice.pdf")
-    pdf_url = "/" + pdf_path.replace("\\", "/")
-    audio_b64 = base64.b64encode(text_to_speech(summary)).decode("ascii")
+    artifacts = await _record_turn(
+        session_id, audio_bytes, session_msgs, first_new, invoice
+    )
+    speech = await _speech_fields(session_id, summary, audio_url)
     SESSION_STATUS[session_id] = "awaiting_confirmation"
     return {
         "done": False,
         "status": "awaiting_confirmation",
         "summary": summary,
         "message": summary,
-        "audio": audio_b64,
+        **speech,
         "invoice": invoice.model_dump(mode="json"),
-        "log_dir": log_dir,
-        "pdf_path": pdf_path,
-        "pdf_url": pdf_url,
+        **artifacts,
         "transcript": full_transcript,
     }
 
@@ -1159,27 +1203,142 @@ async def voice_conversation(
     session_id: str = Form(...),
     file: UploadFile = File(...),
     clarification_context: str | None = Form(None),
+    full_extraction: bool = Form(False),
+    audio_url: bool | None = Form(None),
 ):
     """Führt eine dialogorientierte Aufnahme durch."""
 
-    audio_bytes = await file.read()
-    transcript_part = transcribe_audio(audio_bytes)
-    return _handle_conversation(
+    audio_bytes = await normalize_audio(await read_capped(iter_upload(file)))
+    transcript_part = await atranscribe_audio(audio_bytes)
+    return await _handle_conversation(
         session_id,
         transcript_part,
         audio_bytes,
         clarification_context=clarification_context,
+        full_extraction=full_extraction,
+        audio_url=_use_audio_url(audio_url),
     )
 
 
+@router.websocket("/conversation/stream")
+async def voice_conversation_stream(
+    websocket: WebSocket, session_id: str, sample_rate: int = 16000
+):
+    """Dialog mit Transkription bereits während der Aufnahme.
+
+    Der Client schickt Mono-PCM (16 Bit, little-endian, ``sample_rate`` Hz) als
+    Binärnachrichten. Jedes an einer Sprechpause abgeschlossene Segment wird
+    sofort transkribiert und als ``{"type": "partial"}`` zurückgemeldet. Die
+    Textnachricht ``{"type": "stop", "clarification_context": ...}`` beendet
+    die Aufnahme; die Antwort entspricht der von ``/conversation/`` mit
+    ``"type": "result"``. Eine unzulässige ``sample_rate`` wird schon beim
+    Handshake abgelehnt, zu viel Audio beendet die Verbindung mit ``1009``.
+    """
+
+    if not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+
+    async def send_partial(index: int, text: str) -> None:
+        await websocket.send_json({"type": "partial", "index": index, "text": text})
+
+    stream = StreamingTranscriber(sample_rate, on_segment=send_partial)
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes") is not None:
+                stream.feed(message["bytes"])
+                continue
+            control = json.loads(message.get("text") or "{}")
+            if control.get("type") == "stop":
+                break
+        transcript_part, audio_bytes = await stream.finish()
+        result = await _handle_conversation(
+            session_id,
+            transcript_part,
+            audio_bytes,
+            clarification_context=control.get("clarification_context"),
+            full_extraction=bool(control.get("full_extraction", False)),
+            audio_url=_use_audio_url(control.get("audio_url")),
+        )
+    except WebSocketDisconnect:
+        logger.info("Streaming conversation %s disconnected", session_id)
+        stream.cancel()
+        return
+    except StreamLimitExceeded as exc:
+        logger.warning("Streaming conversation %s: %s", session_id, exc)
+        stream.cancel()
+        await websocket.send_json({"type": "error", "detail": str(exc)})
+        await websocket.close(code=1009)
+        return
+    except Exception as exc:
+        logger.exception("Streaming conversation %s failed", session_id)
+        stream.cancel()
+        detail = getattr(exc, "detail", str(exc))
+        await websocket.send_json({"type": "error", "detail": detail})
+        await websocket.close(code=1011)
+        return
+    await websocket.send_json({"type": "result", **result})
+    await websocket.close()
+
+
 @router.post("/conversation-text/")
 async def text_conversation(
     session_id: str = Form(...),
     text: str = Form(...),
     clarification_context: str | None = Form(None),
+    full_extraction: bool = Form(False),
+    audio_url: bool | None = Form(None),
 ):
     """Dialog über Texteingabe."""
 
-    return _handle_conversation(
-        session_id, text, b"", clarification_context=clarification_context
+    return await _handle_conversation(
+        session_id,
+        text,
+        b"",
+        clarification_context=clarification_context,
+        full_extraction=full_extraction,
+        audio_url=_use_audio_url(audio_url),
     )
+
+
+@router.get("/conversation/{session_id}/audio/{speech_id}")
+async def conversation_audio(session_id: str, speech_id: str):
+    """Streamt die Sprachausgabe einer Dialogantwort (``audio_url``).
+
+    Die Audiodaten werden weitergereicht, sobald der TTS-Anbieter sie liefert;
+    bereits gecachte Sätze kommen sofort vollständig.
+    """
+
+    async with session_view(session_id):
+        text = _lookup_speech(session_id, speech_id)
+    if text is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired audio")
+    return StreamingResponse(astream_speech(text), media_type="audio/mpeg")
+
+
+def _draft_invoice(session_id: str) -> InvoiceContext | None:
+    pending = PENDING_CONFIRMATION.get(session_id)
+    return pending["invoice"] if pending else INVOICE_STATE.get(session_id)
+
+
+@router.get("/conversation/{session_id}/invoice.{kind}")
+async def conversation_invoice(session_id: str, kind: str, request: Request):
+    """Liefert den aktuellen Rechnungsentwurf der Session als PDF bzw. XML.
+
+    Während des Dialogs wird nichts gerendert; erst der Abruf erzeugt das
+    Dokument (gecacht nach Inhalts-Hash, mit ``ETag``).
+    """
+
+    if kind not in ARTIFACT_KINDS:
+        raise HTTPException(status_code=404, detail="Unknown artifact")
+    # Nur lesen, ohne Runden-Sperre: ein laufender Dialogschritt soll den
+    # Abruf nicht blockieren, dann wird eben der vorige Stand geliefert.
+    async with session_view(session_id):
+        invoice = _draft_invoice(session_id)
+    if invoice is None:
+        raise HTTPException(status_code=404, detail="No invoice for this session")
+    return await artifact_response(request, invoice, kind)
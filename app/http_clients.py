@@ -0,0 +1,116 @@
+"""Langlebige, gepoolte HTTP-Clients für die LLM-Backends.
+
+Statt pro Aufruf einen neuen Client (und damit eine neue TCP/TLS-Verbindung)
+aufzubauen, teilen sich alle Anfragen eines Prozesses einen Client pro
+Backend. Die Clients werden beim Start der FastAPI-App angelegt und
+vorgewärmt und beim Herunterfahren geschlossen.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import logging
+import threading
+
+import httpx
+from openai import OpenAI
+
+from app import metrics
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_ollama_client: httpx.Client | None = None
+_openai_client: OpenAI | None = None
+_openai_http_client: httpx.Client | None = None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.llm_http_max_connections,
+        max_keepalive_connections=settings.llm_http_max_keepalive,
+        keepalive_expiry=settings.llm_http_keepalive_expiry,
+    )
+
+
+def _http2_enabled() -> bool:
+    """HTTP/2 nur nutzen, wenn gewünscht und das ``h2``-Paket installiert ist."""
+    return settings.llm_http2 and importlib.util.find_spec("h2") is not None
+
+
+def _connections_in_use(client: httpx.Client | None) -> int:
+    """Zählt aktive (nicht ruhende) Verbindungen im Pool eines Clients."""
+    if client is None:
+        return 0
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = getattr(pool, "connections", None) or []
+    return sum(1 for conn in connections if not conn.is_idle())
+
+
+def _saturation(client: httpx.Client | None) -> float:
+    return _connections_in_use(client) / max(1, settings.llm_http_max_connections)
+
+
+def get_ollama_client() -> httpx.Client:
+    """Gibt den gemeinsamen Client für den Ollama-Server zurück."""
+    global _ollama_client
+    with _lock:
+        if _ollama_client is None:
+            timeout_s = max(300.0, settings.ollama_timeout)
+            _ollama_client = httpx.Client(
+                timeout=httpx.Timeout(timeout_s, connect=5.0),
+                limits=_limits(),
+                http2=_http2_enabled(),
+            )
+        return _ollama_client
+
+
+def get_openai_client() -> OpenAI:
+    """Gibt den gemeinsamen OpenAI-Client (mit eigenem Verbindungspool) zurück."""
+    global _openai_client, _openai_http_client
+    with _lock:
+        if _openai_client is None:
+            _openai_http_client = httpx.Client(
+                limits=_limits(),
+                http2=_http2_enabled(),
+            )
+            _openai_client = OpenAI(http_client=_openai_http_client)
+        return _openai_client
+
+
+def open_clients() -> None:
+    """Legt den Client des konfigurierten LLM-Backends vorab an."""
+    if settings.llm_provider == "openai":
+        get_openai_client()
+    elif settings.llm_provider == "ollama":
+        get_ollama_client()
+
+
+def close_clients() -> None:
+    """Schließt alle offenen Clients und deren Verbindungen."""
+    global _ollama_client, _openai_client, _openai_http_client
+    with _lock:
+        if _ollama_client is not None:
+            _ollama_client.close()
+        if _openai_client is not None:
+            _openai_client.close()
+        _ollama_client = None
+        _openai_client = None
+        _openai_http_client = None
+
+
+metrics.register_gauge(
+    "llm_http.ollama.connections_in_use",
+    lambda: _connections_in_use(_ollama_client),
+)
+metrics.register_gauge(
+    "llm_http.ollama.pool_saturation", lambda: _saturation(_ollama_client)
+)
+metrics.register_gauge(
+    "llm_http.openai.connections_in_use",
+    lambda: _connections_in_use(_openai_http_client),
+)
+metrics.register_gauge(
+    "llm_http.openai.pool_saturation", lambda: _saturation(_openai_http_client)
+)
@@ -0,0 +1,411 @@
+"""Dauerhafte Hintergrund-Jobs für lange Audio- und Bildverarbeitungen.
+
+Lange Transkriptionen plus vier LLM-Pässe überschreiten schnell das
+Zeitlimit von API Gateway/Lambda oder mobilen Clients. Mit ``?async=true``
+nehmen ``/process-audio/`` und ``/process-image/`` den Upload daher nur
+entgegen, legen ihn in einer SQLite-Warteschlange ab und antworten sofort mit
+``202`` und einer Job-ID. Eine begrenzte Zahl von Workern arbeitet die Jobs
+ab; das Ergebnis steht unter ``/jobs/{id}`` bzw. als Server-Sent-Events unter
+``/jobs/{id}/events`` bereit.
+
+Mehrere Prozesse dürfen sich eine Datenbank teilen: Ein Job wird mit einem
+einzigen ``UPDATE`` übernommen, der Besitzer hält ihn per Heartbeat am Leben.
+Nur Jobs ohne aktuellen Heartbeat (Prozess abgestürzt oder beendet) werden
+erneut eingeplant, höchstens ``JOB_MAX_ATTEMPTS``-mal.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+from uuid import uuid4
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app import metrics
+from app.concurrency import run_blocking
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+#: Handler erhalten Nutzdaten und Dateinamen und liefern das JSON-Ergebnis.
+JobHandler = Callable[[bytes, str | None], Awaitable[dict]]
+
+# Registrierte Verarbeitungsschritte je Job-Art (z. B. "audio", "image").
+_JOB_HANDLERS: dict[str, JobHandler] = {}
+
+FINISHED_STATES = frozenset({"succeeded", "failed"})
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    filename TEXT,
+    payload BLOB,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    status_code INTEGER,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    owner TEXT,
+    heartbeat REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+# Spalten, die nach der ersten Version hinzukamen (für bestehende Dateien).
+_ADDED_COLUMNS = {
+    "owner": "TEXT",
+    "heartbeat": "REAL",
+    "attempts": "INTEGER NOT NULL DEFAULT 0",
+}
+
+
+def register_handler(kind: str, handler: JobHandler) -> None:
+    """Registriert die Verarbeitung für eine Job-Art."""
+    _JOB_HANDLERS[kind] = handler
+
+
+class JobQueue:
+    """SQLite-gestützte Warteschlange mit begrenztem Worker-Pool."""
+
+    def __init__(self, db_path: str | Path, workers: int = 2) -> None:
+        self.db_path = Path(db_path)
+        self.workers = max(1, workers)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(_SCHEMA)
+            columns = {
+                row["name"]
+                for row in self._conn.execute("PRAGMA table_info(jobs)")
+            }
+            for name, definition in _ADDED_COLUMNS.items():
+                if name not in columns:
+                    self._conn.execute(
+                        f"ALTER TABLE jobs ADD COLUMN {name} {definition}"
+                    )
+        # Kennung dieser Instanz; markiert die von ihr übernommenen Jobs.
+        self.owner = uuid4().hex
+        self._wakeup: asyncio.Event | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    # -- Persistenz ----------------------------------------------------
+    def submit(self, kind: str, payload: bytes, filename: str | None = None) -> str:
+        """Legt einen neuen Job an und gibt seine ID zurück."""
+        if kind not in _JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind {kind}")
+        job_id = uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs"
+                " (id, kind, filename, payload, status, created, updated)"
+                " VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, filename, payload, now, now),
+            )
+        metrics.inc("jobs.submitted")
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str) -> dict[str, Any] | None:
+        """Liefert Status und ggf. Ergebnis eines Jobs."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, kind, status, result, error, status_code, created, updated"
+                " FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = {
+            "id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "created": row["created"],
+            "updated": row["updated"],
+        }
+        if row["result"] is not None:
+            job["result"] = json.loads(row["result"])
+        if row["error"] is not None:
+            job["error"] = row["error"]
+            job["status_code"] = row["status_code"]
+        return job
+
+    def _claim(self) -> sqlite3.Row | None:
+        """Markiert den ältesten wartenden Job als laufend und gibt ihn zurück.
+
+        Auswahl und Übernahme sind ein einziges ``UPDATE``, damit zwei
+        Prozesse mit derselben Datenbank nie denselben Job erhalten.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, heartbeat = ?,"
+                " attempts = attempts + 1, updated = ?"
+                " WHERE id = (SELECT id FROM jobs WHERE status = 'queued'"
+                " ORDER BY created LIMIT 1) AND status = 'queued'"
+                " RETURNING id, kind, filename, payload",
+                (self.owner, now, now),
+            ).fetchone()
+
+    def _heartbeat(self) -> None:
+        """Bestätigt, dass die Jobs dieser Instanz noch laufen."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status = 'running'",
+                (time.time(), self.owner),
+            )
+
+    def _release(self) -> int:
+        """Gibt beim Beenden die eigenen laufenden Jobs sofort wieder frei."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL,"
+                " attempts = MAX(attempts - 1, 0), updated = ?"
+                " WHERE owner = ? AND status = 'running'",
+                (time.time(), self.owner),
+            )
+        return cursor.rowcount
+
+    def _finish(
+        self,
+        job_id: str,
+        *,
+        result: dict | None = None,
+        error: str | None = None,
+        status_code: int | None = None,
+    ) -> None:
+        status = "failed" if error is not None else "succeeded"
+        encoded = json.dumps(result, ensure_ascii=False) if result is not None else None
+        with self._lock, self._conn:
+            # Die Rohdaten werden nach Abschluss nicht mehr gebraucht.
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, status_code = ?,"
+                " payload = NULL, updated = ? WHERE id = ?",
+                (
+                    status,
+                    encoded,
+                    error,
+                    status_code,
+                    time.time(),
+                    job_id,
+                ),
+            )
+        metrics.inc(f"jobs.{status}")
+
+    def requeue_interrupted(self, stale_after: float | None = None) -> int:
+        """Plant laufende Jobs ohne aktuellen Heartbeat erneut ein.
+
+        Jobs, die schon ``job_max_attempts``-mal gestartet wurden (z. B. weil
+        sie den Prozess zum Absturz bringen), gelten stattdessen als
+        fehlgeschlagen.
+        """
+        now = time.time()
+        if stale_after is None:
+            stale_after = settings.job_stale_after
+        cutoff = now - stale_after
+        with self._lock, self._conn:
+            failed = self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, status_code = 500,"
+                " payload = NULL, owner = NULL, updated = ?"
+                " WHERE status = 'running' AND COALESCE(heartbeat, 0) <= ?"
+                " AND attempts >= ?",
+                (
+                    "Job was interrupted too often",
+                    now,
+                    cutoff,
+                    settings.job_max_attempts,
+                ),
+            ).rowcount
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL, updated = ?"
+                " WHERE status = 'running' AND COALESCE(heartbeat, 0) <= ?",
+                (now, cutoff),
+            )
+        if failed:
+            logger.warning("Gave up on %d repeatedly interrupted jobs", failed)
+            metrics.inc("jobs.failed", failed)
+        return cursor.rowcount
+
+    def pending(self) -> int:
+        """Anzahl wartender Jobs (für ``/metrics``)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued'"
+            ).fetchone()
+        return int(row[0])
+
+    # -- Verarbeitung --------------------------------------------------
+    async def process_next(self) -> bool:
+        """Arbeitet den nächsten wartenden Job ab; ``False`` wenn keiner da ist."""
+        row = await run_blocking(self._claim)
+        if row is None:
+            return False
+        job_id = row["id"]
+        logger.info("Running %s job %s", row["kind"], job_id)
+        try:
+            handler = _JOB_HANDLERS[row["kind"]]
+            result = await handler(row["payload"], row["filename"])
+        except HTTPException as exc:
+            logger.warning("Job %s failed: %s", job_id, exc.detail)
+            finish = functools.partial(
+                self._finish, job_id, error=str(exc.detail), status_code=exc.status_code
+            )
+        except Exception as exc:
+            logger.exception("Job %s failed", job_id)
+            finish = functools.partial(
+                self._finish, job_id, error=str(exc), status_code=500
+            )
+        else:
+            finish = functools.partial(self._finish, job_id, result=result)
+        try:
+            await run_blocking(finish)
+        except Exception:
+            # z. B. nicht serialisierbares Ergebnis oder gesperrte Datenbank
+            logger.exception("Could not store result of job %s", job_id)
+            await run_blocking(
+                functools.partial(
+                    self._finish,
+                    job_id,
+                    error="Could not store job result",
+                    status_code=500,
+                )
+            )
+        return True
+
+    async def _worker(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            # Ein Fehler beim Holen oder Abschließen darf den Worker nicht
+            # beenden, sonst schrumpft der Pool unbemerkt.
+            try:
+                if await self.process_next():
+                    continue
+            except Exception:
+                logger.exception("Job worker iteration failed")
+                metrics.inc("jobs.worker_errors")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=settings.job_poll_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def _maintain(self) -> None:
+        """Heartbeat für eigene Jobs, Wiederaufnahme verwaister fremder Jobs."""
+        assert self._wakeup is not None
+        while True:
+            try:
+                await run_blocking(self._heartbeat)
+                requeued = await run_blocking(self.requeue_interrupted)
+                if requeued:
+                    logger.info("Requeued %d interrupted jobs", requeued)
+                    self._wakeup.set()
+            except Exception:
+                logger.exception("Job heartbeat failed")
+            await asyncio.sleep(settings.job_heartbeat_interval)
+
+    def start(self) -> None:
+        """Startet die Worker im laufenden Event-Loop."""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._maintain()))
+
+    async def stop(self) -> None:
+        """Beendet die Worker und gibt laufende Jobs zur Wiederholung frei."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+        released = await run_blocking(self._release)
+        if released:
+            logger.info("Released %d running jobs", released)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_job_queue: JobQueue | None = None
+
+
+def get_job_queue() -> JobQueue:
+    """Gibt die prozessweite Job-Warteschlange zurück."""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue(settings.jobs_db_path, workers=settings.job_workers)
+    return _job_queue
+
+
+metrics.register_gauge(
+    "jobs.pending", lambda: _job_queue.pending() if _job_queue else 0
+)
+
+
+def accepted_response(job_id: str) -> dict:
+    """Antwortkörper für ``202 Accepted`` mit Verweisen auf Status und SSE."""
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/jobs/{job_id}",
+        "events_url": f"/jobs/{job_id}/events",
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def read_job(job_id: str):
+    """Liefert Status und – sobald fertig – das Ergebnis eines Jobs."""
+    job = await run_blocking(get_job_queue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Streamt Statusänderungen eines Jobs als Server-Sent-Events."""
+    queue = get_job_queue()
+    if await run_blocking(queue.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        last_status = None
+        while True:
+            job = await run_blocking(queue.get, job_id)
+            if job is None:  # pragma: no cover - deleted meanwhile
+                return
+            if job["status"] != last_status:
+                last_status = job["status"]
+                data = json.dumps(job, ensure_ascii=False)
+                yield f"event: {last_status}\ndata: {data}\n\n"
+            if last_status in FINISHED_STATES:
+                return
+            await asyncio.sleep(settings.job_poll_interval)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
@@ -0,0 +1,187 @@
+"""Inkrementelle Prüfung gestreamter LLM-JSON-Ausgaben.
+
+Lokale Modelle brauchen für eine komplette Antwort oft Dutzende Sekunden.
+Beginnt das Modell stattdessen, das JSON-Schema selbst oder ein nicht
+passendes Objekt zu schreiben, erkennt :class:`JSONStreamGuard` das bereits
+an den ersten Token, sodass der Aufrufer den Stream abbrechen und direkt den
+Repair-Prompt senden kann.
+"""
+
+from __future__ import annotations
+
+from pydantic import BaseModel
+
+from app.models import JSON_SCHEMA_KEYS
+
+_CONTAINER_TYPES = frozenset({"object", "array"})
+
+
+class StreamAborted(ValueError):
+    """Die bisherige Ausgabe kann nicht mehr zum erwarteten Modell passen."""
+
+    def __init__(self, reason: str, partial: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.partial = partial
+
+
+def _schema_types(prop: dict, defs: dict) -> frozenset[str] | None:
+    """Ermittelt die erlaubten JSON-Typen eines Schema-Properties.
+
+    ``None`` bedeutet „unbekannt“ – dann wird der Wert nicht geprüft.
+    """
+    if "$ref" in prop:
+        target = defs.get(prop["$ref"].rsplit("/", 1)[-1], {})
+        return _schema_types(target, defs) or frozenset({"object"})
+    if "type" in prop:
+        types = prop["type"]
+        return frozenset([types] if isinstance(types, str) else types)
+    variants = prop.get("anyOf") or prop.get("oneOf")
+    if variants:
+        result: set[str] = set()
+        for variant in variants:
+            types = _schema_types(variant, defs)
+            if types is None:
+                return None
+            result |= types
+        return frozenset(result)
+    return None
+
+
+def _value_type(char: str) -> str:
+    """Leitet den JSON-Typ eines Werts aus seinem ersten Zeichen ab."""
+    if char == "{":
+        return "object"
+    if char == "[":
+        return "array"
+    if char == '"':
+        return "string"
+    if char in "tf":
+        return "boolean"
+    if char == "n":
+        return "null"
+    return "number"
+
+
+class JSONStreamGuard:
+    """Prüft gestreamte JSON-Ausgaben Zeichen für Zeichen gegen ein Modell.
+
+    Geprüft wird nur, was sich früh und sicher entscheiden lässt: das
+    Top-Level-Objekt, Schema-Schlüssel (wie in ``_looks_like_json_schema``),
+    unbekannte Felder bei ``extra="forbid"`` sowie Objekt/Array-Werte an
+    Stellen, an denen das Schema etwas anderes erwartet. Alles Weitere
+    übernimmt wie bisher ``parse_model_json`` nach Ende des Streams.
+    """
+
+    def __init__(self, model_cls: type[BaseModel]) -> None:
+        schema = model_cls.model_json_schema()
+        defs = schema.get("$defs", {})
+        self._field_types = {
+            name: _schema_types(prop, defs)
+            for name, prop in schema.get("properties", {}).items()
+        }
+        self._forbid_extra = model_cls.model_config.get("extra") == "forbid"
+        self._chunks: list[str] = []
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escape = False
+        self._key_chars: list[str] | None = None
+        self._expect_key = False
+        self._expect_value = False
+        self._current_key: str | None = None
+        self.complete = False
+
+    @property
+    def text(self) -> str:
+        """Bisher empfangene Ausgabe."""
+        return "".join(self._chunks)
+
+    def feed(self, chunk: str) -> bool:
+        """Verarbeitet ein weiteres Stück Text.
+
+        Gibt ``True`` zurück, sobald das Top-Level-Objekt geschlossen ist, und
+        wirft :class:`StreamAborted`, wenn die Ausgabe nicht mehr passen kann.
+        """
+        if self.complete:
+            return True
+        for index, char in enumerate(chunk):
+            try:
+                done = self._step(char)
+            except StreamAborted as exc:
+                exc.partial = self.text + chunk[: index + 1]
+                raise
+            if done:
+                self._chunks.append(chunk[: index + 1])
+                self.complete = True
+                return True
+        self._chunks.append(chunk)
+        return False
+
+    def _abort(self, reason: str) -> None:
+        raise StreamAborted(reason, self.text)
+
+    def _step(self, char: str) -> bool:
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._key_chars is not None:
+                    self._check_key("".join(self._key_chars))
+                    self._key_chars = None
+                return False
+            if self._key_chars is not None:
+                self._key_chars.append(char)
+            return False
+
+        if char.isspace():
+            return False
+
+        if not self._stack:
+            if char != "{":
+                self._abort("top-level value is not an object")
+            self._stack.append("{")
+            self._expect_key = True
+            return False
+
+        top_level = len(self._stack) == 1
+        if top_level and self._expect_value:
+            self._expect_value = False
+            self._check_value(_value_type(char))
+
+        if char == '"':
+            self._in_string = True
+            if top_level and self._expect_key:
+                self._key_chars = []
+                self._expect_key = False
+        elif char in "{[":
+            self._stack.append(char)
+        elif char in "}]":
+            self._stack.pop()
+            if not self._stack:
+                return True
+        elif top_level and char == ":":
+            self._expect_value = True
+        elif top_level and char == ",":
+            self._expect_key = True
+        return False
+
+    def _check_key(self, key: str) -> None:
+        if key in JSON_SCHEMA_KEYS:
+            self._abort("received json schema instead of data payload")
+        if self._forbid_extra and key not in self._field_types:
+            self._abort(f"unexpected field {key!r}")
+        self._current_key = key
+
+    def _check_value(self, value_type: str) -> None:
+        allowed = self._field_types.get(self._current_key or "")
+        if not allowed or value_type in allowed:
+            return
+        # Skalare Typen werden von Pydantic teils umgewandelt ("3" → 3.0);
+        # abgebrochen wird nur bei eindeutigen Objekt/Array-Konflikten.
+        if value_type in _CONTAINER_TYPES or allowed - {"null"} <= _CONTAINER_TYPES:
+            self._abort(
+                f"field {self._current_key!r} expects {'/'.join(sorted(allowed))}"
+            )
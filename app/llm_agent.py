@@ -3,18 +3,27 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
 
 import logging
 import httpx
 from fastapi import HTTPException
-from openai import OpenAI
 import json
+from typing import Callable
 
+from app import metrics
+from app.cache import TieredCache, make_key
+from app.concurrency import run_blocking
+from app.http_clients import get_ollama_client, get_openai_client
+from app.json_stream import JSONStreamGuard, StreamAborted
 from app.settings import settings
 from app.logging_config import mask_pii
 from app.models import (
     CustomerPass,
     ExtractionResult,
+    InvoiceContext,
     LaborPass,
     MaterialPass,
     PreextractCandidates,
@@ -31,17 +40,69 @@ logger = logging.getLogger(__name__)
 class LLMProvider(ABC):
     """Abstrakte Basis für alle Large-Language-Model-Backends."""
 
+    #: Name, unter dem der Provider in ``_LLM_PROVIDERS`` registriert ist.
+    name: str = "default"
+
+    @property
+    def max_concurrency(self) -> int:
+        """Maximale Anzahl gleichzeitiger Anfragen an dieses Backend."""
+        return 1
+
     @abstractmethod
     def complete(self, prompt: str, system_prompt: str | None = None) -> str:
         """Gibt eine JSON-Ausgabe auf Basis des Prompts zurück."""
         raise NotImplementedError
 
+    async def acomplete(self, prompt: str, system_prompt: str | None = None) -> str:
+        """Async-Variante von :meth:`complete`.
+
+        Läuft im Thread-Pool des Providers, damit ``max_concurrency`` auch für
+        async-Aufrufer gilt.
+        """
+        return await run_blocking(
+            self.complete, prompt, system_prompt, executor=_pass_executor(self)
+        )
+
+    def complete_json(
+        self,
+        prompt: str,
+        model_cls: type[BaseModel],
+        system_prompt: str | None = None,
+    ) -> str:
+        """Wie :meth:`complete`, aber mit bekanntem Zielmodell der Antwort.
+
+        Provider können so eine offensichtlich unpassende Generierung früh
+        abbrechen (siehe :class:`OllamaProvider`).
+        """
+        return self.complete(prompt, system_prompt=system_prompt)
+
+    async def acomplete_json(
+        self,
+        prompt: str,
+        model_cls: type[BaseModel],
+        system_prompt: str | None = None,
+    ) -> str:
+        """Async-Variante von :meth:`complete_json`."""
+        return await run_blocking(
+            self.complete_json,
+            prompt,
+            model_cls,
+            system_prompt,
+            executor=_pass_executor(self),
+        )
+
 
 class OpenAIProvider(LLMProvider):
     """Verwendet die Chat-Completions-API von OpenAI."""
 
+    name = "openai"
+
+    @property
+    def max_concurrency(self) -> int:
+        return settings.openai_max_concurrency
+
     def complete(self, prompt: str, system_prompt: str | None = None) -> str:
-        client = OpenAI()
+        client = get_openai_client()
         messages = []
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
@@ -64,26 +125,28 @@ class OpenAIProvider(LLMProvider):
 class OllamaProvider(LLMProvider):
     """Spricht mit einem lokalen Ollama-Server."""
 
-    def complete(self, prompt: str, system_prompt: str | None = None) -> str:
+    name = "ollama"
+
+    @property
+    def max_concurrency(self) -> int:
+        return settings.ollama_max_concurrency
+
+    def _request(
+        self, prompt: str, system_prompt: str | None, stream: bool
+    ) -> tuple[str, dict, httpx.Timeout]:
         full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
         url = f"{settings.ollama_base_url.rstrip('/')}/api/generate"
         timeout_s = max(300.0, settings.ollama_timeout)
-        try:
-            resp = httpx.post(
-                url,
-                json={
-                    "model": settings.llm_model,
-                    "prompt": full_prompt,
-                    "stream": False,
-                    "format": "json",
-                },
-                timeout=httpx.Timeout(timeout_s, connect=5.0),
-            )
-        except httpx.RequestError as exc:
-            logger.exception("Failed to contact Ollama server at %s", url)
-            raise HTTPException(
-                status_code=503, detail="Ollama server unreachable"
-            ) from exc
+        payload = {
+            "model": settings.llm_model,
+            "prompt": full_prompt,
+            "stream": stream,
+            "format": "json",
+        }
+        return url, payload, httpx.Timeout(timeout_s, connect=5.0)
+
+    @staticmethod
+    def _raise_for_status(resp: httpx.Response) -> None:
         if resp.status_code == 404:
             # Ollama returns 404 when the model is unknown or not pulled yet.
             # Surface a clearer error message so users know how to resolve it.
@@ -97,12 +160,171 @@ class OllamaProvider(LLMProvider):
             raise RuntimeError(
                 f"Ollama model '{settings.llm_model}' unavailable: {detail}"
             )
-
         resp.raise_for_status()
+
+    def complete(self, prompt: str, system_prompt: str | None = None) -> str:
+        url, payload, timeout = self._request(prompt, system_prompt, stream=False)
+        try:
+            resp = get_ollama_client().post(url, json=payload, timeout=timeout)
+        except httpx.RequestError as exc:
+            logger.exception("Failed to contact Ollama server at %s", url)
+            raise HTTPException(
+                status_code=503, detail="Ollama server unreachable"
+            ) from exc
+        self._raise_for_status(resp)
         resp_json = resp.json()
         logger.debug("Ollama full response: %s", mask_pii(str(resp_json)))
         return resp_json.get("response", "")
 
+    def complete_json(
+        self,
+        prompt: str,
+        model_cls: type[BaseModel],
+        system_prompt: str | None = None,
+    ) -> str:
+        """Streamt die Antwort und bricht ab, sobald sie nicht mehr passen kann.
+
+        Bei einem Abbruch wird die bisherige Teilantwort zurückgegeben; sie
+        scheitert anschließend an ``parse_model_json`` und löst so direkt den
+        Repair-Prompt aus, statt auf das Ende der Generierung zu warten.
+        """
+        if not settings.ollama_stream:
+            return self.complete(prompt, system_prompt=system_prompt)
+        url, payload, timeout = self._request(prompt, system_prompt, stream=True)
+        guard = JSONStreamGuard(model_cls)
+        try:
+            with get_ollama_client().stream(
+                "POST", url, json=payload, timeout=timeout
+            ) as resp:
+                if resp.status_code >= 400:
+                    resp.read()
+                    self._raise_for_status(resp)
+                for line in resp.iter_lines():
+                    if not line.strip():
+                        continue
+                    data = json.loads(line)
+                    if data.get("error"):
+                        raise RuntimeError(f"Ollama stream failed: {data['error']}")
+                    # Nach dem schließenden ``}`` nicht weiterlesen: Modelle im
+                    # JSON-Modus hängen gern noch lange Leerzeichen an.
+                    if guard.feed(data.get("response", "")) or data.get("done"):
+                        break
+        except httpx.RequestError as exc:
+            logger.exception("Failed to contact Ollama server at %s", url)
+            raise HTTPException(
+                status_code=503, detail="Ollama server unreachable"
+            ) from exc
+        except StreamAborted as exc:
+            metrics.inc("ollama.stream_aborts")
+            logger.info(
+                "Aborted Ollama stream for %s after %d chars: %s",
+                model_cls.__name__,
+                len(exc.partial),
+                exc.reason,
+            )
+            return exc.partial
+        logger.debug("Ollama streamed response: %s", mask_pii(guard.text))
+        return guard.text
+
+
+class CachedLLMProvider(LLMProvider):
+    """Cacht Antworten eines anderen Providers inhaltsadressiert.
+
+    Schlüssel sind Provider, Modell, Aufrufart (Text bzw. JSON samt
+    Zielmodell), System-Prompt und Prompt. Identische gleichzeitige Anfragen
+    (z. B. Retries oder erneut zugestellte Webhooks) lösen nur einen einzigen
+    Aufruf beim Backend aus. JSON-Antworten werden nur abgelegt, wenn sie
+    ``parse_model_json`` bestehen; ungültige Antworten und abgebrochene
+    Streams (Teilantworten) würden sonst bis zum TTL-Ablauf wiederholt.
+    """
+
+    def __init__(self, inner: LLMProvider, cache: TieredCache[str]) -> None:
+        self.inner = inner
+        self.cache = cache
+        self.name = inner.name
+
+    @property
+    def max_concurrency(self) -> int:
+        return self.inner.max_concurrency
+
+    def _key(
+        self,
+        prompt: str,
+        system_prompt: str | None,
+        model_cls: type[BaseModel] | None = None,
+    ) -> str:
+        method = f"json:{model_cls.__name__}" if model_cls else "text"
+        return make_key(
+            self.inner.name, settings.llm_model, method, system_prompt or "", prompt
+        )
+
+    @staticmethod
+    def _valid_json(model_cls: type[BaseModel]) -> Callable[[str], bool]:
+        def check(response: str) -> bool:
+            try:
+                parse_model_json(response, model_cls, error_label="cache check")
+            except ValueError:
+                return False
+            return True
+
+        return check
+
+    def complete(self, prompt: str, system_prompt: str | None = None) -> str:
+        return self.cache.get_or_compute(
+            self._key(prompt, system_prompt),
+            lambda: self.inner.complete(prompt, system_prompt=system_prompt),
+        )
+
+    async def acomplete(self, prompt: str, system_prompt: str | None = None) -> str:
+        return await self.cache.aget_or_compute(
+            self._key(prompt, system_prompt),
+            lambda: self.inner.acomplete(prompt, system_prompt=system_prompt),
+        )
+
+    def complete_json(
+        self,
+        prompt: str,
+        model_cls: type[BaseModel],
+        system_prompt: str | None = None,
+    ) -> str:
+        return self.cache.get_or_compute(
+            self._key(prompt, system_prompt, model_cls),
+            lambda: self.inner.complete_json(
+                prompt, model_cls, system_prompt=system_prompt
+            ),
+            store=self._valid_json(model_cls),
+        )
+
+    async def acomplete_json(
+        self,
+        prompt: str,
+        model_cls: type[BaseModel],
+        system_prompt: str | None = None,
+    ) -> str:
+        return await self.cache.aget_or_compute(
+            self._key(prompt, system_prompt, model_cls),
+            lambda: self.inner.acomplete_json(
+                prompt, model_cls, system_prompt=system_prompt
+            ),
+            store=self._valid_json(model_cls),
+        )
+
+
+_llm_cache: TieredCache[str] | None = None
+
+
+def get_llm_cache() -> TieredCache[str]:
+    """Gibt den prozessweiten LLM-Antwortcache zurück."""
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = TieredCache(
+            "llm_cache",
+            max_entries=settings.llm_cache_max_entries,
+            ttl=settings.llm_cache_ttl,
+            disk_dir=settings.llm_cache_dir,
+        )
+    return _llm_cache
+
 
 SYSTEM_PROMPT = (
     "Du bist ein strukturierter JSON-Reconciler für Handwerker. "
@@ -202,7 +424,38 @@ def _run_pass(
 ) -> BaseModel:
     schema = model_cls.model_json_schema()
     prompt = _build_pass_prompt(transcript, candidates, task, schema)
-    response = provider.complete(prompt, system_prompt=SYSTEM_PROMPT)
+    response = provider.complete_json(prompt, model_cls, system_prompt=SYSTEM_PROMPT)
+    try:
+        return parse_model_json(response, model_cls, error_label="invalid pass payload")
+    except ValueError:
+        repair_prompt = _build_repair_prompt(
+            task,
+            schema,
+            response,
+            candidates,
+            transcript,
+        )
+        repair_response = provider.complete_json(
+            repair_prompt, model_cls, system_prompt=SYSTEM_PROMPT
+        )
+        return parse_model_json(
+            repair_response, model_cls, error_label="invalid pass payload"
+        )
+
+
+async def _arun_pass(
+    provider: LLMProvider,
+    transcript: str,
+    candidates: PreextractCandidates,
+    task: str,
+    model_cls: type,
+) -> BaseModel:
+    """Async-Gegenstück zu :func:`_run_pass` inklusive Repair-Versuch."""
+    schema = model_cls.model_json_schema()
+    prompt = _build_pass_prompt(transcript, candidates, task, schema)
+    response = await provider.acomplete_json(
+        prompt, model_cls, system_prompt=SYSTEM_PROMPT
+    )
     try:
         return parse_model_json(response, model_cls, error_label="invalid pass payload")
     except ValueError:
@@ -213,7 +466,9 @@ def _run_pass(
             candidates,
             transcript,
         )
-        repair_response = provider.complete(repair_prompt, system_prompt=SYSTEM_PROMPT)
+        repair_response = await provider.acomplete_json(
+            repair_prompt, model_cls, system_prompt=SYSTEM_PROMPT
+        )
         return parse_model_json(
             repair_response, model_cls, error_label="invalid pass payload"
         )
@@ -241,41 +496,116 @@ def _merge_passes(
     )
 
 
+# Die vier Extraktionspässe sind voneinander unabhängig und laufen parallel.
+_PASSES: tuple[tuple[str, type[BaseModel]], ...] = (
+    ("Pass 1: Extrahiere Kunde und Adresse.", CustomerPass),
+    ("Pass 2: Extrahiere alle Materialpositionen.", MaterialPass),
+    (
+        "Pass 3: Extrahiere Arbeitszeiten inklusive Rolle (meister/geselle).",
+        LaborPass,
+    ),
+    (
+        "Pass 4: Extrahiere Fahrtkosten und sonstige Positionen als travel.",
+        TravelPass,
+    ),
+)
+
+# Ein Thread-Pool pro Provider begrenzt die gleichzeitigen Anfragen an das
+# jeweilige Backend – auch über mehrere parallele HTTP-Requests hinweg.
+_PASS_EXECUTORS: dict[tuple[str, int], ThreadPoolExecutor] = {}
+_PASS_EXECUTORS_LOCK = threading.Lock()
+
+
+def _pass_executor(provider: LLMProvider) -> ThreadPoolExecutor:
+    """Gibt den (einmalig angelegten) Pass-Executor des Providers zurück."""
+    workers = max(1, provider.max_concurrency)
+    key = (provider.name, workers)
+    with _PASS_EXECUTORS_LOCK:
+        executor = _PASS_EXECUTORS.get(key)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix=f"llm-{provider.name}",
+            )
+            _PASS_EXECUTORS[key] = executor
+    return executor
+
+
 def _extract_multi_pass(
     provider: LLMProvider,
     transcript: str,
     candidates: PreextractCandidates,
 ) -> str:
-    customer_pass = _run_pass(
-        provider,
-        transcript,
-        candidates,
-        task="Pass 1: Extrahiere Kunde und Adresse.",
-        model_cls=CustomerPass,
+    executor = _pass_executor(provider)
+    futures = [
+        executor.submit(
+            _run_pass,
+            provider,
+            transcript,
+            candidates,
+            task=task,
+            model_cls=model_cls,
+        )
+        for task, model_cls in _PASSES
+    ]
+    # ``result()`` wartet auf alle Pässe und reicht Fehler unverändert weiter.
+    customer_pass, material_pass, labor_pass, travel_pass = (
+        future.result() for future in futures
+    )
+    return _finalize_passes(customer_pass, material_pass, labor_pass, travel_pass)
+
+
+async def _aextract_multi_pass(
+    provider: LLMProvider,
+    transcript: str,
+    candidates: PreextractCandidates,
+    state: InvoiceContext | None = None,
+) -> str:
+    suffix = _delta_task_suffix(state) if state is not None else ""
+    customer_pass, material_pass, labor_pass, travel_pass = await asyncio.gather(
+        *(
+            _arun_pass(
+                provider,
+                transcript,
+                candidates,
+                task=task + suffix,
+                model_cls=model_cls,
+            )
+            for task, model_cls in _PASSES
+        )
     )
-    material_pass = _run_pass(
-        provider,
-        transcript,
-        candidates,
-        task="Pass 2: Extrahiere alle Materialpositionen.",
-        model_cls=MaterialPass,
+    return _finalize_passes(
+        customer_pass,
+        material_pass,
+        labor_pass,
+        travel_pass,
+        require_items=state is None,
     )
-    labor_pass = _run_pass(
-        provider,
-        transcript,
-        candidates,
-        task="Pass 3: Extrahiere Arbeitszeiten inklusive Rolle (meister/geselle).",
-        model_cls=LaborPass,
+
+
+def _delta_task_suffix(state: InvoiceContext) -> str:
+    """Ergänzt eine Pass-Aufgabe um den bisherigen Rechnungsstand."""
+    state_json = state.model_dump_json(
+        include={"customer", "service", "items"},
+        exclude={"items": {"__all__": {"original_category", "category_source"}}},
     )
-    travel_pass = _run_pass(
-        provider,
-        transcript,
-        candidates,
-        task="Pass 4: Extrahiere Fahrtkosten und sonstige Positionen als travel.",
-        model_cls=TravelPass,
+    return (
+        " Der Text ist nur der neue Gesprächsteil. Gib ausschließlich Angaben "
+        "zurück, die darin neu hinzukommen oder korrigiert werden; bereits "
+        "erfasste Angaben nicht wiederholen. Leere Listen sind erlaubt.\n\n"
+        f"Bisheriger Rechnungsstand (JSON):\n{state_json}"
     )
+
+
+def _finalize_passes(
+    customer_pass: CustomerPass,
+    material_pass: MaterialPass,
+    labor_pass: LaborPass,
+    travel_pass: TravelPass,
+    require_items: bool = True,
+) -> str:
     merged = _merge_passes(customer_pass, material_pass, labor_pass, travel_pass)
-    missing = missing_extraction_fields(merged)
+    missing = missing_extraction_fields(merged) if require_items else []
     if missing:
         raise ValueError(f"missing required fields: {', '.join(missing)}")
     return merged.model_dump_json()
@@ -293,7 +623,10 @@ def _select_provider() -> LLMProvider:
         provider_cls = _LLM_PROVIDERS[settings.llm_provider]
     except KeyError:  # pragma: no cover - configuration error
         raise ValueError(f"Unsupported LLM_PROVIDER {settings.llm_provider}")
-    return provider_cls()
+    provider = provider_cls()
+    if settings.llm_cache_enabled:
+        return CachedLLMProvider(provider, get_llm_cache())
+    return provider
 
 
 def extract_invoice_context(transcript: str) -> str:
@@ -303,16 +636,38 @@ def extract_invoice_context(transcript: str) -> str:
     return _extract_multi_pass(provider, transcript, candidates)
 
 
+async def aextract_invoice_context(transcript: str) -> str:
+    """Async-Variante von :func:`extract_invoice_context` für die Endpunkte."""
+    provider = _select_provider()
+    candidates = preextract_candidates(transcript)
+    return await _aextract_multi_pass(provider, transcript, candidates)
+
+
+async def aextract_invoice_delta(state: InvoiceContext, transcript_part: str) -> str:
+    """Extrahiert nur die Änderungen eines neuen Gesprächsteils.
+
+    Das LLM erhält den bisherigen Rechnungsstand und ausschließlich den neuen
+    Text, sodass Promptgröße und Laufzeit pro Dialogrunde konstant bleiben.
+    Das Ergebnis ist ein ``ExtractionResult``-JSON, das auch leer sein darf.
+    """
+    provider = _select_provider()
+    candidates = preextract_candidates(transcript_part)
+    return await _aextract_multi_pass(
+        provider, transcript_part, candidates, state=state
+    )
+
+
 def check_llm_backend(timeout: float = 5.0) -> bool:
     """Prüft, ob das gewählte LLM erreichbar ist."""
     try:
         if settings.llm_provider == "openai":
-            client = OpenAI()
-            # Listing models is a lightweight way to verify connectivity.
+            client = get_openai_client()
+            # Listing models is a lightweight way to verify connectivity and
+            # opens the first pooled connection (warm-up).
             client.models.list()
         elif settings.llm_provider == "ollama":
             url = f"{settings.ollama_base_url.rstrip('/')}/api/tags"
-            httpx.get(
+            get_ollama_client().get(
                 url, timeout=httpx.Timeout(timeout, connect=5.0)
             ).raise_for_status()
         else:  # pragma: no cover - unrecognised provider
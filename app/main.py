@@ -1,29 +1,44 @@
+import asyncio
+import functools
 import logging
-import os
-import subprocess
-import tempfile
 import time
 from pathlib import Path
+from typing import AsyncIterator
 from uuid import uuid4
 
-from fastapi import File, HTTPException, UploadFile, FastAPI, Request
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi import File, HTTPException, UploadFile, FastAPI, Query, Request
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 
 # Die eigentliche Geschäftslogik steckt in diesen Hilfsmodulen. Wir holen sie
 # hier zusammen, damit die FastAPI-Endpunkte schlank bleiben.
-from app.billing_adapter import send_to_billing_system
-from app.llm_agent import check_llm_backend, extract_invoice_context
+from app.artifacts import artifact_links, router as artifacts_router
+from app.audio import (
+    iter_bytes,
+    iter_upload,
+    normalize_audio,
+    prepare_audio,
+    read_capped,
+)
+from app.billing_adapter import asend_to_billing_system
+from app import metrics, providers, tts
+from app.concurrency import run_blocking, shutdown_executor
+from app.http_clients import close_clients, open_clients
+from app.jobs import accepted_response, get_job_queue, register_handler
+from app.jobs import router as jobs_router
+from app.llm_agent import aextract_invoice_context, check_llm_backend
 from app.models import parse_invoice_context
 from app.pricing import apply_pricing
 from app.persistence import store_interaction
 from app.settings import settings
 from app.telephony import router as telephony_router
-from app.conversation import router as conversation_router
-from app.stt import transcribe_audio
+from app.conversation import fixed_prompts, router as conversation_router
+from app.stt import accepted_audio_formats, atranscribe_audio
+from app.stt.command_server import WorkerUnavailable
 from app.ocr import extract_text
 from app.logging_config import configure_logging
 from app.request_id import request_id_ctx_var
+from app.session_store import close_session_store
 
 # Einmalig beim Import die Standard-Logging-Konfiguration anwenden.
 configure_logging()
@@ -47,15 +62,31 @@ async def add_request_id(request: Request, call_next):
 
 
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
+# PDF/XRechnung werden erst beim Abruf gerendert; die Route muss daher vor
+# dem statischen /data-Mount stehen.
+app.include_router(artifacts_router)
 # Sitzungsartefakte (z. B. generierte PDFs) unter /data verfügbar machen.
 app.mount("/data", StaticFiles(directory="data"), name="data")
 app.include_router(telephony_router)
 app.include_router(conversation_router)
+app.include_router(jobs_router)
+
+
+@app.exception_handler(WorkerUnavailable)
+async def _stt_worker_unavailable(request: Request, exc: WorkerUnavailable):
+    """Belegte oder hängende STT-Worker sind vorübergehend: ``503``."""
+    logger.warning("STT worker unavailable: %s", exc)
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
 
 
 @app.on_event("startup")
 def _check_llm_backend() -> None:
-    """Prüft beim Start, ob das konfigurierte LLM erreichbar ist."""
+    """Prüft beim Start, ob das konfigurierte LLM erreichbar ist.
+
+    Legt dabei den gemeinsamen HTTP-Client an; die Prüfanfrage wärmt
+    gleichzeitig dessen Verbindungspool vor.
+    """
+    open_clients()
     if check_llm_backend():
         logger.info("LLM backend reachable")
         return
@@ -71,6 +102,74 @@ def _check_llm_backend() -> None:
     logger.warning(msg)
 
 
+@app.on_event("startup")
+async def _preload_providers() -> None:
+    """Erzeugt STT/TTS/OCR-Provider und lädt Modelle vor der ersten Anfrage.
+
+    Dazu gehören die Whisper-Worker-Prozesse und die dauerhaften Worker des
+    ``command``-Providers; Fehler werden geloggt und unter ``/ready`` gemeldet.
+    """
+    kinds = [kind.strip() for kind in settings.provider_preload.split(",")]
+    if any(kinds):
+        await run_blocking(providers.preload_all, kinds)
+
+
+# Vorab-Vertonung der festen Rückfragen (läuft im Hintergrund)
+_tts_warmup: asyncio.Task | None = None
+
+
+async def _prewarm_tts() -> None:
+    try:
+        count = await run_blocking(tts.warm_phrases, fixed_prompts())
+    except Exception:
+        logger.warning("TTS pre-warming failed", exc_info=True)
+        return
+    logger.info("Pre-synthesized %d TTS phrase(s)", count)
+
+
+@app.on_event("startup")
+async def _warm_tts_cache() -> None:
+    """Vertont die festen Rückfragen des Dialogs vorab (``TTS_PREWARM``).
+
+    Läuft als Hintergrundaufgabe, der Start wartet also nicht auf den
+    TTS-Anbieter; bis dahin werden Rückfragen wie gewohnt bei Bedarf vertont.
+    Mit der Disk-Stufe (``TTS_CACHE_DIR``) sind nach einem Neustart keine
+    Provider-Aufrufe mehr nötig.
+    """
+    global _tts_warmup
+    if not settings.tts_prewarm or not settings.tts_cache_enabled:
+        return
+    _tts_warmup = asyncio.create_task(_prewarm_tts())
+
+
+@app.on_event("shutdown")
+async def _stop_tts_warmup() -> None:
+    """Bricht eine noch laufende Vorab-Vertonung ab."""
+    if _tts_warmup is not None and not _tts_warmup.done():
+        _tts_warmup.cancel()
+
+
+@app.on_event("startup")
+async def _start_job_workers() -> None:
+    """Startet die Worker der Hintergrund-Jobs (``?async=true``)."""
+    get_job_queue().start()
+
+
+@app.on_event("shutdown")
+async def _stop_job_workers() -> None:
+    """Hält die Job-Worker an; offene Jobs bleiben in SQLite erhalten."""
+    await get_job_queue().stop()
+
+
+@app.on_event("shutdown")
+def _shutdown_executor() -> None:
+    """Gibt Thread-Pool, HTTP-Verbindungen, Provider und Session-Store frei."""
+    close_clients()
+    providers.close_all()
+    close_session_store()
+    shutdown_executor()
+
+
 @app.get("/")
 def read_root():
     """Simple health/info endpoint for the API root."""
@@ -80,6 +179,29 @@ def read_root():
     }
 
 
+@app.get("/ready")
+def read_readiness():
+    """Bereitschaft je Provider; ``503`` solange ein benötigter lädt oder
+    fehlschlug. Fehlgeschlagene optionale Provider (OCR) stehen unter
+    ``degraded``."""
+    status = providers.readiness()
+    code = 200 if providers.is_ready() else 503
+    return JSONResponse(
+        {
+            "ready": code == 200,
+            "degraded": providers.degraded(),
+            "providers": status,
+        },
+        status_code=code,
+    )
+
+
+@app.get("/metrics")
+def read_metrics():
+    """Liefert prozesslokale Kennzahlen (Cache-Treffer, Auslastung usw.)."""
+    return metrics.snapshot()
+
+
 @app.get("/web")
 def web_interface():
     """Serve unified HTML interface for recording and uploading audio."""
@@ -89,42 +211,51 @@ def web_interface():
     return HTMLResponse(html)
 
 
-def _convert_to_wav(audio_bytes: bytes) -> bytes:
-    """Converts arbitrary audio bytes to WAV using ffmpeg."""
-    with tempfile.NamedTemporaryFile(delete=False) as src:
-        src.write(audio_bytes)
-        src.flush()
-        src_path = src.name
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as dst:
-        dst_path = dst.name
-    try:
-        subprocess.run(
-            ["ffmpeg", "-y", "-i", src_path, dst_path],
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
-        return Path(dst_path).read_bytes()
-    finally:
-        os.unlink(src_path)
-        if os.path.exists(dst_path):
-            os.unlink(dst_path)
+async def _enqueue_job(kind: str, payload: bytes, filename: str | None) -> JSONResponse:
+    """Legt einen Hintergrund-Job an und antwortet sofort mit ``202``."""
+    job_id = await run_blocking(get_job_queue().submit, kind, payload, filename)
+    logger.info("Queued %s job %s", kind, job_id)
+    return JSONResponse(status_code=202, content=accepted_response(job_id))
 
 
 @app.post("/process-audio/")
-async def process_audio(file: UploadFile = File(...)):
-    """Hauptendpunkt: nimmt Audio entgegen und liefert Rechnungsdaten zurück."""
+async def process_audio(
+    file: UploadFile = File(...),
+    async_mode: bool = Query(False, alias="async"),
+):
+    """Hauptendpunkt: nimmt Audio entgegen und liefert Rechnungsdaten zurück.
+
+    Mit ``?async=true`` wird die Verarbeitung als Hintergrund-Job eingeplant;
+    das Ergebnis steht dann unter ``/jobs/{id}`` bereit.
+    """
+    if async_mode:
+        audio_bytes = await read_capped(iter_upload(file))
+        return await _enqueue_job("audio", audio_bytes, file.filename)
+    return await _process_audio_stream(iter_upload(file), file.filename)
+
+
+async def _process_audio_bytes(audio_bytes: bytes, filename: str | None) -> dict:
+    """Job-Handler: Audio-Pipeline für bereits gespeicherte Uploads."""
+    return await _process_audio_stream(iter_bytes(audio_bytes), filename)
+
+
+async def _process_audio_stream(
+    chunks: AsyncIterator[bytes], filename: str | None
+) -> dict:
+    """Audio-Pipeline vom Upload-Strom bis zur Rechnung."""
     start_total = time.perf_counter()
     success = False
     try:
-        # 1) Audiodatei in den Arbeitsspeicher laden.
-        audio_bytes = await file.read()
-        if not (file.filename or "").lower().endswith(".wav"):
-            audio_bytes = _convert_to_wav(audio_bytes)
+        # 1) Upload einlesen; nur konvertieren, wenn das STT-Backend den
+        #    Container nicht selbst versteht (ffmpeg über Pipes, ohne Temp-Dateien).
+        start = time.perf_counter()
+        audio_bytes = await prepare_audio(chunks, filename, accepted_audio_formats())
+        audio_bytes = await normalize_audio(audio_bytes)
+        logger.info("Audio preparation took %.3f s", time.perf_counter() - start)
 
         # 2) Mithilfe des konfigurierten Speech‑to‑Text‑Backends in Text umwandeln.
         start = time.perf_counter()
-        transcript = transcribe_audio(audio_bytes)
+        transcript = await atranscribe_audio(audio_bytes)
         transcription_duration = time.perf_counter() - start
         logger.info("Transcription took %.3f s", transcription_duration)
         logger.debug("Transcript: %s", transcript)
@@ -133,7 +264,7 @@ async def process_audio(file: UploadFile = File(...)):
         #    Rechnungsinformationen erzeugt.
         start = time.perf_counter()
         try:
-            invoice_json = extract_invoice_context(transcript)
+            invoice_json = await aextract_invoice_context(transcript)
             logger.debug("LLM raw response: %s", invoice_json)
         except HTTPException as exc:
             logger.exception("LLM backend failure: %s", exc.detail)
@@ -162,24 +293,22 @@ async def process_audio(file: UploadFile = File(...)):
 
         # 6) Rechnung an das externe System senden und alles lokal protokollieren.
         start = time.perf_counter()
-        result = send_to_billing_system(invoice)
+        result = await asend_to_billing_system(invoice)
         billing_duration = time.perf_counter() - start
         logger.info("Invoice creation took %.3f s", billing_duration)
-        log_dir = store_interaction(audio_bytes, transcript, invoice)
+        log_dir = await run_blocking(
+            store_interaction, audio_bytes, transcript, invoice
+        )
         logger.info("Processed audio successfully: log_dir=%s", log_dir)
         success = True
 
-        pdf_path = str(Path(log_dir) / "invoice.pdf")
-        pdf_url = "/" + pdf_path.replace("\\", "/")
-
         # 7) Die aufbereiteten Daten an den Aufrufer zurückgeben.
         return {
             "transcript": transcript,
             "invoice": invoice.model_dump(mode="json"),
             "billing_result": result,
             "log_dir": log_dir,
-            "pdf_path": pdf_path,
-            "pdf_url": pdf_url,
+            **artifact_links(log_dir),
         }
     finally:
         total_duration = time.perf_counter() - start_total
@@ -191,22 +320,34 @@ async def process_audio(file: UploadFile = File(...)):
 
 
 @app.post("/process-image/")
-async def process_image(file: UploadFile = File(...)):
-    """Nimmt ein Bild entgegen und extrahiert Rechnungsdaten per OCR."""
+async def process_image(
+    file: UploadFile = File(...),
+    async_mode: bool = Query(False, alias="async"),
+):
+    """Nimmt ein Bild entgegen und extrahiert Rechnungsdaten per OCR.
+
+    Mit ``?async=true`` wie bei ``/process-audio/`` als Hintergrund-Job.
+    """
+    image_bytes = await read_capped(iter_upload(file))
+    if async_mode:
+        return await _enqueue_job("image", image_bytes, file.filename)
+    return await _process_image_bytes(image_bytes, file.filename)
+
+
+async def _process_image_bytes(image_bytes: bytes, filename: str | None) -> dict:
+    """OCR-Pipeline vom Bild bis zur Rechnung."""
     start_total = time.perf_counter()
     success = False
     try:
-        image_bytes = await file.read()
-
         start = time.perf_counter()
-        transcript = extract_text(image_bytes)
+        transcript = await run_blocking(extract_text, image_bytes)
         ocr_duration = time.perf_counter() - start
         logger.info("OCR took %.3f s", ocr_duration)
         logger.debug("OCR text: %s", transcript)
 
         start = time.perf_counter()
         try:
-            invoice_json = extract_invoice_context(transcript)
+            invoice_json = await aextract_invoice_context(transcript)
             logger.debug("LLM raw response: %s", invoice_json)
         except HTTPException as exc:
             logger.exception("LLM backend failure: %s", exc.detail)
@@ -229,25 +370,28 @@ async def process_image(file: UploadFile = File(...)):
         apply_pricing(invoice)
 
         start = time.perf_counter()
-        result = send_to_billing_system(invoice)
+        result = await asend_to_billing_system(invoice)
         billing_duration = time.perf_counter() - start
         logger.info("Invoice creation took %.3f s", billing_duration)
-        log_dir = store_interaction(
-            None, transcript, invoice, image=image_bytes, image_filename=file.filename
+        log_dir = await run_blocking(
+            functools.partial(
+                store_interaction,
+                None,
+                transcript,
+                invoice,
+                image=image_bytes,
+                image_filename=filename,
+            )
         )
         logger.info("Processed image successfully: log_dir=%s", log_dir)
         success = True
 
-        pdf_path = str(Path(log_dir) / "invoice.pdf")
-        pdf_url = "/" + pdf_path.replace("\\", "/")
-
         return {
             "transcript": transcript,
             "invoice": invoice.model_dump(mode="json"),
             "billing_result": result,
             "log_dir": log_dir,
-            "pdf_path": pdf_path,
-            "pdf_url": pdf_url,
+            **artifact_links(log_dir),
         }
     finally:
         total_duration = time.perf_counter() - start_total
@@ -256,3 +400,7 @@ async def process_image(file: UploadFile = File(...)):
             "succeeded" if success else "failed",
             total_duration,
         )
+
+
+register_handler("audio", _process_audio_bytes)
+register_handler("image", _process_image_bytes)
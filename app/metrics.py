@@ -0,0 +1,41 @@
+"""Einfache prozesslokale Betriebskennzahlen (Zähler und Messwerte)."""
+
+from __future__ import annotations
+
+import threading
+from typing import Callable
+
+_lock = threading.Lock()
+_counters: dict[str, float] = {}
+_gauges: dict[str, Callable[[], float]] = {}
+
+
+def inc(name: str, value: float = 1.0) -> None:
+    """Erhöht den Zähler ``name`` um ``value``."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0.0) + value
+
+
+def register_gauge(name: str, func: Callable[[], float]) -> None:
+    """Registriert einen Messwert, der erst beim Auslesen berechnet wird."""
+    with _lock:
+        _gauges[name] = func
+
+
+def snapshot() -> dict[str, float]:
+    """Liefert alle Zähler und aktuellen Messwerte als flaches Dict."""
+    with _lock:
+        values = dict(_counters)
+        gauges = dict(_gauges)
+    for name, func in gauges.items():
+        try:
+            values[name] = float(func())
+        except Exception:  # pragma: no cover - defensive
+            continue
+    return dict(sorted(values.items()))
+
+
+def reset() -> None:
+    """Setzt alle Zähler zurück (vor allem für Tests)."""
+    with _lock:
+        _counters.clear()
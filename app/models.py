@@ -384,6 +384,11 @@ def parse_model_json(raw_json: str, model_cls: type[TModel], *, error_label: str
         raise ValueError(error_label) from exc
 
 
+#: Top-Level-Schlüssel, an denen ein versehentlich ausgegebenes JSON-Schema
+#: erkannt wird (siehe auch :mod:`app.json_stream`).
+JSON_SCHEMA_KEYS = frozenset({"$defs", "$schema", "properties", "type"})
+
+
 def _looks_like_json_schema(cleaned_json: str) -> bool:
     """Erkennt, ob die LLM-Antwort versehentlich ein JSON-Schema ist."""
     try:
@@ -392,8 +397,7 @@ def _looks_like_json_schema(cleaned_json: str) -> bool:
         return False
     if not isinstance(payload, dict):
         return False
-    schema_keys = {"$defs", "$schema", "properties", "type"}
-    return bool(schema_keys.intersection(payload.keys()))
+    return bool(JSON_SCHEMA_KEYS.intersection(payload.keys()))
 
 
 def parse_extraction_result(raw_json: str) -> ExtractionResult:
@@ -407,6 +411,18 @@ def parse_extraction_result(raw_json: str) -> ExtractionResult:
     return extraction
 
 
+def parse_invoice_delta(raw_json: str) -> "InvoiceContext":
+    """Wandelt eine (ggf. leere) Delta-Extraktion in einen ``InvoiceContext``.
+
+    Anders als :func:`parse_invoice_context` sind Deltas ohne Positionen
+    erlaubt, etwa wenn ein Gesprächsteil nur den Kundennamen nennt.
+    """
+    extraction = parse_model_json(
+        raw_json, ExtractionResult, error_label="invalid extraction delta"
+    )
+    return extraction_to_invoice_context(extraction)
+
+
 def extraction_result_json_schema() -> dict:
     """Gibt das JSON-Schema für Extraktionsdaten zurück."""
     return ExtractionResult.model_json_schema()
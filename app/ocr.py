@@ -1,19 +1,41 @@
-from __future__ import annotations
-
 """Simple OCR helper utility."""
 
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
 import os
+import shutil
 import subprocess
 import tempfile
 from pathlib import Path
 
+from app.providers import ProviderRegistry
 from app.settings import settings
 
 
-def extract_text(image_bytes: bytes) -> str:
-    """Extracts text from image bytes using the configured provider."""
-    provider = settings.ocr_provider
-    if provider == "tesseract":
+class OCRProvider(ABC):
+    """Basisklasse für Texterkennung in Bildern."""
+
+    @abstractmethod
+    def extract_text(self, image_bytes: bytes) -> str:
+        """Liest den Text aus den Bilddaten."""
+        raise NotImplementedError
+
+    def preload(self) -> None:
+        """Prüft Abhängigkeiten vor der ersten Anfrage."""
+
+    def close(self) -> None:
+        """Gibt Ressourcen frei."""
+
+
+class TesseractOCR(OCRProvider):
+    """Ruft das ``tesseract``-Kommandozeilenprogramm auf."""
+
+    def preload(self) -> None:
+        if shutil.which("tesseract") is None:
+            raise RuntimeError("OCR_PROVIDER=tesseract requires the tesseract binary")
+
+    def extract_text(self, image_bytes: bytes) -> str:
         with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmp:
             tmp.write(image_bytes)
             tmp.flush()
@@ -33,4 +55,27 @@ def extract_text(image_bytes: bytes) -> str:
             txt_path = out_base + ".txt"
             if os.path.exists(txt_path):
                 os.unlink(txt_path)
-    raise ValueError(f"Unsupported OCR_PROVIDER {provider}")
+
+
+_OCR_PROVIDERS: dict[str, type[OCRProvider]] = {
+    "tesseract": TesseractOCR,
+}
+
+
+def _create_provider() -> OCRProvider:
+    try:
+        provider_cls = _OCR_PROVIDERS[settings.ocr_provider]
+    except KeyError:
+        raise ValueError(f"Unsupported OCR_PROVIDER {settings.ocr_provider}")
+    return provider_cls()
+
+
+# Nur ``/process-image`` braucht OCR; ein Fehler macht den Dienst nicht unbereit.
+_registry: ProviderRegistry[OCRProvider] = ProviderRegistry(
+    "ocr", _create_provider, lambda: settings.ocr_provider, required=False
+)
+
+
+def extract_text(image_bytes: bytes) -> str:
+    """Extracts text from image bytes using the configured provider."""
+    return _registry.get().extract_text(image_bytes)
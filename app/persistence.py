@@ -1,13 +1,51 @@
 from pathlib import Path
 from datetime import datetime
+import hashlib
 import json
+import re
 from app.models import InvoiceContext
 from app.pdf import generate_invoice_pdf
+from app.settings import settings
 from app.xrechnung import generate_xrechnung_xml
 
 DATA_DIR = Path("data")
 # Alle Sitzungen werden in diesem Verzeichnis abgelegt.
 DATA_DIR.mkdir(exist_ok=True)
+# Dialoge erhalten ein festes Verzeichnis je Session unter ``DATA_DIR``.
+SESSIONS_SUBDIR = "sessions"
+JOURNAL_FILE = "journal.jsonl"
+
+_UNSAFE_CHARS = re.compile(r"[^A-Za-z0-9_-]")
+
+
+def _as_messages(transcript: list[dict[str, str]] | str) -> list[dict[str, str]]:
+    if isinstance(transcript, str):
+        return [{"role": "user", "content": transcript}]
+    return transcript
+
+
+def _write_artifacts(
+    target: Path, messages: list[dict[str, str]], invoice: InvoiceContext
+) -> None:
+    """Schreibt Transkript, Rechnungs-JSON, PDF und XRechnung nach ``target``.
+
+    Mit ``INVOICE_ARTIFACTS_LAZY`` entfallen PDF und XML; sie werden beim
+    ersten Abruf aus ``invoice.json`` erzeugt (:mod:`app.artifacts`).
+    """
+
+    (target / "transcript.json").write_text(
+        json.dumps(messages, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    text = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    (target / "transcript.txt").write_text(text, encoding="utf-8")
+    (target / "invoice.json").write_text(
+        json.dumps(invoice.model_dump(mode="json"), ensure_ascii=False, indent=2),
+        encoding="utf-8",
+    )
+    if settings.invoice_artifacts_lazy:
+        return
+    generate_invoice_pdf(invoice, target / "invoice.pdf")
+    generate_xrechnung_xml(invoice, target / "invoice.xml")
 
 
 def store_interaction(
@@ -24,27 +62,90 @@ def store_interaction(
     session_dir = DATA_DIR / timestamp
     session_dir.mkdir(parents=True, exist_ok=True)
 
-    # Transcript in strukturierter Form sichern
-    if isinstance(transcript, str):
-        messages = [{"role": "user", "content": transcript}]
-    else:
-        messages = transcript
-    (session_dir / "transcript.json").write_text(
-        json.dumps(messages, ensure_ascii=False, indent=2), encoding="utf-8"
-    )
-    text = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
-    (session_dir / "transcript.txt").write_text(text, encoding="utf-8")
-
     # Rohdaten persistieren
     if audio is not None:
         (session_dir / "audio.wav").write_bytes(audio)
     if image is not None:
         suffix = Path(image_filename or "image").suffix or ""
         (session_dir / f"image{suffix}").write_bytes(image)
-    (session_dir / "invoice.json").write_text(
-        json.dumps(invoice.model_dump(mode="json"), ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
-    generate_invoice_pdf(invoice, session_dir / "invoice.pdf")
-    generate_xrechnung_xml(invoice, session_dir / "invoice.xml")
+    _write_artifacts(session_dir, _as_messages(transcript), invoice)
     return str(session_dir)
+
+
+def session_dir(session_id: str) -> Path:
+    """Verzeichnis eines Dialogs: ``data/sessions/<session_id>/``.
+
+    Zeichen außerhalb von ``[A-Za-z0-9_-]`` werden ersetzt; ein kurzer Hash
+    verhindert dann Kollisionen verschiedener IDs.
+    """
+
+    safe = _UNSAFE_CHARS.sub("_", session_id)[:64]
+    if safe != session_id or not safe:
+        digest = hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:12]
+        safe = f"{safe}-{digest}"
+    return DATA_DIR / SESSIONS_SUBDIR / safe
+
+
+def append_turn(
+    session_id: str,
+    audio: bytes | None,
+    messages: list[dict[str, str]],
+    invoice: InvoiceContext,
+) -> str:
+    """Hängt eine Dialogrunde an das Journal der Session an.
+
+    Pro Runde entsteht genau eine Zeile in ``journal.jsonl`` (Zeitpunkt, die
+    neuen Nachrichten, Rechnungsstand) und bei Audio eine Datei
+    ``turn-<n>.wav``. PDF und XRechnung werden hier nicht erzeugt, siehe
+    :func:`render_session_artifacts`. Gibt das Session-Verzeichnis zurück.
+    """
+
+    target = session_dir(session_id)
+    target.mkdir(parents=True, exist_ok=True)
+    journal = target / JOURNAL_FILE
+    turn = 1
+    if journal.exists():
+        with journal.open("rb") as fh:
+            turn += sum(1 for _ in fh)
+    audio_name = None
+    if audio:
+        audio_name = f"turn-{turn:04d}.wav"
+        (target / audio_name).write_bytes(audio)
+    entry = {
+        "turn": turn,
+        "time": datetime.utcnow().isoformat(),
+        "audio": audio_name,
+        "messages": messages,
+        "invoice": invoice.model_dump(mode="json"),
+    }
+    with journal.open("a", encoding="utf-8") as fh:
+        fh.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+    return str(target)
+
+
+def read_journal(session_id: str) -> list[dict]:
+    """Liest alle Runden einer Session aus dem Journal."""
+
+    journal = session_dir(session_id) / JOURNAL_FILE
+    if not journal.exists():
+        return []
+    with journal.open(encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+def render_session_artifacts(
+    session_id: str,
+    transcript: list[dict[str, str]] | str,
+    invoice: InvoiceContext,
+) -> str:
+    """Erzeugt die vollständigen Artefakte (inkl. PDF/XRechnung) der Session.
+
+    Wird bei Bestätigung der Rechnung aufgerufen; vorhandene Artefakte werden
+    überschrieben. PDF/XML entstehen wie bei :func:`store_interaction` ggf.
+    erst beim Abruf.
+    """
+
+    target = session_dir(session_id)
+    target.mkdir(parents=True, exist_ok=True)
+    _write_artifacts(target, _as_messages(transcript), invoice)
+    return str(target)
@@ -0,0 +1,181 @@
+"""Lebenszyklus der STT-, TTS- und OCR-Provider.
+
+Jedes Modul (``app.stt``, ``app.tts``, ``app.ocr``) legt eine
+:class:`ProviderRegistry` an. Sie erzeugt den konfigurierten Provider genau
+einmal – statt bei jedem Aufruf – und erst neu, wenn sich die relevanten
+Einstellungen ändern. Beim App-Start lädt :func:`preload_all` Modelle,
+Worker-Prozesse und Clients vor, sodass die erste Anfrage nach einem Deploy
+nicht die Ladezeit trägt. :func:`readiness` liefert den Zustand je Provider
+für ``/ready``; :func:`close_all` gibt beim Shutdown alle Ressourcen frei.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Generic, Hashable, Iterable, TypeVar
+
+from app import metrics
+from app.concurrency import run_blocking
+
+logger = logging.getLogger(__name__)
+
+P = TypeVar("P")
+
+#: Zustände eines Providers: noch nicht erzeugt, wird geladen, bereit, Fehler.
+IDLE, LOADING, READY, FAILED = "idle", "loading", "ready", "failed"
+
+_REGISTRIES: dict[str, "ProviderRegistry[Any]"] = {}
+
+
+class ProviderRegistry(Generic[P]):
+    """Hält die Provider-Instanz einer Art (z. B. ``"stt"``).
+
+    ``factory`` erzeugt den Provider für die aktuelle Konfiguration, ``key``
+    liefert die Einstellungen, bei deren Änderung er neu erzeugt wird.
+    Provider können optional ``preload()`` und ``close()`` anbieten. Ohne
+    ``required`` (z. B. OCR, nur für ``/process-image``) macht ein Fehler den
+    Dienst nicht unbereit, sondern erscheint unter ``/ready`` als ``degraded``.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        factory: Callable[[], P],
+        key: Callable[[], Hashable],
+        required: bool = True,
+    ) -> None:
+        self.kind = kind
+        self.factory = factory
+        self.key = key
+        self.required = required
+        self._provider: P | None = None
+        self._key: Hashable = None
+        self._state = IDLE
+        self._error: str | None = None
+        self._load_seconds: float | None = None
+        self._lock = threading.RLock()
+        _REGISTRIES[kind] = self
+
+    def get(self) -> P:
+        """Gibt den Provider zurück und erzeugt ihn bei Bedarf einmalig."""
+        key = self.key()
+        provider = self._provider
+        if provider is not None and self._key == key:
+            return provider
+        with self._lock:
+            if self._provider is not None and self._key == key:
+                return self._provider
+            self._close_current()
+            self._state = LOADING
+            start = time.perf_counter()
+            try:
+                provider = self.factory()
+            except Exception as exc:
+                self._state, self._error = FAILED, str(exc)
+                raise
+            self._load_seconds = time.perf_counter() - start
+            self._provider, self._key = provider, key
+            self._state, self._error = READY, None
+            metrics.inc(f"providers.{self.kind}.created")
+            logger.info(
+                "Created %s provider %s in %.2f s",
+                self.kind,
+                type(provider).__name__,
+                self._load_seconds,
+            )
+            return provider
+
+    async def aget(self) -> P:
+        """Async-Variante; nur die erstmalige Erzeugung läuft im Thread-Pool."""
+        provider = self._provider
+        if provider is not None and self._key == self.key():
+            return provider
+        return await run_blocking(self.get)
+
+    def preload(self) -> None:
+        """Erzeugt den Provider und lädt Modelle/Worker vorab."""
+        with self._lock:
+            provider = self.get()
+            preload = getattr(provider, "preload", None)
+            if preload is None:
+                return
+            self._state = LOADING
+            start = time.perf_counter()
+            try:
+                preload()
+            except Exception as exc:
+                self._state, self._error = FAILED, str(exc)
+                raise
+            self._load_seconds = (self._load_seconds or 0.0) + (
+                time.perf_counter() - start
+            )
+            self._state = READY
+
+    def status(self) -> dict[str, Any]:
+        """Zustand für ``/ready``."""
+        provider = self._provider
+        return {
+            "provider": type(provider).__name__ if provider is not None else None,
+            "state": self._state,
+            "error": self._error,
+            "load_seconds": self._load_seconds,
+        }
+
+    def _close_current(self) -> None:
+        provider, self._provider, self._key = self._provider, None, None
+        self._state, self._error, self._load_seconds = IDLE, None, None
+        close = getattr(provider, "close", None)
+        if close is None:
+            return
+        try:
+            close()
+        except Exception:  # pragma: no cover - defensive
+            logger.warning("Could not close %s provider", self.kind, exc_info=True)
+
+    def close(self) -> None:
+        """Gibt die Ressourcen des Providers frei."""
+        with self._lock:
+            self._close_current()
+
+
+def preload_all(kinds: Iterable[str] | None = None) -> None:
+    """Lädt die Provider der genannten Arten vor; Fehler werden nur geloggt."""
+    selected = set(_REGISTRIES) if kinds is None else set(kinds)
+    for registry in list(_REGISTRIES.values()):
+        if registry.kind not in selected:
+            continue
+        try:
+            registry.preload()
+        except Exception:
+            logger.exception("Could not preload %s provider", registry.kind)
+
+
+def readiness() -> dict[str, dict[str, Any]]:
+    """Zustand aller Provider, nach Art sortiert."""
+    return {kind: _REGISTRIES[kind].status() for kind in sorted(_REGISTRIES)}
+
+
+def is_ready() -> bool:
+    """``False``, solange ein benötigter Provider lädt oder fehlgeschlagen ist."""
+    return all(
+        registry.status()["state"] not in (LOADING, FAILED)
+        for registry in _REGISTRIES.values()
+        if registry.required
+    )
+
+
+def degraded() -> list[str]:
+    """Optionale Provider, deren Laden fehlgeschlagen ist."""
+    return sorted(
+        registry.kind
+        for registry in _REGISTRIES.values()
+        if not registry.required and registry.status()["state"] == FAILED
+    )
+
+
+def close_all() -> None:
+    """Schließt alle Provider (Shutdown, Tests)."""
+    for registry in list(_REGISTRIES.values()):
+        registry.close()
@@ -0,0 +1,799 @@
+"""Austauschbarer Speicher für den Zustand laufender Dialoge.
+
+Der Dialog (:mod:`app.conversation`) hält je Sitzung Chat-Verlauf,
+Rechnungsstand, Status und den unbestätigten Entwurf. Statt in
+prozesslokalen Dicts liegen diese Felder in einem :class:`SessionStore`:
+
+- ``memory``: im Prozess, mit TTL und Obergrenze für die Anzahl Sitzungen
+  (älteste zuerst verdrängt) – Standard für einen einzelnen Worker.
+- ``sqlite``: SQLite-Datei im WAL-Modus, geteilt von allen Workern eines
+  Hosts.
+- ``redis``: Redis-Protokoll (RESP) über TCP, ohne zusätzliche Bibliothek;
+  jeder kompatible Dienst kann es bedienen, auch über Hosts hinweg.
+
+Runden derselben Sitzung (:func:`session_turn`) laufen nacheinander: im
+Prozess über einen Lock je Sitzung, über Prozesse und Hosts hinweg zusätzlich
+über eine Sperre im Store (``sqlite``: Zeile in ``session_locks``, ``redis``:
+``SET NX PX``). Die Store-Sperre verfällt nach ``SESSION_LOCK_TTL`` Sekunden,
+falls ihr Prozess abstürzt; Sticky-Routing ist nicht nötig.
+
+Werte werden kompakt serialisiert (JSON ohne Leerzeichen, ab
+``_COMPRESS_MIN_BYTES`` zusätzlich zlib-komprimiert). Die Module greifen
+über :class:`SessionField` wie auf ein Dict zu. Innerhalb von
+:func:`session_turn` wird die Sitzung einmal geladen, die Objekte sind für
+die Dauer der Runde stabil (Änderungen in-place wirken), und am Ende wird
+alles in einem Schreibvorgang zurückgeschrieben. Reine Lesezugriffe außerhalb
+einer Runde laufen über :func:`session_view`; direkte Zugriffe ohne Runde
+blockieren bei ``sqlite``/``redis`` und sind im Event-Loop nicht erlaubt.
+"""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+import asyncio
+import json
+import logging
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from uuid import uuid4
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Generic,
+    Iterable,
+    Iterator,
+    Mapping,
+    MutableMapping,
+    TypeVar,
+)
+from urllib.parse import unquote, urlparse
+import zlib
+
+from app import metrics
+from app.concurrency import KeyedLock, run_blocking
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Kleinere Werte bleiben unkomprimiert; zlib lohnt sich erst bei längeren
+# Chat-Verläufen und Rechnungen.
+_COMPRESS_MIN_BYTES = 512
+_RAW, _ZLIB = b"j", b"z"
+
+
+def pack(data: bytes) -> bytes:
+    """Komprimiert größere Werte; ein Präfixbyte kennzeichnet das Format."""
+    if len(data) >= _COMPRESS_MIN_BYTES:
+        return _ZLIB + zlib.compress(data, 6)
+    return _RAW + data
+
+
+def unpack(data: bytes) -> bytes:
+    if data[:1] == _ZLIB:
+        return zlib.decompress(data[1:])
+    return data[1:]
+
+
+class SessionStore(ABC):
+    """Felder je Sitzung als Bytes; jeder Schreibzugriff verlängert die TTL."""
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+
+    @abstractmethod
+    def load(self, session_id: str) -> dict[str, bytes]:
+        """Alle Felder einer Sitzung (leer, wenn unbekannt oder abgelaufen)."""
+
+    @abstractmethod
+    def save(
+        self,
+        session_id: str,
+        values: Mapping[str, bytes],
+        deleted: Iterable[str] = (),
+    ) -> None:
+        """Schreibt bzw. löscht Felder einer Sitzung in einem Vorgang."""
+
+    @abstractmethod
+    def sessions(self, field: str) -> list[str]:
+        """IDs aller Sitzungen, die ``field`` gesetzt haben."""
+
+    @abstractmethod
+    def clear_field(self, field: str) -> None:
+        """Entfernt ``field`` aus allen Sitzungen."""
+
+    def get(self, session_id: str, field: str) -> bytes | None:
+        return self.load(session_id).get(field)
+
+    def try_lock(self, session_id: str, token: str, ttl: float) -> bool:
+        """Sperrt die Sitzung prozessübergreifend; ``False``, wenn belegt.
+
+        Ohne Überschreiben genügt die Sperre im Prozess (``memory``).
+        """
+        return True
+
+    def unlock(self, session_id: str, token: str) -> None:
+        """Gibt eine mit ``token`` gesetzte Sperre wieder frei."""
+
+    def close(self) -> None:
+        """Gibt Verbindungen frei."""
+
+
+class InMemorySessionStore(SessionStore):
+    """Prozesslokaler Speicher mit TTL und Größenlimit (LRU)."""
+
+    def __init__(self, ttl: float, max_sessions: int) -> None:
+        super().__init__(ttl)
+        self.max_sessions = max(1, max_sessions)
+        self._sessions: OrderedDict[str, tuple[float, dict[str, bytes]]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        while self._sessions:
+            session_id, (expires, _) = next(iter(self._sessions.items()))
+            if expires > now:
+                break
+            del self._sessions[session_id]
+            metrics.inc("sessions.expired")
+
+    def load(self, session_id: str) -> dict[str, bytes]:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return {}
+            if entry[0] <= now:
+                # Durch LRU-Umsortierung kann ein abgelaufener Eintrag hinter
+                # jüngeren liegen, die ``_expire`` nicht mehr erreicht.
+                del self._sessions[session_id]
+                metrics.inc("sessions.expired")
+                return {}
+            self._sessions.move_to_end(session_id)
+            return dict(entry[1])
+
+    def save(
+        self,
+        session_id: str,
+        values: Mapping[str, bytes],
+        deleted: Iterable[str] = (),
+    ) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            _, fields = self._sessions.pop(session_id, (0.0, {}))
+            fields = {**fields, **values}
+            for field in deleted:
+                fields.pop(field, None)
+            if fields:
+                self._sessions[session_id] = (now + self.ttl, fields)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                metrics.inc("sessions.evicted")
+
+    def sessions(self, field: str) -> list[str]:
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            return [
+                sid
+                for sid, (expires, f) in self._sessions.items()
+                if field in f and expires > now
+            ]
+
+    def clear_field(self, field: str) -> None:
+        with self._lock:
+            for session_id in list(self._sessions):
+                expires, fields = self._sessions[session_id]
+                fields.pop(field, None)
+                if not fields:
+                    del self._sessions[session_id]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS session_fields (
+    session_id TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value BLOB NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (session_id, field)
+)
+"""
+
+_SQLITE_LOCK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS session_locks (
+    session_id TEXT PRIMARY KEY,
+    token TEXT NOT NULL,
+    expires REAL NOT NULL
+)
+"""
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite-Datei im WAL-Modus; mehrere Worker-Prozesse teilen sie."""
+
+    # Abgelaufene Zeilen werden höchstens so oft (Sekunden) gelöscht.
+    _PURGE_INTERVAL = 60.0
+
+    def __init__(self, db_path: str | Path, ttl: float) -> None:
+        super().__init__(ttl)
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.db_path, check_same_thread=False, timeout=30.0
+        )
+        self._last_purge = 0.0
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(_SQLITE_SCHEMA)
+            self._conn.execute(_SQLITE_LOCK_SCHEMA)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS session_fields_expires"
+                " ON session_fields (expires)"
+            )
+
+    def load(self, session_id: str) -> dict[str, bytes]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT field, value FROM session_fields"
+                " WHERE session_id = ? AND expires > ?",
+                (session_id, time.time()),
+            ).fetchall()
+        return {field: bytes(value) for field, value in rows}
+
+    def get(self, session_id: str, field: str) -> bytes | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM session_fields"
+                " WHERE session_id = ? AND field = ? AND expires > ?",
+                (session_id, field, time.time()),
+            ).fetchone()
+        return None if row is None else bytes(row[0])
+
+    def save(
+        self,
+        session_id: str,
+        values: Mapping[str, bytes],
+        deleted: Iterable[str] = (),
+    ) -> None:
+        now = time.time()
+        expires = now + self.ttl
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO session_fields (session_id, field, value, expires)"
+                " VALUES (?, ?, ?, ?) ON CONFLICT (session_id, field)"
+                " DO UPDATE SET value = excluded.value, expires = excluded.expires",
+                [(session_id, f, v, expires) for f, v in values.items()],
+            )
+            self._conn.executemany(
+                "DELETE FROM session_fields WHERE session_id = ? AND field = ?",
+                [(session_id, field) for field in deleted],
+            )
+            # Die übrigen Felder der Sitzung laufen gemeinsam ab.
+            self._conn.execute(
+                "UPDATE session_fields SET expires = ? WHERE session_id = ?",
+                (expires, session_id),
+            )
+            if now - self._last_purge > self._PURGE_INTERVAL:
+                self._last_purge = now
+                purged = self._conn.execute(
+                    "DELETE FROM session_fields WHERE expires <= ?", (now,)
+                ).rowcount
+                if purged:
+                    metrics.inc("sessions.expired", purged)
+
+    def sessions(self, field: str) -> list[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT session_id FROM session_fields WHERE field = ? AND expires > ?",
+                (field, time.time()),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def clear_field(self, field: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM session_fields WHERE field = ?", (field,))
+
+    def try_lock(self, session_id: str, token: str, ttl: float) -> bool:
+        now = time.time()
+        # Ein einziges Upsert: nur eine freie oder abgelaufene Sperre wird
+        # übernommen, auch wenn mehrere Prozesse gleichzeitig zugreifen.
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO session_locks (session_id, token, expires)"
+                " VALUES (?, ?, ?) ON CONFLICT (session_id) DO UPDATE"
+                " SET token = excluded.token, expires = excluded.expires"
+                " WHERE session_locks.expires <= ?",
+                (session_id, token, now + ttl, now),
+            )
+        return cursor.rowcount == 1
+
+    def unlock(self, session_id: str, token: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM session_locks WHERE session_id = ? AND token = ?",
+                (session_id, token),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class RespError(RuntimeError):
+    """Fehlerantwort (``-ERR …``) des Redis-Servers."""
+
+
+class RespConnection:
+    """Minimaler, threadsicherer RESP2-Client (nur was der Store braucht)."""
+
+    def __init__(self, url: str, timeout: float = 5.0) -> None:
+        parsed = urlparse(url)
+        if parsed.scheme != "redis":
+            raise ValueError(f"Unsupported session store URL {url}")
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._sock: socket.socket | None = None
+        self._file: Any = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> None:
+        self._sock = socket.create_connection((self.host, self.port), self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._sock.makefile("rb")
+        if self.password:
+            auth = [self.username, self.password] if self.username else [self.password]
+            self._roundtrip([["AUTH", *auth]])
+        if self.db:
+            self._roundtrip([["SELECT", str(self.db)]])
+
+    @staticmethod
+    def _encode(args: list[str | bytes]) -> bytes:
+        out = [f"*{len(args)}\r\n".encode("ascii")]
+        for arg in args:
+            data = arg.encode("utf-8") if isinstance(arg, str) else arg
+            out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(out)
+
+    def _read(self) -> Any:
+        line = self._file.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Redis connection closed")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode("utf-8")
+        if kind == b"-":
+            return RespError(body.decode("utf-8", "replace"))
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            size = int(body)
+            if size < 0:
+                return None
+            data = self._file.read(size + 2)
+            return data[:-2]
+        if kind == b"*":
+            size = int(body)
+            return None if size < 0 else [self._read() for _ in range(size)]
+        raise ConnectionError(f"Invalid RESP reply {line!r}")
+
+    def _roundtrip(self, commands: list[list[str | bytes]]) -> list[Any]:
+        assert self._sock is not None
+        self._sock.sendall(b"".join(self._encode(c) for c in commands))
+        replies = [self._read() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def pipeline(self, commands: list[list[str | bytes]]) -> list[Any]:
+        """Schickt mehrere Befehle in einem Roundtrip; ein Neuversuch bei Abbruch."""
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._roundtrip(commands)
+                except (OSError, ConnectionError):
+                    self._close()
+                    if attempt == 2:
+                        raise
+            raise AssertionError("unreachable")  # pragma: no cover
+
+    def command(self, *args: str | bytes) -> Any:
+        return self.pipeline([list(args)])[0]
+
+    def _close(self) -> None:
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:  # pragma: no cover - defensive
+                pass
+        self._sock = self._file = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+
+# Löscht die Sperre nur, wenn sie noch dem eigenen Token gehört.
+_REDIS_UNLOCK = (
+    "if redis.call('GET', KEYS[1]) == ARGV[1] then"
+    " return redis.call('DEL', KEYS[1]) else return 0 end"
+)
+
+
+class RedisSessionStore(SessionStore):
+    """Je Sitzung ein Redis-Hash ``<prefix><id>`` mit ``EXPIRE``.
+
+    Sperren liegen unter ``lock:<prefix><id>``, außerhalb des Musters, das
+    :meth:`sessions` durchsucht.
+    """
+
+    def __init__(self, url: str, ttl: float, prefix: str = "session:") -> None:
+        super().__init__(ttl)
+        self.prefix = prefix
+        self.connection = RespConnection(url)
+
+    def _key(self, session_id: str) -> str:
+        return self.prefix + session_id
+
+    def load(self, session_id: str) -> dict[str, bytes]:
+        reply = self.connection.command("HGETALL", self._key(session_id)) or []
+        return {
+            reply[i].decode("utf-8"): reply[i + 1] for i in range(0, len(reply), 2)
+        }
+
+    def get(self, session_id: str, field: str) -> bytes | None:
+        return self.connection.command("HGET", self._key(session_id), field)
+
+    def save(
+        self,
+        session_id: str,
+        values: Mapping[str, bytes],
+        deleted: Iterable[str] = (),
+    ) -> None:
+        key = self._key(session_id)
+        commands: list[list[str | bytes]] = []
+        removed = list(deleted)
+        if removed:
+            commands.append(["HDEL", key, *removed])
+        if values:
+            pairs: list[str | bytes] = []
+            for field, value in values.items():
+                pairs += [field, value]
+            commands.append(["HSET", key, *pairs])
+        commands.append(["EXPIRE", key, str(max(1, int(self.ttl)))])
+        self.connection.pipeline(commands)
+
+    def _scan(self) -> Iterator[str]:
+        cursor = "0"
+        while True:
+            cursor_bytes, keys = self.connection.command(
+                "SCAN", cursor, "MATCH", f"{self.prefix}*", "COUNT", "500"
+            )
+            for key in keys:
+                yield key.decode("utf-8")
+            cursor = cursor_bytes.decode("ascii")
+            if cursor == "0":
+                return
+
+    def sessions(self, field: str) -> list[str]:
+        keys = list(self._scan())
+        if not keys:
+            return []
+        exists = self.connection.pipeline([["HEXISTS", key, field] for key in keys])
+        return [key[len(self.prefix) :] for key, hit in zip(keys, exists) if hit]
+
+    def clear_field(self, field: str) -> None:
+        keys = list(self._scan())
+        if keys:
+            self.connection.pipeline([["HDEL", key, field] for key in keys])
+
+    def try_lock(self, session_id: str, token: str, ttl: float) -> bool:
+        reply = self.connection.command(
+            "SET",
+            "lock:" + self._key(session_id),
+            token,
+            "NX",
+            "PX",
+            str(max(1, int(ttl * 1000))),
+        )
+        return reply == "OK"
+
+    def unlock(self, session_id: str, token: str) -> None:
+        self.connection.command(
+            "EVAL", _REDIS_UNLOCK, "1", "lock:" + self._key(session_id), token
+        )
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def _create_store() -> SessionStore:
+    backend = settings.session_store
+    if backend == "memory":
+        return InMemorySessionStore(settings.session_ttl, settings.session_max_entries)
+    if backend == "sqlite":
+        return SQLiteSessionStore(settings.session_db_path, settings.session_ttl)
+    if backend == "redis":
+        return RedisSessionStore(
+            settings.session_redis_url,
+            settings.session_ttl,
+            prefix=settings.session_redis_prefix,
+        )
+    raise ValueError(f"Unsupported SESSION_STORE {backend}")
+
+
+_store: SessionStore | None = None
+_store_key: tuple | None = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Gibt den (bei geänderter Konfiguration neu angelegten) Store zurück."""
+    global _store, _store_key
+    key = (
+        settings.session_store,
+        settings.session_ttl,
+        settings.session_max_entries,
+        settings.session_db_path,
+        settings.session_redis_url,
+        settings.session_redis_prefix,
+    )
+    with _store_lock:
+        if _store is None or _store_key != key:
+            if _store is not None:
+                _store.close()
+            _store, _store_key = _create_store(), key
+        return _store
+
+
+def close_session_store() -> None:
+    """Schließt den Store (Shutdown, Tests)."""
+    global _store, _store_key
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+        _store, _store_key = None, None
+
+
+class _Turn:
+    """Für die Dauer einer Dialogrunde geladene Sitzung (Identity-Map)."""
+
+    def __init__(
+        self, session_id: str, raw: dict[str, bytes], readonly: bool = False
+    ) -> None:
+        self.session_id = session_id
+        self.raw = raw
+        self.readonly = readonly
+        self.objects: dict[str, Any] = {}
+        self.codecs: dict[str, SessionField[Any]] = {}
+        self.deleted: set[str] = set()
+
+    def encoded(self) -> dict[str, bytes]:
+        # Alle gelesenen Objekte zurückschreiben: sie können in-place
+        # geändert worden sein.
+        return {
+            name: pack(self.codecs[name].encode(value))
+            for name, value in self.objects.items()
+        }
+
+
+_TURN: ContextVar[_Turn | None] = ContextVar("session_turn", default=None)
+
+
+class SessionField(MutableMapping[str, T], Generic[T]):
+    """Dict-artige Sicht auf ein Feld aller Sitzungen (``SESSIONS[id]``)."""
+
+    def __init__(
+        self,
+        name: str,
+        encode: Callable[[T], bytes],
+        decode: Callable[[bytes], T],
+    ) -> None:
+        self.name = name
+        self.encode = encode
+        self.decode = decode
+
+    def _turn(self, session_id: str) -> _Turn | None:
+        turn = _TURN.get()
+        if turn is None or turn.session_id != session_id:
+            return None
+        return turn
+
+    def _writable_turn(self, session_id: str) -> _Turn | None:
+        turn = self._turn(session_id)
+        if turn is not None and turn.readonly:
+            raise RuntimeError(f"Session {session_id} is opened read-only")
+        return turn
+
+    def _store(self) -> SessionStore:
+        """Store für Zugriffe ohne Runde; blockierende Backends nicht im Loop."""
+        store = get_session_store()
+        if not isinstance(store, InMemorySessionStore) and _in_event_loop():
+            raise RuntimeError(
+                f"Blocking access to session field {self.name!r} on the event"
+                " loop; use session_turn, session_view or run_blocking"
+            )
+        return store
+
+    def __getitem__(self, session_id: str) -> T:
+        turn = self._turn(session_id)
+        if turn is not None:
+            if self.name in turn.objects:
+                return turn.objects[self.name]
+            raw = turn.raw.get(self.name)
+            if raw is None or self.name in turn.deleted:
+                raise KeyError(session_id)
+            value = self.decode(unpack(raw))
+            turn.objects[self.name] = value
+            turn.codecs[self.name] = self
+            return value
+        raw = self._store().get(session_id, self.name)
+        if raw is None:
+            raise KeyError(session_id)
+        return self.decode(unpack(raw))
+
+    def __setitem__(self, session_id: str, value: T) -> None:
+        turn = self._writable_turn(session_id)
+        if turn is not None:
+            turn.objects[self.name] = value
+            turn.codecs[self.name] = self
+            turn.deleted.discard(self.name)
+            return
+        self._store().save(session_id, {self.name: pack(self.encode(value))})
+
+    def __delitem__(self, session_id: str) -> None:
+        if session_id not in self:
+            raise KeyError(session_id)
+        turn = self._writable_turn(session_id)
+        if turn is not None:
+            turn.objects.pop(self.name, None)
+            turn.deleted.add(self.name)
+            return
+        self._store().save(session_id, {}, deleted=[self.name])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store().sessions(self.name))
+
+    def __len__(self) -> int:
+        return len(self._store().sessions(self.name))
+
+    def clear(self) -> None:
+        self._store().clear_field(self.name)
+
+
+def _in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def json_field(name: str) -> SessionField[Any]:
+    """Feld mit kompakt JSON-serialisiertem Wert."""
+    return SessionField(
+        name,
+        lambda value: json.dumps(
+            value, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8"),
+        lambda data: json.loads(data),
+    )
+
+
+@asynccontextmanager
+async def session_view(session_id: str) -> AsyncIterator[None]:
+    """Lädt die Sitzung einmal (im Thread-Pool) nur zum Lesen.
+
+    Ohne Sperre und ohne Zurückschreiben, z. B. für Abrufe neben einer
+    laufenden Runde; diese sehen den zuletzt gespeicherten Stand.
+    Schreibzugriffe auf die Sitzung lösen ``RuntimeError`` aus.
+    """
+    current = _TURN.get()
+    if current is not None and current.session_id == session_id:
+        yield
+        return
+    raw = await run_blocking(get_session_store().load, session_id)
+    token = _TURN.set(_Turn(session_id, raw, readonly=True))
+    try:
+        yield
+    finally:
+        _TURN.reset(token)
+
+
+class SessionBusyError(TimeoutError):
+    """Eine andere Runde derselben Sitzung läuft länger als erlaubt."""
+
+
+# Runden derselben Sitzung laufen nacheinander, verschiedene parallel.
+_session_locks = KeyedLock("session_lock")
+
+# Abstand (Sekunden) zwischen Versuchen, eine belegte Store-Sperre zu setzen.
+_STORE_LOCK_RETRY = 0.05
+
+
+async def _lock_in_store(
+    store: SessionStore, session_id: str, deadline: float | None
+) -> str:
+    """Setzt die prozessübergreifende Sperre und gibt ihr Token zurück."""
+    token = uuid4().hex
+    ttl = settings.session_lock_ttl
+    contended = False
+    while not await run_blocking(store.try_lock, session_id, token, ttl):
+        if not contended:
+            contended = True
+            metrics.inc("session_lock.store_contended")
+        if deadline is not None and time.monotonic() >= deadline:
+            metrics.inc("session_lock.timeouts")
+            raise SessionBusyError(session_id)
+        await asyncio.sleep(_STORE_LOCK_RETRY)
+    return token
+
+
+@asynccontextmanager
+async def session_turn(session_id: str) -> AsyncIterator[None]:
+    """Lädt die Sitzung einmal und schreibt sie am Ende gesammelt zurück.
+
+    Gleichzeitige Runden derselben Sitzung (Doppelklick, Wiederholung)
+    warten höchstens ``SESSION_LOCK_TIMEOUT`` Sekunden auf die vorige und
+    sehen dann deren Ergebnis; danach :class:`SessionBusyError`. Das gilt
+    dank der Store-Sperre auch für Runden in anderen Workern oder auf
+    anderen Hosts (siehe Moduldokumentation).
+
+    Auch bei einem Fehler wird zurückgeschrieben, damit – wie bisher mit den
+    Dicts – bereits übernommene Änderungen erhalten bleiben.
+    """
+    current = _TURN.get()
+    if current is not None and current.session_id == session_id:
+        # Verschachtelte Runde derselben Sitzung: die äußere schreibt zurück.
+        yield
+        return
+    timeout = settings.session_lock_timeout
+    deadline = time.monotonic() + timeout if timeout > 0 else None
+    acquired = False
+    try:
+        async with _session_locks.hold(
+            session_id, timeout if timeout > 0 else None
+        ):
+            acquired = True
+            store = get_session_store()
+            lock_token = await _lock_in_store(store, session_id, deadline)
+            try:
+                raw = await run_blocking(store.load, session_id)
+                turn = _Turn(session_id, raw)
+                token = _TURN.set(turn)
+                try:
+                    yield
+                finally:
+                    _TURN.reset(token)
+                    await run_blocking(
+                        store.save, session_id, turn.encoded(), turn.deleted
+                    )
+            finally:
+                await run_blocking(store.unlock, session_id, lock_token)
+    except TimeoutError as exc:
+        if acquired:
+            raise
+        raise SessionBusyError(session_id) from exc
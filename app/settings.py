@@ -20,10 +20,97 @@ class Settings(BaseSettings):
     ollama_base_url: str = "http://localhost:11434"
     # Request timeout for Ollama interactions (seconds, minimum 300s)
     ollama_timeout: float = 300.0
+    # Ollama-Antworten streamen und abbrechen, sobald die Ausgabe nicht mehr
+    # zum erwarteten Pass-Modell passen kann (direkt weiter zum Repair-Prompt).
+    ollama_stream: bool = False
+    # Maximale Anzahl paralleler Anfragen pro LLM-Provider. Die vier
+    # Extraktionspässe laufen gleichzeitig, solange dieses Limit es zulässt.
+    # Lokale Ollama-Modelle arbeiten Anfragen meist ohnehin nacheinander ab.
+    openai_max_concurrency: int = 4
+    ollama_max_concurrency: int = 1
+    # Verbindungspool der gemeinsamen HTTP-Clients für OpenAI und Ollama.
+    # HTTP/2 wird nur genutzt, wenn das Paket ``h2`` installiert ist.
+    llm_http_max_connections: int = 20
+    llm_http_max_keepalive: int = 10
+    llm_http_keepalive_expiry: float = 30.0
+    llm_http2: bool = True
+    # Cache für LLM-Antworten (Schlüssel: Provider, Modell, Prompts). Die
+    # Disk-Stufe ist optional und wird nur mit ``llm_cache_dir`` aktiv.
+    llm_cache_enabled: bool = False
+    llm_cache_max_entries: int = 512
+    llm_cache_ttl: float = 3600.0
+    llm_cache_dir: str | None = None
+
+    # Delta-Extraktion im Dialog: Pro Runde nur den neuen Gesprächsteil plus
+    # bisherigen Rechnungsstand an das LLM schicken. Alle N Runden (oder auf
+    # Anfrage) erfolgt trotzdem eine vollständige Extraktion; 0 = nie.
+    conversation_delta_extraction: bool = False
+    conversation_full_extraction_interval: int = 5
+    # Dialogantworten ohne Warten auf TTS: statt Base64-``audio`` eine
+    # ``audio_url`` zum Streamen (Clients können je Anfrage abweichen);
+    # die URL ist ``conversation_audio_ttl`` Sekunden gültig
+    conversation_audio_url: bool = False
+    conversation_audio_ttl: float = 600.0
+    # Speicher für den Dialogzustand: "memory" (im Prozess, höchstens
+    # ``session_max_entries`` Sessions), "sqlite" (Datei im WAL-Modus, für
+    # mehrere Worker) oder "redis" (RESP-kompatibler Dienst, für mehrere
+    # Hosts). Sessions verfallen ``session_ttl`` Sekunden nach der letzten Runde.
+    session_store: str = "memory"
+    session_ttl: float = 86400.0
+    session_max_entries: int = 1000
+    session_db_path: str = "data/sessions.sqlite3"
+    session_redis_url: str = "redis://localhost:6379/0"
+    session_redis_prefix: str = "session:"
+    # Runden derselben Session laufen nacheinander; eine weitere wartet
+    # höchstens so viele Sekunden (0 = unbegrenzt), sonst HTTP 409.
+    session_lock_timeout: float = 30.0
+    # Sperre im Store (sqlite/redis) gegen gleichzeitige Runden in mehreren
+    # Workern; verfällt nach so vielen Sekunden, falls ihr Worker abstürzt
+    session_lock_ttl: float = 300.0
     stt_provider: str = "openai"
     stt_model: str = "whisper-1"
     stt_prompt: str | None = None
     stt_language: str = "de"
+    # Cache für Transkripte (Schlüssel: Audio-Hash, Provider, Modell, Sprache,
+    # Prompt und weitere Dekodier-Einstellungen des Providers, z. B. Beam-Größe).
+    # Die Disk-Stufe ist optional und wird nur mit ``stt_cache_dir`` aktiv.
+    stt_cache_enabled: bool = False
+    stt_cache_max_entries: int = 256
+    stt_cache_ttl: float = 86400.0
+    stt_cache_dir: str | None = None
+    # Lange Aufnahmen an leisen Stellen in überlappende Abschnitte von höchstens
+    # ``stt_chunk_seconds`` teilen und ``stt_chunk_parallelism`` davon
+    # gleichzeitig transkribieren. Nicht-WAV-Formate werden ab
+    # ``stt_chunk_max_bytes`` geteilt (Upload-Limit der Whisper-API: 25 MB).
+    stt_chunking: bool = True
+    stt_chunk_seconds: float = 120.0
+    stt_chunk_overlap: float = 2.0
+    stt_chunk_parallelism: int = 4
+    stt_chunk_max_bytes: int = 24 * 1024 * 1024
+    # ``command``-Provider als dauerhaft laufende Worker (``--server``) statt
+    # eines neuen Prozesses pro Aufnahme; Eingabe als WAV-Pfad oder PCM
+    stt_command_persistent: bool = False
+    stt_command_workers: int = 1
+    stt_command_input: str = "path"
+    stt_command_timeout: float = 300.0
+    stt_command_start_timeout: float = 120.0
+    stt_command_health_interval: float = 60.0
+    # Lokales Whisper: Anzahl Worker-Prozesse (0 = im API-Prozess) und
+    # Torch-Threads pro Worker (0 = CPU-Kerne / Worker)
+    whisper_workers: int = 1
+    whisper_threads: int = 0
+    # Micro-Batching gleichzeitiger Whisper-Anfragen: Sammelfenster in
+    # Sekunden und maximale Anzahl 30-s-Fenster pro Batch
+    whisper_batching: bool = False
+    whisper_batch_window: float = 0.05
+    whisper_batch_size: int = 8
+    # CPU-Provider ``faster-whisper`` (CTranslate2): Quantisierung, Threads
+    # (0 = Bibliotheksstandard), Beam-Größe (1 = greedy, am schnellsten) und
+    # Wort-Zeitstempel
+    faster_whisper_compute_type: str = "int8"
+    faster_whisper_threads: int = 0
+    faster_whisper_beam_size: int = 1
+    faster_whisper_word_timestamps: bool = True
     # Bild-zu-Text-Konvertierung
     ocr_provider: str = "tesseract"
 
@@ -32,6 +119,15 @@ class Settings(BaseSettings):
     tts_provider: str = "gtts"
     elevenlabs_api_key: SecretStr | None = None
     enable_manual_tts: bool = True
+    # Cache für Sprachausgaben (Schlüssel: Provider, Stimme, Sprache, Text);
+    # die Disk-Stufe (``tts_cache_dir``, leer = aus) übersteht Neustarts.
+    # Feste Rückfragen werden nach dem Start im Hintergrund vorab vertont
+    # (``tts_prewarm``).
+    tts_cache_enabled: bool = True
+    tts_cache_max_entries: int = 512
+    tts_cache_ttl: float = 30 * 86400.0
+    tts_cache_dir: str | None = "data/tts_cache"
+    tts_prewarm: bool = True
 
     # Standardpreise für Positionen, damit Rechnungen sinnvolle Beträge
     # enthalten, selbst wenn keine expliziten Angaben gemacht werden.
@@ -56,10 +152,53 @@ class Settings(BaseSettings):
 
     # Optionale PDF-Vorlage für Rechnungen
     invoice_template_pdf: str | None = None
+    # PDF und XRechnung erst beim ersten Abruf erzeugen und nach Inhalts-Hash
+    # der Rechnung zwischenspeichern; false = sofort beim Speichern rendern
+    invoice_artifacts_lazy: bool = True
+    artifact_cache_max_entries: int = 128
+    artifact_cache_ttl: float = 7 * 86400.0
+    artifact_cache_dir: str | None = None
 
     # Optionaler Pfad zu einer externen Materialpreisdatei (JSON)
     material_prices_path: str | None = None
 
+    # Größe des Thread-Pools, in dem blockierende Provider-Aufrufe (STT, TTS,
+    # Billing, Dateizugriffe) aus den async-Endpunkten ausgeführt werden
+    blocking_pool_size: int = 32
+    # Provider, die beim Start erzeugt und vorgeladen werden (Modelle, Worker,
+    # Clients), kommagetrennt aus "stt", "tts", "ocr"; leer = alle lazy
+    provider_preload: str = "stt,tts,ocr"
+
+    # Uploads: Größenlimit (Audio und Bilder) und maximale Dauer der
+    # ffmpeg-Konvertierung
+    audio_max_upload_bytes: int = 50 * 1024 * 1024
+    audio_conversion_timeout: float = 120.0
+    # Normalisierung vor STT: Mono-Downmix, Resampling, Stille per Energie-VAD
+    # an den Rändern entfernen und lange Pausen kürzen
+    audio_normalize: bool = True
+    audio_sample_rate: int = 16000
+    audio_vad_threshold_db: float = -45.0
+    audio_vad_padding: float = 0.2
+    audio_max_pause: float = 1.0
+    # Streaming-Diktat (WebSocket): Segmentgrenze nach dieser Sprechpause
+    # bzw. spätestens nach dieser Segmentlänge sowie maximale Aufnahmedauer
+    # (Sekunden); zusätzlich gilt ``audio_max_upload_bytes``
+    stream_segment_pause: float = 0.6
+    stream_max_segment: float = 25.0
+    stream_max_duration: float = 600.0
+
+    # Hintergrund-Jobs (``?async=true``): SQLite-Warteschlange, Anzahl
+    # gleichzeitig laufender Jobs und Abfrageintervall für Worker/SSE
+    jobs_db_path: str = "data/jobs.sqlite3"
+    job_workers: int = 2
+    job_poll_interval: float = 1.0
+    # Heartbeat laufender Jobs (Sekunden); Jobs ohne Heartbeat seit
+    # ``job_stale_after`` gelten als verwaist und werden erneut eingeplant,
+    # nach ``job_max_attempts`` Starts als fehlgeschlagen markiert
+    job_heartbeat_interval: float = 10.0
+    job_stale_after: float = 60.0
+    job_max_attempts: int = 3
+
     # Verhalten beim Start, falls das LLM nicht erreichbar ist
     fail_on_llm_unavailable: bool = False
 
@@ -16,6 +16,8 @@ document.addEventListener('DOMContentLoaded', () => {
   const sessionId = crypto.randomUUID();
   let recorder;
   let audioStream;
+  let streamSocket;
+  let streamProcessor;
   let fullTranscript = '';
   let pendingClarifications = [];
   let latestTtsText = '';
@@ -78,6 +80,16 @@ document.addEventListener('DOMContentLoaded', () => {
     }
   }
 
+  // Mit ``audio_url`` kommt die Antwort ohne Warten auf die Sprachausgabe;
+  // der Browser spielt den Stream ab, sobald die ersten Bytes eintreffen.
+  function playServerAudio(data) {
+    if (data.audio_url) {
+      new Audio(data.audio_url).play();
+    } else if (data.audio) {
+      new Audio(`data:audio/mpeg;base64,${data.audio}`).play();
+    }
+  }
+
   function initializeTtsControls() {
     if (!ttsControls) return;
     if (!enableManualTts) {
@@ -93,6 +105,66 @@ document.addEventListener('DOMContentLoaded', () => {
     ttsStopBtn?.addEventListener('click', stopTts);
   }
 
+  function floatTo16BitPCM(samples) {
+    const pcm = new Int16Array(samples.length);
+    for (let i = 0; i < samples.length; i += 1) {
+      const s = Math.max(-1, Math.min(1, samples[i]));
+      pcm[i] = s < 0 ? s * 0x8000 : s * 0x7fff;
+    }
+    return pcm.buffer;
+  }
+
+  // Schickt das Mikrofonsignal schon während der Aufnahme an den Server, der
+  // es an Sprechpausen segmentiert und fortlaufend transkribiert. Ohne
+  // WebSocket-Verbindung bleibt der WAV-Upload nach dem Stopp als Fallback.
+  function startStreaming(audioContext, input) {
+    if (!('WebSocket' in window)) return;
+    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+    const params = new URLSearchParams({
+      session_id: sessionId,
+      sample_rate: String(audioContext.sampleRate),
+    });
+    streamSocket = new WebSocket(
+      `${protocol}//${window.location.host}/conversation/stream?${params}`
+    );
+    streamSocket.binaryType = 'arraybuffer';
+    streamSocket.onmessage = (event) => {
+      const data = JSON.parse(event.data);
+      if (data.type === 'partial' && data.text) {
+        status.textContent = data.text;
+      } else if (data.type === 'result') {
+        handleAudioResponse(data);
+      } else if (data.type === 'error') {
+        status.textContent = 'Fehler: ' + data.detail;
+      }
+    };
+    streamProcessor = audioContext.createScriptProcessor(4096, 1, 1);
+    streamProcessor.onaudioprocess = (event) => {
+      if (streamSocket && streamSocket.readyState === WebSocket.OPEN) {
+        streamSocket.send(floatTo16BitPCM(event.inputBuffer.getChannelData(0)));
+      }
+    };
+    input.connect(streamProcessor);
+    streamProcessor.connect(audioContext.destination);
+  }
+
+  function stopStreaming() {
+    if (streamProcessor) {
+      streamProcessor.disconnect();
+      streamProcessor = null;
+    }
+    const socket = streamSocket;
+    streamSocket = null;
+    if (!socket || socket.readyState !== WebSocket.OPEN) return false;
+    const stop = { type: 'stop', audio_url: true };
+    if (pendingClarifications.length) {
+      stop.clarification_context = pendingClarifications.join(' | ');
+      pendingClarifications = [];
+    }
+    socket.send(JSON.stringify(stop));
+    return true;
+  }
+
   recordBtn.addEventListener('click', async () => {
     if (!recordBtn.classList.contains('recording')) {
       audioStream = await navigator.mediaDevices.getUserMedia({
@@ -106,6 +178,7 @@ document.addEventListener('DOMContentLoaded', () => {
       const input = audioContext.createMediaStreamSource(audioStream);
       recorder = new Recorder(input, { numChannels: 1 });
       recorder.record();
+      startStreaming(audioContext, input);
       recordBtn.classList.add('recording', 'bg-red-600');
       status.textContent = 'Aufnahme läuft...';
     } else {
@@ -113,7 +186,9 @@ document.addEventListener('DOMContentLoaded', () => {
       audioStream.getTracks().forEach((t) => t.stop());
       recordBtn.classList.remove('recording', 'bg-red-600');
       status.textContent = 'Verarbeite...';
-      recorder.exportWAV(sendAudio);
+      if (!stopStreaming()) {
+        recorder.exportWAV(sendAudio);
+      }
     }
   });
 
@@ -140,13 +215,16 @@ document.addEventListener('DOMContentLoaded', () => {
     const fd = new FormData();
     fd.append('session_id', sessionId);
     fd.append('file', blob, 'audio.wav');
+    fd.append('audio_url', 'true');
     if (pendingClarifications.length) {
       fd.append('clarification_context', pendingClarifications.join(' | '));
       pendingClarifications = [];
     }
     const resp = await fetch('/conversation/', { method: 'POST', body: fd });
-    const data = await resp.json();
+    handleAudioResponse(await resp.json());
+  }
 
+  function handleAudioResponse(data) {
     const userPart = data.transcript.slice(fullTranscript.length).trim();
     if (userPart) {
       addMessage(userPart, 'user');
@@ -164,8 +242,8 @@ document.addEventListener('DOMContentLoaded', () => {
     }
     if (enableManualTts) {
       updateTtsTextFromResponse(data);
-    } else if (data.audio) {
-      new Audio(`data:audio/mpeg;base64,${data.audio}`).play();
+    } else {
+      playServerAudio(data);
     }
     if (data.done && data.log_dir) {
       pdfFrame.src = '/' + data.log_dir + '/invoice.pdf';
@@ -183,6 +261,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const fd = new FormData();
     fd.append('session_id', sessionId);
     fd.append('text', text);
+    fd.append('audio_url', 'true');
     if (pendingClarifications.length) {
       fd.append('clarification_context', pendingClarifications.join(' | '));
       pendingClarifications = [];
@@ -202,8 +281,8 @@ document.addEventListener('DOMContentLoaded', () => {
     }
     if (enableManualTts) {
       updateTtsTextFromResponse(data);
-    } else if (data.audio) {
-      new Audio(`data:audio/mpeg;base64,${data.audio}`).play();
+    } else {
+      playServerAudio(data);
     }
     if (data.done && data.log_dir) {
       pdfFrame.src = '/' + data.log_dir + '/invoice.pdf';
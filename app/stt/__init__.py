@@ -3,40 +3,103 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import hashlib
 from io import BytesIO
 import json
+import logging
 import os
 from pathlib import Path
-import re
 import shlex
 import subprocess  # nosec B404
 import tempfile
+import threading
 from typing import Any
 
 import yaml  # type: ignore
 
 from openai import OpenAI
 
+from app.audio import pcm_from_audio, sniff_format
+from app.cache import TieredCache, make_key
+from app.concurrency import run_blocking
+from app.providers import ProviderRegistry
 from app.settings import settings
+from app.stt import chunking, command_server, whisper_batch, whisper_pool
+from app.stt.normalizer import TranscriptNormalizer
+
+logger = logging.getLogger(__name__)
+
+# Whisper erwartet Mono-Audio mit 16 kHz.
+WHISPER_SAMPLE_RATE = 16000
+
+# Container, die Whisper (API oder lokal über ffmpeg) direkt lesen kann.
+_WHISPER_FORMATS = frozenset(
+    {"flac", "m4a", "mp3", "mp4", "mpeg", "mpga", "ogg", "wav", "webm"}
+)
+
+
+@dataclass(frozen=True)
+class WordTimestamp:
+    """Ein erkanntes Wort mit Start/Ende in Sekunden ab Aufnahmebeginn."""
+
+    word: str
+    start: float
+    end: float
+    probability: float
 
 
 class STTProvider(ABC):
     """Basisklasse für alle Speech-to-Text-Backends."""
 
+    #: Dateiformate, die ohne vorherige WAV-Konvertierung verarbeitet werden.
+    accepted_formats: frozenset[str] = frozenset({"wav"})
+
     @abstractmethod
     def transcribe(self, audio_bytes: bytes) -> str:
         """Wandelt rohe Audio-Bytes in Text um."""
         raise NotImplementedError
 
+    async def atranscribe(self, audio_bytes: bytes) -> str:
+        """Async-Variante; führt ``transcribe`` im Thread-Pool aus."""
+        return await run_blocking(self.transcribe, audio_bytes)
+
+    def transcribe_words(self, audio_bytes: bytes) -> tuple[str, list[WordTimestamp]]:
+        """Transkript plus Wort-Zeitstempel; ohne Unterstützung leer."""
+        return self.transcribe(audio_bytes), []
+
+    @classmethod
+    def chunk_parallelism(cls) -> int:
+        """Wie viele Abschnitte einer langen Aufnahme gleichzeitig laufen dürfen."""
+        return max(1, settings.stt_chunk_parallelism)
+
+    @classmethod
+    def decode_settings(cls) -> tuple[str, ...]:
+        """Einstellungen, die das Transkript verändern (Teil des Cache-Schlüssels)."""
+        return (settings.stt_model, settings.stt_language, settings.stt_prompt or "")
+
+    def preload(self) -> None:
+        """Lädt Modelle bzw. startet Worker vor der ersten Anfrage."""
+
+    def close(self) -> None:
+        """Gibt Worker-Prozesse und andere Ressourcen frei."""
+
 
 class OpenAITranscriber(STTProvider):
     """Nutzen die Whisper-API von OpenAI."""
 
+    accepted_formats = _WHISPER_FORMATS
+
     def transcribe(self, audio_bytes: bytes) -> str:
         client = OpenAI()
+        # Die API erkennt das Format am Dateinamen.
+        audio_file = BytesIO(audio_bytes)
+        audio_file.name = f"audio.{sniff_format(audio_bytes) or 'wav'}"
         response = client.audio.transcriptions.create(
             model=settings.stt_model,
-            file=BytesIO(audio_bytes),
+            file=audio_file,
             response_format="text",
             prompt=settings.stt_prompt,
             language=settings.stt_language,
@@ -45,9 +108,31 @@ class OpenAITranscriber(STTProvider):
 
 
 class CommandTranscriber(STTProvider):
-    """Startet ein lokales Kommandozeilen-Tool."""
+    """Startet ein lokales Kommandozeilen-Tool.
+
+    Mit ``STT_COMMAND_PERSISTENT`` läuft das Tool dauerhaft als Worker
+    (:mod:`app.stt.command_server`), statt pro Aufnahme neu zu starten.
+    """
+
+    @classmethod
+    def decode_settings(cls) -> tuple[str, ...]:
+        # Der Worker-Modus ruft das Tool anders auf (``--server``, PCM/Pfad).
+        return (
+            *super().decode_settings(),
+            str(settings.stt_command_persistent),
+            settings.stt_command_input,
+        )
+
+    def preload(self) -> None:
+        if settings.stt_command_persistent:
+            command_server.warm_up()
+
+    def close(self) -> None:
+        command_server.shutdown()
 
     def transcribe(self, audio_bytes: bytes) -> str:
+        if settings.stt_command_persistent:
+            return command_server.transcribe(audio_bytes)
         with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
             tmp.write(audio_bytes)
             tmp.flush()
@@ -66,13 +151,33 @@ class CommandTranscriber(STTProvider):
 
 
 class WhisperTranscriber(STTProvider):
-    """Verwendet das lokale `whisper`-Paket."""
+    """Verwendet das lokale `whisper`-Paket.
 
+    Mit ``WHISPER_WORKERS > 0`` läuft die Transkription in einem eigenen
+    Prozess-Pool (:mod:`app.stt.whisper_pool`), sonst im aufrufenden Thread.
+    """
+
+    # Whisper-Eingaben werden vorab im Speicher zu PCM dekodiert.
+    accepted_formats = _WHISPER_FORMATS
     _model_cache: dict[str, Any] = {}
+    # Das Modell im API-Prozess ist nicht threadsicher: Dekodierungen ohne
+    # Pool (Einzelaufrufe, parallele Abschnitte, Batches) laufen nacheinander.
+    _model_lock = threading.Lock()
+    # Import- und ffmpeg-Prüfung nur einmal pro Prozess.
+    _dependencies_checked = False
 
     def __init__(self) -> None:
+        if not WhisperTranscriber._dependencies_checked:
+            self._check_dependencies()
+            WhisperTranscriber._dependencies_checked = True
+        # Im Pool-Modus hält nur der Worker-Prozess das Modell im Speicher.
+        if settings.whisper_workers <= 0:
+            self.model = self._load_model()
+
+    @staticmethod
+    def _check_dependencies() -> None:
         # Lazy import to avoid mandatory dependency during test runs
-        import whisper  # type: ignore
+        import whisper  # type: ignore  # noqa: F401
 
         try:
             import numpy  # noqa: F401
@@ -90,6 +195,9 @@ class WhisperTranscriber(STTProvider):
                 "or set STT_PROVIDER=openai."
             )
 
+    def _load_model(self) -> Any:
+        import whisper  # type: ignore
+
         if settings.stt_model not in self._model_cache:
             try:
                 self._model_cache[settings.stt_model] = whisper.load_model(
@@ -102,38 +210,324 @@ class WhisperTranscriber(STTProvider):
                         "'pip install numpy' or set STT_PROVIDER=openai."
                     ) from exc
                 raise
-        self.model = self._model_cache[settings.stt_model]
+        return self._model_cache[settings.stt_model]
+
+    @classmethod
+    def chunk_parallelism(cls) -> int:
+        # Ohne Pool dekodiert ein einziges Modell unter ``_model_lock``;
+        # parallele Abschnitte lohnen nur, wenn der Batcher sie bündelt.
+        if settings.whisper_workers <= 0 and not settings.whisper_batching:
+            return 1
+        return super().chunk_parallelism()
+
+    @classmethod
+    def decode_settings(cls) -> tuple[str, ...]:
+        # Mit Batching wird in festen 30-s-Fenstern dekodiert.
+        return (*super().decode_settings(), str(settings.whisper_batching))
+
+    def preload(self) -> None:
+        # Im In-Process-Modus hat der Konstruktor das Modell bereits geladen.
+        if settings.whisper_workers > 0:
+            whisper_pool.warm_up()
+
+    def close(self) -> None:
+        whisper_pool.shutdown()
 
     def transcribe(self, audio_bytes: bytes) -> str:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-            tmp.write(audio_bytes)
-            tmp.flush()
-            result = self.model.transcribe(tmp.name, language=settings.stt_language)
-        os.unlink(tmp.name)
+        pcm = pcm_from_audio(audio_bytes, WHISPER_SAMPLE_RATE)
+        if settings.whisper_workers > 0:
+            return whisper_pool.submit(pcm, settings.stt_language).result()
+        with self._model_lock:
+            result = self.model.transcribe(pcm, language=settings.stt_language)
         return result.get("text", "").strip()
 
+    async def atranscribe(self, audio_bytes: bytes) -> str:
+        if settings.whisper_batching:
+            pcm = await run_blocking(pcm_from_audio, audio_bytes, WHISPER_SAMPLE_RATE)
+            batcher = whisper_batch.get_batcher(
+                self._adecode_batch,
+                batch_size=settings.whisper_batch_size,
+                window=settings.whisper_batch_window,
+            )
+            return await batcher.transcribe(pcm, settings.stt_language)
+        if settings.whisper_workers <= 0:
+            return await super().atranscribe(audio_bytes)
+        pcm = await run_blocking(pcm_from_audio, audio_bytes, WHISPER_SAMPLE_RATE)
+        # Auf den Pool warten, ohne einen Thread des Blocking-Pools zu belegen.
+        return await asyncio.wrap_future(
+            whisper_pool.submit(pcm, settings.stt_language)
+        )
+
+    async def _adecode_batch(self, windows: list, language: str) -> list[str]:
+        """Dekodiert einen Batch im Pool bzw. im API-Prozess."""
+        if settings.whisper_workers > 0:
+            return await asyncio.wrap_future(
+                whisper_pool.submit_batch(windows, language)
+            )
+        return await run_blocking(self._decode_in_process, windows, language)
+
+    def _decode_in_process(self, windows: list, language: str) -> list[str]:
+        # Der Batcher kann mehrere Batches gleichzeitig starten.
+        with self._model_lock:
+            return whisper_pool.decode_windows(self.model, windows, language)
+
+
+class FasterWhisperTranscriber(STTProvider):
+    """Int8-quantisiertes Whisper auf der CPU (``faster-whisper``/CTranslate2).
+
+    Deutlich schneller und sparsamer als das Referenzpaket ohne GPU.
+    ``STT_MODEL`` ist ein Modellname (``base``, ``small``, …) oder ein Pfad
+    zu einem konvertierten CTranslate2-Modell.
+    """
+
+    accepted_formats = _WHISPER_FORMATS
+    _model_cache: dict[tuple[str, str, int], Any] = {}
+
+    def __init__(self) -> None:
+        self.model = self._load_model()
+
+    @classmethod
+    def decode_settings(cls) -> tuple[str, ...]:
+        return (
+            *super().decode_settings(),
+            settings.faster_whisper_compute_type,
+            str(settings.faster_whisper_beam_size),
+            str(settings.faster_whisper_word_timestamps),
+        )
+
+    @staticmethod
+    def _load_model() -> Any:
+        try:
+            from faster_whisper import WhisperModel  # type: ignore
+        except ImportError as exc:  # pragma: no cover - environment issue
+            raise RuntimeError(
+                "FasterWhisperTranscriber requires faster-whisper. Install it with "
+                "'pip install faster-whisper' or set STT_PROVIDER=whisper."
+            ) from exc
+
+        key = (
+            settings.stt_model,
+            settings.faster_whisper_compute_type,
+            settings.faster_whisper_threads,
+        )
+        cache = FasterWhisperTranscriber._model_cache
+        if key not in cache:
+            cache[key] = WhisperModel(
+                settings.stt_model,
+                device="cpu",
+                compute_type=settings.faster_whisper_compute_type,
+                cpu_threads=max(0, settings.faster_whisper_threads),
+            )
+        return cache[key]
+
+    def transcribe(self, audio_bytes: bytes) -> str:
+        return self.transcribe_words(audio_bytes)[0]
+
+    def transcribe_words(self, audio_bytes: bytes) -> tuple[str, list[WordTimestamp]]:
+        pcm = pcm_from_audio(audio_bytes, WHISPER_SAMPLE_RATE)
+        segments, _info = self.model.transcribe(
+            pcm,
+            language=settings.stt_language,
+            beam_size=max(1, settings.faster_whisper_beam_size),
+            initial_prompt=settings.stt_prompt,
+            word_timestamps=settings.faster_whisper_word_timestamps,
+        )
+        # ``segments`` ist ein Generator; dekodiert wird erst beim Iterieren.
+        texts: list[str] = []
+        words: list[WordTimestamp] = []
+        for segment in segments:
+            texts.append(segment.text.strip())
+            for word in segment.words or ():
+                words.append(
+                    WordTimestamp(
+                        word=word.word.strip(),
+                        start=float(word.start),
+                        end=float(word.end),
+                        probability=float(word.probability),
+                    )
+                )
+        return " ".join(text for text in texts if text), words
+
+
+class CachedTranscriber(STTProvider):
+    """Cacht Transkripte anhand eines Hashes der (normalisierten) Audiodaten.
+
+    Schlüssel sind Audio-Hash, Provider und alle Einstellungen, die das
+    Transkript verändern (:meth:`STTProvider.decode_settings`). Erneut
+    zugestellte Telefonie-Webhooks und wiederholte Uploads werden so ohne
+    erneute Spracherkennung beantwortet; der eigentliche Provider wird erst
+    bei einem Cache-Miss erzeugt.
+    """
+
+    def __init__(
+        self, provider_cls: type[STTProvider], cache: TieredCache[str]
+    ) -> None:
+        self.provider_cls = provider_cls
+        self.cache = cache
+        self.accepted_formats = provider_cls.accepted_formats
+        self._inner: STTProvider | None = None
+
+    @property
+    def inner(self) -> STTProvider:
+        if self._inner is None:
+            self._inner = self.provider_cls()
+        return self._inner
+
+    def _key(self, audio_bytes: bytes) -> str:
+        return make_key(
+            hashlib.sha256(audio_bytes).hexdigest(),
+            settings.stt_provider,
+            *self.provider_cls.decode_settings(),
+        )
+
+    def chunk_parallelism(self) -> int:  # type: ignore[override]
+        return self.provider_cls.chunk_parallelism()
+
+    def transcribe_words(self, audio_bytes: bytes) -> tuple[str, list[WordTimestamp]]:
+        # Zeitstempel werden nicht gecacht; der Aufruf geht direkt an den Provider.
+        return self.inner.transcribe_words(audio_bytes)
+
+    def preload(self) -> None:
+        self.inner.preload()
+
+    def close(self) -> None:
+        if self._inner is not None:
+            self._inner.close()
+
+    @staticmethod
+    def _log_hit(key: str, computed: bool) -> None:
+        if not computed:
+            logger.info("STT cache hit for audio %s, skipping transcription", key[:12])
+
+    def transcribe(self, audio_bytes: bytes) -> str:
+        key = self._key(audio_bytes)
+        computed = False
+
+        def compute() -> str:
+            nonlocal computed
+            computed = True
+            return self.inner.transcribe(audio_bytes)
+
+        text = self.cache.get_or_compute(key, compute)
+        self._log_hit(key, computed)
+        return text
+
+    async def atranscribe(self, audio_bytes: bytes) -> str:
+        key = await run_blocking(self._key, audio_bytes)
+        computed = False
+
+        async def compute() -> str:
+            nonlocal computed
+            computed = True
+            # Die Provider-Initialisierung kann Modelle laden und blockiert daher.
+            inner = await run_blocking(lambda: self.inner)
+            return await inner.atranscribe(audio_bytes)
+
+        text = await self.cache.aget_or_compute(key, compute)
+        self._log_hit(key, computed)
+        return text
+
+
+_stt_cache: TieredCache[str] | None = None
+
+
+def get_stt_cache() -> TieredCache[str]:
+    """Gibt den prozessweiten Transkript-Cache zurück."""
+    global _stt_cache
+    if _stt_cache is None:
+        _stt_cache = TieredCache(
+            "stt_cache",
+            max_entries=settings.stt_cache_max_entries,
+            ttl=settings.stt_cache_ttl,
+            disk_dir=settings.stt_cache_dir,
+        )
+    return _stt_cache
+
 
 _STT_PROVIDERS: dict[str, type[STTProvider]] = {
     "openai": OpenAITranscriber,
     "command": CommandTranscriber,
     "whisper": WhisperTranscriber,
+    "faster-whisper": FasterWhisperTranscriber,
 }
 
 
-def _select_provider() -> STTProvider:
-    """Wählt anhand der Einstellung den passenden Provider aus."""
+def _create_provider() -> STTProvider:
+    """Erzeugt den konfigurierten Provider (ggf. mit Transkript-Cache)."""
     provider_name = settings.stt_provider
     try:
         provider_cls = _STT_PROVIDERS[provider_name]
     except KeyError:  # pragma: no cover - configuration error
         raise ValueError(f"Unsupported STT_PROVIDER {settings.stt_provider}")
+    if settings.stt_cache_enabled:
+        return CachedTranscriber(provider_cls, get_stt_cache())
     return provider_cls()
 
 
+# Einstellungen, bei deren Änderung der Provider neu erzeugt wird.
+_registry: ProviderRegistry[STTProvider] = ProviderRegistry(
+    "stt",
+    _create_provider,
+    lambda: (
+        settings.stt_provider,
+        settings.stt_model,
+        settings.stt_cache_enabled,
+        settings.whisper_workers,
+        settings.faster_whisper_compute_type,
+        settings.faster_whisper_threads,
+    ),
+)
+
+
+def _select_provider() -> STTProvider:
+    """Gibt den einmalig erzeugten Provider der aktuellen Konfiguration zurück."""
+    return _registry.get()
+
+
+def accepted_audio_formats() -> frozenset[str]:
+    """Formate, die das konfigurierte Backend ohne Konvertierung annimmt."""
+    provider_cls = _STT_PROVIDERS.get(settings.stt_provider, STTProvider)
+    return provider_cls.accepted_formats
+
+
 def transcribe_audio(audio_bytes: bytes) -> str:
     """Convenience-Funktion für andere Module."""
     provider = _select_provider()
-    raw = provider.transcribe(audio_bytes)
+    if not chunking.needs_chunking(audio_bytes):
+        return _normalize_transcript(provider.transcribe(audio_bytes))
+    chunks = chunking.split_audio(audio_bytes)
+    workers = min(len(chunks), provider.chunk_parallelism())
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        texts = list(executor.map(provider.transcribe, chunks))
+    raw = chunking.stitch_transcripts(texts, settings.stt_chunk_overlap)
+    return _normalize_transcript(raw)
+
+
+def transcribe_audio_words(audio_bytes: bytes) -> tuple[str, list[WordTimestamp]]:
+    """Wie :func:`transcribe_audio`, zusätzlich mit Wort-Zeitstempeln.
+
+    Die Zeitstempel beziehen sich auf die Wörter vor der Normalisierung;
+    Provider ohne Zeitstempel liefern eine leere Liste.
+    """
+    raw, words = _select_provider().transcribe_words(audio_bytes)
+    return _normalize_transcript(raw), words
+
+
+async def atranscribe_audio(audio_bytes: bytes) -> str:
+    """Async-Variante von :func:`transcribe_audio` für die Endpunkte."""
+    # Die erstmalige Provider-Erzeugung kann Modelle laden und blockiert daher.
+    provider = await _registry.aget()
+    if not chunking.needs_chunking(audio_bytes):
+        return _normalize_transcript(await provider.atranscribe(audio_bytes))
+    chunks = await run_blocking(chunking.split_audio, audio_bytes)
+    semaphore = asyncio.Semaphore(provider.chunk_parallelism())
+
+    async def transcribe_chunk(chunk: bytes) -> str:
+        async with semaphore:
+            return await provider.atranscribe(chunk)
+
+    texts = await asyncio.gather(*(transcribe_chunk(chunk) for chunk in chunks))
+    raw = chunking.stitch_transcripts(list(texts), settings.stt_chunk_overlap)
     return _normalize_transcript(raw)
 
 
@@ -158,59 +552,10 @@ def _load_transcript_replacements() -> dict[str, str]:
 
 _TRANSCRIPT_REPLACEMENTS = _load_transcript_replacements()
 
-
-_NUMBER_WORDS = {
-    "null": "0",
-    "eins": "1",
-    "ein": "1",
-    "eine": "1",
-    "einen": "1",
-    "zwei": "2",
-    "drei": "3",
-    "vier": "4",
-    "fünf": "5",
-    "fuenf": "5",
-    "sechs": "6",
-    "sieben": "7",
-    "acht": "8",
-    "neun": "9",
-    "zehn": "10",
-    "elf": "11",
-    "zwölf": "12",
-    "zwoelf": "12",
-    "dreizehn": "13",
-    "vierzehn": "14",
-    "fünfzehn": "15",
-    "funfzehn": "15",
-    "sechzehn": "16",
-    "siebzehn": "17",
-    "achtzehn": "18",
-    "neunzehn": "19",
-    "zwanzig": "20",
-    "dreißig": "30",
-    "dreissig": "30",
-    "vierzig": "40",
-    "fünfzig": "50",
-    "funfzig": "50",
-    "sechzig": "60",
-    "siebzig": "70",
-    "achtzig": "80",
-    "neunzig": "90",
-    "hundert": "100",
-}
-
-
-def _replace_number_words(text: str) -> str:
-    pattern = r"\b(" + "|".join(re.escape(w) for w in _NUMBER_WORDS.keys()) + r")\b"
-
-    def repl(match: re.Match[str]) -> str:
-        return _NUMBER_WORDS[match.group(0).lower()]
-
-    return re.sub(pattern, repl, text, flags=re.IGNORECASE)
+# Einmal beim Import kompiliert; siehe :mod:`app.stt.normalizer`.
+_NORMALIZER = TranscriptNormalizer(_TRANSCRIPT_REPLACEMENTS)
 
 
 def _normalize_transcript(text: str) -> str:
-    """Korrigiert häufige Erkennungsfehler im Transkript."""
-    for wrong, correct in _TRANSCRIPT_REPLACEMENTS.items():
-        text = text.replace(wrong, correct)
-    return _replace_number_words(text)
+    """Korrigiert häufige Erkennungsfehler und schreibt Zahlwörter als Ziffern."""
+    return _NORMALIZER(text)
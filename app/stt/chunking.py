@@ -0,0 +1,126 @@
+"""Aufteilen langer Aufnahmen in überlappende Abschnitte.
+
+Lange Diktate (mehrere Minuten) werden vor der Spracherkennung an leisen
+Stellen in Abschnitte von höchstens ``STT_CHUNK_SECONDS`` geschnitten, die
+sich um ``STT_CHUNK_OVERLAP`` Sekunden überlappen. Die Abschnitte lassen sich
+parallel transkribieren; :func:`stitch_transcripts` fügt die Texte wieder
+zusammen und entfernt dabei die doppelt erkannten Wörter aus der Überlappung.
+Zusätzlich bleibt jede Anfrage unter dem Upload-Limit der Whisper-API.
+"""
+
+from __future__ import annotations
+
+import difflib
+import re
+
+import numpy as np
+
+from app import metrics
+from app.audio import encode_wav, frame_levels, pcm_from_audio, wav_duration
+from app.settings import settings
+
+CHUNK_SAMPLE_RATE = 16000
+
+# Anteil des Abschnitts (höchstens ``_MAX_SEARCH`` Sekunden) vor der
+# Maximallänge, in dem nach der leisesten Stelle für den Schnitt gesucht wird.
+_SEARCH_FRACTION = 0.25
+_MAX_SEARCH = 10.0
+# Gesprochene Wörter pro Sekunde, großzügig geschätzt, für das Suchfenster
+# beim Zusammenfügen.
+_WORDS_PER_SECOND = 4
+_MIN_OVERLAP_WORDS = 2
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def needs_chunking(audio_bytes: bytes) -> bool:
+    """``True``, wenn die Aufnahme länger als ein Abschnitt ist.
+
+    Für Formate ohne günstig bestimmbare Dauer (MP3, WebM, …) entscheidet
+    die Dateigröße (``STT_CHUNK_MAX_BYTES``).
+    """
+    if not settings.stt_chunking or settings.stt_chunk_seconds <= 0:
+        return False
+    duration = wav_duration(audio_bytes)
+    if duration is None:
+        return len(audio_bytes) > settings.stt_chunk_max_bytes
+    return duration > settings.stt_chunk_seconds + settings.stt_chunk_overlap
+
+
+def plan_chunks(
+    samples: np.ndarray, rate: int, max_seconds: float, overlap_seconds: float
+) -> list[tuple[int, int]]:
+    """Berechnet ``(start, ende)`` der Abschnitte in Samples.
+
+    Geschnitten wird an der leisesten Stelle im letzten Teil jedes
+    Abschnitts, damit möglichst kein Wort zerteilt wird. Der folgende
+    Abschnitt beginnt ``overlap_seconds`` vor dem Schnitt.
+    """
+    total = len(samples)
+    size = int(max_seconds * rate)
+    overlap = int(overlap_seconds * rate)
+    if size <= 0 or total <= size + overlap:
+        return [(0, total)]
+    levels, frame = frame_levels(samples, rate)
+    search = int(min(max_seconds * _SEARCH_FRACTION, _MAX_SEARCH) * rate)
+    chunks: list[tuple[int, int]] = []
+    start = 0
+    while total - start > size + overlap:
+        end = start + size
+        first = max(start + overlap + 1, end - search) // frame
+        last = end // frame
+        if last > first:
+            quietest = first + int(np.argmin(levels[first:last]))
+            end = quietest * frame + frame // 2
+        chunks.append((start, end))
+        start = max(end - overlap, start + 1)
+    chunks.append((start, total))
+    return chunks
+
+
+def split_audio(audio_bytes: bytes) -> list[bytes]:
+    """Zerlegt eine Aufnahme in überlappende 16-kHz-WAV-Abschnitte."""
+    samples = pcm_from_audio(audio_bytes, CHUNK_SAMPLE_RATE)
+    plan = plan_chunks(
+        samples,
+        CHUNK_SAMPLE_RATE,
+        settings.stt_chunk_seconds,
+        settings.stt_chunk_overlap,
+    )
+    metrics.inc("stt_chunking.recordings")
+    metrics.inc("stt_chunking.chunks", len(plan))
+    return [encode_wav(samples[start:end], CHUNK_SAMPLE_RATE) for start, end in plan]
+
+
+def _norm(word: str) -> str:
+    return "".join(_WORD_RE.findall(word.lower()))
+
+
+def _merge(previous: list[str], following: list[str], window: int) -> list[str]:
+    """Hängt ``following`` an und entfernt die längste gemeinsame Wortfolge."""
+    tail = previous[-window:]
+    head = following[:window]
+    matcher = difflib.SequenceMatcher(
+        None, [_norm(w) for w in tail], [_norm(w) for w in head], autojunk=False
+    )
+    match = matcher.find_longest_match(0, len(tail), 0, len(head))
+    if match.size < _MIN_OVERLAP_WORDS:
+        return previous + following
+    cut = len(previous) - len(tail) + match.a + match.size
+    return previous[:cut] + following[match.b + match.size :]
+
+
+def stitch_transcripts(texts: list[str], overlap_seconds: float) -> str:
+    """Fügt die Transkripte aufeinanderfolgender Abschnitte zusammen.
+
+    Die in der Überlappung doppelt erkannten Wörter werden über die längste
+    gemeinsame Wortfolge am Ende des einen und am Anfang des nächsten Texts
+    gefunden (Groß-/Kleinschreibung und Satzzeichen werden ignoriert). Ohne
+    eindeutige Übereinstimmung werden die Texte unverändert verbunden.
+    """
+    window = max(_MIN_OVERLAP_WORDS, int(overlap_seconds * _WORDS_PER_SECOND) + 2)
+    words: list[str] = []
+    for text in texts:
+        following = text.split()
+        words = _merge(words, following, window) if words else following
+    return " ".join(words)
@@ -0,0 +1,301 @@
+"""Dauerhaft laufende Worker für den ``command``-STT-Provider.
+
+Ohne diesen Modus startet :class:`~app.stt.CommandTranscriber` das Kommando
+aus ``STT_MODEL`` für jede Aufnahme neu – bei whisper.cpp heißt das, jedes
+Mal ein mehrere hundert MB großes Modell zu laden. Mit
+``STT_COMMAND_PERSISTENT`` wird das Kommando stattdessen einmal (bzw.
+``STT_COMMAND_WORKERS`` mal) mit ``--server`` gestartet und über stdin/stdout
+angesprochen.
+
+Protokoll (je Nachricht eine Kopfzeile, danach genau ``<länge>`` Bytes)::
+
+    Anfrage:  PATH <länge>\\n<UTF-8-Pfad einer WAV-Datei>
+              PCM <länge>\\n<16-Bit-PCM, little-endian, mono, 16 kHz>
+              PING 0\\n
+    Antwort:  OK <länge>\\n<UTF-8-Transkript>
+              ERR <länge>\\n<UTF-8-Fehlermeldung>
+
+Abgestürzte oder hängende Worker werden beendet und beim nächsten Auftrag
+neu gestartet; länger unbenutzte Worker werden vorher per ``PING`` geprüft.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import select
+import shlex
+import subprocess  # nosec B404
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from app import metrics
+from app.audio import pcm_from_audio
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+PCM_SAMPLE_RATE = 16000
+
+_UNSAFE_TOKENS = {";", "&", "|", "&&", "||", "`", "$", ">", "<"}
+
+
+class CommandServerError(RuntimeError):
+    """Der Worker hat für eine Aufnahme ``ERR`` gemeldet."""
+
+
+class WorkerUnavailable(CommandServerError):
+    """Der Worker ist abgestürzt, hängt oder verletzt das Protokoll."""
+
+
+def server_command() -> list[str]:
+    """Kommandozeile des Worker-Prozesses (``STT_MODEL`` plus Server-Flag)."""
+    command = shlex.split(settings.stt_model)
+    for token in command:
+        if token in _UNSAFE_TOKENS:
+            raise ValueError("Unsafe token in stt_model")
+    return command + ["--language", settings.stt_language, "--server"]
+
+
+class CommandWorker:
+    """Ein langlebiger Prozess, der Anfragen nacheinander beantwortet."""
+
+    def __init__(self, command: list[str]) -> None:
+        self.command = command
+        self.process: subprocess.Popen | None = None
+        self.last_used = 0.0
+        self._buffer = b""
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self) -> None:
+        # Ungepuffert, damit select() und os.read() dieselben Daten sehen.
+        self.process = subprocess.Popen(  # nosec B603
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            bufsize=0,
+        )
+        # Nicht blockierend schreiben: ein hängender Worker, der stdin nicht
+        # mehr liest, darf den Aufrufer bei vollem Pipe-Puffer nicht festhalten.
+        os.set_blocking(self.process.stdin.fileno(), False)
+        self._buffer = b""
+        self.request("PING", b"", timeout=settings.stt_command_start_timeout)
+        logger.info("STT command worker %s started", self.process.pid)
+
+    def stop(self) -> None:
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            if stream is not None:
+                stream.close()
+        self.process = None
+
+    def restart(self) -> None:
+        logger.warning("Restarting STT command worker")
+        metrics.inc("stt_command.restarts")
+        self.stop()
+        self.start()
+
+    def ensure_healthy(self) -> None:
+        """Startet tote Worker neu und pingt länger unbenutzte vorab an."""
+        if self.process is None:
+            self.start()
+            return
+        if not self.alive:
+            metrics.inc("stt_command.crashes")
+            self.restart()
+            return
+        if time.monotonic() - self.last_used < settings.stt_command_health_interval:
+            return
+        try:
+            self.request("PING", b"", timeout=settings.stt_command_start_timeout)
+        except WorkerUnavailable:
+            metrics.inc("stt_command.failed_health_checks")
+            self.restart()
+
+    # -- Protokoll -------------------------------------------------------
+    def request(self, kind: str, payload: bytes, timeout: float) -> str:
+        assert self.process is not None and self.process.stdin is not None
+        deadline = time.monotonic() + timeout
+        self._write(f"{kind} {len(payload)}\n".encode("ascii") + payload, deadline)
+        header = self._read_line(deadline).decode("ascii", "replace").split()
+        if (
+            len(header) != 2
+            or header[0] not in {"OK", "ERR"}
+            or not header[1].isdigit()
+        ):
+            raise WorkerUnavailable(f"Invalid response header {header!r}")
+        body = self._read_exact(int(header[1]), deadline).decode("utf-8", "replace")
+        self.last_used = time.monotonic()
+        if header[0] == "ERR":
+            raise CommandServerError(body)
+        return body
+
+    def _write(self, data: bytes, deadline: float) -> None:
+        assert self.process is not None and self.process.stdin is not None
+        fd = self.process.stdin.fileno()
+        view = memoryview(data)
+        while view:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([], [fd], [], remaining)[1]:
+                raise WorkerUnavailable("STT command worker timed out reading input")
+            try:
+                written = os.write(fd, view)
+            except BlockingIOError:
+                continue
+            except OSError as exc:  # BrokenPipe: Prozess ist beendet
+                raise WorkerUnavailable(
+                    f"STT command worker not writable: {exc}"
+                ) from exc
+            view = view[written:]
+
+    def _fill(self, deadline: float) -> None:
+        assert self.process is not None and self.process.stdout is not None
+        fd = self.process.stdout.fileno()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+            raise WorkerUnavailable("STT command worker timed out")
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            raise WorkerUnavailable("STT command worker exited")
+        self._buffer += chunk
+
+    def _read_line(self, deadline: float) -> bytes:
+        while b"\n" not in self._buffer:
+            self._fill(deadline)
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return line
+
+    def _read_exact(self, size: int, deadline: float) -> bytes:
+        while len(self._buffer) < size:
+            self._fill(deadline)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+class CommandServerPool:
+    """Verteilt Aufträge auf ``workers`` langlebige Prozesse."""
+
+    def __init__(self, command: list[str], workers: int = 1) -> None:
+        self.command = command
+        self.workers = [CommandWorker(command) for _ in range(max(1, workers))]
+        self._idle: queue.Queue[CommandWorker] = queue.Queue()
+        for worker in self.workers:
+            self._idle.put(worker)
+
+    def _take(self, deadline: float) -> CommandWorker:
+        """Wartet bis ``deadline`` auf einen freien Worker."""
+        try:
+            return self._idle.get(timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+            metrics.inc("stt_command.busy")
+            raise WorkerUnavailable("No STT command worker became free") from None
+
+    def warm_up(self) -> None:
+        """Startet alle Worker und wartet, bis sie auf ``PING`` antworten."""
+        # Alle Worker belegen, damit keine Anfrage parallel darauf zugreift.
+        deadline = time.monotonic() + settings.stt_command_start_timeout
+        taken: list[CommandWorker] = []
+        try:
+            for _ in self.workers:
+                taken.append(self._take(deadline))
+            for worker in taken:
+                worker.ensure_healthy()
+        finally:
+            for worker in taken:
+                self._idle.put(worker)
+
+    def alive(self) -> int:
+        return sum(1 for worker in self.workers if worker.alive)
+
+    def transcribe(self, audio_bytes: bytes) -> str:
+        """Transkribiert über einen freien Worker; bei Absturz ein Neuversuch.
+
+        Ist binnen ``STT_COMMAND_TIMEOUT`` kein Worker frei, folgt
+        :class:`WorkerUnavailable` statt unbegrenzten Wartens.
+        """
+        worker = self._take(time.monotonic() + settings.stt_command_timeout)
+        try:
+            worker.ensure_healthy()
+            try:
+                return self._send(worker, audio_bytes)
+            except WorkerUnavailable as exc:
+                logger.warning("STT command worker failed: %s", exc)
+                metrics.inc("stt_command.crashes")
+                worker.restart()
+                return self._send(worker, audio_bytes)
+        finally:
+            self._idle.put(worker)
+
+    def _send(self, worker: CommandWorker, audio_bytes: bytes) -> str:
+        metrics.inc("stt_command.requests")
+        timeout = settings.stt_command_timeout
+        if settings.stt_command_input == "pcm":
+            pcm = pcm_from_audio(audio_bytes, PCM_SAMPLE_RATE)
+            data = (np.clip(pcm, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+            return worker.request("PCM", data, timeout).strip()
+        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
+            tmp.write(audio_bytes)
+        try:
+            return worker.request("PATH", tmp.name.encode("utf-8"), timeout).strip()
+        finally:
+            os.unlink(tmp.name)
+
+    def shutdown(self) -> None:
+        for worker in self.workers:
+            worker.stop()
+
+
+_pool: CommandServerPool | None = None
+_pool_key: tuple[tuple[str, ...], int] | None = None
+_lock = threading.Lock()
+
+
+def get_pool() -> CommandServerPool:
+    """Gibt den (bei geänderter Konfiguration neu angelegten) Pool zurück."""
+    global _pool, _pool_key
+    command = server_command()
+    key = (tuple(command), max(1, settings.stt_command_workers))
+    with _lock:
+        if _pool is not None and _pool_key != key:
+            _pool.shutdown()
+            _pool = None
+        if _pool is None:
+            _pool = CommandServerPool(command, workers=key[1])
+            _pool_key = key
+        return _pool
+
+
+def transcribe(audio_bytes: bytes) -> str:
+    return get_pool().transcribe(audio_bytes)
+
+
+def warm_up() -> None:
+    pool = get_pool()
+    pool.warm_up()
+    logger.info("STT command pool ready with %d worker(s)", pool.alive())
+
+
+def shutdown() -> None:
+    """Beendet alle Worker-Prozesse."""
+    global _pool, _pool_key
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = None
+        _pool_key = None
+
+
+metrics.register_gauge(
+    "stt_command.workers_alive", lambda: _pool.alive() if _pool else 0
+)
@@ -0,0 +1,191 @@
+"""Einmal kompilierte Normalisierung von Transkripten.
+
+:class:`TranscriptNormalizer` fasst die Ersetzungstabelle
+(``transcript_replacements.*``) und die Erkennung deutscher Zahlwörter zu
+einem einzigen regulären Ausdruck zusammen, der beim Import gebaut wird. Die
+Ersetzungen werden dafür als Präfixbaum (Trie) in ein verschachteltes Muster
+übersetzt, sodass die Regex-Engine je Textposition höchstens einen Pfad
+verfolgt. Ein ``sub``-Durchlauf erledigt damit alle Korrekturen.
+
+Zahlwörter werden vollständig ausgewertet, auch zusammengesetzte wie
+„dreiundzwanzig“, „zweihundertfünfzig“ oder „zweitausenddreihundert“, sowie
+Dezimalzahlen („drei Komma fünf“ → ``3,5``). Die Preis- und Stundenparser
+arbeiten danach nur noch mit Ziffern.
+"""
+
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import Iterable, Mapping
+
+_UNITS = {
+    "eins": 1,
+    "ein": 1,
+    "zwei": 2,
+    "drei": 3,
+    "vier": 4,
+    "fünf": 5,
+    "fuenf": 5,
+    "sechs": 6,
+    "sieben": 7,
+    "acht": 8,
+    "neun": 9,
+}
+
+_TEENS = {
+    "zehn": 10,
+    "elf": 11,
+    "zwölf": 12,
+    "zwoelf": 12,
+    "dreizehn": 13,
+    "vierzehn": 14,
+    "fünfzehn": 15,
+    "fuenfzehn": 15,
+    "funfzehn": 15,
+    "sechzehn": 16,
+    "siebzehn": 17,
+    "achtzehn": 18,
+    "neunzehn": 19,
+}
+
+_TENS = {
+    "zwanzig": 20,
+    "dreißig": 30,
+    "dreissig": 30,
+    "vierzig": 40,
+    "fünfzig": 50,
+    "fuenfzig": 50,
+    "funfzig": 50,
+    "sechzig": 60,
+    "siebzig": 70,
+    "achtzig": 80,
+    "neunzig": 90,
+}
+
+# Nur als eigenständiges Wort eine Zahl (Artikel „eine“, „einen“ und „null“).
+_STANDALONE = {"null": 0, "eine": 1, "einen": 1}
+
+_MORPHEMES = {**_UNITS, **_TEENS, **_TENS, "hundert": 100, "tausend": 1000}
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Übersetzt Wörter in ein Muster mit gemeinsamen Präfixen (Trie).
+
+    ``["Geselden", "Geseldenstunde"]`` wird zu ``Geselden(?:stunde)?``; die
+    Engine prüft jedes Zeichen nur einmal statt jede Alternative einzeln.
+    """
+    trie: dict = {}
+    for word in words:
+        if not word:
+            continue
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node: dict) -> str:
+        terminal = "" in node
+        branches = [
+            re.escape(char) + build(child)
+            for char, child in sorted(node.items())
+            if char != ""
+        ]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Längere Treffer zuerst, das Wortende bleibt als Rückfall.
+        return f"(?:{body})?" if terminal else body
+
+    return build(trie)
+
+
+# Die Grammatik ist so aufgebaut, dass jede Alternative mit einem anderen
+# Zeichen beginnt; Wörter, die keine Zahlen sind, scheitern so sofort.
+_SIMPLE = f"(?:{_trie_pattern([*_UNITS, *_TEENS, *_TENS])})"
+_UNIT = f"(?:{_trie_pattern(list(_UNITS))})"
+_BELOW_100 = f"(?:{_SIMPLE}(?:und(?:{_trie_pattern(list(_TENS))}))?)"
+_BELOW_1000 = (
+    f"(?:{_BELOW_100}(?:hundert(?:und)?{_BELOW_100}?)?|hundert(?:und)?{_BELOW_100}?)"
+)
+_CARDINAL = (
+    f"(?:{_BELOW_1000}(?:tausend(?:und)?{_BELOW_1000}?)?"
+    f"|tausend(?:und)?{_BELOW_1000}?)"
+)
+_NUMBER_WORD = f"(?:{_CARDINAL}|{_trie_pattern(list(_STANDALONE))})"
+# Nachkommastellen: „Komma fünf“, „Komma fünfundzwanzig“ oder „Komma null
+# fünf“. Längere Ziffernfolgen sind mehrdeutig („Komma fünf zwei Gesellen“).
+_DECIMAL = rf"\s+komma\s+(?:null\s+{_UNIT}|{_BELOW_100})"
+# Vorab-Prüfung des Anfangsbuchstabens, bevor die Grammatik versucht wird.
+_FIRST_CHARS = "".join(sorted({word[0] for word in [*_MORPHEMES, *_STANDALONE]}))
+_NUMBER = rf"\b(?=[{_FIRST_CHARS}]){_NUMBER_WORD}(?:{_DECIMAL})?\b"
+
+_NUMBER_RE = re.compile(_NUMBER, re.IGNORECASE)
+_MORPHEME_RE = re.compile(f"und|{_trie_pattern(list(_MORPHEMES))}")
+_FRACTION_SPLIT_RE = re.compile(r"\s+komma\s+", re.IGNORECASE)
+
+
+def parse_german_number(words: str) -> str | None:
+    """Wandelt ein deutsches Zahlwort in Ziffern um (``None`` falls keines).
+
+    >>> parse_german_number("dreiundzwanzig")
+    '23'
+    >>> parse_german_number("drei Komma fünf")
+    '3,5'
+    """
+    match = _NUMBER_RE.fullmatch(words.strip())
+    if match is None:
+        return None
+    return _format_number(match.group(0))
+
+
+def _cardinal_value(word: str) -> int:
+    word = word.lower()
+    if word in _STANDALONE:
+        return _STANDALONE[word]
+    total = current = 0
+    for morpheme in _MORPHEME_RE.findall(word):
+        if morpheme == "und":
+            continue
+        if morpheme == "hundert":
+            current = (current or 1) * 100
+        elif morpheme == "tausend":
+            total += (current or 1) * 1000
+            current = 0
+        else:
+            current += _MORPHEMES[morpheme]
+    return total + current
+
+
+@lru_cache(maxsize=4096)
+def _format_number(text: str) -> str:
+    parts = _FRACTION_SPLIT_RE.split(text, maxsplit=1)
+    integer = str(_cardinal_value(parts[0]))
+    if len(parts) == 1:
+        return integer
+    fraction = "".join(str(_cardinal_value(word)) for word in parts[1].split())
+    return f"{integer},{fraction}"
+
+
+class TranscriptNormalizer:
+    """Wendet Ersetzungen und Zahlwort-Erkennung in einem Durchlauf an.
+
+    Ersetzungen gelten wie ``str.replace`` für Teilzeichenketten und
+    unterscheiden Groß-/Kleinschreibung; bei überlappenden Einträgen gewinnt
+    der längste. Ersetzter Text wird nicht erneut durchsucht.
+    """
+
+    def __init__(self, replacements: Mapping[str, str] | None = None) -> None:
+        self.replacements = dict(replacements or {})
+        alternatives = [rf"(?P<num>(?i:{_NUMBER}))"]
+        if any(self.replacements):
+            alternatives.insert(0, f"(?P<rep>{_trie_pattern(self.replacements)})")
+        self.pattern = re.compile("|".join(alternatives))
+
+    def _substitute(self, match: re.Match[str]) -> str:
+        if match.lastgroup == "rep":
+            return self.replacements[match.group("rep")]
+        return _format_number(match.group("num"))
+
+    def __call__(self, text: str) -> str:
+        return self.pattern.sub(self._substitute, text)
@@ -0,0 +1,105 @@
+"""Inkrementelle Transkription während der Aufnahme.
+
+:class:`StreamingTranscriber` nimmt PCM-Blöcke vom Browser entgegen, zerlegt
+sie per :class:`~app.audio.SpeechSegmenter` an Sprechpausen und schickt jedes
+fertige Segment sofort über :func:`~app.stt.atranscribe_audio` an den
+konfigurierten STT-Provider. Beim Stopp muss nur noch das letzte Segment
+transkribiert werden; das Gesamttranskript steht damit fast ohne Wartezeit
+bereit.
+
+Ein Strom ist begrenzt: Mehr als ``AUDIO_MAX_UPLOAD_BYTES`` oder
+``STREAM_MAX_DURATION`` Sekunden Audio führen zu
+:class:`StreamLimitExceeded`; die Abtastrate muss zwischen
+:data:`MIN_SAMPLE_RATE` und :data:`MAX_SAMPLE_RATE` liegen.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable
+
+import numpy as np
+
+from app import metrics
+from app.audio import SpeechSegmenter, encode_wav
+from app.settings import settings
+from app.stt import atranscribe_audio
+
+logger = logging.getLogger(__name__)
+
+#: Wird pro fertig transkribiertem Segment mit Index und Text aufgerufen.
+SegmentCallback = Callable[[int, str], Awaitable[None]]
+
+#: Zulässige Abtastraten des Client-Signals (Hz).
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 192000
+
+
+class StreamLimitExceeded(Exception):
+    """Der Client hat mehr Audio geschickt als erlaubt."""
+
+
+class StreamingTranscriber:
+    """Transkribiert Segmente eines laufenden Audiostroms im Hintergrund."""
+
+    def __init__(self, rate: int, on_segment: SegmentCallback | None = None) -> None:
+        if not MIN_SAMPLE_RATE <= rate <= MAX_SAMPLE_RATE:
+            raise ValueError(f"Unsupported sample rate {rate}")
+        self.segmenter = SpeechSegmenter(rate)
+        self.on_segment = on_segment
+        # 16-Bit-Mono: zwei Byte je Sample
+        self.max_bytes = min(
+            settings.audio_max_upload_bytes,
+            int(settings.stream_max_duration * rate * 2),
+        )
+        self.received = 0
+        self._segments: list[np.ndarray] = []
+        self._tasks: list[asyncio.Task[str]] = []
+
+    def feed(self, data: bytes) -> None:
+        """Nimmt PCM-Bytes an und startet die Transkription fertiger Segmente."""
+        self.received += len(data)
+        if self.received > self.max_bytes:
+            raise StreamLimitExceeded(
+                f"Audio stream exceeds {self.max_bytes} bytes"
+            )
+        for segment in self.segmenter.feed(data):
+            self._start(segment)
+
+    def _start(self, segment: np.ndarray) -> None:
+        index = len(self._segments)
+        self._segments.append(segment)
+        metrics.inc("stt_stream.segments")
+        self._tasks.append(asyncio.create_task(self._transcribe(index, segment)))
+
+    async def _transcribe(self, index: int, segment: np.ndarray) -> str:
+        text = await atranscribe_audio(encode_wav(segment, self.segmenter.target))
+        if self.on_segment is not None:
+            await self.on_segment(index, text)
+        return text
+
+    async def finish(self) -> tuple[str, bytes]:
+        """Schließt die Aufnahme ab und liefert Transkript und Sprach-Audio."""
+        stopped = time.perf_counter()
+        segment = self.segmenter.flush()
+        if segment is not None:
+            self._start(segment)
+        texts = await asyncio.gather(*self._tasks)
+        transcript = " ".join(text for text in texts if text).strip()
+        if self._segments:
+            audio = encode_wav(np.concatenate(self._segments), self.segmenter.target)
+        else:
+            audio = b""
+        logger.info(
+            "Streaming transcript of %d segment(s) ready %.2f s after stop",
+            len(self._segments),
+            time.perf_counter() - stopped,
+        )
+        return transcript, audio
+
+    def cancel(self) -> None:
+        """Bricht laufende Transkriptionen ab (z. B. bei Verbindungsabbruch)."""
+        for task in self._tasks:
+            task.cancel()
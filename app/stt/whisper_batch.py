@@ -0,0 +1,129 @@
+"""Micro-Batching für lokale Whisper-Transkriptionen.
+
+Laden mehrere Trupps gleichzeitig Aufnahmen hoch, sammelt
+:class:`WhisperBatcher` die Anfragen für ein kurzes Zeitfenster
+(``WHISPER_BATCH_WINDOW``), zerlegt sie in 30-s-Fenster und dekodiert bis zu
+``WHISPER_BATCH_SIZE`` Fenster gemeinsam. Jeder Aufrufer erhält anschließend
+genau den Text seiner eigenen Fenster zurück.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import weakref
+from typing import Awaitable, Callable
+
+import numpy as np
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+#: Whisper verarbeitet Audio in Fenstern von 30 s bei 16 kHz.
+WINDOW_SAMPLES = 30 * 16000
+
+BatchDecoder = Callable[[list[np.ndarray], str], Awaitable[list[str]]]
+
+
+def split_windows(pcm: np.ndarray, size: int = WINDOW_SAMPLES) -> list[np.ndarray]:
+    """Zerlegt PCM in Fenster zu je ``size`` Samples (mindestens eines)."""
+    if len(pcm) <= size:
+        return [pcm]
+    return [pcm[start : start + size] for start in range(0, len(pcm), size)]
+
+
+class WhisperBatcher:
+    """Sammelt Fenster gleichzeitiger Anfragen und dekodiert sie gebündelt.
+
+    Ein voller Batch wird sofort abgeschickt; ein unvollständiger spätestens
+    nach ``window`` Sekunden. Der Batcher gehört zu genau einem Event-Loop.
+    """
+
+    def __init__(self, decode: BatchDecoder, *, batch_size: int, window: float) -> None:
+        self.decode = decode
+        self.batch_size = max(1, batch_size)
+        self.window = max(0.0, window)
+        self._pending: list[tuple[np.ndarray, str, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def transcribe(self, pcm: np.ndarray, language: str) -> str:
+        """Reiht alle Fenster von ``pcm`` ein und wartet auf deren Text."""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for window in split_windows(pcm):
+            future = loop.create_future()
+            self._pending.append((window, language, future))
+            futures.append(future)
+        self._schedule(loop)
+        texts = await asyncio.gather(*futures)
+        return " ".join(text for text in texts if text).strip()
+
+    def _schedule(self, loop: asyncio.AbstractEventLoop) -> None:
+        if len(self._pending) >= self.batch_size:
+            self._flush(full_only=True)
+        if self._pending and self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+    def _flush(self, full_only: bool = False) -> None:
+        """Schickt wartende Fenster in Batches (je Sprache) an den Decoder."""
+        if not full_only and self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            language = self._pending[0][1]
+            batch = [item for item in self._pending if item[1] == language]
+            batch = batch[: self.batch_size]
+            if full_only and len(batch) < self.batch_size:
+                return
+            for item in batch:
+                self._pending.remove(item)
+            task = asyncio.get_running_loop().create_task(self._run(batch, language))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(
+        self, batch: list[tuple[np.ndarray, str, asyncio.Future]], language: str
+    ) -> None:
+        metrics.inc("whisper_batch.batches")
+        metrics.inc("whisper_batch.windows", len(batch))
+        logger.debug("Decoding Whisper batch of %d window(s)", len(batch))
+        try:
+            texts = await self.decode([window for window, _, _ in batch], language)
+        except Exception as exc:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, _, future), text in zip(batch, texts):
+            if not future.done():
+                future.set_result(text)
+
+
+# Ein Batcher je Event-Loop (TestClient und uvicorn nutzen eigene Loops).
+_batchers: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, WhisperBatcher] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_batcher(
+    decode: BatchDecoder, *, batch_size: int, window: float
+) -> WhisperBatcher:
+    """Gibt den Batcher des laufenden Event-Loops zurück.
+
+    Ändern sich Decoder (z. B. neu erzeugter Provider mit anderem Modell),
+    Batch-Größe oder Zeitfenster, wird ein neuer Batcher angelegt; der alte
+    arbeitet seine wartenden Fenster noch ab.
+    """
+    loop = asyncio.get_running_loop()
+    batcher = _batchers.get(loop)
+    if (
+        batcher is None
+        or batcher.decode != decode
+        or batcher.batch_size != max(1, batch_size)
+        or batcher.window != max(0.0, window)
+    ):
+        batcher = WhisperBatcher(decode, batch_size=batch_size, window=window)
+        _batchers[loop] = batcher
+    return batcher
@@ -0,0 +1,163 @@
+"""Prozess-Pool für lokale Whisper-Transkriptionen.
+
+Jeder Worker-Prozess lädt das Modell genau einmal (im Initializer) und
+begrenzt die Torch-Threads, damit mehrere Worker die CPU-Kerne aufteilen,
+statt sich gegenseitig zu verdrängen. Audio kommt als Float32-PCM-Array über
+die Pipe des Pools; Temp-Dateien sind nicht nötig. Die FastAPI-Worker
+bleiben dadurch frei von Whisper-Rechenlast und GIL-Konkurrenz.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+
+import numpy as np
+
+from app import metrics
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Modell des jeweiligen Worker-Prozesses (nur im Kindprozess gesetzt).
+_worker_model: Any = None
+
+_pool: ProcessPoolExecutor | None = None
+_pool_key: tuple[str, int, int] | None = None
+_lock = threading.Lock()
+
+
+def _threads_per_worker(workers: int) -> int:
+    if settings.whisper_threads > 0:
+        return settings.whisper_threads
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def _init_worker(model_name: str, threads: int) -> None:
+    """Initializer der Kindprozesse: Threads pinnen, Modell laden."""
+    global _worker_model
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[name] = str(threads)
+    import torch  # type: ignore
+    import whisper  # type: ignore
+
+    torch.set_num_threads(threads)
+    _worker_model = whisper.load_model(model_name)
+    logger.info(
+        "Whisper worker %s loaded model %s with %d threads",
+        os.getpid(),
+        model_name,
+        threads,
+    )
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _transcribe(pcm: np.ndarray, language: str) -> str:
+    result = _worker_model.transcribe(pcm, language=language)
+    return result.get("text", "").strip()
+
+
+def decode_windows(model: Any, windows: list[np.ndarray], language: str) -> list[str]:
+    """Dekodiert mehrere 30-s-Fenster in einem einzigen Batch.
+
+    Jedes Fenster wird auf 30 s aufgefüllt bzw. gekürzt, in ein
+    Mel-Spektrogramm umgerechnet und gemeinsam durch den Decoder geschickt.
+    """
+    import torch  # type: ignore
+    import whisper  # type: ignore
+
+    n_mels = model.dims.n_mels
+    mel = torch.stack(
+        [
+            whisper.log_mel_spectrogram(
+                whisper.pad_or_trim(torch.from_numpy(window)), n_mels=n_mels
+            )
+            for window in windows
+        ]
+    ).to(model.device)
+    options = whisper.DecodingOptions(
+        language=language, fp16=model.device.type == "cuda"
+    )
+    results = whisper.decode(model, mel, options)
+    return [result.text.strip() for result in results]
+
+
+def _decode_batch(windows: list[np.ndarray], language: str) -> list[str]:
+    return decode_windows(_worker_model, windows, language)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Gibt den (bei geänderter Konfiguration neu angelegten) Pool zurück."""
+    global _pool, _pool_key
+    workers = max(1, settings.whisper_workers)
+    threads = _threads_per_worker(workers)
+    key = (settings.stt_model, workers, threads)
+    with _lock:
+        if _pool is not None and _pool_key != key:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        if _pool is None:
+            # "spawn" statt "fork": der Elternprozess hält Threads und Sockets.
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(settings.stt_model, threads),
+            )
+            _pool_key = key
+        return _pool
+
+
+def warm_up() -> None:
+    """Startet alle Worker und wartet, bis deren Modelle geladen sind."""
+    pool = get_pool()
+    workers = max(1, settings.whisper_workers)
+    # Der Pool startet Prozesse nur bei Bedarf; ein Auftrag je Worker reicht.
+    pids = {future.result() for future in [pool.submit(_ping) for _ in range(workers)]}
+    logger.info("Whisper pool ready with %d worker(s)", len(pids))
+
+
+def submit(pcm: np.ndarray, language: str) -> Future:
+    """Plant eine Transkription ein und gibt das Future zurück."""
+    metrics.inc("whisper_pool.submitted")
+    future = get_pool().submit(_transcribe, pcm, language)
+    future.add_done_callback(_reset_if_broken)
+    return future
+
+
+def submit_batch(windows: list[np.ndarray], language: str) -> Future:
+    """Plant einen Batch aus 30-s-Fenstern ein (siehe :mod:`whisper_batch`)."""
+    metrics.inc("whisper_pool.submitted")
+    future = get_pool().submit(_decode_batch, windows, language)
+    future.add_done_callback(_reset_if_broken)
+    return future
+
+
+def _reset_if_broken(future: Future) -> None:
+    """Verwirft einen Pool, dessen Worker abgestürzt ist (z. B. OOM)."""
+    global _pool
+    if future.cancelled():
+        return
+    if isinstance(future.exception(), BrokenProcessPool):
+        logger.error("Whisper worker crashed; pool will be recreated")
+        metrics.inc("whisper_pool.crashes")
+        with _lock:
+            _pool = None
+
+
+def shutdown() -> None:
+    """Beendet alle Worker-Prozesse."""
+    global _pool, _pool_key
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+        _pool_key = None
@@ -3,7 +3,8 @@ from pathlib import Path
 import httpx
 from fastapi import BackgroundTasks
 
-from app.billing_adapter import send_to_billing_system
+from app.billing_adapter import asend_to_billing_system
+from app.concurrency import run_blocking
 from app.models import InvoiceContext
 from app.persistence import store_interaction
 from app.tts import text_to_speech
@@ -21,15 +22,15 @@ async def download_recording(url: str) -> bytes:
         return resp.content
 
 
-def finalize(
+async def finalize(
     audio_bytes: bytes,
     transcript: str,
     invoice: InvoiceContext,
     background_tasks: BackgroundTasks,
 ) -> None:
     """Schickt die Rechnung weiter und speichert alle Daten."""
-    send_to_billing_system(invoice)
-    log_dir = store_interaction(audio_bytes, transcript, invoice)
+    await asend_to_billing_system(invoice)
+    log_dir = await run_blocking(store_interaction, audio_bytes, transcript, invoice)
 
     def tts_and_store() -> None:
         # Nachträglich eine Sprachausgabe erzeugen und ablegen. Die Aufgabe
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, BackgroundTasks, Request
 
-from app.llm_agent import extract_invoice_context
+from app.llm_agent import aextract_invoice_context
 from app.models import missing_invoice_fields, parse_invoice_context
-from app.stt import transcribe_audio
+from app.audio import normalize_audio
+from app.stt import atranscribe_audio
 
 from .common import download_recording, finalize
 
@@ -22,14 +23,14 @@ async def sipgate_recording(request: Request, background_tasks: BackgroundTasks)
     recording_url = form.get("recordingUrl")
     if not recording_url:
         return {"error": "Keine Aufnahme erhalten."}
-    audio_bytes = await download_recording(recording_url)
-    transcript = transcribe_audio(audio_bytes)
+    audio_bytes = await normalize_audio(await download_recording(recording_url))
+    transcript = await atranscribe_audio(audio_bytes)
     try:
-        invoice_json = extract_invoice_context(transcript)
+        invoice_json = await aextract_invoice_context(transcript)
         invoice = parse_invoice_context(invoice_json)
     except ValueError:
         return {"error": "Ungültiger Rechnungsinhalt"}
     if missing_invoice_fields(invoice):
         return {"error": "Unvollständige Rechnungsdaten"}
-    finalize(audio_bytes, transcript, invoice, background_tasks)
+    await finalize(audio_bytes, transcript, invoice, background_tasks)
     return {"status": "ok"}
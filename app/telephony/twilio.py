@@ -1,9 +1,10 @@
 from fastapi import APIRouter, BackgroundTasks, Request, Response
 from twilio.twiml.voice_response import VoiceResponse
 
-from app.llm_agent import extract_invoice_context
+from app.llm_agent import aextract_invoice_context
 from app.models import missing_invoice_fields, parse_invoice_context
-from app.stt import transcribe_audio
+from app.audio import normalize_audio
+from app.stt import atranscribe_audio
 
 from .common import download_recording, finalize
 
@@ -46,14 +47,15 @@ async def twilio_recording(request: Request, background_tasks: BackgroundTasks):
         return Response(content=str(vr), media_type="application/xml")
 
     # Aufnahme herunterladen und an vorherige Teiltranskripte anhängen.
-    audio_bytes = await download_recording(recording_url + ".wav")
-    transcript_part = transcribe_audio(audio_bytes)
+    recording = await download_recording(recording_url + ".wav")
+    audio_bytes = await normalize_audio(recording)
+    transcript_part = await atranscribe_audio(audio_bytes)
     full_transcript = (SESSIONS.get(call_sid, "") + " " + transcript_part).strip()
     SESSIONS[call_sid] = full_transcript
 
     # Kontext aus dem Transkript extrahieren und prüfen, ob Daten fehlen.
     try:
-        invoice_json = extract_invoice_context(full_transcript)
+        invoice_json = await aextract_invoice_context(full_transcript)
         invoice = parse_invoice_context(invoice_json)
     except ValueError:
         missing = [
@@ -81,7 +83,7 @@ async def twilio_recording(request: Request, background_tasks: BackgroundTasks):
         return Response(content=str(vr), media_type="application/xml")
 
     # Alle Daten vorhanden → Rechnung speichern und aufräumen.
-    finalize(audio_bytes, full_transcript, invoice, background_tasks)
+    await finalize(audio_bytes, full_transcript, invoice, background_tasks)
     del SESSIONS[call_sid]
     vr = VoiceResponse()
     vr.say("Vielen Dank. Ihre Rechnung wurde erstellt.", language="de-DE")
@@ -0,0 +1,261 @@
+"""Heuristische Fakten aus dem Dialogtranskript, inkrementell erfasst.
+
+Der Dialog ergänzt die LLM-Extraktion um einfache Textmuster: Stunden je
+Rolle, Materialmengen und -preise, Anfahrtskilometer, erwähnte Rollen und
+den Kundennamen. Früher wurde dafür in jeder Runde das gesamte, stetig
+wachsende Transkript mehrfach durchsucht (quadratischer Aufwand über die
+Runden). :func:`scan_turn` erfasst alle Fakten einer Nutzeräußerung in einem
+Durchgang mit vorkompilierten Mustern; :func:`update_facts` durchsucht nur
+die seit der letzten Runde neuen Äußerungen und führt die Ergebnisse mit den
+gespeicherten :class:`TranscriptFacts` zusammen.
+
+Muster werden je Äußerung ausgewertet, Treffer über die Grenze zweier
+Äußerungen hinweg (z. B. Zahl am Ende der einen, Einheit am Anfang der
+nächsten) entfallen damit bewusst.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+from dataclasses import asdict, dataclass, field
+
+from app import metrics
+
+ROLE_KEYWORDS = {
+    r"\bmeister\b": "Meister",
+    r"\bmeisterstund": "Meister",
+    r"\bgesell": "Geselle",
+    r"\bazub": "Azubi",
+    r"\blehrling": "Azubi",
+}
+# Alle Rollen-Schlüsselwörter in einem Muster; die Gruppe nennt die Rolle.
+_ROLE_PATTERN = re.compile(
+    "|".join(
+        f"(?P<r{index}>{pattern})" for index, pattern in enumerate(ROLE_KEYWORDS)
+    ),
+    re.IGNORECASE,
+)
+_ROLE_GROUPS = {
+    f"r{index}": label for index, label in enumerate(ROLE_KEYWORDS.values())
+}
+
+LABOR_ROLE_LABELS = {
+    "meister": "Meister",
+    "gesell": "Geselle",
+    "azub": "Azubi",
+}
+
+_LABOR_QUANTITY_PATTERNS = [
+    (
+        re.compile(
+            r"(\d+(?:[.,]\d+)?)\s*(meister|gesell(?:e|en)?|azub(?:i|is)?)\w*",
+            re.IGNORECASE,
+        ),
+        1,
+        2,
+    ),
+    (
+        re.compile(
+            r"(meister|gesell(?:e|en)?|azub(?:i|is)?)\w*\s*(?:von\s+|für\s+)?(\d+(?:[.,]\d+)?)\s*(?:stunden|std|h)",
+            re.IGNORECASE,
+        ),
+        2,
+        1,
+    ),
+]
+_HOURS_UNIT = re.compile(r"\b(h|std)\b")
+
+_MATERIAL_PRICE_PATTERN = re.compile(
+    r"(?:die|der|das|den|ein|eine|einen|zwei|drei|vier|fünf|sechs|sieben|acht|neun|zehn|\d+)\s+"
+    r"((?:[a-zäöüß-]+(?:\s+[a-zäöüß-]+){0,2}))\s+(?:je|für|zu|kostet(?:en)?|waren|war)\s+"
+    r"(\d+(?:[.,]\d+)?)\s*(?:€|eur|euro)",
+    re.IGNORECASE,
+)
+
+_MATERIAL_COUNT_PATTERN = re.compile(
+    r"(\d+(?:[.,]\d+)?)\s*(?:x\s*)?([a-zäöüß][a-zäöüß-]*)",
+    re.IGNORECASE,
+)
+# Mengenangaben, die keine Materialien sind.
+_COUNT_SKIP_WORDS = {
+    "km",
+    "kilometer",
+    "kilometern",
+    "stunden",
+    "stunde",
+    "std",
+    "meisterstunden",
+    "gesellenstunden",
+}
+
+_DISTANCE_PATTERN = re.compile(r"(\d+(?:[.,]\d+)?)\s*(?:km|kilometer)", re.IGNORECASE)
+
+_CUSTOMER_PATTERN = re.compile(
+    r"bei\s+(?:herrn?|herr|hr\.?|frau|fr\.?|firma)?\s*([a-zäöüß'\-\s]+?)(?=\s+(?:in|am|auf|an|mit|und|,|\.|$))",
+    re.IGNORECASE,
+)
+_CUSTOMER_ARTICLE = re.compile(r"^(der|die|das)\s+", re.IGNORECASE)
+
+
+def normalize_material_key(word: str) -> list[str]:
+    """Erzeugt Vergleichsvarianten für Materialbeschreibungen."""
+
+    variants: list[str] = []
+    lowered = word.casefold()
+    if lowered:
+        variants.append(lowered)
+    for suffix in ("ern", "en", "n"):
+        if lowered.endswith(suffix) and len(lowered) > len(suffix) + 1:
+            shortened = lowered[: -len(suffix)]
+            if shortened and shortened not in variants:
+                variants.append(shortened)
+    return variants
+
+
+def _number(value: str) -> float:
+    return float(value.replace(",", "."))
+
+
+@dataclass
+class TranscriptFacts:
+    """Zusammengeführte Fakten aller bisher durchsuchten Nutzeräußerungen."""
+
+    # Arbeitsstunden je Rolle (Summe aller Angaben)
+    hours: dict[str, float] = field(default_factory=dict)
+    # Menge je Materialvariante; spätere Angaben gewinnen
+    material_counts: dict[str, float] = field(default_factory=dict)
+    # (Beschreibung, Stückpreis) in Reihenfolge der Nennung
+    material_prices: list[tuple[str, float]] = field(default_factory=list)
+    # Erste genannte Entfernung in km
+    distance: float | None = None
+    # Alle erwähnten Rollen bzw. die der letzten Äußerung
+    roles: list[str] = field(default_factory=list)
+    last_roles: list[str] = field(default_factory=list)
+    # Erster erkannter Kundenname ("bei Herrn ...")
+    customer_name: str | None = None
+    # Anzahl durchsuchter Äußerungen und Prüfsumme der zuletzt durchsuchten
+    scanned: int = 0
+    digest: str = ""
+
+    def absorb(self, turn: "TranscriptFacts") -> None:
+        """Übernimmt die Fakten einer später folgenden Äußerung."""
+        for role, qty in turn.hours.items():
+            self.hours[role] = self.hours.get(role, 0.0) + qty
+        self.material_counts.update(turn.material_counts)
+        self.material_prices.extend(turn.material_prices)
+        if self.distance is None:
+            self.distance = turn.distance
+        self.roles = sorted(set(self.roles) | set(turn.roles))
+        self.last_roles = list(turn.roles)
+        if self.customer_name is None:
+            self.customer_name = turn.customer_name
+
+    def to_json(self) -> bytes:
+        return json.dumps(
+            asdict(self), ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+
+    @classmethod
+    def from_json(cls, data: bytes) -> "TranscriptFacts":
+        facts = cls(**json.loads(data))
+        facts.material_prices = [(desc, price) for desc, price in facts.material_prices]
+        return facts
+
+
+def _scan_hours(text: str, hours: dict[str, float]) -> None:
+    for pattern, qty_index, role_index in _LABOR_QUANTITY_PATTERNS:
+        for match in pattern.finditer(text):
+            qty_str = match.group(qty_index)
+            role_key = match.group(role_index).casefold()
+            label = next(
+                (value for key, value in LABOR_ROLE_LABELS.items() if key in role_key),
+                None,
+            )
+            if not label:
+                continue
+            tail = match.group(0).casefold()
+            if "stund" not in tail and not _HOURS_UNIT.search(tail):
+                # Stellen wie "2 Meister" ohne Stundenangabe ignorieren.
+                continue
+            hours[label] = hours.get(label, 0.0) + _number(qty_str)
+
+
+def _scan_customer(text: str) -> str | None:
+    match = _CUSTOMER_PATTERN.search(text)
+    if not match:
+        return None
+    name = match.group(1).strip()
+    if not name:
+        return None
+    # Entfernt eventuell führende Artikel wie "der" oder "die" innerhalb des Namens.
+    return _CUSTOMER_ARTICLE.sub("", name).title()
+
+
+def scan_turn(text: str) -> TranscriptFacts:
+    """Erfasst alle heuristischen Fakten einer einzelnen Nutzeräußerung."""
+
+    facts = TranscriptFacts()
+    if not text:
+        return facts
+    _scan_hours(text, facts.hours)
+    for match in _MATERIAL_COUNT_PATTERN.finditer(text):
+        qty_str, word = match.groups()
+        forms = normalize_material_key(word)
+        if any(form in _COUNT_SKIP_WORDS for form in forms):
+            continue
+        qty = _number(qty_str)
+        for form in forms:
+            facts.material_counts[form] = qty
+    facts.material_prices = [
+        (desc.strip(), _number(price))
+        for desc, price in _MATERIAL_PRICE_PATTERN.findall(text)
+    ]
+    distance = _DISTANCE_PATTERN.search(text)
+    if distance:
+        facts.distance = _number(distance.group(1))
+    facts.roles = sorted(
+        {
+            _ROLE_GROUPS[name]
+            for match in _ROLE_PATTERN.finditer(text)
+            for name, value in match.groupdict().items()
+            if value is not None
+        }
+    )
+    facts.customer_name = _scan_customer(text)
+    return facts
+
+
+def _text_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def update_facts(
+    facts: TranscriptFacts | None, user_texts: list[str]
+) -> TranscriptFacts:
+    """Bringt ``facts`` auf den Stand von ``user_texts``.
+
+    Nur Äußerungen nach den bereits erfassten werden durchsucht. Ist der
+    Verlauf kürzer geworden oder passt die zuletzt durchsuchte Äußerung nicht
+    mehr zur Prüfsumme (Session neu begonnen oder geleert), wird von vorn
+    begonnen. Der Verlauf wächst nur am Ende, daher genügt dieser Vergleich;
+    frühere Äußerungen werden nicht erneut gehasht.
+    """
+
+    if facts is not None and (
+        facts.scanned > len(user_texts)
+        or (
+            facts.scanned
+            and _text_digest(user_texts[facts.scanned - 1]) != facts.digest
+        )
+    ):
+        facts = None
+    if facts is None:
+        facts = TranscriptFacts()
+    for text in user_texts[facts.scanned :]:
+        facts.absorb(scan_turn(text))
+        facts.digest = _text_digest(text)
+        metrics.inc("transcript_facts.scanned_turns")
+    facts.scanned = len(user_texts)
+    return facts
@@ -4,20 +4,50 @@ from __future__ import annotations
 
 from abc import ABC, abstractmethod
 from io import BytesIO
+import logging
+import threading
+from typing import AsyncIterator, Iterable, Iterator
+
 from gtts import gTTS
 from elevenlabs.client import ElevenLabs
 
+from app import metrics
+from app.cache import TieredCache, make_key
+from app.concurrency import run_blocking
+from app.providers import ProviderRegistry
 from app.settings import settings
 
+logger = logging.getLogger(__name__)
+
 
 class TTSProvider(ABC):
     """Abstrakte Basis für verschiedene Text-zu-Sprache-Anbieter."""
 
+    #: Stimme; Teil des Cache-Schlüssels, leer bei Anbietern ohne Auswahl.
+    voice: str = ""
+
     @abstractmethod
     def synthesize(self, text: str, lang: str = "de") -> bytes:
         """Erzeugt Audiobits aus Text."""
         raise NotImplementedError
 
+    async def asynthesize(self, text: str, lang: str = "de") -> bytes:
+        """Async-Variante; führt ``synthesize`` im Thread-Pool aus."""
+        return await run_blocking(self.synthesize, text, lang)
+
+    def stream(self, text: str, lang: str = "de") -> Iterator[bytes]:
+        """Liefert die Audiodaten stückweise, sobald der Anbieter sie erzeugt.
+
+        Ohne Streaming-Unterstützung kommt alles in einem Stück.
+        """
+        yield self.synthesize(text, lang)
+
+    def preload(self) -> None:
+        """Baut Clients vor der ersten Anfrage auf."""
+
+    def close(self) -> None:
+        """Gibt Clients und Verbindungen frei."""
+
 
 class GTTSProvider(TTSProvider):
     """Verwendet das freie `gTTS`-Paket."""
@@ -28,23 +58,133 @@ class GTTSProvider(TTSProvider):
         tts.write_to_fp(fp)
         return fp.getvalue()
 
+    def stream(self, text: str, lang: str = "de") -> Iterator[bytes]:
+        # gTTS fragt längere Texte satzweise an und liefert je Teil MP3-Daten.
+        yield from gTTS(text=text, lang=lang).stream()
+
 
 class ElevenLabsProvider(TTSProvider):
-    """Bindet den Cloud-Dienst von ElevenLabs ein."""
+    """Bindet den Cloud-Dienst von ElevenLabs ein.
 
-    def synthesize(self, text: str, lang: str = "de") -> bytes:
+    Der Client (samt Verbindungspool) wird einmal pro Provider angelegt und
+    nicht mehr pro Äußerung.
+    """
+
+    voice = "Mats"
+
+    def __init__(self) -> None:
+        self._client: ElevenLabs | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> ElevenLabs:
         if not settings.elevenlabs_api_key:
             raise ValueError("ELEVENLABS_API_KEY not set")
+        with self._lock:
+            if self._client is None:
+                self._client = ElevenLabs(api_key=settings.elevenlabs_api_key)
+            return self._client
 
-        client = ElevenLabs(api_key=settings.elevenlabs_api_key)
-        audio_iter = client.text_to_speech.convert(
-            voice_id="Mats",
+    def preload(self) -> None:
+        if settings.elevenlabs_api_key:
+            self.client  # noqa: B018 - legt den Client an
+
+    def close(self) -> None:
+        with self._lock:
+            self._client = None
+
+    def synthesize(self, text: str, lang: str = "de") -> bytes:
+        return b"".join(self.stream(text, lang))
+
+    def stream(self, text: str, lang: str = "de") -> Iterator[bytes]:
+        # ``convert`` liefert die MP3-Daten bereits während der Synthese.
+        yield from self.client.text_to_speech.convert(
+            voice_id=self.voice,
             text=text,
             model_id="eleven_monolingual_v1",
             language_code=lang,
             output_format="mp3_44100_128",
         )
-        return b"".join(audio_iter)
+
+
+class CachedSynthesizer(TTSProvider):
+    """Cacht Sprachausgaben nach Provider, Stimme, Sprache und Text.
+
+    Rückfragen wie „Wie viele Meisterstunden?“ wiederholen sich in jedem
+    Dialog; statt erneut gTTS bzw. ElevenLabs anzufragen, kommen sie aus dem
+    Speicher oder von Disk. Der eigentliche Provider wird erst bei einem
+    Cache-Miss erzeugt.
+    """
+
+    def __init__(
+        self, provider_cls: type[TTSProvider], cache: TieredCache[bytes]
+    ) -> None:
+        self.provider_cls = provider_cls
+        self.cache = cache
+        self.voice = provider_cls.voice
+        self._inner: TTSProvider | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def inner(self) -> TTSProvider:
+        with self._lock:
+            if self._inner is None:
+                self._inner = self.provider_cls()
+            return self._inner
+
+    def key(self, text: str, lang: str) -> str:
+        return make_key(settings.tts_provider, self.voice, lang, text)
+
+    def preload(self) -> None:
+        self.inner.preload()
+
+    def close(self) -> None:
+        if self._inner is not None:
+            self._inner.close()
+
+    def synthesize(self, text: str, lang: str = "de") -> bytes:
+        return self.cache.get_or_compute(
+            self.key(text, lang), lambda: self.inner.synthesize(text, lang)
+        )
+
+    def stream(self, text: str, lang: str = "de") -> Iterator[bytes]:
+        key = self.key(text, lang)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        metrics.inc("tts_cache.misses")
+        chunks: list[bytes] = []
+        for chunk in self.inner.stream(text, lang):
+            chunks.append(chunk)
+            yield chunk
+        # Nur vollständig übertragene Ausgaben landen im Cache.
+        self.cache.put(key, b"".join(chunks))
+
+    async def asynthesize(self, text: str, lang: str = "de") -> bytes:
+        async def compute() -> bytes:
+            # Die Provider-Erzeugung kann Clients aufbauen und blockiert daher.
+            inner = await run_blocking(lambda: self.inner)
+            return await inner.asynthesize(text, lang)
+
+        return await self.cache.aget_or_compute(self.key(text, lang), compute)
+
+
+_tts_cache: TieredCache[bytes] | None = None
+
+
+def get_tts_cache() -> TieredCache[bytes]:
+    """Gibt den prozessweiten Cache für Sprachausgaben zurück."""
+    global _tts_cache
+    if _tts_cache is None:
+        _tts_cache = TieredCache(
+            "tts_cache",
+            max_entries=settings.tts_cache_max_entries,
+            ttl=settings.tts_cache_ttl,
+            disk_dir=settings.tts_cache_dir,
+            binary=True,
+        )
+    return _tts_cache
 
 
 _TTS_PROVIDERS: dict[str, type[TTSProvider]] = {
@@ -53,16 +193,80 @@ _TTS_PROVIDERS: dict[str, type[TTSProvider]] = {
 }
 
 
-def _select_provider() -> TTSProvider:
+def _create_provider() -> TTSProvider:
     """Ermittelt anhand der Einstellungen die zu nutzende Implementierung."""
     try:
         provider_cls = _TTS_PROVIDERS[settings.tts_provider]
     except KeyError:  # pragma: no cover - configuration error
         raise ValueError(f"Unsupported TTS_PROVIDER {settings.tts_provider}")
+    if settings.tts_cache_enabled:
+        return CachedSynthesizer(provider_cls, get_tts_cache())
     return provider_cls()
 
 
+_registry: ProviderRegistry[TTSProvider] = ProviderRegistry(
+    "tts",
+    _create_provider,
+    lambda: (
+        settings.tts_provider,
+        settings.elevenlabs_api_key,
+        settings.tts_cache_enabled,
+    ),
+)
+
+
+def _select_provider() -> TTSProvider:
+    """Gibt den einmalig erzeugten Provider der aktuellen Konfiguration zurück."""
+    return _registry.get()
+
+
 def text_to_speech(text: str, lang: str = "de") -> bytes:
     """Hilfsfunktion für den Rest der App."""
     provider = _select_provider()
     return provider.synthesize(text, lang)
+
+
+async def atext_to_speech(text: str, lang: str = "de") -> bytes:
+    """Async-Variante von :func:`text_to_speech`."""
+    provider = await _registry.aget()
+    return await provider.asynthesize(text, lang)
+
+
+async def astream_speech(text: str, lang: str = "de") -> AsyncIterator[bytes]:
+    """Async-Variante von :meth:`TTSProvider.stream` für ``StreamingResponse``.
+
+    Jedes Stück wird im Thread-Pool abgeholt, damit ein wartender Anbieter den
+    Event-Loop nicht blockiert.
+    """
+    provider = await _registry.aget()
+    chunks = provider.stream(text, lang)
+    while True:
+        chunk = await run_blocking(next, chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def warm_phrases(phrases: Iterable[str], lang: str = "de") -> int:
+    """Vertont feste Sätze vorab in den Cache; gibt die Anzahl neuer zurück.
+
+    Bereits (auch auf Disk) gecachte Sätze kosten keinen Provider-Aufruf.
+    Fehler werden geloggt, damit ein nicht erreichbarer Dienst den Start nicht
+    verhindert.
+    """
+    provider = _select_provider()
+    if not isinstance(provider, CachedSynthesizer):
+        return 0
+    synthesized = 0
+    for phrase in phrases:
+        key = provider.key(phrase, lang)
+        if provider.cache.get(key) is not None:
+            continue
+        try:
+            provider.synthesize(phrase, lang)
+        except Exception:
+            logger.warning("Could not pre-synthesize %r", phrase, exc_info=True)
+            continue
+        synthesized += 1
+        metrics.inc("tts_cache.prewarmed")
+    return synthesized
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Benchmark: ``whisper`` gegen ``faster-whisper`` (int8) auf der CPU.
+
+Beide Provider transkribieren dieselbe Aufnahme. Jeder läuft in einem eigenen
+Kindprozess, damit der Speicherbedarf (maximale RSS) nicht vom anderen Modell
+verfälscht wird. Gemessen werden Ladezeit, Real-Time-Faktor (Rechenzeit /
+Audiodauer, kleiner ist besser; bester von ``--repeat`` Läufen) und
+Spitzen-RSS.
+
+Beispiel::
+
+    python scripts/bench_stt_cpu.py --audio aufnahme.wav --model base \\
+        --threads 4 --beam-sizes 1,5
+
+Ohne ``--audio`` wird leises Rauschen der Länge ``--seconds`` verwendet.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import subprocess  # nosec B404
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np  # noqa: E402
+
+from app.audio import encode_wav, wav_duration  # noqa: E402
+from app.settings import settings  # noqa: E402
+
+
+def _child(args: argparse.Namespace) -> None:
+    """Lädt einen Provider, transkribiert und gibt die Messwerte als JSON aus."""
+    from app import stt
+
+    audio = args.audio.read_bytes()
+    settings.stt_provider = args.provider
+    settings.stt_model = args.model
+    settings.stt_language = args.language
+    settings.stt_chunking = False
+    settings.whisper_workers = 0
+    settings.whisper_threads = args.threads
+    settings.faster_whisper_threads = args.threads
+    settings.faster_whisper_beam_size = args.beam_size
+    settings.faster_whisper_compute_type = args.compute_type
+    if args.provider == "whisper" and args.threads > 0:
+        import torch  # type: ignore
+
+        torch.set_num_threads(args.threads)
+
+    start = time.perf_counter()
+    provider = stt._STT_PROVIDERS[args.provider]()
+    load = time.perf_counter() - start
+    timings = []
+    text = ""
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        text = provider.transcribe(audio)
+        timings.append(time.perf_counter() - start)
+    print(
+        json.dumps(
+            {
+                "load": load,
+                "seconds": min(timings),
+                # ru_maxrss ist unter Linux in KiB angegeben.
+                "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                "text": text,
+            }
+        )
+    )
+
+
+def _run(args: argparse.Namespace, provider: str, beam_size: int) -> dict:
+    command = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--child",
+        "--provider",
+        provider,
+        "--audio",
+        str(args.audio),
+        "--model",
+        args.model,
+        "--language",
+        args.language,
+        "--threads",
+        str(args.threads),
+        "--beam-size",
+        str(beam_size),
+        "--compute-type",
+        args.compute_type,
+        "--repeat",
+        str(args.repeat),
+    ]
+    result = subprocess.run(  # nosec B603
+        command, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--audio", type=Path, help="WAV-Aufnahme")
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--language", default="de")
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--beam-sizes", default="1,5")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--providers", default="whisper,faster-whisper")
+    # Interne Optionen für den Kindprozess.
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--provider", help=argparse.SUPPRESS)
+    parser.add_argument("--beam-size", type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args)
+        return
+
+    if args.audio is None:
+        rng = np.random.default_rng(0)
+        pcm = (rng.standard_normal(int(args.seconds * 16000)) * 0.01).astype(
+            np.float32
+        )
+        args.audio = Path("bench_stt_cpu_noise.wav")
+        args.audio.write_bytes(encode_wav(pcm, 16000))
+    duration = wav_duration(args.audio.read_bytes()) or args.seconds
+
+    print(f"model={args.model} audio={duration:.1f}s threads={args.threads or 'auto'}")
+    print(f"{'provider':>15} {'beam':>4} {'load s':>7} {'RTF':>6} {'RSS MB':>7}  text")
+    for provider in args.providers.split(","):
+        # Das Referenzpaket dekodiert hier immer greedy; Beam nur für int8.
+        beams = [1] if provider == "whisper" else [
+            int(item) for item in args.beam_sizes.split(",") if item
+        ]
+        for beam_size in beams:
+            stats = _run(args, provider, beam_size)
+            print(
+                f"{provider:>15} {beam_size:>4} {stats['load']:>7.2f} "
+                f"{stats['seconds'] / duration:>6.3f} {stats['rss_mb']:>7.0f}  "
+                f"{stats['text'][:40]!r}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Benchmark: Transkript-Normalisierung, bisheriges Verfahren gegen Single-Pass.
+
+Das bisherige Verfahren ruft ``str.replace`` einmal je Eintrag der
+Ersetzungstabelle auf und kompiliert die Zahlwort-Regex bei jedem Aufruf neu.
+:class:`app.stt.normalizer.TranscriptNormalizer` erledigt beides mit einem
+beim Import kompilierten Muster. Gemessen wird die mittlere Dauer je
+Transkript für wachsende Textlängen und Tabellengrößen.
+
+Beispiel::
+
+    python scripts/bench_transcript_normalizer.py --sentences 10,100,1000 \\
+        --replacements 2,200,2000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import sys
+import timeit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from app.stt.normalizer import TranscriptNormalizer  # noqa: E402
+
+_LEGACY_NUMBER_WORDS = {
+    "null": "0", "eins": "1", "ein": "1", "eine": "1", "einen": "1",
+    "zwei": "2", "drei": "3", "vier": "4", "fünf": "5", "sechs": "6",
+    "sieben": "7", "acht": "8", "neun": "9", "zehn": "10", "elf": "11",
+    "zwölf": "12", "zwanzig": "20", "dreißig": "30", "vierzig": "40",
+    "fünfzig": "50", "hundert": "100",
+}  # fmt: skip
+
+SENTENCE = (
+    "Kunde Hans Müller, Hauptstraße zwölf, drei Geselden und ein Meister "
+    "je drei Komma fünf Stunden, zweihundertfünfzig Meter Kabel für "
+    "dreiundzwanzig Euro, Anfahrt achtundvierzig Kilometer. "
+)
+
+
+def legacy_normalize(text: str, replacements: dict[str, str]) -> str:
+    for wrong, correct in replacements.items():
+        text = text.replace(wrong, correct)
+    pattern = (
+        r"\b(" + "|".join(re.escape(w) for w in _LEGACY_NUMBER_WORDS) + r")\b"
+    )
+    return re.sub(
+        pattern,
+        lambda m: _LEGACY_NUMBER_WORDS[m.group(0).lower()],
+        text,
+        flags=re.IGNORECASE,
+    )
+
+
+def _replacements(count: int) -> dict[str, str]:
+    table = {"Geselden": "Gesellen", "Geseldenstunde": "Gesellenstunde"}
+    for index in range(max(0, count - len(table))):
+        table[f"Fehlwort{index}x"] = f"Wort{index}"
+    return table
+
+
+def _parse_list(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sentences", default="10,100,1000")
+    parser.add_argument("--replacements", default="2,200,2000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        f"{'sentences':>9} {'repl':>5} {'legacy ms':>10} "
+        f"{'single ms':>10} {'speedup':>8}"
+    )
+    for count in _parse_list(args.replacements):
+        table = _replacements(count)
+        normalizer = TranscriptNormalizer(table)
+        for sentences in _parse_list(args.sentences):
+            text = SENTENCE * sentences
+            number = max(1, 2000 // sentences)
+            legacy = min(
+                timeit.repeat(
+                    lambda: legacy_normalize(text, table),
+                    number=number,
+                    repeat=args.repeat,
+                )
+            ) / number
+            single = min(
+                timeit.repeat(
+                    lambda: normalizer(text), number=number, repeat=args.repeat
+                )
+            ) / number
+            print(
+                f"{sentences:>9} {count:>5} {legacy * 1000:>10.3f} "
+                f"{single * 1000:>10.3f} {legacy / single:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
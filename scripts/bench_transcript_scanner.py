@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Benchmark: Transkript-Heuristiken je Dialogrunde, bisher gegen inkrementell.
+
+Bisher durchsuchte jede Runde das gesamte bisherige Transkript getrennt nach
+Stunden, Materialmengen, Materialpreisen, Kilometern, Rollen und Kundennamen
+(die Kundennamen-Regex wurde dabei jedes Mal neu kompiliert). Über eine
+Session wächst der Aufwand damit quadratisch mit der Zahl der Runden.
+:func:`app.transcript_facts.update_facts` durchsucht nur die neue Äußerung.
+Gemessen wird die Dauer einer kompletten Session mit ``--turns`` Runden;
+zusätzlich wird geprüft, dass beide Verfahren dieselben Fakten liefern.
+
+Beispiel::
+
+    python scripts/bench_transcript_scanner.py --turns 10,50,200
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import sys
+import timeit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from app import transcript_facts as tf  # noqa: E402
+
+TURNS = [
+    "Wir waren bei Herrn Schmidt in Augsburg, Anfahrt 24 km.",
+    "Geselle 3,5 Stunden und Meister 1 h.",
+    "Wir haben 2 Fenster eingebaut, die Fenster je 250 Euro.",
+    "Dazu 12 Schrauben und ein Dichtband für 8 Euro.",
+    "Der Azubi war auch dabei, Azubi 4 Stunden.",
+    "Sonst nichts weiter, bitte die Rechnung vorbereiten.",
+]
+
+
+def legacy_turn(transcript_part: str, transcript: str) -> dict:
+    """Die Auswertungen einer Runde, wie sie vorher aufgerufen wurden."""
+
+    roles = {
+        label
+        for pattern, label in tf.ROLE_KEYWORDS.items()
+        if re.search(pattern, transcript_part, re.IGNORECASE)
+    } or {
+        label
+        for pattern, label in tf.ROLE_KEYWORDS.items()
+        if re.search(pattern, transcript, re.IGNORECASE)
+    }
+    hours: dict[str, float] = {}
+    tf._scan_hours(transcript, hours)
+    counts: dict[str, float] = {}
+    for match in tf._MATERIAL_COUNT_PATTERN.finditer(transcript):
+        qty_str, word = match.groups()
+        forms = tf.normalize_material_key(word)
+        if any(form in tf._COUNT_SKIP_WORDS for form in forms):
+            continue
+        for form in forms:
+            counts[form] = float(qty_str.replace(",", "."))
+    prices = [
+        (desc.strip(), float(price.replace(",", ".")))
+        for desc, price in tf._MATERIAL_PRICE_PATTERN.findall(transcript)
+    ]
+    distance = None
+    m_distance = re.search(
+        r"(\d+(?:[.,]\d+)?)\s*(?:km|kilometer)", transcript, re.IGNORECASE
+    )
+    if m_distance:
+        distance = float(m_distance.group(1).replace(",", "."))
+    pattern = re.compile(tf._CUSTOMER_PATTERN.pattern, re.IGNORECASE)
+    match = pattern.search(transcript)
+    name = None
+    if match and match.group(1).strip():
+        name = re.sub(
+            r"^(der|die|das)\s+", "", match.group(1).strip(), flags=re.IGNORECASE
+        ).title()
+    return {
+        "roles": roles,
+        "hours": hours,
+        "counts": counts,
+        "prices": prices,
+        "distance": distance,
+        "customer": name,
+    }
+
+
+def _session(turns: int) -> list[str]:
+    return [TURNS[index % len(TURNS)] for index in range(turns)]
+
+
+def run_legacy(texts: list[str]) -> dict:
+    result: dict = {}
+    for index, text in enumerate(texts):
+        result = legacy_turn(text, " ".join(texts[: index + 1]))
+    return result
+
+
+def run_incremental(texts: list[str]) -> tf.TranscriptFacts:
+    facts = None
+    for index in range(len(texts)):
+        facts = tf.update_facts(facts, texts[: index + 1])
+    assert facts is not None
+    return facts
+
+
+def _check(texts: list[str]) -> None:
+    legacy = run_legacy(texts)
+    facts = run_incremental(texts)
+    assert legacy["roles"] == (set(facts.last_roles) or set(facts.roles))
+    assert legacy["hours"] == facts.hours
+    assert legacy["counts"] == facts.material_counts
+    assert legacy["prices"] == facts.material_prices
+    assert legacy["distance"] == facts.distance
+    assert legacy["customer"] == facts.customer_name
+
+
+def _parse_list(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", default="10,50,200")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'turns':>6} {'legacy ms':>10} {'incr ms':>10} {'speedup':>8}")
+    for turns in _parse_list(args.turns):
+        texts = _session(turns)
+        _check(texts)
+        number = max(1, 500 // turns)
+        legacy = min(
+            timeit.repeat(lambda: run_legacy(texts), number=number, repeat=args.repeat)
+        ) / number
+        incremental = min(
+            timeit.repeat(
+                lambda: run_incremental(texts), number=number, repeat=args.repeat
+            )
+        ) / number
+        print(
+            f"{turns:>6} {legacy * 1000:>10.3f} {incremental * 1000:>10.3f} "
+            f"{legacy / incremental:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
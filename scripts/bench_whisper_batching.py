@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Benchmark: Durchsatz und Latenz des Whisper-Micro-Batchings.
+
+Simuliert ``--requests`` gleichzeitige Uploads und misst für jede
+Kombination aus Batchgröße und Sammelfenster die Gesamtdauer, den Durchsatz
+(Anfragen/s) sowie Median- und p95-Latenz pro Anfrage. Batchgröße 1 mit
+Fenster 0 entspricht dem bisherigen Verhalten ohne Batching.
+
+Beispiel::
+
+    python scripts/bench_whisper_batching.py --model base --audio aufnahme.wav \\
+        --requests 16 --batch-sizes 1,4,8 --windows 0,0.05,0.2
+
+Ohne ``--audio`` wird leises Rauschen der Länge ``--seconds`` verwendet.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np  # noqa: E402
+
+from app.audio import pcm_from_audio  # noqa: E402
+from app.stt.whisper_batch import WhisperBatcher  # noqa: E402
+from app.stt.whisper_pool import decode_windows  # noqa: E402
+
+
+def _parse_list(value: str, cast):
+    return [cast(item) for item in value.split(",") if item]
+
+
+async def _run(model, pcm, language, requests, batch_size, window):
+    # Ein einzelner Inferenz-Thread, wie ein Worker des Prozess-Pools.
+    executor = ThreadPoolExecutor(max_workers=1)
+    loop = asyncio.get_running_loop()
+
+    async def decode(windows, lang):
+        return await loop.run_in_executor(
+            executor, decode_windows, model, windows, lang
+        )
+
+    batcher = WhisperBatcher(decode, batch_size=batch_size, window=window)
+    latencies: list[float] = []
+
+    async def one():
+        start = time.perf_counter()
+        await batcher.transcribe(pcm, language)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    total = time.perf_counter() - start
+    executor.shutdown()
+    return total, latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--audio", type=Path, help="WAV/M4A-Aufnahme")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--language", default="de")
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--batch-sizes", default="1,4,8")
+    parser.add_argument("--windows", default="0,0.05,0.2")
+    args = parser.parse_args()
+
+    import whisper  # type: ignore
+
+    model = whisper.load_model(args.model)
+    if args.audio:
+        pcm = pcm_from_audio(args.audio.read_bytes())
+    else:
+        rng = np.random.default_rng(0)
+        pcm = (rng.standard_normal(int(args.seconds * 16000)) * 0.01).astype(
+            np.float32
+        )
+
+    # Einmal aufwärmen, damit Lazy-Initialisierungen nicht mitgemessen werden.
+    decode_windows(model, [pcm[: 16000 * 30]], args.language)
+
+    print(
+        f"model={args.model} audio={len(pcm) / 16000:.1f}s requests={args.requests}"
+    )
+    print(
+        f"{'batch':>5} {'window':>7} {'total s':>8} "
+        f"{'req/s':>7} {'p50 s':>7} {'p95 s':>7}"
+    )
+    for batch_size in _parse_list(args.batch_sizes, int):
+        for window in _parse_list(args.windows, float):
+            total, latencies = asyncio.run(
+                _run(model, pcm, args.language, args.requests, batch_size, window)
+            )
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            print(
+                f"{batch_size:>5} {window:>7.3f} {total:>8.2f} "
+                f"{args.requests / total:>7.2f} {statistics.median(latencies):>7.2f} "
+                f"{p95:>7.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
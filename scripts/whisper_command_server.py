@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Referenz-Server für ``STT_PROVIDER=command`` mit ``STT_COMMAND_PERSISTENT``.
+
+Lädt ein Modell des ``whisper``-Pakets einmal und beantwortet danach
+Anfragen nach dem Protokoll aus :mod:`app.stt.command_server` (``PATH``,
+``PCM``, ``PING``). Andere Backends (z. B. whisper.cpp-Bindings) lassen sich
+nach demselben Muster anbinden.
+
+Beispiel (``.env``)::
+
+    STT_PROVIDER=command
+    STT_MODEL="python scripts/whisper_command_server.py base"
+    STT_COMMAND_PERSISTENT=true
+
+Ohne ``--server`` wird – wie beim bisherigen Einmal-Aufruf – die als letztes
+Argument übergebene Datei transkribiert und der Text ausgegeben.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+
+import numpy as np
+
+
+def _reply(stream, kind: str, text: str) -> None:
+    data = text.encode("utf-8")
+    stream.write(f"{kind} {len(data)}\n".encode("ascii") + data)
+    stream.flush()
+
+
+def serve(model, language: str) -> None:
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+    while True:
+        header = stdin.readline()
+        if not header:
+            return
+        kind, size = header.decode("ascii").split()
+        payload = stdin.read(int(size))
+        if kind == "PING":
+            _reply(stdout, "OK", "")
+            continue
+        try:
+            if kind == "PCM":
+                audio = np.frombuffer(payload, dtype="<i2").astype(np.float32) / 32768
+            elif kind == "PATH":
+                audio = payload.decode("utf-8")
+            else:
+                raise ValueError(f"unknown request {kind}")
+            result = model.transcribe(audio, language=language)
+        except Exception as exc:  # Fehler melden, Prozess weiterlaufen lassen
+            _reply(stdout, "ERR", str(exc))
+        else:
+            _reply(stdout, "OK", result.get("text", "").strip())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("model", nargs="?", default="base")
+    parser.add_argument("--language", default="de")
+    parser.add_argument("--server", action="store_true")
+    parser.add_argument("file", nargs="?")
+    args = parser.parse_intermixed_args()
+
+    import whisper  # type: ignore
+
+    # Protokoll-Ausgaben dürfen nicht mit Log-Ausgaben vermischt werden.
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+    model = whisper.load_model(args.model)
+    sys.stdout = stdout
+    if args.server:
+        serve(model, args.language)
+    else:
+        print(model.transcribe(args.file, language=args.language)["text"].strip())
+
+
+if __name__ == "__main__":
+    main()
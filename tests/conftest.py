@@ -6,6 +6,20 @@ import pytest
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from app import persistence
+from app.settings import settings
+
+# Keine Sprachausgaben im ``data/`` des Repositorys zwischenspeichern; sonst
+# sähen spätere Testläufe Treffer aus früheren.
+settings.tts_cache_dir = None
+
+def _async(func):
+    """Verpackt einen synchronen Test-Stub als Coroutine-Funktion."""
+
+    async def wrapper(*args, **kwargs):
+        return func(*args, **kwargs)
+
+    return wrapper
+
 
 @pytest.fixture(autouse=True)
 def log_test_start(request):
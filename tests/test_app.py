@@ -1,10 +1,14 @@
+import asyncio
 import os
 import sys
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 import app.main as app_main
 import json
+import re
+import threading
 from pathlib import Path
+from types import SimpleNamespace
 from fastapi import HTTPException
 from fastapi.testclient import TestClient
 import pytest
@@ -12,10 +16,12 @@ import httpx
 
 from app.main import app
 from app import stt, llm_agent, billing_adapter, persistence, tts, telephony, ocr
+from app import audio, jobs
 import app.telephony.twilio as telephony_twilio
 import app.telephony.common as telephony_common
 from app import settings as app_settings
 from app.models import InvoiceContext
+from conftest import _async
 
 
 class DummyResponse:
@@ -70,7 +76,12 @@ class DummyOpenAI:
 
             def create(self, **kwargs):
                 self.parent.parent.calls += 1
-                if self.parent.parent.index < len(self.parent.parent.results):
+                # Die Extraktionspässe laufen parallel: Antwort je Pass wählen.
+                prompt = kwargs["messages"][-1]["content"]
+                match = re.match(r"Pass (\d+):", prompt)
+                if match and len(self.parent.parent.results) >= int(match.group(1)):
+                    content = self.parent.parent.results[int(match.group(1)) - 1]
+                elif self.parent.parent.index < len(self.parent.parent.results):
                     content = self.parent.parent.results[self.parent.parent.index]
                     self.parent.parent.index += 1
                 else:
@@ -99,6 +110,17 @@ def test_transcribe_audio(monkeypatch):
     assert result == "hallo"
 
 
+def test_atranscribe_audio(monkeypatch):
+    """Transcribes audio asynchronously via the thread pool."""
+    import asyncio
+
+    monkeypatch.setattr(stt.settings, "stt_provider", "openai")
+    monkeypatch.setattr(stt.settings, "stt_model", "whisper-1")
+    monkeypatch.setattr(stt, "OpenAI", lambda: DummyOpenAI("eine Stunde"))
+    result = asyncio.run(stt.atranscribe_audio(b"audio"))
+    assert result == "1 Stunde"
+
+
 def test_transcribe_audio_prompt(monkeypatch):
     """Forwards prompt to OpenAI STT"""
     monkeypatch.setattr(stt.settings, "stt_provider", "openai")
@@ -226,7 +248,7 @@ def test_extract_invoice_context(monkeypatch):
     monkeypatch.setattr(llm_agent.settings, "llm_provider", "openai")
     monkeypatch.setattr(llm_agent.settings, "llm_model", "gpt-4o")
     dummy = DummyOpenAI(dummy_json)
-    monkeypatch.setattr(llm_agent, "OpenAI", lambda: dummy)
+    monkeypatch.setattr(llm_agent, "get_openai_client", lambda: dummy)
     result = llm_agent.extract_invoice_context("text")
     payload = json.loads(result)
     assert payload["customer"]["name"] == "Anna"
@@ -298,7 +320,9 @@ def test_extract_invoice_context_ollama(monkeypatch):
 
         return Resp()
 
-    monkeypatch.setattr(llm_agent.httpx, "post", fake_post)
+    monkeypatch.setattr(
+        llm_agent, "get_ollama_client", lambda: SimpleNamespace(post=fake_post)
+    )
     result = llm_agent.extract_invoice_context("text")
     assert json.loads(result)["customer"]["name"] == "Anna"
 
@@ -317,7 +341,9 @@ def test_extract_invoice_context_ollama_model_missing(monkeypatch):
     def fake_post(url, json=None, timeout=60):
         return Resp()
 
-    monkeypatch.setattr(llm_agent.httpx, "post", fake_post)
+    monkeypatch.setattr(
+        llm_agent, "get_ollama_client", lambda: SimpleNamespace(post=fake_post)
+    )
     with pytest.raises(RuntimeError) as exc:
         llm_agent.extract_invoice_context("text")
     assert "model not found" in str(exc.value)
@@ -331,15 +357,18 @@ def test_extract_invoice_context_ollama_unreachable(monkeypatch):
     def fake_post(url, json=None, timeout=60):
         raise httpx.RequestError("boom")
 
-    monkeypatch.setattr(llm_agent.httpx, "post", fake_post)
+    monkeypatch.setattr(
+        llm_agent, "get_ollama_client", lambda: SimpleNamespace(post=fake_post)
+    )
     with pytest.raises(HTTPException) as exc:
         llm_agent.extract_invoice_context("text")
     assert exc.value.status_code == 503
     assert exc.value.detail == "Ollama server unreachable"
 
 
-def test_store_interaction(tmp_data_dir):
+def test_store_interaction(tmp_data_dir, monkeypatch):
     """Stores audio, transcript and invoice files"""
+    monkeypatch.setattr(app_settings.settings, "invoice_artifacts_lazy", False)
     invoice = InvoiceContext(
         type="InvoiceContext",
         customer={},
@@ -362,7 +391,7 @@ def test_store_interaction(tmp_data_dir):
 def test_process_audio(monkeypatch, tmp_data_dir):
     """Processes audio upload end-to-end"""
     monkeypatch.setattr(stt, "transcribe_audio", lambda x: "transcript")
-    monkeypatch.setattr(app_main, "transcribe_audio", lambda x: "transcript")
+    monkeypatch.setattr(app_main, "atranscribe_audio", _async(lambda x: "transcript"))
     dummy_json = json.dumps(
         {
             "type": "InvoiceContext",
@@ -382,11 +411,15 @@ def test_process_audio(monkeypatch, tmp_data_dir):
         }
     )
     monkeypatch.setattr(llm_agent, "extract_invoice_context", lambda t: dummy_json)
-    monkeypatch.setattr(app_main, "extract_invoice_context", lambda t: dummy_json)
+    monkeypatch.setattr(
+        app_main, "aextract_invoice_context", _async(lambda t: dummy_json)
+    )
     monkeypatch.setattr(
         billing_adapter, "send_to_billing_system", lambda i: {"ok": True}
     )
-    monkeypatch.setattr(app_main, "send_to_billing_system", lambda i: {"ok": True})
+    monkeypatch.setattr(
+        app_main, "asend_to_billing_system", _async(lambda i: {"ok": True})
+    )
     monkeypatch.setattr(
         persistence,
         "store_interaction",
@@ -409,14 +442,15 @@ def test_process_audio(monkeypatch, tmp_data_dir):
     assert data["invoice"]["customer"]["name"] == "Hans"
     assert data["invoice"]["items"][0]["worker_role"] == "Geselle"
     assert data["billing_result"] == {"ok": True}
-    assert data["pdf_path"].endswith("dir/invoice.pdf")
     assert data["pdf_url"].endswith("/dir/invoice.pdf")
+    # Im Lazy-Modus (Standard) existiert noch keine Datei, also kein Pfad.
+    assert "pdf_path" not in data
 
 
 def test_process_audio_m4a(monkeypatch, tmp_data_dir):
     """Processes m4a uploads by converting to wav."""
     monkeypatch.setattr(stt, "transcribe_audio", lambda x: "transcript")
-    monkeypatch.setattr(app_main, "transcribe_audio", lambda x: "transcript")
+    monkeypatch.setattr(app_main, "atranscribe_audio", _async(lambda x: "transcript"))
     dummy_json = json.dumps(
         {
             "type": "InvoiceContext",
@@ -436,11 +470,15 @@ def test_process_audio_m4a(monkeypatch, tmp_data_dir):
         }
     )
     monkeypatch.setattr(llm_agent, "extract_invoice_context", lambda t: dummy_json)
-    monkeypatch.setattr(app_main, "extract_invoice_context", lambda t: dummy_json)
+    monkeypatch.setattr(
+        app_main, "aextract_invoice_context", _async(lambda t: dummy_json)
+    )
     monkeypatch.setattr(
         billing_adapter, "send_to_billing_system", lambda i: {"ok": True}
     )
-    monkeypatch.setattr(app_main, "send_to_billing_system", lambda i: {"ok": True})
+    monkeypatch.setattr(
+        app_main, "asend_to_billing_system", _async(lambda i: {"ok": True})
+    )
     monkeypatch.setattr(
         persistence,
         "store_interaction",
@@ -451,7 +489,15 @@ def test_process_audio_m4a(monkeypatch, tmp_data_dir):
         "store_interaction",
         lambda a, t, i, image=None, image_filename=None: "dir",
     )
-    monkeypatch.setattr(app_main, "_convert_to_wav", lambda b: b)
+    monkeypatch.setattr(app_main, "accepted_audio_formats", lambda: frozenset({"wav"}))
+    converted = []
+
+    async def fake_convert(chunks):
+        data = b"".join([chunk async for chunk in chunks])
+        converted.append(data)
+        return data
+
+    monkeypatch.setattr(audio, "convert_to_wav", fake_convert)
 
     client = TestClient(app)
     response = client.post(
@@ -459,6 +505,7 @@ def test_process_audio_m4a(monkeypatch, tmp_data_dir):
         files={"file": ("audio.m4a", b"data")},
     )
     assert response.status_code == 200
+    assert converted == [b"data"]
     data = response.json()
     assert data["transcript"] == "transcript"
     assert data["invoice"]["customer"]["name"] == "Hans"
@@ -469,9 +516,9 @@ def test_process_audio_m4a(monkeypatch, tmp_data_dir):
 def test_process_audio_invalid_invoice(monkeypatch):
     """Returns error when LLM response is empty."""
     monkeypatch.setattr(stt, "transcribe_audio", lambda x: "t")
-    monkeypatch.setattr(app_main, "transcribe_audio", lambda x: "t")
+    monkeypatch.setattr(app_main, "atranscribe_audio", _async(lambda x: "t"))
     monkeypatch.setattr(llm_agent, "extract_invoice_context", lambda t: "")
-    monkeypatch.setattr(app_main, "extract_invoice_context", lambda t: "")
+    monkeypatch.setattr(app_main, "aextract_invoice_context", _async(lambda t: ""))
 
     client = TestClient(app)
     response = client.post(
@@ -505,11 +552,15 @@ def test_process_image(monkeypatch, tmp_data_dir):
         }
     )
     monkeypatch.setattr(llm_agent, "extract_invoice_context", lambda t: dummy_json)
-    monkeypatch.setattr(app_main, "extract_invoice_context", lambda t: dummy_json)
+    monkeypatch.setattr(
+        app_main, "aextract_invoice_context", _async(lambda t: dummy_json)
+    )
     monkeypatch.setattr(
         billing_adapter, "send_to_billing_system", lambda i: {"ok": True}
     )
-    monkeypatch.setattr(app_main, "send_to_billing_system", lambda i: {"ok": True})
+    monkeypatch.setattr(
+        app_main, "asend_to_billing_system", _async(lambda i: {"ok": True})
+    )
     monkeypatch.setattr(
         persistence,
         "store_interaction",
@@ -532,8 +583,55 @@ def test_process_image(monkeypatch, tmp_data_dir):
     assert data["invoice"]["customer"]["name"] == "Hans"
     assert data["invoice"]["items"][0]["worker_role"] == "Geselle"
     assert data["billing_result"] == {"ok": True}
-    assert data["pdf_path"].endswith("dir/invoice.pdf")
     assert data["pdf_url"].endswith("/dir/invoice.pdf")
+    # Im Lazy-Modus (Standard) existiert noch keine Datei, also kein Pfad.
+    assert "pdf_path" not in data
+
+
+def test_process_image_async_job(monkeypatch, tmp_path):
+    """Queues the upload with 202 and serves the result via /jobs/{id}."""
+    queue = jobs.JobQueue(tmp_path / "jobs.sqlite3")
+    monkeypatch.setattr(jobs, "_job_queue", queue)
+    monkeypatch.setattr(
+        app_main,
+        "_process_image_bytes",
+        _async(lambda data, name: {"transcript": data.decode(), "file": name}),
+    )
+    monkeypatch.setitem(jobs._JOB_HANDLERS, "image", app_main._process_image_bytes)
+
+    client = TestClient(app)
+    response = client.post(
+        "/process-image/?async=true",
+        files={"file": ("img.png", b"Rechnung", "image/png")},
+    )
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert client.get(f"/jobs/{job_id}").json()["status"] == "queued"
+
+    assert asyncio.run(queue.process_next()) is True
+    job = client.get(f"/jobs/{job_id}").json()
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"transcript": "Rechnung", "file": "img.png"}
+
+    events = client.get(f"/jobs/{job_id}/events")
+    assert events.headers["content-type"].startswith("text/event-stream")
+    assert "event: succeeded" in events.text
+    assert client.get("/jobs/unknown").status_code == 404
+
+
+def test_process_image_rejects_oversized_upload(monkeypatch, tmp_path):
+    """Caps image uploads like audio, also before queueing a job."""
+    queue = jobs.JobQueue(tmp_path / "jobs.sqlite3")
+    monkeypatch.setattr(jobs, "_job_queue", queue)
+    monkeypatch.setattr(app_settings.settings, "audio_max_upload_bytes", 4)
+
+    client = TestClient(app)
+    for url in ("/process-image/", "/process-image/?async=true"):
+        response = client.post(
+            url, files={"file": ("img.png", b"zu gross", "image/png")}
+        )
+        assert response.status_code == 413
+    assert queue.pending() == 0
 
 
 def test_root_endpoint():
@@ -581,7 +679,7 @@ def test_text_to_speech_elevenlabs(monkeypatch):
     assert result == b"mp3"
 
 
-def test_twilio_recording_followup(monkeypatch, tmp_data_dir):
+def test_twilio_recording_followup(monkeypatch, tmp_data_dir, tmp_path):
     """Asks follow-up questions until invoice is complete."""
     telephony.SESSIONS.clear()
 
@@ -594,7 +692,7 @@ def test_twilio_recording_followup(monkeypatch, tmp_data_dir):
     transcripts = iter(["", "Hans Malen 100"])
     monkeypatch.setattr(stt, "transcribe_audio", lambda b: next(transcripts))
     monkeypatch.setattr(
-        telephony_twilio, "transcribe_audio", lambda b: next(transcripts)
+        telephony_twilio, "atranscribe_audio", _async(lambda b: next(transcripts))
     )
 
     def fake_extract(text):
@@ -624,12 +722,14 @@ def test_twilio_recording_followup(monkeypatch, tmp_data_dir):
         return json.dumps(data)
 
     monkeypatch.setattr(llm_agent, "extract_invoice_context", fake_extract)
-    monkeypatch.setattr(telephony_twilio, "extract_invoice_context", fake_extract)
+    monkeypatch.setattr(
+        telephony_twilio, "aextract_invoice_context", _async(fake_extract)
+    )
     monkeypatch.setattr(
         billing_adapter, "send_to_billing_system", lambda i: {"ok": True}
     )
     monkeypatch.setattr(
-        telephony_common, "send_to_billing_system", lambda i: {"ok": True}
+        telephony_common, "asend_to_billing_system", _async(lambda i: {"ok": True})
     )
     monkeypatch.setattr(
         persistence,
@@ -643,6 +743,7 @@ def test_twilio_recording_followup(monkeypatch, tmp_data_dir):
     )
     monkeypatch.setattr(tts, "text_to_speech", lambda t: b"mp3")
     monkeypatch.setattr(telephony_common, "text_to_speech", lambda t: b"mp3")
+    monkeypatch.setattr(telephony_common, "RECORDINGS_DIR", tmp_path)
 
     client = TestClient(app)
     call_sid = "abc"
@@ -659,7 +760,7 @@ def test_twilio_recording_followup(monkeypatch, tmp_data_dir):
     assert "Ihre Rechnung wurde erstellt" in response.text
 
 
-def test_sipgate_recording(monkeypatch, tmp_data_dir):
+def test_sipgate_recording(monkeypatch, tmp_data_dir, tmp_path):
     """Processes a sipgate recording webhook"""
     monkeypatch.setattr(app_settings.settings, "telephony_provider", "sipgate")
     import importlib
@@ -673,7 +774,9 @@ def test_sipgate_recording(monkeypatch, tmp_data_dir):
     monkeypatch.setattr(telephony_mod, "download_recording", fake_download)
     monkeypatch.setattr(telephony_sipgate, "download_recording", fake_download)
     monkeypatch.setattr(stt, "transcribe_audio", lambda b: "transcript")
-    monkeypatch.setattr(telephony_sipgate, "transcribe_audio", lambda b: "transcript")
+    monkeypatch.setattr(
+        telephony_sipgate, "atranscribe_audio", _async(lambda b: "transcript")
+    )
     dummy_json = json.dumps(
         {
             "type": "InvoiceContext",
@@ -694,13 +797,13 @@ def test_sipgate_recording(monkeypatch, tmp_data_dir):
     )
     monkeypatch.setattr(llm_agent, "extract_invoice_context", lambda t: dummy_json)
     monkeypatch.setattr(
-        telephony_sipgate, "extract_invoice_context", lambda t: dummy_json
+        telephony_sipgate, "aextract_invoice_context", _async(lambda t: dummy_json)
     )
     monkeypatch.setattr(
         billing_adapter, "send_to_billing_system", lambda i: {"ok": True}
     )
     monkeypatch.setattr(
-        telephony_common, "send_to_billing_system", lambda i: {"ok": True}
+        telephony_common, "asend_to_billing_system", _async(lambda i: {"ok": True})
     )
     monkeypatch.setattr(
         persistence,
@@ -714,6 +817,7 @@ def test_sipgate_recording(monkeypatch, tmp_data_dir):
     )
     monkeypatch.setattr(tts, "text_to_speech", lambda t: b"mp3")
     monkeypatch.setattr(telephony_common, "text_to_speech", lambda t: b"mp3")
+    monkeypatch.setattr(telephony_common, "RECORDINGS_DIR", tmp_path)
 
     from fastapi import FastAPI
 
@@ -759,3 +863,23 @@ def test_sevdesk_mcp_adapter(monkeypatch):
     assert called["url"].endswith("/invoice")
     assert called["json"]["type"] == "InvoiceContext"
     assert result == {"status": "ok"}
+
+
+def test_tts_prewarm_does_not_block_startup(monkeypatch):
+    """Startup returns while the fixed prompts are still being synthesized."""
+    release = threading.Event()
+    monkeypatch.setattr(app_settings.settings, "tts_prewarm", True)
+    monkeypatch.setattr(app_settings.settings, "tts_cache_enabled", True)
+    monkeypatch.setattr(app_main, "fixed_prompts", lambda: ["Wie heißt der Kunde?"])
+    monkeypatch.setattr(
+        tts, "warm_phrases", lambda phrases: release.wait(5) and len(phrases)
+    )
+
+    async def main():
+        await asyncio.wait_for(app_main._warm_tts_cache(), timeout=1)
+        task = app_main._tts_warmup
+        assert task is not None and not task.done()
+        release.set()
+        await task
+
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app import artifacts, metrics, persistence
+from app.main import app
+from app.models import InvoiceContext
+from app.settings import settings
+
+
+def _invoice(total=10.0):
+    return InvoiceContext(
+        type="InvoiceContext",
+        customer={"name": "Anna"},
+        service={"description": "Streichen"},
+        items=[],
+        amount={"total": total, "currency": "EUR"},
+    )
+
+
+def test_identical_invoices_render_once(tmp_data_dir, monkeypatch):
+    """Artifacts render on first GET, cached by invoice content hash."""
+    monkeypatch.setattr(artifacts, "_artifact_cache", None)
+    monkeypatch.setattr(settings, "artifact_cache_dir", None)
+    calls = []
+    original = artifacts.render_artifact
+
+    def counting(invoice, kind):
+        calls.append(kind)
+        return original(invoice, kind)
+
+    monkeypatch.setattr(artifacts, "render_artifact", counting)
+    first = Path(persistence.store_interaction(b"", "eins", _invoice()))
+    second = persistence.append_turn("s", None, [], _invoice())
+    persistence.render_session_artifacts("s", "zwei", _invoice())
+    assert calls == [] and not (first / "invoice.pdf").exists()
+
+    client = TestClient(app)
+    urls = [
+        f"/data/{Path(path).relative_to(tmp_data_dir).as_posix()}/invoice.pdf"
+        for path in (first, second)
+    ]
+    metrics.reset()
+    a, b = client.get(urls[0]), client.get(urls[1])
+    assert a.status_code == b.status_code == 200
+    assert a.content == b.content and a.headers["etag"] == b.headers["etag"]
+    assert calls == ["pdf"]
+    assert metrics.snapshot()["artifact_cache.hits"] == 1
+
+    monkeypatch.setattr(settings, "supplier_name", "Andere GmbH")
+    changed = client.get(urls[0])
+    assert changed.headers["etag"] != a.headers["etag"]
+    assert calls == ["pdf", "pdf"]
+
+    assert client.get(f"/data/{urls[0].split('/')[2]}/invoice.json").status_code == 200
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(artifacts.invoice_artifact("../app", "pdf", None))
+    assert exc.value.status_code == 404
+
+
+def test_artifact_key_ignores_dict_order():
+    a = _invoice()
+    b = _invoice()
+    b.customer = {"name": "Anna"}
+    b.amount = {"currency": "EUR", "total": 10.0}
+    assert artifacts.artifact_key(a, "pdf") == artifacts.artifact_key(b, "pdf")
+    assert artifacts.artifact_key(a, "pdf") != artifacts.artifact_key(a, "xml")
+    assert artifacts.artifact_key(a, "pdf") != artifacts.artifact_key(
+        _invoice(total=11.0), "pdf"
+    )
@@ -0,0 +1,138 @@
+import asyncio
+import io
+import struct
+import sys
+import wave
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from app import audio, metrics
+
+# Liest stdin blockweise und gibt ein WAV mit Platzhalter-Längen aus, wie
+# ffmpeg es bei einer Pipe als Ausgabe tut.
+_FAKE_FFMPEG = """
+import struct, sys
+pcm = b"".join(iter(lambda: sys.stdin.buffer.read(4096), b""))
+header = b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+fmt = struct.pack("<HHIIHH", 1, 1, 16000, 32000, 2, 16)
+out = header + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+sys.stdout.buffer.write(out + b"data" + struct.pack("<I", 0xFFFFFFFF) + pcm)
+"""
+
+
+def _convert(monkeypatch, data, script=_FAKE_FFMPEG, **kwargs):
+    monkeypatch.setattr(
+        audio, "_ffmpeg_command", lambda: [sys.executable, "-c", script]
+    )
+    return asyncio.run(
+        audio.convert_to_wav(audio.iter_bytes(data, chunk_size=1000), **kwargs)
+    )
+
+
+def test_convert_to_wav_streams_through_pipes(monkeypatch):
+    """Feeds chunks into stdin and fixes the WAV header read from stdout."""
+    pcm = b"\x01\x00" * 50_000
+    result = _convert(monkeypatch, pcm)
+    with wave.open(io.BytesIO(result)) as wav:
+        assert wav.getframerate() == 16000
+        assert wav.readframes(wav.getnframes()) == pcm
+    assert struct.unpack_from("<I", result, 4)[0] == len(result) - 8
+
+
+def test_convert_to_wav_enforces_size_cap(monkeypatch):
+    with pytest.raises(HTTPException) as exc:
+        _convert(monkeypatch, b"x" * 5000, max_bytes=2000)
+    assert exc.value.status_code == 413
+
+
+def test_convert_to_wav_times_out_and_reports_failures(monkeypatch):
+    with pytest.raises(HTTPException) as exc:
+        _convert(monkeypatch, b"x", script="import time; time.sleep(5)", timeout=0.2)
+    assert exc.value.status_code == 504
+
+    with pytest.raises(HTTPException) as exc:
+        _convert(monkeypatch, b"x", script="import sys; sys.exit(1)")
+    assert exc.value.status_code == 422
+
+
+def test_prepare_audio_skips_accepted_containers(monkeypatch):
+    """Only converts formats the STT backend cannot read itself."""
+
+    async def fail_convert(chunks):  # pragma: no cover - must not run
+        raise AssertionError("conversion not expected")
+
+    monkeypatch.setattr(audio, "convert_to_wav", fail_convert)
+    data = asyncio.run(
+        audio.prepare_audio(audio.iter_bytes(b"m4a"), "memo.M4A", {"m4a", "wav"})
+    )
+    assert data == b"m4a"
+    assert audio.sniff_format(b"\x00\x00\x00\x20ftypM4A ") == "m4a"
+    assert audio.sniff_format(b"OggS\x00") == "ogg"
+
+
+def _wav(samples, rate, channels=1):
+    pcm = (np.clip(samples, -1, 1) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def test_normalize_wav_downmixes_resamples_and_trims(monkeypatch):
+    """48 kHz stereo with long silences becomes short 16 kHz mono audio."""
+    metrics.reset()
+    monkeypatch.setattr(audio.settings, "audio_max_pause", 1.0)
+    rate = 48000
+    t = np.arange(rate) / rate
+    tone = 0.3 * np.sin(2 * np.pi * 440 * t)
+    silence = np.zeros(rate * 3)
+    mono = np.concatenate([silence, tone, silence, tone, silence])
+    stereo = np.repeat(mono, 2)
+    data = _wav(stereo, rate, channels=2)
+
+    result = audio.normalize_wav(data)
+    with wave.open(io.BytesIO(result)) as wav:
+        assert wav.getframerate() == 16000
+        assert wav.getnchannels() == 1
+        seconds = wav.getnframes() / wav.getframerate()
+    # 2 s Ton, 1 s gekürzte Pause und etwas Rand statt 11 s.
+    assert 3.0 <= seconds <= 3.8
+    assert len(result) * 10 < len(data)
+    assert metrics.snapshot()["audio.seconds_saved"] > 7
+
+
+def test_normalize_audio_leaves_other_data_untouched():
+    assert asyncio.run(audio.normalize_audio(b"data")) == b"data"
+    assert audio.normalize_wav(b"RIFF\x00\x00\x00\x00WAVEjunk") == (
+        b"RIFF\x00\x00\x00\x00WAVEjunk"
+    )
+
+
+def _pcm16(samples):
+    return (np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes()
+
+
+def test_speech_segmenter_cuts_at_pauses(monkeypatch):
+    """Streamed PCM is split into one segment per utterance."""
+    monkeypatch.setattr(audio.settings, "stream_segment_pause", 0.5)
+    rate = 16000
+    t = np.arange(rate) / rate
+    tone = 0.3 * np.sin(2 * np.pi * 440 * t)
+    silence = np.zeros(rate)
+    data = _pcm16(np.concatenate([silence, tone, silence, tone[: rate // 2]]))
+
+    segmenter = audio.SpeechSegmenter(rate)
+    segments = []
+    # Ungerade Blockgrößen: Samples dürfen über Blockgrenzen hinweg reichen.
+    for start in range(0, len(data), 4097):
+        segments.extend(segmenter.feed(data[start : start + 4097]))
+    assert len(segments) == 1
+    assert 1.0 <= len(segments[0]) / rate <= 1.5
+    last = segmenter.flush()
+    assert last is not None and 0.5 <= len(last) / rate <= 0.8
+    assert segmenter.flush() is None
@@ -0,0 +1,265 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app import conversation, llm_agent, metrics, stt, tts
+from app.cache import TieredCache, make_key
+
+
+def test_cache_evicts_least_recently_used():
+    """Keeps at most max_entries and drops the oldest entry first."""
+    cache = TieredCache("test_lru", max_entries=2, ttl=0)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+
+def test_cache_expires_entries_and_uses_disk_tier(tmp_path, monkeypatch):
+    """Expires entries after the TTL and reloads fresh ones from disk."""
+    cache = TieredCache("test_disk", max_entries=10, ttl=60, disk_dir=tmp_path)
+    cache.put("key", "wert")
+    cache.clear()
+    assert cache.get("key") == "wert"
+
+    now = time.time()
+    monkeypatch.setattr("app.cache.time.time", lambda: now + 120)
+    cache.clear()
+    assert cache.get("key") is None
+
+
+def test_cache_coalesces_concurrent_calls():
+    """Runs compute only once for identical concurrent requests."""
+    metrics.reset()
+    cache = TieredCache("test_flight", max_entries=10, ttl=0)
+    calls = 0
+
+    def compute():
+        nonlocal calls
+        calls += 1
+        time.sleep(0.05)
+        return "ergebnis"
+
+    results = []
+
+    def worker():
+        results.append(cache.get_or_compute("k", compute))
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == 1
+    assert results == ["ergebnis"] * 5
+    stats = metrics.snapshot()
+    assert stats["test_flight.misses"] == 1
+    assert stats["test_flight.coalesced"] + stats.get("test_flight.hits", 0) == 4
+
+
+def test_cache_waiters_survive_cancelled_leader():
+    """A cancelled leader hands the computation to a live waiter."""
+    metrics.reset()
+    cache = TieredCache("test_cancel", max_entries=10, ttl=0)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return f"ergebnis {calls}"
+
+    async def main():
+        leader = asyncio.create_task(cache.aget_or_compute("k", compute))
+        await asyncio.sleep(0.01)
+        waiters = [
+            asyncio.create_task(cache.aget_or_compute("k", compute))
+            for _ in range(2)
+        ]
+        # Ein abgebrochener Wartender betrifft die anderen ebenfalls nicht.
+        quitter = asyncio.create_task(cache.aget_or_compute("k", compute))
+        await asyncio.sleep(0.01)
+        quitter.cancel()
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*waiters)
+
+    assert asyncio.run(main()) == ["ergebnis 2", "ergebnis 2"]
+    assert calls == 2
+    assert metrics.snapshot()["test_cancel.leader_cancelled"] == 2
+
+
+def test_cached_llm_provider_reuses_responses():
+    """Answers identical prompts from the cache, sync and async."""
+
+    class CountingProvider(llm_agent.LLMProvider):
+        name = "counting"
+
+        def __init__(self):
+            self.calls = 0
+
+        def complete(self, prompt, system_prompt=None):
+            self.calls += 1
+            return f"antwort auf {prompt}"
+
+    inner = CountingProvider()
+    cache = TieredCache("test_llm", max_entries=10, ttl=0)
+    provider = llm_agent.CachedLLMProvider(inner, cache)
+
+    assert provider.complete("a", system_prompt="s") == "antwort auf a"
+    assert provider.complete("a", system_prompt="s") == "antwort auf a"
+    assert provider.complete("a", system_prompt="anders") == "antwort auf a"
+    assert asyncio.run(provider.acomplete("a", system_prompt="s")) == "antwort auf a"
+    assert inner.calls == 2
+    assert make_key("ab", "c") != make_key("a", "bc")
+
+
+def test_cached_llm_provider_skips_invalid_json():
+    """Invalid or aborted JSON answers are not replayed from the cache."""
+    from app.models import Customer
+
+    class ScriptedProvider(llm_agent.LLMProvider):
+        name = "scripted"
+
+        def __init__(self, answers):
+            self.answers = list(answers)
+
+        def complete(self, prompt, system_prompt=None):
+            return self.answers.pop(0)
+
+    metrics.reset()
+    inner = ScriptedProvider(['{"name": "Ha', '{"name": "Hans"}', "frei"])
+    provider = llm_agent.CachedLLMProvider(
+        inner, TieredCache("test_llm_json", max_entries=10, ttl=0)
+    )
+
+    assert provider.complete_json("p", Customer) == '{"name": "Ha'
+    assert provider.complete_json("p", Customer) == '{"name": "Hans"}'
+    assert provider.complete_json("p", Customer) == '{"name": "Hans"}'
+    assert metrics.snapshot()["test_llm_json.rejected"] == 1
+    # Freitext und JSON-Durchlauf teilen sich keinen Eintrag.
+    assert provider.complete("p") == "frei"
+    assert inner.answers == []
+
+
+def test_cached_transcriber_skips_stt_on_hit(monkeypatch, tmp_path):
+    """Identical audio is transcribed once; the disk tier survives restarts."""
+    calls = []
+
+    class CountingTranscriber(stt.STTProvider):
+        def __init__(self):
+            calls.append("init")
+
+        def transcribe(self, audio_bytes):
+            calls.append("transcribe")
+            return f"{len(audio_bytes)} Bytes"
+
+    metrics.reset()
+    monkeypatch.setattr(stt.settings, "stt_prompt", None)
+    cache = TieredCache("stt_cache", max_entries=10, ttl=60, disk_dir=tmp_path)
+    provider = stt.CachedTranscriber(CountingTranscriber, cache)
+
+    assert provider.transcribe(b"wav") == "3 Bytes"
+    assert asyncio.run(provider.atranscribe(b"wav")) == "3 Bytes"
+    assert calls == ["init", "transcribe"]
+
+    # Anderer Prompt ergibt einen anderen Schlüssel.
+    monkeypatch.setattr(stt.settings, "stt_prompt", "Dachdecker")
+    provider.transcribe(b"wav")
+    assert calls.count("transcribe") == 2
+
+    # Neuer Prozess: Speicher leer, Treffer aus der Disk-Stufe ohne Provider.
+    monkeypatch.setattr(stt.settings, "stt_prompt", None)
+    fresh = stt.CachedTranscriber(
+        CountingTranscriber,
+        TieredCache("stt_cache", max_entries=10, ttl=60, disk_dir=tmp_path),
+    )
+    assert fresh.transcribe(b"wav") == "3 Bytes"
+    assert calls.count("init") == 1
+    stats = metrics.snapshot()
+    assert stats["stt_cache.hits"] == 1
+    assert stats["stt_cache.disk_hits"] == 1
+    assert stats["stt_cache.misses"] == 2
+
+
+def test_cached_transcriber_key_includes_decode_settings(monkeypatch):
+    """Provider settings that change the transcript invalidate cached text."""
+    cache = TieredCache("stt_cache", max_entries=10, ttl=60)
+    faster = stt.CachedTranscriber(stt.FasterWhisperTranscriber, cache)
+    command = stt.CachedTranscriber(stt.CommandTranscriber, cache)
+    keys = {faster._key(b"wav"), command._key(b"wav")}
+
+    monkeypatch.setattr(stt.settings, "faster_whisper_beam_size", 5)
+    monkeypatch.setattr(stt.settings, "faster_whisper_compute_type", "float32")
+    monkeypatch.setattr(stt.settings, "stt_command_input", "pcm")
+    assert faster._key(b"wav") not in keys
+    assert command._key(b"wav") not in keys
+    assert len({faster._key(b"wav"), command._key(b"wav")}) == 2
+
+
+def test_cached_synthesizer_prewarms_fixed_prompts(monkeypatch, tmp_path):
+    """Fixed questions are synthesized once at startup and then served from cache."""
+    calls = []
+
+    class CountingTTS(tts.TTSProvider):
+        voice = "Mats"
+
+        def synthesize(self, text, lang="de"):
+            calls.append(text)
+            return text.encode("utf-8")
+
+    metrics.reset()
+    monkeypatch.setattr(tts.settings, "tts_provider", "elevenlabs")
+    cache = TieredCache(
+        "tts_cache", max_entries=100, ttl=60, disk_dir=tmp_path, binary=True
+    )
+    provider = tts.CachedSynthesizer(CountingTTS, cache)
+    monkeypatch.setattr(tts, "_select_provider", lambda: provider)
+
+    prompts = conversation.fixed_prompts()
+    assert "Wie viele Meisterstunden?\nWie viele Gesellenstunden?" in prompts
+    assert "Wie heißt der Kunde?\nWelche Positionen wurden abgerechnet?" in prompts
+    assert tts.warm_phrases(prompts) == len(prompts)
+    assert tts.warm_phrases(prompts) == 0
+    assert len(calls) == len(prompts)
+
+    question = "Wie viele Meisterstunden?"
+    assert asyncio.run(provider.asynthesize(question)) == question.encode()
+    assert tts.text_to_speech(question) == question.encode()
+    assert len(calls) == len(prompts)
+
+    # Andere Sprache oder Stimme ergibt einen anderen Schlüssel.
+    provider.synthesize(question, lang="en")
+    provider.voice = "Anna"
+    provider.synthesize(question)
+    assert len(calls) == len(prompts) + 2
+    assert metrics.snapshot()["tts_cache.prewarmed"] == len(prompts)
+
+
+def test_cached_synthesizer_stores_streamed_audio():
+    """Streamed speech is passed through chunk by chunk and cached once complete."""
+    calls = []
+
+    class StreamingTTS(tts.TTSProvider):
+        def synthesize(self, text, lang="de"):
+            raise AssertionError("stream expected")
+
+        def stream(self, text, lang="de"):
+            calls.append(text)
+            yield b"a"
+            yield b"b"
+
+    cache = TieredCache("tts_cache", max_entries=10, ttl=60, binary=True)
+    provider = tts.CachedSynthesizer(StreamingTTS, cache)
+
+    assert list(provider.stream("Hallo")) == [b"a", b"b"]
+    assert list(provider.stream("Hallo")) == [b"ab"]
+    assert provider.synthesize("Hallo") == b"ab"
+    assert calls == ["Hallo"]
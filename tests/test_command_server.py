@@ -0,0 +1,151 @@
+import io
+import os
+import sys
+import textwrap
+import time
+import wave
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import metrics, stt  # noqa: E402
+from app.stt import command_server  # noqa: E402
+
+# Minimaler Server nach dem Protokoll aus app/stt/command_server.py.
+FAKE_SERVER = textwrap.dedent(
+    """
+    import os, sys
+    assert sys.argv[-1] == "--server"
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+
+    def reply(kind, text):
+        data = text.encode()
+        stdout.write(f"{kind} {len(data)}\\n".encode() + data)
+        stdout.flush()
+
+    while True:
+        header = stdin.readline()
+        if not header:
+            break
+        kind, size = header.split()
+        payload = stdin.read(int(size))
+        if kind == b"PING":
+            reply("OK", "")
+        elif kind == b"PCM":
+            reply("OK", f"pcm {len(payload) // 2} {os.getpid()}")
+        else:
+            with open(payload.decode(), "rb") as handle:
+                audio = handle.read()
+            if audio == b"kaputt":
+                reply("ERR", "unlesbar")
+            else:
+                reply("OK", f"datei {len(audio)} {os.getpid()}")
+    """
+)
+
+
+@pytest.fixture
+def fake_server(monkeypatch, tmp_path):
+    script = tmp_path / "server.py"
+    script.write_text(FAKE_SERVER)
+    monkeypatch.setattr(stt.settings, "stt_provider", "command")
+    monkeypatch.setattr(stt.settings, "stt_model", f"{sys.executable} {script}")
+    monkeypatch.setattr(stt.settings, "stt_command_persistent", True)
+    monkeypatch.setattr(stt.settings, "stt_command_workers", 1)
+    monkeypatch.setattr(stt.settings, "stt_command_input", "path")
+    monkeypatch.setattr(stt.settings, "stt_command_timeout", 10.0)
+    monkeypatch.setattr(stt.settings, "stt_command_start_timeout", 10.0)
+    metrics.reset()
+    yield
+    command_server.shutdown()
+
+
+def test_command_server_reuses_worker_and_restarts_after_crash(fake_server):
+    """One process serves all requests; a killed worker is restarted."""
+    first = stt.transcribe_audio(b"abc").split()
+    second = stt.transcribe_audio(b"abcd").split()
+    assert first[:2] == ["datei", "3"]
+    assert second[:2] == ["datei", "4"]
+    assert first[2] == second[2]
+
+    with pytest.raises(command_server.CommandServerError, match="unlesbar"):
+        stt.transcribe_audio(b"kaputt")
+    assert metrics.snapshot()["stt_command.workers_alive"] == 1
+
+    command_server.get_pool().workers[0].process.kill()
+    third = stt.transcribe_audio(b"abc").split()
+    assert third[2] != first[2]
+    assert metrics.snapshot()["stt_command.crashes"] == 1
+    assert metrics.snapshot()["stt_command.restarts"] == 1
+
+
+def test_command_server_sends_pcm(fake_server, monkeypatch):
+    monkeypatch.setattr(stt.settings, "stt_command_input", "pcm")
+    monkeypatch.setattr(stt.settings, "stt_command_workers", 2)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as handle:
+        handle.setnchannels(1)
+        handle.setsampwidth(2)
+        handle.setframerate(16000)
+        handle.writeframes(bytes(3200))
+    wav = buffer.getvalue()
+
+    command_server.warm_up()
+    assert metrics.snapshot()["stt_command.workers_alive"] == 2
+    assert stt.transcribe_audio(wav).split()[:2] == ["pcm", "1600"]
+
+
+def test_command_worker_write_times_out_on_hung_worker(tmp_path, monkeypatch):
+    """A worker that stops reading stdin cannot block a large PCM write."""
+    script = tmp_path / "hung.py"
+    script.write_text(
+        "import sys, time\n"
+        "sys.stdin.buffer.readline()\n"
+        "sys.stdout.buffer.write(b'OK 0\\n'); sys.stdout.buffer.flush()\n"
+        "time.sleep(60)\n"
+    )
+    monkeypatch.setattr(stt.settings, "stt_command_start_timeout", 10.0)
+    worker = command_server.CommandWorker([sys.executable, str(script)])
+    worker.start()
+    try:
+        start = time.monotonic()
+        with pytest.raises(command_server.WorkerUnavailable, match="timed out"):
+            worker.request("PCM", bytes(4 << 20), timeout=0.3)
+        assert time.monotonic() - start < 5
+    finally:
+        worker.stop()
+
+
+def test_command_server_pool_wait_is_bounded(fake_server, monkeypatch):
+    """When every worker is busy, callers get WorkerUnavailable (HTTP 503)."""
+    from fastapi.testclient import TestClient
+
+    from app import main
+
+    monkeypatch.setattr(stt.settings, "stt_command_timeout", 0.1)
+    monkeypatch.setattr(stt.settings, "stt_command_start_timeout", 0.1)
+    # Provider samt Pool anlegen, dann den einzigen Worker belegen.
+    assert stt.transcribe_audio(b"frei").split()[:2] == ["datei", "4"]
+    pool = command_server.get_pool()
+    busy = pool._idle.get()
+    try:
+        start = time.monotonic()
+        with pytest.raises(command_server.WorkerUnavailable):
+            stt.transcribe_audio(b"belegt")
+        with pytest.raises(command_server.WorkerUnavailable):
+            command_server.warm_up()
+        assert time.monotonic() - start < 5
+        assert metrics.snapshot()["stt_command.busy"] == 2
+
+        async def unavailable(chunks, filename):
+            raise command_server.WorkerUnavailable("No STT command worker")
+
+        monkeypatch.setattr(main, "_process_audio_stream", unavailable)
+        response = TestClient(main.app).post(
+            "/process-audio/", files={"file": ("a.wav", b"abc", "audio/wav")}
+        )
+        assert response.status_code == 503
+    finally:
+        pool._idle.put(busy)
+    assert stt.transcribe_audio(b"belegt").split()[:2] == ["datei", "6"]
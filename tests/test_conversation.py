@@ -1,15 +1,36 @@
+import asyncio
 import os
 import sys
 import json
+import numpy as np
 import pytest
+from fastapi import WebSocketDisconnect
 from fastapi.testclient import TestClient
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from app.main import app  # noqa: E402
 import app.conversation as conversation  # noqa: E402
+import app.session_store as session_store  # noqa: E402
+import app.stt.streaming as streaming  # noqa: E402
 from app.models import InvoiceContext, InvoiceItem  # noqa: E402
 from app.pricing import apply_pricing  # noqa: E402
+from conftest import _async  # noqa: E402
+
+
+def test_conversation_rejects_oversized_upload(monkeypatch):
+    """The upload limit of /process-audio/ also applies to /conversation/."""
+    monkeypatch.setattr(conversation.settings, "audio_max_upload_bytes", 4)
+    monkeypatch.setattr(
+        conversation, "atranscribe_audio", _async(lambda b: pytest.fail("called"))
+    )
+
+    resp = TestClient(app).post(
+        "/conversation/",
+        data={"session_id": "gross"},
+        files={"file": ("audio.wav", b"zu viele Bytes")},
+    )
+    assert resp.status_code == 413
 
 
 def test_conversation_provisional_invoice(monkeypatch, tmp_data_dir):
@@ -20,7 +41,9 @@ def test_conversation_provisional_invoice(monkeypatch, tmp_data_dir):
     conversation.PENDING_CONFIRMATION.clear()
 
     transcripts = iter(["Hans Malen", "Ja, passt."])
-    monkeypatch.setattr(conversation, "transcribe_audio", lambda b: next(transcripts))
+    monkeypatch.setattr(
+        conversation, "atranscribe_audio", _async(lambda b: next(transcripts))
+    )
 
     def fake_extract(text):
         data = {
@@ -46,12 +69,11 @@ def test_conversation_provisional_invoice(monkeypatch, tmp_data_dir):
             )
         return json.dumps(data)
 
-    monkeypatch.setattr(conversation, "extract_invoice_context", fake_extract)
-    monkeypatch.setattr(conversation, "send_to_billing_system", lambda i: {"ok": True})
+    monkeypatch.setattr(conversation, "aextract_invoice_context", _async(fake_extract))
     monkeypatch.setattr(
-        conversation, "store_interaction", lambda a, t, i: str(tmp_data_dir)
+        conversation, "asend_to_billing_system", _async(lambda i: {"ok": True})
     )
-    monkeypatch.setattr(conversation, "text_to_speech", lambda t: b"mp3")
+    monkeypatch.setattr(conversation, "atext_to_speech", _async(lambda t: b"mp3"))
 
     client = TestClient(app)
     session_id = "abc"
@@ -93,7 +115,9 @@ def test_conversation_correction_flow(monkeypatch, tmp_data_dir):
     conversation.PENDING_CONFIRMATION.clear()
 
     transcripts = iter(["Hans Malen zwei Stunden", "Nein, Menge drei", "Ja, passt."])
-    monkeypatch.setattr(conversation, "transcribe_audio", lambda b: next(transcripts))
+    monkeypatch.setattr(
+        conversation, "atranscribe_audio", _async(lambda b: next(transcripts))
+    )
 
     def fake_extract(text):
         quantity = 2
@@ -119,12 +143,11 @@ def test_conversation_correction_flow(monkeypatch, tmp_data_dir):
             }
         )
 
-    monkeypatch.setattr(conversation, "extract_invoice_context", fake_extract)
-    monkeypatch.setattr(conversation, "send_to_billing_system", lambda i: {"ok": True})
+    monkeypatch.setattr(conversation, "aextract_invoice_context", _async(fake_extract))
     monkeypatch.setattr(
-        conversation, "store_interaction", lambda a, t, i: str(tmp_data_dir)
+        conversation, "asend_to_billing_system", _async(lambda i: {"ok": True})
     )
-    monkeypatch.setattr(conversation, "text_to_speech", lambda t: b"mp3")
+    monkeypatch.setattr(conversation, "atext_to_speech", _async(lambda t: b"mp3"))
 
     client = TestClient(app)
     session_id = "corr"
@@ -169,13 +192,16 @@ def test_conversation_parse_error(monkeypatch, tmp_data_dir):
     conversation.INVOICE_STATE.clear()
     conversation.SESSION_STATUS.clear()
     conversation.PENDING_CONFIRMATION.clear()
-    monkeypatch.setattr(conversation, "transcribe_audio", lambda b: "kaputt 7 km")
-    monkeypatch.setattr(conversation, "extract_invoice_context", lambda t: "invalid")
-    monkeypatch.setattr(conversation, "send_to_billing_system", lambda i: {"ok": True})
     monkeypatch.setattr(
-        conversation, "store_interaction", lambda a, t, i: str(tmp_data_dir)
+        conversation, "atranscribe_audio", _async(lambda b: "kaputt 7 km")
+    )
+    monkeypatch.setattr(
+        conversation, "aextract_invoice_context", _async(lambda t: "invalid")
+    )
+    monkeypatch.setattr(
+        conversation, "asend_to_billing_system", _async(lambda i: {"ok": True})
     )
-    monkeypatch.setattr(conversation, "text_to_speech", lambda t: b"mp3")
+    monkeypatch.setattr(conversation, "atext_to_speech", _async(lambda t: b"mp3"))
 
     client = TestClient(app)
     resp = client.post(
@@ -205,7 +231,9 @@ def test_conversation_parse_error_keeps_state(monkeypatch, tmp_data_dir):
     conversation.PENDING_CONFIRMATION.clear()
 
     transcripts = iter(["Hans Malen", "Nur eine Stunde"])
-    monkeypatch.setattr(conversation, "transcribe_audio", lambda b: next(transcripts))
+    monkeypatch.setattr(
+        conversation, "atranscribe_audio", _async(lambda b: next(transcripts))
+    )
 
     def fake_extract(text):
         if "Nur eine Stunde" in text or "Nur 1 Stunde" in text:
@@ -232,12 +260,11 @@ def test_conversation_parse_error_keeps_state(monkeypatch, tmp_data_dir):
             }
         )
 
-    monkeypatch.setattr(conversation, "extract_invoice_context", fake_extract)
-    monkeypatch.setattr(conversation, "send_to_billing_system", lambda i: {"ok": True})
+    monkeypatch.setattr(conversation, "aextract_invoice_context", _async(fake_extract))
     monkeypatch.setattr(
-        conversation, "store_interaction", lambda a, t, i: str(tmp_data_dir)
+        conversation, "asend_to_billing_system", _async(lambda i: {"ok": True})
     )
-    monkeypatch.setattr(conversation, "text_to_speech", lambda t: b"mp3")
+    monkeypatch.setattr(conversation, "atext_to_speech", _async(lambda t: b"mp3"))
 
     client = TestClient(app)
     session_id = "parsekeep"
@@ -277,10 +304,10 @@ def test_conversation_store_company_name(monkeypatch, tmp_path):
     monkeypatch.setattr(conversation, "ENV_PATH", env_file)
     monkeypatch.setattr(
         conversation,
-        "transcribe_audio",
-        lambda b: "Speichere meinen Firmennamen Beispiel GmbH",
+        "atranscribe_audio",
+        _async(lambda b: "Speichere meinen Firmennamen Beispiel GmbH"),
     )
-    monkeypatch.setattr(conversation, "text_to_speech", lambda t: b"mp3")
+    monkeypatch.setattr(conversation, "atext_to_speech", _async(lambda t: b"mp3"))
 
     client = TestClient(app)
     resp = client.post(
@@ -304,11 +331,13 @@ def test_conversation_defaults(monkeypatch, tmp_data_dir):
     conversation.PENDING_CONFIRMATION.clear()
     conversation.SESSION_STATUS.clear()
 
-    monkeypatch.setattr(conversation, "transcribe_audio", lambda b: "Malen 100")
+    monkeypatch.setattr(
+        conversation, "atranscribe_audio", _async(lambda b: "Malen 100")
+    )
     monkeypatch.setattr(
         conversation,
-        "extract_invoice_context",
-        lambda t: json.dumps(
+        "aextract_invoice_context",
+        _async(lambda t: json.dumps(
             {
                 "type": "InvoiceContext",
                 "customer": {},
@@ -316,13 +345,12 @@ def test_conversation_defaults(monkeypatch, tmp_data_dir):
                 "items": [],
                 "amount": {},
             }
-        ),
+        )),
     )
-    monkeypatch.setattr(conversation, "send_to_billing_system", lambda i: {"ok": True})
     monkeypatch.setattr(
-        conversation, "store_interaction", lambda a, t, i: str(tmp_data_dir)
+        conversation, "asend_to_billing_system", _async(lambda i: {"ok": True})
     )
-    monkeypatch.setattr(conversation, "text_to_speech", lambda t: b"mp3")
+    monkeypatch.setattr(conversation, "atext_to_speech", _async(lambda t: b"mp3"))
 
     client = TestClient(app)
     resp = client.post(
@@ -349,7 +377,9 @@ def test_conversation_estimates_labor_item(monkeypatch, tmp_data_dir):
     conversation.SESSION_STATUS.clear()
     conversation.PENDING_CONFIRMATION.clear()
 
-    monkeypatch.setattr(conversation, "transcribe_audio", lambda b: "Hans Dusche")
+    monkeypatch.setattr(
+        conversation, "atranscribe_audio", _async(lambda b: "Hans Dusche")
+    )
 
     def fake_extract(text):
         return json.dumps(
@@ -371,12 +401,11 @@ def test_conversation_estimates_labor_item(monkeypatch, tmp_data_dir):
             }
         )
 
-    monkeypatch.setattr(conversation, "extract_invoice_context", fake_extract)
-    monkeypatch.setattr(conversation, "send_to_billing_system", lambda i: {"ok": True})
+    monkeypatch.setattr(conversation, "aextract_invoice_context", _async(fake_extract))
     monkeypatch.setattr(
-        conversation, "store_interaction", lambda a, t, i: str(tmp_data_dir)
+        conversation, "asend_to_billing_system", _async(lambda i: {"ok": True})
     )
-    monkeypatch.setattr(conversation, "text_to_speech", lambda t: b"mp3")
+    monkeypatch.setattr(conversation, "atext_to_speech", _async(lambda t: b"mp3"))
 
     client = TestClient(app)
     resp = client.post(
@@ -410,7 +439,7 @@ def test_conversation_extracts_hours_and_materials(monkeypatch, tmp_data_dir):
         "noch 2 Meisterstunden und 4 Gesellenstunden, und 35km Anfahrtsweg."
     )
 
-    monkeypatch.setattr(conversation, "transcribe_audio", lambda b: transcript)
+    monkeypatch.setattr(conversation, "atranscribe_audio", _async(lambda b: transcript))
 
     def fake_extract(text):
         return json.dumps(
@@ -426,12 +455,11 @@ def test_conversation_extracts_hours_and_materials(monkeypatch, tmp_data_dir):
             }
         )
 
-    monkeypatch.setattr(conversation, "extract_invoice_context", fake_extract)
-    monkeypatch.setattr(conversation, "send_to_billing_system", lambda i: {"ok": True})
+    monkeypatch.setattr(conversation, "aextract_invoice_context", _async(fake_extract))
     monkeypatch.setattr(
-        conversation, "store_interaction", lambda a, t, i: str(tmp_data_dir)
+        conversation, "asend_to_billing_system", _async(lambda i: {"ok": True})
     )
-    monkeypatch.setattr(conversation, "text_to_speech", lambda t: b"mp3")
+    monkeypatch.setattr(conversation, "atext_to_speech", _async(lambda t: b"mp3"))
 
     client = TestClient(app)
     resp = client.post(
@@ -479,7 +507,9 @@ def test_conversation_keeps_context_on_correction(monkeypatch, tmp_data_dir):
     conversation.PENDING_CONFIRMATION.clear()
 
     transcripts = iter(["Huber Fenster", "Nur eine Stunde"])
-    monkeypatch.setattr(conversation, "transcribe_audio", lambda b: next(transcripts))
+    monkeypatch.setattr(
+        conversation, "atranscribe_audio", _async(lambda b: next(transcripts))
+    )
 
     invoice_jsons = iter(
         [
@@ -505,13 +535,12 @@ def test_conversation_keeps_context_on_correction(monkeypatch, tmp_data_dir):
         ]
     )
     monkeypatch.setattr(
-        conversation, "extract_invoice_context", lambda t: next(invoice_jsons)
+        conversation, "aextract_invoice_context", _async(lambda t: next(invoice_jsons))
     )
-    monkeypatch.setattr(conversation, "send_to_billing_system", lambda i: {"ok": True})
     monkeypatch.setattr(
-        conversation, "store_interaction", lambda a, t, i: str(tmp_data_dir)
+        conversation, "asend_to_billing_system", _async(lambda i: {"ok": True})
     )
-    monkeypatch.setattr(conversation, "text_to_speech", lambda t: b"mp3")
+    monkeypatch.setattr(conversation, "atext_to_speech", _async(lambda t: b"mp3"))
 
     client = TestClient(app)
     session_id = "corr"
@@ -546,7 +575,7 @@ def test_conversation_ignores_auto_customer_name(monkeypatch, tmp_data_dir):
     conversation.SESSION_STATUS.clear()
     conversation.PENDING_CONFIRMATION.clear()
 
-    monkeypatch.setattr(conversation, "transcribe_audio", lambda b: "nur text")
+    monkeypatch.setattr(conversation, "atranscribe_audio", _async(lambda b: "nur text"))
 
     def fake_extract(text):
         return json.dumps(
@@ -568,10 +597,11 @@ def test_conversation_ignores_auto_customer_name(monkeypatch, tmp_data_dir):
             }
         )
 
-    monkeypatch.setattr(conversation, "extract_invoice_context", fake_extract)
-    monkeypatch.setattr(conversation, "send_to_billing_system", lambda i: {"ok": True})
-    monkeypatch.setattr(conversation, "store_interaction", lambda a, t, i: str(tmp_data_dir))
-    monkeypatch.setattr(conversation, "text_to_speech", lambda t: b"mp3")
+    monkeypatch.setattr(conversation, "aextract_invoice_context", _async(fake_extract))
+    monkeypatch.setattr(
+        conversation, "asend_to_billing_system", _async(lambda i: {"ok": True})
+    )
+    monkeypatch.setattr(conversation, "atext_to_speech", _async(lambda t: b"mp3"))
 
 
 def test_conversation_clarification_needed_for_ambiguous_roles_and_material_sum(
@@ -610,9 +640,8 @@ def test_conversation_clarification_needed_for_ambiguous_roles_and_material_sum(
             }
         )
 
-    monkeypatch.setattr(conversation, "extract_invoice_context", fake_extract)
-    monkeypatch.setattr(conversation, "store_interaction", lambda a, t, i: str(tmp_data_dir))
-    monkeypatch.setattr(conversation, "text_to_speech", lambda t: b"mp3")
+    monkeypatch.setattr(conversation, "aextract_invoice_context", _async(fake_extract))
+    monkeypatch.setattr(conversation, "atext_to_speech", _async(lambda t: b"mp3"))
 
     client = TestClient(app)
     resp = client.post(
@@ -676,9 +705,8 @@ def test_conversation_example_sentence_no_clarification(monkeypatch, tmp_data_di
             }
         )
 
-    monkeypatch.setattr(conversation, "extract_invoice_context", fake_extract)
-    monkeypatch.setattr(conversation, "store_interaction", lambda a, t, i: str(tmp_data_dir))
-    monkeypatch.setattr(conversation, "text_to_speech", lambda t: b"mp3")
+    monkeypatch.setattr(conversation, "aextract_invoice_context", _async(fake_extract))
+    monkeypatch.setattr(conversation, "atext_to_speech", _async(lambda t: b"mp3"))
 
     client = TestClient(app)
     resp = client.post(
@@ -731,10 +759,14 @@ def test_conversation_delete_position(monkeypatch):
     apply_pricing(invoice)
     conversation.INVOICE_STATE[session_id] = invoice
 
-    monkeypatch.setattr(conversation, "transcribe_audio", lambda b: "Position 1 löschen")
-    monkeypatch.setattr(conversation, "text_to_speech", lambda t: b"mp3")
     monkeypatch.setattr(
-        conversation, "extract_invoice_context", lambda t: pytest.fail("should not be called")
+        conversation, "atranscribe_audio", _async(lambda b: "Position 1 löschen")
+    )
+    monkeypatch.setattr(conversation, "atext_to_speech", _async(lambda t: b"mp3"))
+    monkeypatch.setattr(
+        conversation,
+        "aextract_invoice_context",
+        _async(lambda t: pytest.fail("should not be called")),
     )
 
     client = TestClient(app)
@@ -783,11 +815,13 @@ def test_conversation_direct_price_correction(monkeypatch):
     apply_pricing(invoice)
     conversation.INVOICE_STATE[session_id] = invoice
 
-    monkeypatch.setattr(conversation, "text_to_speech", lambda t: b"mp3")
+    monkeypatch.setattr(conversation, "atext_to_speech", _async(lambda t: b"mp3"))
     monkeypatch.setattr(
         conversation,
-        "extract_invoice_context",
-        lambda t: pytest.fail("LLM merge should not run for direct corrections"),
+        "aextract_invoice_context",
+        _async(
+            lambda t: pytest.fail("LLM merge should not run for direct corrections")
+        ),
     )
 
     client = TestClient(app)
@@ -836,11 +870,13 @@ def test_conversation_direct_quantity_correction_without_field(monkeypatch):
     apply_pricing(invoice)
     conversation.INVOICE_STATE[session_id] = invoice
 
-    monkeypatch.setattr(conversation, "text_to_speech", lambda t: b"mp3")
+    monkeypatch.setattr(conversation, "atext_to_speech", _async(lambda t: b"mp3"))
     monkeypatch.setattr(
         conversation,
-        "extract_invoice_context",
-        lambda t: pytest.fail("LLM merge should not run for direct corrections"),
+        "aextract_invoice_context",
+        _async(
+            lambda t: pytest.fail("LLM merge should not run for direct corrections")
+        ),
     )
 
     client = TestClient(app)
@@ -885,11 +921,13 @@ def test_conversation_direct_customer_correction(monkeypatch):
     apply_pricing(invoice)
     conversation.INVOICE_STATE[session_id] = invoice
 
-    monkeypatch.setattr(conversation, "text_to_speech", lambda t: b"mp3")
+    monkeypatch.setattr(conversation, "atext_to_speech", _async(lambda t: b"mp3"))
     monkeypatch.setattr(
         conversation,
-        "extract_invoice_context",
-        lambda t: pytest.fail("LLM merge should not run for direct corrections"),
+        "aextract_invoice_context",
+        _async(
+            lambda t: pytest.fail("LLM merge should not run for direct corrections")
+        ),
     )
 
     client = TestClient(app)
@@ -908,3 +946,235 @@ def test_conversation_direct_customer_correction(monkeypatch):
     invoice_state = conversation.INVOICE_STATE[session_id]
     assert invoice_state.customer["name"] == "Familie Müller"
     assert conversation.SESSION_STATUS[session_id] == "collecting"
+
+
+def test_conversation_delta_extraction(monkeypatch, tmp_data_dir):
+    """Sends only the new turn plus state and re-extracts fully every N turns."""
+
+    conversation.SESSIONS.clear()
+    conversation.INVOICE_STATE.clear()
+    conversation.SESSION_STATUS.clear()
+    conversation.PENDING_CONFIRMATION.clear()
+    monkeypatch.setattr(conversation.settings, "conversation_delta_extraction", True)
+    monkeypatch.setattr(
+        conversation.settings, "conversation_full_extraction_interval", 3
+    )
+
+    full_calls: list[str] = []
+    delta_calls: list[tuple[str, str]] = []
+
+    def fake_extract(text):
+        full_calls.append(text)
+        return json.dumps(
+            {
+                "type": "InvoiceContext",
+                "customer": {"name": "Hans"},
+                "service": {"description": "Malen"},
+                "items": [
+                    {
+                        "description": "Arbeitszeit Geselle",
+                        "category": "labor",
+                        "quantity": 1,
+                        "unit": "h",
+                        "unit_price": 40,
+                        "worker_role": "Geselle",
+                    }
+                ],
+                "amount": {},
+            }
+        )
+
+    def fake_delta(state, text):
+        delta_calls.append((state.customer.get("name"), text))
+        return json.dumps(
+            {
+                "line_items": [
+                    {
+                        "description": "Farbe",
+                        "type": "material",
+                        "quantity": 2.0,
+                        "unit": "Stk",
+                        "unit_price_cents": 1500,
+                    }
+                ]
+            }
+        )
+
+    monkeypatch.setattr(conversation, "aextract_invoice_context", _async(fake_extract))
+    monkeypatch.setattr(conversation, "aextract_invoice_delta", _async(fake_delta))
+    monkeypatch.setattr(conversation, "atext_to_speech", _async(lambda t: b"mp3"))
+
+    client = TestClient(app)
+    session_id = "delta"
+    for text in ["Hans Malen Geselle", "zwei Farbe", "noch etwas", "und mehr"]:
+        resp = client.post(
+            "/conversation-text/", data={"session_id": session_id, "text": text}
+        )
+        assert resp.status_code == 200
+
+    # Runde 1 ohne Zustand und Runde 3 (Intervall) laufen vollständig.
+    assert len(full_calls) == 2
+    assert full_calls[1].startswith("Hans Malen Geselle")
+    assert delta_calls == [("Hans", "zwei Farbe"), ("Hans", "und mehr")]
+    items = conversation.INVOICE_STATE[session_id].items
+    assert any(item.description == "Farbe" for item in items)
+
+
+def test_conversation_stream_transcribes_segments(monkeypatch):
+    """WebSocket audio is transcribed per segment and handled on stop."""
+    monkeypatch.setattr(conversation.settings, "stream_segment_pause", 0.3)
+
+    texts = iter(["Hans Malen", "zwei Stunden"])
+    monkeypatch.setattr(streaming, "atranscribe_audio", _async(lambda b: next(texts)))
+    calls = {}
+
+    async def fake_handle(session_id, transcript, audio_bytes, **kwargs):
+        calls.update(session_id=session_id, transcript=transcript, **kwargs)
+        calls["audio"] = audio_bytes
+        return {"done": False, "transcript": transcript}
+
+    monkeypatch.setattr(conversation, "_handle_conversation", fake_handle)
+    rate = 16000
+    tone = 0.3 * np.sin(2 * np.pi * 440 * np.arange(rate) / rate)
+    pcm = (np.concatenate([tone, np.zeros(rate), tone]) * 32767).astype("<i2")
+
+    client = TestClient(app)
+    with client.websocket_connect("/conversation/stream?session_id=s1") as ws:
+        ws.send_bytes(pcm.tobytes())
+        partial = ws.receive_json()
+        assert partial == {"type": "partial", "index": 0, "text": "Hans Malen"}
+        ws.send_text(json.dumps({"type": "stop", "clarification_context": "Wer?"}))
+        messages = [ws.receive_json(), ws.receive_json()]
+
+    assert messages[-1] == {
+        "type": "result",
+        "done": False,
+        "transcript": "Hans Malen zwei Stunden",
+    }
+    assert calls["session_id"] == "s1"
+    assert calls["clarification_context"] == "Wer?"
+    assert calls["audio"].startswith(b"RIFF")
+
+
+def test_conversation_stream_rejects_invalid_sample_rate():
+    """A zero or absurd sample rate is refused at the handshake."""
+    client = TestClient(app)
+    for rate in (0, -16000, 10**9):
+        with pytest.raises(WebSocketDisconnect) as exc:
+            with client.websocket_connect(
+                f"/conversation/stream?session_id=s1&sample_rate={rate}"
+            ):
+                pass
+        assert exc.value.code == 1008
+
+
+def test_conversation_stream_closes_when_too_long(monkeypatch):
+    """Audio beyond the maximum recording length closes the socket with 1009."""
+    monkeypatch.setattr(conversation.settings, "stream_max_duration", 0.5)
+    monkeypatch.setattr(streaming, "atranscribe_audio", _async(lambda b: "x"))
+    silence = np.zeros(16000, dtype="<i2").tobytes()
+
+    client = TestClient(app)
+    with client.websocket_connect("/conversation/stream?session_id=s1") as ws:
+        ws.send_bytes(silence)
+        assert ws.receive_json()["type"] == "error"
+        with pytest.raises(WebSocketDisconnect) as exc:
+            ws.receive_json()
+    assert exc.value.code == 1009
+
+
+def test_conversation_returns_audio_url_and_streams_speech(monkeypatch):
+    """With audio_url the reply skips TTS; the audio is streamed separately."""
+    from app import tts
+
+    conversation.INVOICE_STATE.clear()
+    monkeypatch.setattr(
+        conversation, "atext_to_speech", _async(lambda text: pytest.fail("TTS"))
+    )
+
+    class ChunkedTTS(tts.TTSProvider):
+        def synthesize(self, text, lang="de"):
+            return b"".join(self.stream(text, lang))
+
+        def stream(self, text, lang="de"):
+            yield b"ID3"
+            yield text.encode("utf-8")
+
+    monkeypatch.setattr(tts._registry, "aget", _async(lambda: ChunkedTTS()))
+    client = TestClient(app)
+    resp = client.post(
+        "/conversation-text/",
+        data={"session_id": "s1", "text": "Position 3 löschen", "audio_url": "true"},
+    )
+    data = resp.json()
+    assert data["message"] == "Position 3 nicht gefunden."
+    assert "audio" not in data
+    assert data["audio_url"].startswith("/conversation/s1/audio/")
+
+    audio = client.get(data["audio_url"])
+    assert audio.headers["content-type"] == "audio/mpeg"
+    assert audio.content == "ID3Position 3 nicht gefunden.".encode("utf-8")
+    assert client.get("/conversation/s1/audio/unbekannt").status_code == 404
+    other = data["audio_url"].replace("/s1/", "/s2/")
+    assert client.get(other).status_code == 404
+
+
+def test_conversation_invoice_renders_draft_on_request(tmp_data_dir):
+    """The draft PDF is only rendered when its URL is fetched."""
+    session_id = "draft"
+    conversation.PENDING_CONFIRMATION.pop(session_id, None)
+    conversation.SESSIONS[session_id] = [{"role": "user", "content": "Hallo"}]
+    conversation.INVOICE_STATE[session_id] = InvoiceContext(
+        type="InvoiceContext",
+        customer={"name": "Hans"},
+        service={"description": "Malen"},
+        items=[],
+        amount={},
+    )
+
+    client = TestClient(app)
+    resp = client.get(f"/conversation/{session_id}/invoice.pdf")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/pdf"
+    assert not (tmp_data_dir / "sessions" / session_id).exists()
+    etag = resp.headers["etag"]
+    cached = client.get(
+        f"/conversation/{session_id}/invoice.pdf", headers={"If-None-Match": etag}
+    )
+    assert cached.status_code == 304
+    assert client.get("/conversation/unknown/invoice.pdf").status_code == 404
+    assert client.get(f"/conversation/{session_id}/invoice.exe").status_code == 404
+
+
+def test_conversation_invoice_does_not_wait_for_running_turn(
+    monkeypatch, tmp_data_dir
+):
+    """Fetching the draft reads the stored state without the turn lock."""
+    from starlette.requests import Request
+
+    monkeypatch.setattr(conversation.settings, "session_lock_timeout", 0.05)
+    session_id = "busy-draft"
+    conversation.PENDING_CONFIRMATION.pop(session_id, None)
+    conversation.INVOICE_STATE[session_id] = InvoiceContext(
+        type="InvoiceContext",
+        customer={"name": "Hans"},
+        service={"description": "Malen"},
+        items=[],
+        amount={},
+    )
+    request = Request({"type": "http", "headers": []})
+
+    async def main():
+        async def slow_turn():
+            async with session_store.session_turn(session_id):
+                await asyncio.sleep(0.3)
+
+        task = asyncio.create_task(slow_turn())
+        await asyncio.sleep(0.01)
+        resp = await conversation.conversation_invoice(session_id, "xml", request)
+        still_running = not task.done()
+        await task
+        return resp, still_running
+
+    resp, still_running = asyncio.run(main())
+    assert resp.status_code == 200 and still_running
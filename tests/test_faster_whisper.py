@@ -0,0 +1,56 @@
+import sys
+import types
+from types import SimpleNamespace
+
+import numpy as np
+
+from app import audio, stt
+from app.settings import settings
+
+
+class FakeWhisperModel:
+    def __init__(self, model, device, compute_type, cpu_threads):
+        self.args = (model, device, compute_type, cpu_threads)
+        self.calls = []
+
+    def transcribe(self, pcm, **kwargs):
+        self.calls.append((pcm, kwargs))
+        words = [
+            SimpleNamespace(word=" drei", start=0.0, end=0.4, probability=0.9),
+            SimpleNamespace(word=" Stunden", start=0.4, end=0.9, probability=0.8),
+        ]
+        segments = [
+            SimpleNamespace(text=" drei Stunden", words=words),
+            SimpleNamespace(text=" Geselden ", words=[]),
+        ]
+        return iter(segments), SimpleNamespace(language="de")
+
+
+def test_faster_whisper_transcribes_with_word_timestamps(monkeypatch):
+    """Loads an int8 CPU model once and returns text plus word timings."""
+    module = types.ModuleType("faster_whisper")
+    module.WhisperModel = FakeWhisperModel
+    monkeypatch.setitem(sys.modules, "faster_whisper", module)
+    monkeypatch.setattr(stt.FasterWhisperTranscriber, "_model_cache", {})
+    monkeypatch.setattr(settings, "stt_provider", "faster-whisper")
+    monkeypatch.setattr(settings, "stt_model", "base")
+    monkeypatch.setattr(settings, "faster_whisper_threads", 4)
+    monkeypatch.setattr(settings, "faster_whisper_beam_size", 3)
+    monkeypatch.setattr(settings, "stt_cache_enabled", False)
+    wav = audio.encode_wav(np.zeros(16000, dtype=np.float32), 16000)
+
+    provider = stt._STT_PROVIDERS["faster-whisper"]()
+    assert stt._STT_PROVIDERS["faster-whisper"]().model is provider.model
+    assert provider.model.args == ("base", "cpu", "int8", 4)
+
+    monkeypatch.setattr(stt, "_select_provider", lambda: provider)
+    text, words = stt.transcribe_audio_words(wav)
+
+    assert text == "3 Stunden Gesellen"
+    assert words == [
+        stt.WordTimestamp("drei", 0.0, 0.4, 0.9),
+        stt.WordTimestamp("Stunden", 0.4, 0.9, 0.8),
+    ]
+    pcm, kwargs = provider.model.calls[0]
+    assert pcm.dtype == np.float32 and len(pcm) == 16000
+    assert kwargs["beam_size"] == 3 and kwargs["word_timestamps"] is True
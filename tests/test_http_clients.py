@@ -0,0 +1,27 @@
+from app import http_clients, metrics
+
+
+def test_ollama_client_is_shared_and_closed(monkeypatch):
+    """Reuses one pooled client until it is closed at shutdown."""
+    monkeypatch.setattr(http_clients.settings, "llm_http_max_connections", 7)
+    http_clients.close_clients()
+
+    first = http_clients.get_ollama_client()
+    assert http_clients.get_ollama_client() is first
+    assert metrics.snapshot()["llm_http.ollama.pool_saturation"] == 0.0
+
+    http_clients.close_clients()
+    assert first.is_closed
+    assert http_clients.get_ollama_client() is not first
+    http_clients.close_clients()
+
+
+def test_openai_client_uses_shared_pool(monkeypatch):
+    """Creates the OpenAI client once with a pooled httpx client."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    http_clients.close_clients()
+
+    client = http_clients.get_openai_client()
+    assert http_clients.get_openai_client() is client
+    assert "llm_http.openai.connections_in_use" in metrics.snapshot()
+    http_clients.close_clients()
@@ -1,10 +1,12 @@
 import json
+import re
 from pathlib import Path
 from fastapi.testclient import TestClient
 
 from app.main import app
 from app import stt, llm_agent, conversation
 from app import settings as app_settings
+from conftest import _async
 
 
 class DummyResponse:
@@ -59,7 +61,12 @@ class DummyOpenAI:
 
             def create(self, **kwargs):
                 self.parent.parent.calls += 1
-                if self.parent.parent.index < len(self.parent.parent.results):
+                # Die Extraktionspässe laufen parallel: Antwort je Pass wählen.
+                prompt = kwargs["messages"][-1]["content"]
+                match = re.match(r"Pass (\d+):", prompt)
+                if match and len(self.parent.parent.results) >= int(match.group(1)):
+                    content = self.parent.parent.results[int(match.group(1)) - 1]
+                elif self.parent.parent.index < len(self.parent.parent.results):
                     content = self.parent.parent.results[self.parent.parent.index]
                     self.parent.parent.index += 1
                 else:
@@ -131,7 +138,7 @@ def test_end_to_end(monkeypatch, tmp_data_dir):
     monkeypatch.setattr(llm_agent.settings, "llm_provider", "openai")
     monkeypatch.setattr(llm_agent.settings, "llm_model", "gpt-4o")
     dummy = DummyOpenAI(dummy_json)
-    monkeypatch.setattr(llm_agent, "OpenAI", lambda: dummy)
+    monkeypatch.setattr(llm_agent, "get_openai_client", lambda: dummy)
 
     monkeypatch.setattr(app_settings.settings, "billing_adapter", None)
 
@@ -142,8 +149,15 @@ def test_end_to_end(monkeypatch, tmp_data_dir):
     assert data["invoice"]["customer"]["name"] == "Anna"
     assert data["invoice"]["items"][1]["worker_role"] == "geselle"
     assert Path(data["log_dir"]).exists()
-    assert Path(data["pdf_path"]).exists()
     assert data["pdf_url"].endswith("invoice.pdf")
+    # PDF und XRechnung entstehen erst beim Abruf.
+    assert "pdf_path" not in data
+    assert not (Path(data["log_dir"]) / "invoice.pdf").exists()
+    relative = Path(data["log_dir"]).relative_to(tmp_data_dir).as_posix()
+    pdf = client.get(f"/data/{relative}/invoice.pdf")
+    assert pdf.status_code == 200
+    assert pdf.content.startswith(b"%PDF")
+    assert client.get(f"/data/{relative}/invoice.xml").status_code == 200
 
 
 def test_conversation_flow_integration(monkeypatch, tmp_data_dir):
@@ -172,12 +186,11 @@ def test_conversation_flow_integration(monkeypatch, tmp_data_dir):
         }
         return json.dumps(base)
 
-    monkeypatch.setattr(conversation, "extract_invoice_context", fake_extract)
-    monkeypatch.setattr(conversation, "send_to_billing_system", lambda i: {"ok": True})
+    monkeypatch.setattr(conversation, "aextract_invoice_context", _async(fake_extract))
     monkeypatch.setattr(
-        conversation, "store_interaction", lambda a, t, i: str(tmp_data_dir)
+        conversation, "asend_to_billing_system", _async(lambda i: {"ok": True})
     )
-    monkeypatch.setattr(conversation, "text_to_speech", lambda t: b"mp3")
+    monkeypatch.setattr(conversation, "atext_to_speech", _async(lambda t: b"mp3"))
 
     client = TestClient(app)
     session_id = "integration"
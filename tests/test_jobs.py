@@ -0,0 +1,147 @@
+import asyncio
+
+from fastapi import HTTPException
+
+from app import jobs
+
+
+def test_job_queue_requeues_interrupted_jobs(tmp_path, monkeypatch):
+    """Jobs that were running during a restart are picked up again."""
+    monkeypatch.setitem(jobs._JOB_HANDLERS, "echo", None)
+    db_path = tmp_path / "jobs.sqlite3"
+    queue = jobs.JobQueue(db_path)
+    job_id = queue.submit("echo", b"daten", "a.wav")
+    assert queue._claim()["id"] == job_id
+    queue.close()
+
+    restarted = jobs.JobQueue(db_path)
+    assert restarted.get(job_id)["status"] == "running"
+    # Solange der Heartbeat frisch ist, gehört der Job noch dem alten Prozess.
+    assert restarted.requeue_interrupted() == 0
+    assert restarted.requeue_interrupted(stale_after=0) == 1
+    assert restarted.pending() == 1
+
+    async def echo(payload, filename):
+        return {"payload": payload.decode(), "filename": filename}
+
+    monkeypatch.setitem(jobs._JOB_HANDLERS, "echo", echo)
+    assert asyncio.run(restarted.process_next()) is True
+    assert asyncio.run(restarted.process_next()) is False
+    job = restarted.get(job_id)
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"payload": "daten", "filename": "a.wav"}
+
+
+def test_job_queue_records_failures(tmp_path, monkeypatch):
+    """Stores HTTP errors of the pipeline with their status code."""
+
+    async def broken(payload, filename):
+        raise HTTPException(status_code=502, detail="invalid invoice")
+
+    monkeypatch.setitem(jobs._JOB_HANDLERS, "broken", broken)
+    queue = jobs.JobQueue(tmp_path / "jobs.sqlite3")
+    job_id = queue.submit("broken", b"x")
+    asyncio.run(queue.process_next())
+    job = queue.get(job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "invalid invoice"
+    assert job["status_code"] == 502
+
+
+def test_job_queue_fails_job_with_unserializable_result(tmp_path, monkeypatch):
+    """A result that cannot be stored marks the job failed instead of running."""
+
+    async def odd(payload, filename):
+        return {"value": object()}
+
+    monkeypatch.setitem(jobs._JOB_HANDLERS, "odd", odd)
+    queue = jobs.JobQueue(tmp_path / "jobs.sqlite3")
+    job_id = queue.submit("odd", b"x")
+    assert asyncio.run(queue.process_next()) is True
+    job = queue.get(job_id)
+    assert job["status"] == "failed"
+    assert job["status_code"] == 500
+
+
+def test_job_worker_survives_claim_errors(tmp_path, monkeypatch):
+    """A failing claim is logged and the worker keeps processing jobs."""
+
+    async def echo(payload, filename):
+        return {"payload": payload.decode()}
+
+    monkeypatch.setitem(jobs._JOB_HANDLERS, "echo", echo)
+    monkeypatch.setattr(jobs.settings, "job_poll_interval", 0.01)
+    queue = jobs.JobQueue(tmp_path / "jobs.sqlite3", workers=1)
+    claim = queue._claim
+    calls = []
+
+    def flaky_claim():
+        calls.append(1)
+        if len(calls) == 1:
+            raise jobs.sqlite3.OperationalError("database is locked")
+        return claim()
+
+    monkeypatch.setattr(queue, "_claim", flaky_claim)
+    job_id = queue.submit("echo", b"daten")
+
+    async def scenario():
+        queue.start()
+        for _ in range(200):
+            if queue.get(job_id)["status"] == "succeeded":
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+
+    asyncio.run(scenario())
+    assert queue.get(job_id)["status"] == "succeeded"
+    assert len(calls) > 1
+
+
+def test_job_queue_claims_each_job_once_across_instances(tmp_path, monkeypatch):
+    """Two queues sharing a database never claim the same job."""
+    monkeypatch.setitem(jobs._JOB_HANDLERS, "echo", None)
+    db_path = tmp_path / "jobs.sqlite3"
+    first, second = jobs.JobQueue(db_path), jobs.JobQueue(db_path)
+    job_ids = {first.submit("echo", b"a"), first.submit("echo", b"b")}
+
+    claimed = [first._claim()["id"], second._claim()["id"]]
+    assert set(claimed) == job_ids
+    assert first._claim() is None and second._claim() is None
+
+
+def test_job_queue_gives_up_on_repeatedly_interrupted_jobs(tmp_path, monkeypatch):
+    """A job that keeps crashing its process is failed after max attempts."""
+    monkeypatch.setitem(jobs._JOB_HANDLERS, "echo", None)
+    monkeypatch.setattr(jobs.settings, "job_max_attempts", 2)
+    queue = jobs.JobQueue(tmp_path / "jobs.sqlite3")
+    job_id = queue.submit("echo", b"x")
+
+    assert queue._claim()["id"] == job_id
+    assert queue.requeue_interrupted(stale_after=0) == 1
+    assert queue._claim()["id"] == job_id
+    assert queue.requeue_interrupted(stale_after=0) == 0
+    job = queue.get(job_id)
+    assert job["status"] == "failed"
+    assert job["status_code"] == 500
+
+
+def test_job_queue_stop_releases_running_jobs(tmp_path, monkeypatch):
+    """On shutdown a queue hands its running jobs back without waiting."""
+    started = asyncio.Event()
+
+    async def slow(payload, filename):
+        started.set()
+        await asyncio.sleep(10)
+
+    monkeypatch.setitem(jobs._JOB_HANDLERS, "slow", slow)
+    queue = jobs.JobQueue(tmp_path / "jobs.sqlite3", workers=1)
+    job_id = queue.submit("slow", b"x")
+
+    async def scenario():
+        queue.start()
+        await asyncio.wait_for(started.wait(), timeout=5)
+        await queue.stop()
+
+    asyncio.run(scenario())
+    assert queue.get(job_id)["status"] == "queued"
+    assert queue._claim()["id"] == job_id
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from app.json_stream import JSONStreamGuard, StreamAborted
+from app.models import CustomerPass, MaterialPass
+
+
+def _feed_tokens(guard, text, size=3):
+    for start in range(0, len(text), size):
+        if guard.feed(text[start : start + size]):
+            return True
+    return False
+
+
+def test_guard_accepts_valid_payload_and_stops_at_closing_brace():
+    """Completes once the top-level object closes and ignores trailing text."""
+    payload = json.dumps(
+        {"customer": {"name": "Müller {GmbH}", "address": None}, "notes": ["a\"}"]}
+    )
+    guard = JSONStreamGuard(CustomerPass)
+    assert _feed_tokens(guard, payload + "\n\n   ")
+    assert guard.text == payload
+    CustomerPass.model_validate_json(guard.text)
+
+
+def test_guard_aborts_on_json_schema():
+    """Aborts as soon as the model starts writing the schema itself."""
+    guard = JSONStreamGuard(MaterialPass)
+    with pytest.raises(StreamAborted) as exc:
+        _feed_tokens(guard, '{"$defs": {"MaterialLineItem": {"properties": {}}}}')
+    assert "json schema" in exc.value.reason
+    assert exc.value.partial.endswith('"$defs"')
+
+
+@pytest.mark.parametrize(
+    "text, reason",
+    [
+        ("Hier ist das JSON: {}", "not an object"),
+        ('{"items": []}', "unexpected field 'items'"),
+        ('{"line_items": {"description": "Rohr"}}', "expects array"),
+        ('{"notes": "keine"}', "expects array"),
+    ],
+)
+def test_guard_aborts_on_mismatching_structure(text, reason):
+    guard = JSONStreamGuard(MaterialPass)
+    with pytest.raises(StreamAborted) as exc:
+        _feed_tokens(guard, text)
+    assert reason in exc.value.reason
+
+
+def test_guard_tolerates_coercible_scalars():
+    """Leaves scalar type coercion to the final pydantic validation."""
+    guard = JSONStreamGuard(MaterialPass)
+    assert _feed_tokens(
+        guard, '{"line_items": [], "confidence_per_field": null, "notes": []}'
+    )
@@ -1,4 +1,8 @@
+import asyncio
 import json
+import threading
+import time
+from types import SimpleNamespace
 
 from app import llm_agent
 
@@ -17,10 +21,12 @@ class DummyChatResponse:
 
 
 class DummyOpenAI:
+    """Liefert Antworten je Pass, da die Pässe parallel laufen."""
+
     def __init__(self, responses):
-        self.responses = responses
-        self.index = 0
+        self.responses = {key: list(value) for key, value in responses.items()}
         self.calls = 0
+        self.lock = threading.Lock()
 
     class Chat:
         def __init__(self, parent):
@@ -31,12 +37,13 @@ class DummyOpenAI:
                 self.parent = parent
 
             def create(self, **kwargs):
-                self.parent.parent.calls += 1
-                if self.parent.parent.index < len(self.parent.parent.responses):
-                    content = self.parent.parent.responses[self.parent.parent.index]
-                    self.parent.parent.index += 1
-                else:
-                    content = self.parent.parent.responses[-1]
+                dummy = self.parent.parent
+                prompt = kwargs["messages"][-1]["content"]
+                with dummy.lock:
+                    dummy.calls += 1
+                    key = next(k for k in dummy.responses if prompt.startswith(k))
+                    queue = dummy.responses[key]
+                    content = queue.pop(0) if len(queue) > 1 else queue[0]
                 return DummyChatResponse(content)
 
         @property
@@ -49,76 +56,240 @@ class DummyOpenAI:
 
 
 def test_multi_pass_repairs_invalid_json(monkeypatch):
-    responses = [
-        json.dumps(
-            {
-                "customer": {
-                    "name": "Klara",
-                    "address": {
-                        "street": "Hauptstraße 5",
-                        "postal_code": "12345",
-                        "city": "Berlin",
-                    },
+    responses = {
+        "Pass 1": [
+            json.dumps(
+                {
+                    "customer": {
+                        "name": "Klara",
+                        "address": {
+                            "street": "Hauptstraße 5",
+                            "postal_code": "12345",
+                            "city": "Berlin",
+                        },
+                    }
                 }
-            }
-        ),
-        "not json",
-        json.dumps(
+            )
+        ],
+        "Pass 2": [
+            "not json",
+            json.dumps(
+                {
+                    "line_items": [
+                        {
+                            "description": "Tür",
+                            "type": "material",
+                            "quantity": 1.0,
+                            "unit": "Stk",
+                            "unit_price_cents": 12000,
+                        }
+                    ]
+                }
+            ),
+        ],
+        "Pass 3": [
+            json.dumps(
+                {
+                    "line_items": [
+                        {
+                            "description": "Meisterstunden",
+                            "type": "labor",
+                            "role": "meister",
+                            "quantity": 2.0,
+                            "unit": "h",
+                            "unit_price_cents": 8000,
+                        },
+                        {
+                            "description": "Gesellenstunden",
+                            "type": "labor",
+                            "role": "geselle",
+                            "quantity": 3.0,
+                            "unit": "h",
+                            "unit_price_cents": 5000,
+                        },
+                    ]
+                }
+            )
+        ],
+        "Pass 4": [
+            json.dumps(
+                {
+                    "line_items": [
+                        {
+                            "description": "Anfahrt",
+                            "type": "travel",
+                            "quantity": 35.0,
+                            "unit": "km",
+                            "unit_price_cents": 150,
+                        }
+                    ]
+                }
+            )
+        ],
+    }
+    dummy = DummyOpenAI(responses)
+    monkeypatch.setattr(llm_agent.settings, "llm_provider", "openai")
+    monkeypatch.setattr(llm_agent, "get_openai_client", lambda: dummy)
+    result = llm_agent.extract_invoice_context(
+        "Tür und Fenster, Meister 2h, Geselle 3h, 35km Anfahrt"
+    )
+    payload = json.loads(result)
+    assert payload["customer"]["name"] == "Klara"
+    assert len(payload["line_items"]) == 4
+    assert dummy.calls == 5
+
+
+def test_multi_pass_runs_passes_concurrently(monkeypatch):
+    """Runs the four passes in parallel up to the provider limit."""
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+    payloads = {
+        "Pass 1": json.dumps({"customer": {"name": "Klara"}}),
+        "Pass 2": json.dumps({"line_items": []}),
+        "Pass 3": json.dumps(
             {
                 "line_items": [
                     {
-                        "description": "Tür",
-                        "type": "material",
+                        "description": "Gesellenstunden",
+                        "type": "labor",
+                        "role": "geselle",
                         "quantity": 1.0,
-                        "unit": "Stk",
-                        "unit_price_cents": 12000,
+                        "unit": "h",
                     }
                 ]
             }
         ),
-        json.dumps(
+        "Pass 4": json.dumps({"line_items": []}),
+    }
+
+    class SlowProvider(llm_agent.LLMProvider):
+        name = "slow"
+
+        @property
+        def max_concurrency(self) -> int:
+            return 4
+
+        def complete(self, prompt, system_prompt=None):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+            return next(v for k, v in payloads.items() if prompt.startswith(k))
+
+    candidates = llm_agent.preextract_candidates("Geselle 1h")
+    result = llm_agent._extract_multi_pass(SlowProvider(), "Geselle 1h", candidates)
+    assert json.loads(result)["customer"]["name"] == "Klara"
+    assert peak == 4
+
+
+def test_async_multi_pass_respects_provider_limit(monkeypatch):
+    """Awaits all passes via acomplete without exceeding max_concurrency."""
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    class LimitedProvider(llm_agent.LLMProvider):
+        name = "limited"
+
+        @property
+        def max_concurrency(self) -> int:
+            return 2
+
+        def complete(self, prompt, system_prompt=None):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+            if prompt.startswith("Pass 1"):
+                return json.dumps({"customer": {"name": "Klara"}})
+            if prompt.startswith("Pass 3"):
+                return json.dumps(
+                    {
+                        "line_items": [
+                            {
+                                "description": "Meisterstunden",
+                                "type": "labor",
+                                "role": "meister",
+                                "quantity": 1.0,
+                                "unit": "h",
+                            }
+                        ]
+                    }
+                )
+            return json.dumps({"line_items": []})
+
+    monkeypatch.setattr(llm_agent, "_select_provider", LimitedProvider)
+    result = asyncio.run(llm_agent.aextract_invoice_context("Meister 1h"))
+    assert json.loads(result)["customer"]["name"] == "Klara"
+    assert peak == 2
+
+
+def test_ollama_stream_aborts_schema_output_and_repairs(monkeypatch):
+    """Stops a stream that starts with the schema and goes straight to repair."""
+    schema_tokens = ['{"', "$defs", '": {', '"Customer"'] + [" "] * 50
+    payloads = {
+        "Pass 1": json.dumps({"customer": {"name": "Klara"}}),
+        "Pass 3": json.dumps(
             {
                 "line_items": [
                     {
                         "description": "Meisterstunden",
                         "type": "labor",
                         "role": "meister",
-                        "quantity": 2.0,
-                        "unit": "h",
-                        "unit_price_cents": 8000,
-                    },
-                    {
-                        "description": "Gesellenstunden",
-                        "type": "labor",
-                        "role": "geselle",
-                        "quantity": 3.0,
+                        "quantity": 1.0,
                         "unit": "h",
-                        "unit_price_cents": 5000,
-                    },
-                ]
-            }
-        ),
-        json.dumps(
-            {
-                "line_items": [
-                    {
-                        "description": "Anfahrt",
-                        "type": "travel",
-                        "quantity": 35.0,
-                        "unit": "km",
-                        "unit_price_cents": 150,
                     }
                 ]
             }
         ),
-    ]
-    dummy = DummyOpenAI(responses)
-    monkeypatch.setattr(llm_agent.settings, "llm_provider", "openai")
-    monkeypatch.setattr(llm_agent, "OpenAI", lambda: dummy)
-    result = llm_agent.extract_invoice_context(
-        "Tür und Fenster, Meister 2h, Geselle 3h, 35km Anfahrt"
+    }
+    consumed = []
+
+    class FakeStream:
+        def __init__(self, tokens):
+            self.tokens = tokens
+            self.status_code = 200
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def iter_lines(self):
+            for token in self.tokens:
+                consumed.append(token)
+                yield json.dumps({"response": token, "done": False})
+            yield json.dumps({"response": "", "done": True})
+
+    def fake_stream(method, url, json=None, timeout=None):
+        prompt = json["prompt"]
+        assert json["stream"] is True
+        if "Pass 1" in prompt and "Ungültige Antwort" not in prompt:
+            return FakeStream(schema_tokens)
+        payload = next(
+            (v for k, v in payloads.items() if k in prompt), '{"line_items": []}'
+        )
+        return FakeStream([payload[:10], payload[10:], "\n", " " * 20])
+
+    monkeypatch.setattr(llm_agent.settings, "llm_provider", "ollama")
+    monkeypatch.setattr(llm_agent.settings, "ollama_stream", True)
+    monkeypatch.setattr(llm_agent.settings, "llm_cache_enabled", False)
+    monkeypatch.setattr(
+        llm_agent,
+        "get_ollama_client",
+        lambda: SimpleNamespace(stream=fake_stream),
     )
-    payload = json.loads(result)
-    assert payload["customer"]["name"] == "Klara"
-    assert len(payload["line_items"]) == 4
-    assert dummy.calls == 5
+
+    result = llm_agent.extract_invoice_context("Meister 1h für Klara")
+    assert json.loads(result)["customer"]["name"] == "Klara"
+    # Nur die ersten Schema-Token und keine angehängten Leerzeichen gelesen.
+    assert consumed.count(" ") == 0
+    assert consumed.count("$defs") == 1
@@ -3,6 +3,7 @@ import shutil
 
 from app.models import InvoiceContext, InvoiceItem
 from app.persistence import store_interaction, DATA_DIR
+from app.settings import settings
 
 
 def _invoice():
@@ -23,7 +24,8 @@ def _invoice():
     )
 
 
-def test_store_interaction_creates_xrechnung(tmp_path):
+def test_store_interaction_creates_xrechnung(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "invoice_artifacts_lazy", False)
     # Ensure DATA_DIR points to temporary directory for test isolation
     original_data_dir = DATA_DIR.resolve()
     try:
@@ -40,3 +42,38 @@ def test_store_interaction_creates_xrechnung(tmp_path):
         # Cleanup any created directories
         shutil.rmtree(tmp_path, ignore_errors=True)
         persistence_module.DATA_DIR = original_data_dir
+
+
+def test_append_turn_journals_without_rendering(tmp_data_dir):
+    """Conversation turns append to one journal per session, no PDF/XML."""
+    import app.persistence as persistence
+
+    first = persistence.append_turn(
+        "abc", b"wav1", [{"role": "user", "content": "eins"}], _invoice()
+    )
+    second = persistence.append_turn(
+        "abc", b"", [{"role": "assistant", "content": "zwei"}], _invoice()
+    )
+
+    assert first == second == str(tmp_data_dir / "sessions" / "abc")
+    entries = persistence.read_journal("abc")
+    assert [e["turn"] for e in entries] == [1, 2]
+    assert entries[0]["audio"] == "turn-0001.wav" and entries[1]["audio"] is None
+    assert entries[1]["messages"][0]["content"] == "zwei"
+    assert sorted(p.name for p in Path(first).iterdir()) == [
+        "journal.jsonl",
+        "turn-0001.wav",
+    ]
+
+    persistence.render_session_artifacts("abc", [], _invoice())
+    assert (Path(first) / "invoice.json").exists()
+    # PDF und XML entstehen erst beim Abruf (app.artifacts).
+    assert not (Path(first) / "invoice.pdf").exists()
+
+
+def test_session_dir_sanitizes_ids(tmp_data_dir):
+    import app.persistence as persistence
+
+    path = persistence.session_dir("../x y")
+    assert path.parent == tmp_data_dir / "sessions"
+    assert ".." not in path.name and path != persistence.session_dir("___x_y")
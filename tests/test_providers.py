@@ -0,0 +1,100 @@
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import main, providers, stt, tts  # noqa: E402
+
+
+class FakeProvider:
+    created = 0
+
+    def __init__(self, config):
+        FakeProvider.created += 1
+        self.config = config
+        self.preloaded = False
+        self.closed = False
+
+    def preload(self):
+        if self.config == "kaputt":
+            raise RuntimeError("Modell fehlt")
+        self.preloaded = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def registry():
+    config = {"value": "a"}
+    FakeProvider.created = 0
+    registry = providers.ProviderRegistry(
+        "test", lambda: FakeProvider(config["value"]), lambda: config["value"]
+    )
+    yield registry, config
+    registry.close()
+    providers._REGISTRIES.pop("test", None)
+
+
+def test_registry_creates_provider_once_per_configuration(registry):
+    """Reuses the instance and closes it when the configuration changes."""
+    registry, config = registry
+    assert registry.status()["state"] == providers.IDLE
+    first = registry.get()
+    assert registry.get() is first
+    assert FakeProvider.created == 1
+
+    config["value"] = "b"
+    second = registry.get()
+    assert second is not first and first.closed
+    registry.preload()
+    assert second.preloaded
+    assert registry.status()["state"] == providers.READY
+
+
+def test_ready_endpoint_reports_failed_preload(registry, monkeypatch):
+    registry, config = registry
+    providers.close_all()
+    config["value"] = "kaputt"
+    providers.preload_all(["test"])
+    client = TestClient(main.app)
+    response = client.get("/ready")
+    assert response.status_code == 503
+    body = response.json()["providers"]["test"]
+    assert body == {
+        "provider": "FakeProvider",
+        "state": "failed",
+        "error": "Modell fehlt",
+        "load_seconds": body["load_seconds"],
+    }
+
+    config["value"] = "a"
+    providers.preload_all(["test"])
+    assert client.get("/ready").status_code == 200
+
+
+def test_failed_optional_provider_only_degrades_readiness():
+    FakeProvider.created = 0
+    optional = providers.ProviderRegistry(
+        "optional", lambda: FakeProvider("kaputt"), lambda: "kaputt", required=False
+    )
+    try:
+        providers.preload_all(["optional"])
+        response = TestClient(main.app).get("/ready")
+        assert response.json()["providers"]["optional"]["state"] == "failed"
+        assert response.json()["degraded"] == ["optional"]
+        assert providers.is_ready() == (response.status_code == 200)
+    finally:
+        optional.close()
+        providers._REGISTRIES.pop("optional", None)
+
+
+def test_stt_and_tts_providers_are_cached(monkeypatch):
+    monkeypatch.setattr(stt.settings, "stt_provider", "openai")
+    monkeypatch.setattr(stt.settings, "stt_cache_enabled", False)
+    monkeypatch.setattr(tts.settings, "tts_provider", "gtts")
+    assert stt._select_provider() is stt._select_provider()
+    assert tts._select_provider() is tts._select_provider()
@@ -0,0 +1,381 @@
+import asyncio
+import fnmatch
+import socketserver
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app import conversation, metrics, session_store
+from app.models import InvoiceContext, InvoiceItem
+from app.settings import settings
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    """Beantwortet die Hash-Befehle, die der Session-Store verwendet."""
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def _bulk(self, value):
+        if value is None:
+            return b"$-1\r\n"
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _array(self, values):
+        return b"*%d\r\n" % len(values) + b"".join(self._bulk(v) for v in values)
+
+    def handle(self):
+        data = self.server.data
+        while (args := self._read_command()) is not None:
+            name, key = args[0].upper(), args[1] if len(args) > 1 else b""
+            if name == b"HGETALL":
+                pairs = [x for kv in data.get(key, {}).items() for x in kv]
+                reply = self._array(pairs)
+            elif name == b"HGET":
+                reply = self._bulk(data.get(key, {}).get(args[2]))
+            elif name == b"HSET":
+                fields = data.setdefault(key, {})
+                for i in range(2, len(args), 2):
+                    fields[args[i]] = args[i + 1]
+                reply = b":1\r\n"
+            elif name == b"HDEL":
+                fields = data.get(key, {})
+                for field in args[2:]:
+                    fields.pop(field, None)
+                if not fields:
+                    data.pop(key, None)
+                reply = b":1\r\n"
+            elif name == b"HEXISTS":
+                reply = b":%d\r\n" % (args[2] in data.get(key, {}))
+            elif name == b"SET":
+                # Nur die Form ``SET key value NX PX ms`` der Sperre.
+                if key in data:
+                    reply = b"$-1\r\n"
+                else:
+                    data[key] = args[2]
+                    reply = b"+OK\r\n"
+            elif name == b"EVAL":
+                # Das Entsperr-Skript: löschen, wenn das Token passt.
+                lock_key, token = args[3], args[4]
+                released = data.get(lock_key) == token
+                if released:
+                    del data[lock_key]
+                reply = b":%d\r\n" % released
+            elif name == b"EXPIRE":
+                self.server.expire[key] = int(args[2])
+                reply = b":1\r\n"
+            elif name == b"SCAN":
+                pattern = args[3].decode()
+                keys = [k for k in data if fnmatch.fnmatch(k.decode(), pattern)]
+                reply = b"*2\r\n" + self._bulk(b"0") + self._array(keys)
+            else:
+                reply = b"-ERR unknown command\r\n"
+            self.wfile.write(reply)
+
+
+@pytest.fixture
+def resp_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _RespHandler)
+    server.daemon_threads = True
+    server.data, server.expire = {}, {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "session_store", request.param)
+    monkeypatch.setattr(settings, "session_db_path", str(tmp_path / "s.sqlite3"))
+    if request.param == "redis":
+        server = request.getfixturevalue("resp_server")
+        host, port = server.server_address
+        monkeypatch.setattr(settings, "session_redis_url", f"redis://{host}:{port}/0")
+    session_store.close_session_store()
+    yield session_store.get_session_store()
+    session_store.close_session_store()
+
+
+def _invoice():
+    return InvoiceContext(
+        type="InvoiceContext",
+        customer={"name": "Hans Müller"},
+        service={"description": "Malerarbeiten"},
+        items=[
+            InvoiceItem(
+                description="Farbe", category="material", quantity=2, unit="l",
+                unit_price=12.5,
+            )
+        ],
+        amount={"total": 25.0, "currency": "EUR"},
+    )
+
+
+def test_session_views_round_trip(store):
+    """Every backend serializes and restores the conversation fields."""
+    conversation.SESSIONS["s1"] = [{"role": "user", "content": "Hallo"}]
+    conversation.INVOICE_STATE["s1"] = _invoice()
+    conversation.SESSION_STATUS["s1"] = "collecting"
+    conversation.PENDING_CONFIRMATION["s2"] = {
+        "invoice": _invoice(),
+        "summary": "Bestätigen?",
+    }
+
+    assert conversation.INVOICE_STATE["s1"] == _invoice()
+    assert conversation.PENDING_CONFIRMATION["s2"]["invoice"] == _invoice()
+    assert conversation.SESSION_STATUS.get("s1") == "collecting"
+    assert "s1" in conversation.SESSIONS and "s2" not in conversation.SESSIONS
+    assert sorted(conversation.SESSION_STATUS) == ["s1"]
+
+    del conversation.SESSION_STATUS["s1"]
+    assert conversation.SESSION_STATUS.get("s1") is None
+    conversation.INVOICE_STATE.clear()
+    assert "s1" not in conversation.INVOICE_STATE
+    assert conversation.SESSIONS["s1"][0]["content"] == "Hallo"
+
+
+def test_session_turn_writes_back_in_place_changes(store):
+    async def turn():
+        async with session_store.session_turn("s1"):
+            msgs = conversation.SESSIONS.setdefault("s1", [])
+            msgs.append({"role": "user", "content": "eins"})
+            conversation.SESSIONS.setdefault("s1", []).append(
+                {"role": "assistant", "content": "zwei"}
+            )
+            conversation.INVOICE_STATE["s1"] = _invoice()
+            conversation.INVOICE_STATE["s1"].items[0].quantity = 3
+        # Außerhalb der Runde ist die andere Session unberührt.
+        async with session_store.session_view("s2"):
+            return conversation.SESSIONS.get("s2")
+
+    assert asyncio.run(turn()) is None
+    assert [m["content"] for m in conversation.SESSIONS["s1"]] == ["eins", "zwei"]
+    assert conversation.INVOICE_STATE["s1"].items[0].quantity == 3
+
+
+def test_large_values_are_compressed():
+    data = ("Position " * 200).encode()
+    packed = session_store.pack(data)
+    assert len(packed) < len(data) // 4
+    assert session_store.unpack(packed) == data
+    assert session_store.unpack(session_store.pack(b"{}")) == b"{}"
+
+
+def test_memory_store_evicts_expired_and_oldest(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(session_store.time, "monotonic", lambda: now[0])
+    store = session_store.InMemorySessionStore(ttl=60, max_sessions=2)
+    store.save("a", {"status": b"1"})
+    store.save("b", {"status": b"2"})
+    store.load("a")  # "a" zuletzt benutzt, "b" ist der älteste Eintrag
+    store.save("c", {"status": b"3"})
+    assert store.sessions("status") == ["a", "c"]
+
+    now[0] += 61
+    assert store.load("a") == {} and len(store) == 0
+
+
+def test_memory_store_expires_recently_read_sessions(monkeypatch):
+    """A read moves the entry behind newer ones but must not extend its TTL."""
+    now = [1000.0]
+    monkeypatch.setattr(session_store.time, "monotonic", lambda: now[0])
+    store = session_store.InMemorySessionStore(ttl=60, max_sessions=10)
+    store.save("a", {"status": b"1"})
+    now[0] += 30
+    store.save("b", {"status": b"2"})
+    assert store.load("a") == {"status": b"1"}  # "a" liegt jetzt hinter "b"
+
+    now[0] += 31
+    assert store.load("a") == {}
+    assert store.sessions("status") == ["b"]
+
+
+def test_session_view_reads_without_blocking_the_loop(tmp_path, monkeypatch):
+    """Outside a turn, sqlite/redis are only read via session_view."""
+    monkeypatch.setattr(settings, "session_store", "sqlite")
+    monkeypatch.setattr(settings, "session_db_path", str(tmp_path / "s.sqlite3"))
+    session_store.close_session_store()
+    conversation.SESSION_STATUS["s1"] = "collecting"
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            conversation.SESSION_STATUS.get("s1")
+        async with session_store.session_view("s1"):
+            status = conversation.SESSION_STATUS.get("s1")
+            with pytest.raises(RuntimeError):
+                conversation.SESSION_STATUS["s1"] = "completed"
+        return status
+
+    assert asyncio.run(main()) == "collecting"
+    assert conversation.SESSION_STATUS["s1"] == "collecting"
+    session_store.close_session_store()
+
+
+def test_speech_urls_survive_worker_switch(tmp_path, monkeypatch):
+    """Speech IDs live in the shared store, not in the worker process."""
+    monkeypatch.setattr(settings, "session_store", "sqlite")
+    monkeypatch.setattr(settings, "session_db_path", str(tmp_path / "s.sqlite3"))
+    session_store.close_session_store()
+    speech_id = conversation._register_speech("s1", "Hallo")
+    # Ein anderer Worker öffnet den Store neu.
+    session_store.close_session_store()
+    assert conversation._lookup_speech("s1", speech_id) == "Hallo"
+    assert conversation._lookup_speech("s2", speech_id) is None
+
+    monkeypatch.setattr(settings, "conversation_audio_ttl", -1)
+    assert conversation._lookup_speech("s1", speech_id) is None
+    session_store.close_session_store()
+
+
+def test_sqlite_store_expires_sessions(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(session_store.time, "time", lambda: now[0])
+    store = session_store.SQLiteSessionStore(tmp_path / "s.sqlite3", ttl=60)
+    store.save("a", {"status": b"1", "messages": b"2"})
+    store.save("a", {}, deleted=["messages"])
+    assert store.load("a") == {"status": b"1"}
+    now[0] += 61
+    assert store.get("a", "status") is None and store.sessions("status") == []
+    store.close()
+
+
+def test_redis_store_sets_ttl(resp_server, monkeypatch):
+    host, port = resp_server.server_address
+    store = session_store.RedisSessionStore(f"redis://{host}:{port}/0", ttl=90)
+    store.save("a", {"status": b"1"})
+    assert resp_server.expire[b"session:a"] == 90
+    assert store.load("a") == {"status": b"1"}
+    store.close()
+    # Nach einem Verbindungsabbruch wird neu verbunden.
+    assert store.get("a", "status") == b"1"
+    store.close()
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "redis"])
+def test_store_lock_is_shared_between_workers(backend, request, tmp_path):
+    """A second worker cannot take a session lock held by the first."""
+
+    def open_store():
+        if backend == "sqlite":
+            return session_store.SQLiteSessionStore(tmp_path / "s.sqlite3", ttl=60)
+        host, port = request.getfixturevalue("resp_server").server_address
+        return session_store.RedisSessionStore(f"redis://{host}:{port}/0", ttl=60)
+
+    first, second = open_store(), open_store()
+    assert first.try_lock("s1", "a", 30)
+    assert not second.try_lock("s1", "b", 30)
+    assert second.try_lock("s2", "b", 30)
+    # Fremde Tokens geben die Sperre nicht frei.
+    second.unlock("s1", "b")
+    assert not second.try_lock("s1", "b", 30)
+    first.unlock("s1", "a")
+    assert second.try_lock("s1", "b", 30)
+    first.close()
+    second.close()
+
+
+def test_sqlite_store_lock_expires(tmp_path):
+    store = session_store.SQLiteSessionStore(tmp_path / "s.sqlite3", ttl=60)
+    assert store.try_lock("s1", "crashed", -1)
+    assert store.try_lock("s1", "next", 30)
+    store.close()
+
+
+def test_session_turn_waits_for_lock_of_other_worker(store, monkeypatch):
+    """A turn held by another worker (store lock) is answered with busy."""
+    metrics.reset()
+    monkeypatch.setattr(settings, "session_lock_timeout", 0.1)
+    store.try_lock("busy", "other-worker", 30)
+
+    async def main():
+        async with session_store.session_turn("busy"):
+            conversation.SESSION_STATUS["busy"] = "collecting"
+
+    if isinstance(store, session_store.InMemorySessionStore):
+        asyncio.run(main())
+        return
+    with pytest.raises(session_store.SessionBusyError):
+        asyncio.run(main())
+    assert metrics.snapshot()["session_lock.store_contended"] == 1
+    store.unlock("busy", "other-worker")
+    asyncio.run(main())
+    assert conversation.SESSION_STATUS["busy"] == "collecting"
+
+
+def test_session_turns_are_serialized_per_session(store, monkeypatch):
+    """Turns of one session run in order; other sessions are not blocked."""
+    metrics.reset()
+    events = []
+
+    async def turn(session_id, label, delay):
+        async with session_store.session_turn(session_id):
+            msgs = conversation.SESSIONS.setdefault(session_id, [])
+            events.append(f"{label}+")
+            await asyncio.sleep(delay)
+            msgs.append({"role": "user", "content": label})
+            events.append(f"{label}-")
+
+    async def main():
+        first = asyncio.create_task(turn("s1", "a", 0.1))
+        await asyncio.sleep(0.01)
+        await asyncio.gather(turn("s1", "b", 0), turn("s2", "c", 0))
+        await first
+
+    asyncio.run(main())
+
+    # "c" (andere Session) läuft während "a", "b" erst danach.
+    assert events.index("c-") < events.index("a-") < events.index("b+")
+    assert [m["content"] for m in conversation.SESSIONS["s1"]] == ["a", "b"]
+    stats = metrics.snapshot()
+    assert stats["session_lock.contended"] == 1
+    assert stats["session_lock.acquired"] == 3
+    assert stats["session_lock.waiting"] == 0
+    assert len(session_store._session_locks) == 0
+
+
+def test_session_turn_wait_is_bounded(monkeypatch):
+    metrics.reset()
+    monkeypatch.setattr(settings, "session_lock_timeout", 0.05)
+
+    async def main():
+        async def slow():
+            async with session_store.session_turn("busy"):
+                await asyncio.sleep(0.3)
+
+        task = asyncio.create_task(slow())
+        await asyncio.sleep(0.01)
+        with pytest.raises(session_store.SessionBusyError):
+            async with session_store.session_turn("busy"):
+                pass
+        await task
+
+    asyncio.run(main())
+    assert metrics.snapshot()["session_lock.timeouts"] == 1
+
+
+def test_concurrent_conversation_turn_returns_409(monkeypatch):
+    monkeypatch.setattr(settings, "session_lock_timeout", 0.01)
+
+    async def main():
+        async def slow():
+            async with session_store.session_turn("dup"):
+                await asyncio.sleep(0.2)
+
+        task = asyncio.create_task(slow())
+        await asyncio.sleep(0.01)
+        with pytest.raises(HTTPException) as exc:
+            await conversation._handle_conversation("dup", "Hallo", b"")
+        await task
+        return exc.value.status_code
+
+    assert asyncio.run(main()) == 409
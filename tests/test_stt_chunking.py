@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from app import audio, stt
+from app.settings import settings
+from app.stt import chunking
+
+RATE = chunking.CHUNK_SAMPLE_RATE
+
+
+def _tone(seconds: float) -> np.ndarray:
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def test_plan_chunks_cuts_at_silence_with_overlap():
+    """Cuts in the quiet gap before the limit; chunks overlap by the setting."""
+    samples = np.concatenate(
+        [_tone(8.0), np.zeros(RATE // 2, np.float32), _tone(6.0)]
+    )
+    plan = chunking.plan_chunks(samples, RATE, max_seconds=10, overlap_seconds=1)
+    assert len(plan) == 2
+    (start_a, end_a), (start_b, end_b) = plan
+    assert start_a == 0 and end_b == len(samples)
+    assert 8.0 * RATE <= end_a <= 8.5 * RATE
+    assert end_a - start_b == RATE
+
+
+def test_plan_chunks_keeps_short_audio_whole():
+    samples = _tone(3.0)
+    assert chunking.plan_chunks(samples, RATE, 10, 1) == [(0, len(samples))]
+
+
+def test_stitch_transcripts_removes_overlap():
+    texts = [
+        "Drei Stunden Arbeit am Dach und zwei Meter",
+        "zwei Meter Rinne, Anfahrt zwanzig Kilometer.",
+        "zwanzig Kilometer. Fertig.",
+    ]
+    assert chunking.stitch_transcripts(texts, overlap_seconds=1) == (
+        "Drei Stunden Arbeit am Dach und zwei Meter Rinne, "
+        "Anfahrt zwanzig Kilometer. Fertig."
+    )
+    # Ohne gemeinsame Wortfolge werden die Texte einfach verbunden.
+    assert chunking.stitch_transcripts(["a b", "c d"], 1) == "a b c d"
+
+
+class _RecordingProvider(stt.STTProvider):
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def transcribe(self, audio_bytes: bytes) -> str:
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        return f"teil{zlib.crc32(audio_bytes)}"
+
+
+def _speech(seconds: float) -> np.ndarray:
+    # Rauschen statt Sinus, damit sich keine zwei Abschnitte gleichen.
+    rng = np.random.default_rng(7)
+    return (0.2 * rng.standard_normal(int(seconds * RATE))).astype(np.float32)
+
+
+def _chunk_settings(monkeypatch):
+    monkeypatch.setattr(settings, "stt_chunking", True)
+    monkeypatch.setattr(settings, "stt_chunk_seconds", 4.0)
+    monkeypatch.setattr(settings, "stt_chunk_overlap", 0.5)
+    monkeypatch.setattr(settings, "stt_chunk_parallelism", 2)
+
+
+def test_transcribe_audio_chunks_long_recordings(monkeypatch):
+    """Transcribes chunks concurrently but never more than the parallelism."""
+    _chunk_settings(monkeypatch)
+    provider = _RecordingProvider()
+    monkeypatch.setattr(stt, "_select_provider", lambda: provider)
+    samples = _speech(17.0)
+    wav = audio.encode_wav(samples, RATE)
+    expected = len(chunking.plan_chunks(samples, RATE, 4.0, 0.5))
+
+    text = stt.transcribe_audio(wav)
+
+    assert provider.peak == 2
+    assert expected >= 4
+    assert len(text.split()) == expected
+
+    short = audio.encode_wav(_tone(3.0), RATE)
+    assert stt.transcribe_audio(short) == f"teil{zlib.crc32(short)}"
+
+
+def test_atranscribe_audio_chunks_long_recordings(monkeypatch):
+    _chunk_settings(monkeypatch)
+    provider = _RecordingProvider()
+
+    async def aget():
+        return provider
+
+    monkeypatch.setattr(stt._registry, "aget", aget)
+    samples = _speech(17.0)
+    wav = audio.encode_wav(samples, RATE)
+    expected = len(chunking.plan_chunks(samples, RATE, 4.0, 0.5))
+
+    text = asyncio.run(stt.atranscribe_audio(wav))
+
+    assert provider.peak == 2
+    assert expected >= 4
+    assert len(text.split()) == expected
@@ -0,0 +1,57 @@
+from app import metrics
+from app.transcript_facts import TranscriptFacts, scan_turn, update_facts
+
+TURNS = [
+    "Wir waren bei Herrn Schmidt in Augsburg, Anfahrt 24 km.",
+    "Geselle 3,5 Stunden und Meister 1 h.",
+    "Wir haben 2 Fenster eingebaut, die Fenster je 250 Euro.",
+    "Azubi 4 Stunden, noch einmal 30 km zurück.",
+]
+
+
+def test_scan_turn_collects_all_facts():
+    facts = scan_turn(" ".join(TURNS[:3]))
+
+    assert facts.customer_name == "Schmidt"
+    assert facts.distance == 24.0
+    assert facts.hours == {"Geselle": 3.5, "Meister": 1.0}
+    assert facts.material_counts["fenster"] == 2.0
+    assert facts.material_prices == [("Fenster", 250.0)]
+    assert facts.roles == ["Geselle", "Meister"]
+
+
+def test_update_facts_scans_only_new_turns():
+    metrics.reset()
+    facts = None
+    for index in range(len(TURNS)):
+        facts = update_facts(facts, TURNS[: index + 1])
+
+    assert metrics.snapshot()["transcript_facts.scanned_turns"] == len(TURNS)
+    assert facts.hours == {"Geselle": 3.5, "Meister": 1.0, "Azubi": 4.0}
+    # Die erste Entfernung bleibt maßgeblich, Rollen der letzten Äußerung separat.
+    assert facts.distance == 24.0
+    assert facts.last_roles == ["Azubi"]
+    assert facts.roles == ["Azubi", "Geselle", "Meister"]
+
+    restored = TranscriptFacts.from_json(facts.to_json())
+    assert restored == facts
+
+
+def test_update_facts_restarts_when_history_changes():
+    metrics.reset()
+    facts = update_facts(None, TURNS[:2])
+    facts = update_facts(facts, ["Bei Frau Weber am Markt, 5 km."])
+
+    assert metrics.snapshot()["transcript_facts.scanned_turns"] == 3
+    assert facts.scanned == 1
+    assert facts.customer_name == "Weber" and facts.hours == {}
+
+
+def test_update_facts_restarts_when_last_scanned_turn_differs():
+    metrics.reset()
+    facts = update_facts(None, TURNS[:2])
+    facts = update_facts(facts, [TURNS[0], "Geselle 2 Stunden.", TURNS[2]])
+
+    assert metrics.snapshot()["transcript_facts.scanned_turns"] == 5
+    assert facts.scanned == 3
+    assert facts.customer_name == "Schmidt" and facts.hours == {"Geselle": 2.0}
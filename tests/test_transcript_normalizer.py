@@ -0,0 +1,53 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import stt  # noqa: E402
+from app.stt.normalizer import TranscriptNormalizer, parse_german_number  # noqa: E402
+
+
+@pytest.mark.parametrize(
+    "words, expected",
+    [
+        ("drei", "3"),
+        ("Dreiundzwanzig", "23"),
+        ("zweihundertfünfzig", "250"),
+        ("einhundertdreiundzwanzig", "123"),
+        ("zweitausenddreihundert", "2300"),
+        ("neunzehnhundertneunzig", "1990"),
+        ("hundert", "100"),
+        ("eine", "1"),
+        ("drei Komma fünf", "3,5"),
+        ("zwölf Komma fünfundzwanzig", "12,25"),
+        ("null Komma null fünf", "0,05"),
+        ("Achtung", None),
+        ("Meister", None),
+    ],
+)
+def test_parse_german_number(words, expected):
+    assert parse_german_number(words) == expected
+
+
+def test_normalizer_applies_replacements_and_numbers_in_one_pass():
+    """Longest replacement wins; numbers inside other words stay untouched."""
+    normalizer = TranscriptNormalizer(
+        {"Geselden": "Gesellen", "Geseldenstunde": "Gesellenstunde"}
+    )
+    text = (
+        "Zwei Geselden je drei Komma fünf Stunden, eine Geseldenstunde, "
+        "achtundvierzig Kilometer, Achtung Elfmeter"
+    )
+    assert normalizer(text) == (
+        "2 Gesellen je 3,5 Stunden, 1 Gesellenstunde, "
+        "48 Kilometer, Achtung Elfmeter"
+    )
+    assert TranscriptNormalizer()("zehn Euro") == "10 Euro"
+
+
+def test_normalize_transcript_uses_replacement_table():
+    assert stt._normalize_transcript("dreiundzwanzig Geseldenstunden") == (
+        "23 Gesellenstunden"
+    )
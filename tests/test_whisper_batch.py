@@ -0,0 +1,152 @@
+import asyncio
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+import pytest
+
+from app import stt
+from app.stt import whisper_batch, whisper_pool
+
+
+def _pcm(value, seconds=1.0):
+    return np.full(int(seconds * 16000), value, dtype=np.float32)
+
+
+def test_batcher_groups_concurrent_requests():
+    """Collects concurrent requests and returns each caller its own text."""
+    batches = []
+
+    async def decode(windows, language):
+        batches.append(len(windows))
+        await asyncio.sleep(0.01)
+        return [f"{language}-{int(window[0])}" for window in windows]
+
+    async def main():
+        batcher = whisper_batch.WhisperBatcher(decode, batch_size=4, window=0.05)
+        return await asyncio.gather(
+            *(batcher.transcribe(_pcm(i), "de") for i in range(5))
+        )
+
+    assert asyncio.run(main()) == [f"de-{i}" for i in range(5)]
+    assert batches == [4, 1]
+
+
+def test_batcher_splits_long_audio_into_30s_windows():
+    async def decode(windows, language):
+        return [str(len(window)) for window in windows]
+
+    async def main():
+        batcher = whisper_batch.WhisperBatcher(decode, batch_size=8, window=0)
+        return await batcher.transcribe(_pcm(1, seconds=70), "de")
+
+    assert asyncio.run(main()) == "480000 480000 160000"
+
+
+def test_batcher_propagates_decode_errors():
+    async def decode(windows, language):
+        raise RuntimeError("decoder failed")
+
+    async def main():
+        batcher = whisper_batch.WhisperBatcher(decode, batch_size=2, window=0)
+        await asyncio.gather(
+            batcher.transcribe(_pcm(0), "de"), batcher.transcribe(_pcm(1), "de")
+        )
+
+    with pytest.raises(RuntimeError, match="decoder failed"):
+        asyncio.run(main())
+
+
+def test_get_batcher_follows_decoder_and_settings():
+    """A recreated provider or new settings never reuse a stale batcher."""
+
+    class Provider:
+        def __init__(self, model):
+            self.model = model
+
+        async def decode(self, windows, language):
+            return [self.model for _ in windows]
+
+    old, new = Provider("base"), Provider("small")
+
+    async def main():
+        first = whisper_batch.get_batcher(old.decode, batch_size=2, window=0)
+        same = whisper_batch.get_batcher(old.decode, batch_size=2, window=0)
+        resized = whisper_batch.get_batcher(old.decode, batch_size=4, window=0)
+        switched = whisper_batch.get_batcher(new.decode, batch_size=4, window=0)
+        text = await switched.transcribe(_pcm(1), "de")
+        return first, same, resized, switched, text
+
+    first, same, resized, switched, text = asyncio.run(main())
+    assert first is same
+    assert resized is not first and resized.batch_size == 4
+    assert switched is not resized
+    assert text == "small"
+
+
+def test_whisper_transcriber_uses_batcher(monkeypatch):
+    """Routes async transcriptions through the batching front-end."""
+    fake_whisper = types.ModuleType("whisper")
+    fake_whisper.load_model = lambda name: "model"
+    monkeypatch.setitem(sys.modules, "whisper", fake_whisper)
+    monkeypatch.setattr("shutil.which", lambda name: "/usr/bin/ffmpeg")
+    monkeypatch.setattr(stt.WhisperTranscriber, "_model_cache", {})
+    monkeypatch.setattr(stt.settings, "whisper_workers", 0)
+    monkeypatch.setattr(stt.settings, "whisper_batching", True)
+    monkeypatch.setattr(stt.settings, "whisper_batch_size", 3)
+    monkeypatch.setattr(stt.settings, "whisper_batch_window", 0.05)
+    monkeypatch.setattr(stt, "pcm_from_audio", lambda data, rate: _pcm(len(data)))
+    calls = []
+
+    def fake_decode(model, windows, language):
+        calls.append((model, len(windows)))
+        return [f"text {int(window[0])}" for window in windows]
+
+    monkeypatch.setattr(whisper_pool, "decode_windows", fake_decode)
+
+    async def main():
+        provider = stt.WhisperTranscriber()
+        return await asyncio.gather(
+            *(provider.atranscribe(b"x" * n) for n in (1, 2, 3))
+        )
+
+    assert asyncio.run(main()) == ["text 1", "text 2", "text 3"]
+    assert calls == [("model", 3)]
+
+
+def test_in_process_whisper_decodes_are_serialized(monkeypatch):
+    """Without a worker pool concurrent batches never share the model."""
+    fake_whisper = types.ModuleType("whisper")
+    fake_whisper.load_model = lambda name: "model"
+    monkeypatch.setitem(sys.modules, "whisper", fake_whisper)
+    monkeypatch.setattr("shutil.which", lambda name: "/usr/bin/ffmpeg")
+    monkeypatch.setattr(stt.WhisperTranscriber, "_model_cache", {})
+    monkeypatch.setattr(stt.settings, "whisper_workers", 0)
+    monkeypatch.setattr(stt.settings, "whisper_batching", True)
+    monkeypatch.setattr(stt.settings, "whisper_batch_size", 1)
+    monkeypatch.setattr(stt.settings, "whisper_batch_window", 0.0)
+    monkeypatch.setattr(stt, "pcm_from_audio", lambda data, rate: _pcm(len(data)))
+    active, peak = [0], [0]
+    guard = threading.Lock()
+
+    def fake_decode(model, windows, language):
+        with guard:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with guard:
+            active[0] -= 1
+        return [f"text {int(window[0])}" for window in windows]
+
+    monkeypatch.setattr(whisper_pool, "decode_windows", fake_decode)
+
+    async def main():
+        provider = stt.WhisperTranscriber()
+        return await asyncio.gather(
+            *(provider.atranscribe(b"x" * n) for n in (1, 2, 3, 4))
+        )
+
+    assert asyncio.run(main()) == ["text 1", "text 2", "text 3", "text 4"]
+    assert peak[0] == 1
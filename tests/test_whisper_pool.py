@@ -0,0 +1,85 @@
+import asyncio
+import io
+import os
+import sys
+import types
+import wave
+
+import numpy as np
+
+from app import stt
+from app.stt import whisper_pool
+
+# Platzhalter für torch/whisper, die auch in den Worker-Prozessen (spawn
+# übernimmt sys.path) importierbar sind.
+_FAKE_TORCH = "def set_num_threads(n):\n    global THREADS\n    THREADS = n\n"
+_FAKE_WHISPER = """
+import os
+import sys
+
+class _Model:
+    def __init__(self, name):
+        self.name = name
+
+    def transcribe(self, audio, language=None):
+        threads = getattr(sys.modules.get("torch"), "THREADS", 0)
+        text = f"{self.name} {language} {len(audio)} {threads} {os.getpid()}"
+        return {"text": text}
+
+def load_model(name):
+    return _Model(name)
+"""
+
+
+def _wav(seconds, rate=16000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(np.zeros(int(seconds * rate), dtype="<i2").tobytes())
+    return buffer.getvalue()
+
+
+def test_whisper_pool_transcribes_pcm_in_worker_processes(monkeypatch, tmp_path):
+    """Workers load the model once, pin threads and receive PCM arrays."""
+    (tmp_path / "torch.py").write_text(_FAKE_TORCH)
+    (tmp_path / "whisper.py").write_text(_FAKE_WHISPER)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(stt.settings, "stt_provider", "whisper")
+    monkeypatch.setattr(stt.settings, "stt_model", "tiny")
+    monkeypatch.setattr(stt.settings, "stt_language", "de")
+    monkeypatch.setattr(stt.settings, "whisper_workers", 2)
+    monkeypatch.setattr(stt.settings, "whisper_threads", 3)
+    monkeypatch.setattr("shutil.which", lambda name: "/usr/bin/ffmpeg")
+    monkeypatch.setattr(stt.WhisperTranscriber, "_dependencies_checked", False)
+
+    try:
+        whisper_pool.warm_up()
+        provider = stt._select_provider()
+        assert not hasattr(provider, "model")
+        # 44,1 kHz werden vor dem Versand auf 16 kHz umgerechnet.
+        text = asyncio.run(provider.atranscribe(_wav(1.0, rate=44100)))
+        name, language, samples, threads, pid = text.split()
+        assert (name, language, samples, threads) == ("tiny", "de", "16000", "3")
+        assert int(pid) != os.getpid()
+        assert provider.transcribe(_wav(0.5)).split()[2] == "8000"
+    finally:
+        whisper_pool.shutdown()
+
+
+def test_whisper_in_process_mode_uses_cached_model(monkeypatch):
+    """With WHISPER_WORKERS=0 the model is cached in the API process."""
+    fake_whisper = types.ModuleType("whisper")
+    exec(_FAKE_WHISPER, fake_whisper.__dict__)
+    monkeypatch.setitem(sys.modules, "whisper", fake_whisper)
+    monkeypatch.setattr(stt.settings, "stt_model", "base")
+    monkeypatch.setattr(stt.settings, "whisper_workers", 0)
+    monkeypatch.setattr("shutil.which", lambda name: "/usr/bin/ffmpeg")
+    monkeypatch.setattr(stt.WhisperTranscriber, "_dependencies_checked", False)
+    monkeypatch.setattr(stt.WhisperTranscriber, "_model_cache", {})
+
+    first = stt.WhisperTranscriber()
+    assert stt.WhisperTranscriber._dependencies_checked
+    assert stt.WhisperTranscriber().model is first.model
+    assert first.transcribe(_wav(0.25)).startswith("base de 4000")